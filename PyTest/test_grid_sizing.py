@@ -0,0 +1,73 @@
+# PyTest/test_grid_sizing.py
+"""
+Unit tests for sampled column widths and on-demand row heights (grid_sizing.py).
+"""
+
+import os
+import sys
+import pytest
+import pandas as pd
+from PyQt6.QtWidgets import QApplication, QTableWidget, QTableWidgetItem
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from grid_sizing import fit_columns, longest_rows, VisibleRowSizer
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    yield app
+
+
+def _table(rows, cols=2):
+    table = QTableWidget(len(rows), cols)
+    for r, texts in enumerate(rows):
+        for c, text in enumerate(texts):
+            table.setItem(r, c, QTableWidgetItem(text))
+    return table
+
+
+def test_fit_columns_matches_qt_on_sampled_rows(qapp):
+    table = _table([("A1", "Concrete grade 25 in slabs"), ("A2", "Formwork"), ("A3", "")])
+    fit_columns(table)
+    widths = [table.columnWidth(c) for c in range(2)]
+    table.resizeColumnsToContents()
+    assert widths == [table.columnWidth(c) for c in range(2)]
+
+
+def test_fit_columns_measures_longest_row_outside_sample(qapp):
+    rows = [("A", "short")] * 200
+    rows[100] = ("A", "A much longer description in the middle of the bill")
+    table = _table(rows)
+    fit_columns(table, edge=5)
+    sampled = table.columnWidth(1)
+    fit_columns(table, longest={1: 100}, edge=5)
+    assert table.columnWidth(1) > sampled
+    fit_columns(table, longest={1: 100}, edge=5, max_width=60)
+    assert table.columnWidth(1) == 60
+
+
+def test_longest_rows_of_dataframe():
+    df = pd.DataFrame([["a", 1.5], ["abc", ""], ["", 123456]], dtype=object)
+    assert longest_rows(df) == {0: 1, 1: 2}
+    assert longest_rows(df.iloc[0:0]) == {}
+
+
+def test_row_sizer_only_sizes_rows_in_view(qapp):
+    text = "Excavate trench not exceeding 1.5m deep and dispose of surplus material off site"
+    table = _table([("A", text)] * 500)
+    table.setWordWrap(True)
+    table.setColumnWidth(1, 80)
+    table.resize(300, 200)
+    default = table.rowHeight(499)
+    sizer = VisibleRowSizer(table)
+    sizer.set_enabled(True)
+    assert table.rowHeight(0) > default
+    assert table.rowHeight(499) == default
+    # Scrolling to the end sizes the rows that come into view
+    table.scrollToBottom()
+    sizer.size_visible_rows()
+    assert table.rowHeight(499) > default
@@ -0,0 +1,93 @@
+# PyTest/test_pboq_batch.py
+"""
+Unit tests for the command-line batch pricing runner (pboq_batch.py).
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pboq_batch
+from pboq_batch import parse_pipeline, resolve_mappings, run_batch, format_report
+
+
+def _make_bill(project_dir, name, rows, state):
+    pboq_dir = os.path.join(project_dir, "Priced BOQs")
+    os.makedirs(pboq_dir, exist_ok=True)
+    db_path = os.path.join(pboq_dir, name)
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, "Column 3" TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+    state_dir = os.path.join(project_dir, "PBOQ States")
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, name + ".json"), 'w') as f:
+        json.dump(state, f)
+    return db_path
+
+
+@pytest.fixture
+def project(tmp_path):
+    project_dir = str(tmp_path)
+    state = {'mappings': {'ref': 0, 'desc': 1, 'qty': 2, 'unit': 3},
+             'extend_cb0': True, 'extend_cb1': True, 'extend_cb2': True, 'extend_cb3': True,
+             'dummy_rate': 0.5, 'collect_kw': "carried", 'collect_desc': True, 'collect_amount': False}
+    _make_bill(project_dir, "PBOQ_A.db", [
+        ("Bill 1", "A", "Concrete", "4", "m3"),
+        ("Bill 1", "B", "Formwork", "10", "m2"),
+        ("Bill 1", "", "Carried to collection", "", ""),
+    ], state)
+    _make_bill(project_dir, "PBOQ_B.db", [("Bill 1", "A", "Brickwork", "2", "m2")], state)
+    return project_dir
+
+
+def test_parse_pipeline_accepts_names_dicts_and_files(tmp_path):
+    assert [s['op'] for s in parse_pipeline("extend, recalc")] == ["extend", "recalc"]
+    assert parse_pipeline([{"op": "Extend", "dummy_rate": 1}]) == [{"op": "extend", "dummy_rate": 1}]
+    path = tmp_path / "pipe.json"
+    path.write_text(json.dumps(["recalc", {"op": "collect", "keyword": "total"}]))
+    assert [s['op'] for s in parse_pipeline(str(path))] == ["recalc", "collect"]
+    with pytest.raises(ValueError):
+        parse_pipeline("extend,bogus")
+
+
+def test_resolve_mappings_detects_pricing_columns():
+    db_columns = ["Sheet", "Column 0", "Column 1", "Column 2", "Column 3", "Bill Rate", "Bill Amount", "GrossRate"]
+    m = resolve_mappings(db_columns, {'ref': 0, 'desc': 1, 'qty': 2, 'unit': 3, 'rate': 99})
+    assert (m['bill_rate'], m['bill_amount'], m['rate']) == (4, 5, 6)
+    assert m['plug_rate'] == -1
+
+
+def test_run_batch_prices_every_bill(project):
+    report = run_batch(project, "extend,recalc,collect", workers=1)
+    assert report['bills'] == 2 and report['failed'] == 0
+    assert [r['bill'] for r in report['results']] == ["PBOQ_A.db", "PBOQ_B.db"]
+    assert [s['op'] for s in report['results'][0]['steps']] == ["load", "extend", "recalc", "collect", "persist"]
+
+    conn = sqlite3.connect(os.path.join(project, "Priced BOQs", "PBOQ_A.db"))
+    rows = conn.execute('SELECT "Bill Rate", "Bill Amount" FROM pboq_items ORDER BY rowid').fetchall()
+    conn.close()
+    assert rows == [("0.50", "2.00"), ("0.50", "5.00"), (None, "7.00")]
+    assert "2 bill(s), 0 failed" in format_report(report)
+
+
+def test_dry_run_leaves_bills_untouched(project):
+    report = run_batch(project, ["extend"], workers=1, dry_run=True)
+    assert report['changed_cells'] == 6
+    conn = sqlite3.connect(os.path.join(project, "Priced BOQs", "PBOQ_B.db"))
+    assert conn.execute('SELECT "Bill Rate" FROM pboq_items').fetchall() == [(None,)]
+    conn.close()
+
+
+def test_cli_writes_report(project):
+    report_path = os.path.join(project, "report.json")
+    assert pboq_batch.main([project, "--steps", "extend,recalc", "--workers", "1", "--report", report_path]) == 0
+    with open(report_path) as f:
+        assert json.load(f)['changed_cells'] == 6
+    assert os.path.exists(os.path.join(project, "report.txt"))
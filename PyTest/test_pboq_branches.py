@@ -0,0 +1,96 @@
+# PyTest/test_pboq_branches.py
+"""
+Unit tests for PBOQ snapshots and what-if branches (pboq_branches.py).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic
+from pboq_journal import PBOQJournal
+import pboq_branches as branches
+
+MAPPINGS = {'description': 1, 'qty': 2, 'bill_rate': 3, 'bill_amount': 4}
+
+
+@pytest.fixture
+def bill(tmp_path):
+    folder = tmp_path / "Priced BOQs"
+    folder.mkdir()
+    path = str(folder / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, '
+                 '"Column 3" TEXT, "Column 4" TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?, ?)", [
+        ("Bill 1", "A", "Concrete", "10", "5.00", "50.00"),
+        ("Bill 1", "B", "Formwork", "4", "2.50", "10.00"),
+        ("Bill 2", "A", "Blockwork", "3", "", "1,200.00"),
+    ])
+    conn.commit()
+    _, db_columns = PBOQLogic.ensure_schema(conn)
+    conn.close()
+    return path, db_columns
+
+
+def _values(path, col):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute(f'SELECT "{col}" FROM pboq_items ORDER BY rowid')]
+    finally:
+        conn.close()
+
+
+def test_snapshot_and_restore(bill):
+    path, db_columns = bill
+    snapshot = branches.create_snapshot(path, "before/changes")
+    assert os.path.dirname(snapshot).endswith(branches.SNAPSHOT_DIR)
+    assert os.path.basename(snapshot).endswith(" beforechanges.db")
+    assert branches.list_snapshots(path) == [snapshot]
+
+    PBOQLogic.persist_batch_updates(path, db_columns, 4, [(1, "99.00")])
+    branches.restore_snapshot(snapshot, path)
+    assert _values(path, "Column 4") == ["50.00", "10.00", "1,200.00"]
+
+
+def test_branch_diff_compare_and_merge(bill):
+    path, db_columns = bill
+    branches.create_branch(path, "Cheaper concrete", [(1, "Column 3", "4.00"), (2, "Column 1", "Formwork")])
+    branches.create_branch(path, "Blockwork plug", [(3, "Column 4", "1,000.00")])
+    assert [(n, c) for n, _, c in branches.list_branches(path)] == [("Cheaper concrete", 2), ("Blockwork plug", 1)]
+    # Cells equal to the bill are not differences
+    assert branches.branch_diff(path, "Cheaper concrete") == [(1, "Column 3", "5.00", "4.00")]
+
+    totals = branches.compare_branches(path, db_columns, MAPPINGS)
+    assert totals[branches.BASE] == {"Bill 1": 60.0, "Bill 2": 1200.0}
+    assert totals["Cheaper concrete"] == {"Bill 1": 50.0, "Bill 2": 1200.0}    # re-extended 10 x 4.00
+    assert totals["Blockwork plug"] == {"Bill 1": 60.0, "Bill 2": 1000.0}
+    # The bill itself is untouched until a branch is merged
+    assert _values(path, "Column 3") == ["5.00", "2.50", ""]
+
+    assert branches.merge_branch(path, "Blockwork plug") == {3}
+    assert _values(path, "Column 4")[2] == "1,000.00"
+    assert [n for n, _, _ in branches.list_branches(path)] == ["Cheaper concrete"]
+    branches.delete_branch(path, "Cheaper concrete")
+    assert branches.list_branches(path) == []
+    with pytest.raises(KeyError):
+        branches.branch_diff(path, "Cheaper concrete")
+
+
+def test_branch_from_last_journaled_operation(bill):
+    path, db_columns = bill
+    journal = PBOQJournal(path)
+    journal.begin("Re-rate")
+    PBOQLogic.persist_batch_updates(path, db_columns, 3, [(1, "6.00"), (2, "3.00")])
+    PBOQLogic.persist_batch_updates(path, db_columns, 3, [(1, "7.00")])
+    journal.commit()
+
+    cells = journal.last_operation_cells()
+    assert sorted(cells) == [(1, "Column 3", "7.00"), (2, "Column 3", "3.00")]
+    branches.create_branch(path, "Re-rate", cells)
+    journal.undo()
+    assert _values(path, "Column 3") == ["5.00", "2.50", ""]
+    assert branches.compare_branches(path, db_columns, MAPPINGS, ["Re-rate"])["Re-rate"]["Bill 1"] == 82.0
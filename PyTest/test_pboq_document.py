@@ -0,0 +1,210 @@
+# PyTest/test_pboq_document.py
+"""
+Unit tests for the headless PBOQ pricing engine (pboq_document.py).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_document import (PBOQDocument, CollectionIndex, CellDelta, extension_amount, extension_amounts,
+                           compile_merge_plan, apply_merge_plan, merged_select, LOGICAL_COLUMNS,
+                           BLACK, GRAY_TEXT, COLLECT_BG, YELLOW, PURPLE)
+from pboq_logic import PBOQLogic
+from pboq_match import FuzzyIndex
+
+MAPPINGS = {'ref': 0, 'desc': 1, 'qty': 2, 'unit': 3, 'bill_rate': 4, 'bill_amount': 5,
+            'rate': 6, 'rate_code': 7, 'plug_rate': -1, 'prov_sum': -1, 'pc_sum': -1, 'sub_rate': -1}
+
+
+def _doc(rows):
+    doc = PBOQDocument(MAPPINGS, 8)
+    sheet = doc.add_sheet("Bill 1")
+    for i, values in enumerate(rows):
+        cells = {c: (v, YELLOW if c in (4, 5) else BLACK, BLACK) for c, v in enumerate(values)}
+        doc.append_row(sheet, i + 1, i, cells)
+    return doc
+
+
+def test_extension_amount_rounding_and_markers():
+    # Qty 4dp, Rate 2dp, Amount 2dp ("precision as displayed")
+    assert extension_amount("1.23456", "10.005", YELLOW, YELLOW) == "{:,.2f}".format(round(round(1.23456, 4) * round(10.005, 2), 2))
+    assert extension_amount("1,000", "2.50", YELLOW, "") == "2,500.00"
+    # Purple Bill Amount with a default Bill Rate is a lump sum plug
+    assert extension_amount("3", "2", PURPLE, YELLOW) is None
+    assert extension_amount("", "2", YELLOW, YELLOW) is None
+    assert extension_amount("abc", "2", YELLOW, YELLOW) is None
+    # Parsed like pboq_numeric.parse_number: currency symbols and spaces go, malformed text is no number
+    assert extension_amount("1 000", "₵ 2.50", YELLOW, YELLOW) == "2,500.00"
+    assert extension_amount("1-2", "2", YELLOW, YELLOW) is None
+
+
+def test_extend_then_revert():
+    doc = _doc([
+        ["A", "Concrete", "10", "m3", "", "", "", ""],
+        ["B", "Heading", "", "", "", "", "", ""],
+        ["C", "Priced", "2", "m2", "5.00", "10.00", "", ""],
+    ])
+    deltas = doc.extend([0, 1, 2, 3], 0.1)
+    assert [(d.rowid, d.col, d.text) for d in deltas] == [(1, 4, "0.10"), (1, 5, "1.00")]
+    assert doc.sheets[0].fg[4][0] == GRAY_TEXT
+
+    reverted = doc.revert_extend(0.1)
+    assert [(d.rowid, d.col, d.text, d.clear_fmt) for d in reverted] == [(1, 4, "", True), (1, 5, "", True)]
+    assert doc.sheets[0].text[4][0] == ""
+
+
+def test_bulk_extension_matches_scalar_rules():
+    # Ties, thousands separators, words, exotic float syntax and every price-type colour
+    texts = [None, "", "  ", "Incl.", "nan", "1e3", "1_000", "--5", "2.675", "1.005", "0.125",
+             "1,234.5678", "-3", "12.3.4", "0.00005", "999999.995", "123456789012345678",
+             "$5", "1 000", "1-2"]
+    bgs = [YELLOW, PURPLE, GRAY_TEXT, "", BLACK]
+    qty, rate, amt_bg, rate_bg = [], [], [], []
+    for i, q in enumerate(texts):
+        for j, r in enumerate(texts):
+            qty.append(q); rate.append(r)
+            amt_bg.append(bgs[(i + j) % len(bgs)]); rate_bg.append(bgs[(i * j) % len(bgs)])
+    expected = [extension_amount(*row) for row in zip(qty, rate, amt_bg, rate_bg)]
+    assert extension_amounts(qty, rate, amt_bg, rate_bg) == expected
+
+
+def test_recalculate_returns_only_changed_rows():
+    doc = _doc([
+        ["A", "x", "3", "m", "2.00", "6.00", "", ""],
+        ["B", "y", "3", "m", "2.00", "5.00", "", ""],
+    ])
+    deltas = doc.recalculate()
+    assert [(d.rowid, d.text) for d in deltas] == [(2, "6.00")]
+    assert doc.recalculate() == []
+    doc.sheets[0].text[5][0] = "6"
+    assert [(d.rowid, d.text) for d in doc.recalculate(rowids=[1, 1, 99])] == [(1, "6.00")]
+
+
+def test_collect_sums_between_keyword_rows():
+    doc = _doc([
+        ["A", "x", "1", "m", "", "100.00", "", ""],
+        ["B", "y", "1", "m", "", "1,000.50", "", ""],
+        ["", "Carried to collection", "", "", "", "", "", ""],
+        ["C", "z", "1", "m", "", "7.00", "", ""],
+        ["", "Carried to collection", "", "", "", "", "", ""],
+    ])
+    deltas = doc.collect("carried")
+    assert [(d.rowid, d.text, d.bg) for d in deltas] == [(3, "1,100.50", COLLECT_BG), (5, "7.00", COLLECT_BG)]
+    # Collection cells never feed later sums
+    assert [d.text for d in doc.collect("carried")] == ["1,100.50", "7.00"]
+    assert len(doc.revert_collect()) == 2
+
+
+def test_collection_index_updates_only_affected_sections():
+    rows = []
+    for page in range(20):
+        rows += [["R", "item", "1", "m", "", "{:,.2f}".format(page * 10 + i + 0.1), "", ""] for i in range(5)]
+        rows.append(["", "Carried to collection", "", "", "", "", "", ""])
+    doc = _doc(rows)
+    index = CollectionIndex()
+    assert len(index.collect(doc, "carried")) == 20
+    assert index.collect(doc, "carried") == []
+
+    # One amount on page 3 changes: only that page's collection cell is rewritten
+    doc.apply([CellDelta(3 * 6 + 2, 5, text="1,000.00")])
+    deltas = index.collect(doc, "carried")
+    assert [(d.rowid, d.text) for d in deltas] == [(3 * 6 + 6, "1,129.40")]
+
+    # A new keyword row splits page 5; full pass agrees with the incremental state
+    doc.apply([CellDelta(5 * 6 + 3, 1, text="Carried to collection")])
+    incremental = index.collect(doc, "carried")
+    assert [d.rowid for d in incremental] == [5 * 6 + 3, 5 * 6 + 6]
+    expected = {d.rowid: d.text for d in doc.collect("carried")}
+    assert {d.rowid: d.text for d in index.collect(doc, "carried", full=True)} == expected
+
+
+def test_fuzzy_matches_price_only_unpriced_quantity_rows():
+    index = FuzzyIndex()
+    index.add("Grade 25 concrete in foundations", ("150.00", "GR-003"), unit="m3")
+    doc = _doc([
+        ["A", "Substructure: Grade 25 concrete in foundation", "4", "m3", "", "", "", ""],
+        ["B", "Grade 25 concrete in foundations", "", "", "", "", "", ""],
+        ["C", "Grade 25 concrete in foundations", "2", "m3", "", "", "99.00", "GR-X"],
+    ])
+    matches = doc.fuzzy_matches(index, min_score=0.85)
+    assert list(matches) == [1] and matches[1][0] == ("150.00", "GR-003")
+
+    deltas = doc.price_rows({rid: hit for rid, (hit, _) in matches.items()})
+    assert [(d.rowid, d.col, d.text, d.sor_mark) for d in deltas if d.sor_mark] == [(1, 6, "150.00", True), (1, 7, "GR-003", True)]
+    assert doc.fuzzy_matches(index) == {}
+
+
+def test_sql_merge_matches_python_merge():
+    values = [None, "", "  ", "\t", "None", "0", 0, 0.0, 7, 2.5, "x", " y "]
+    mappings = {'sub_name': 0, 'sub_category': 1, 'plug_rate': 2, 'plug_factor': 2}
+    db_columns = ["Sheet", "Column 0", "Column 1", "Column 2"]
+    plan = compile_merge_plan(mappings, len(db_columns))
+    assert plan == [(1, 1, False), (2, 4, True), (3, 18, True), (3, 24, True)]
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0", "Column 1", "Column 2", '
+                 + ", ".join(LOGICAL_COLUMNS) + ")")
+    rows = [(p, l) for p in values for l in values]
+    for p, l in rows:
+        logical = [None] * len(LOGICAL_COLUMNS)
+        logical[1] = logical[4] = logical[18] = l
+        conn.execute(f"INSERT INTO pboq_items VALUES ({', '.join('?' * (4 + len(LOGICAL_COLUMNS)))})",
+                     ["S", p, p, p] + logical)
+    merged = conn.execute(f"SELECT {', '.join(merged_select(db_columns, plan))} FROM pboq_items ORDER BY rowid").fetchall()
+    for (p, l), got in zip(rows, merged):
+        logical = [None] * len(LOGICAL_COLUMNS)
+        logical[1] = logical[4] = logical[18] = l
+        assert list(got) == apply_merge_plan(["S", p, p, p], logical, plan), (p, l)
+    conn.close()
+
+
+def test_load_and_persist_roundtrip(tmp_path):
+    db_path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, "Column 3" TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?)",
+                     [("Bill 1", "A", "Concrete", "4", "m3"), ("Bill 1", "B", "Heading", "", "")])
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(db_path)
+    _, db_columns = PBOQLogic.ensure_schema(conn)
+    conn.close()
+    mappings = {'ref': 0, 'desc': 1, 'qty': 2, 'unit': 3,
+                'bill_rate': db_columns.index("Bill Rate") - 1, 'bill_amount': db_columns.index("Bill Amount") - 1}
+
+    doc, db_columns = PBOQDocument.load(db_path, mappings)
+    deltas = doc.extend([0, 1, 2, 3], 0.5)
+    doc.persist(db_path, db_columns, deltas)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT "Bill Rate", "Bill Amount" FROM pboq_items ORDER BY rowid').fetchall() == \
+        [("0.50", "2.00"), (None, None)]
+    fmt = PBOQLogic.load_formatting(conn)
+    assert fmt.get((0, mappings['bill_rate'])) == {'font_color': GRAY_TEXT}
+    conn.close()
+
+    reloaded, _ = PBOQDocument.load(db_path, mappings)
+    assert reloaded.sheets[0].fg[mappings['bill_rate']][0] == GRAY_TEXT
+
+
+def test_engine_colours_match_the_viewer_constants():
+    import pboq_constants as const
+    import pboq_document
+    assert {role: bg for role, bg in pboq_document.ROLE_BGS.items()} == \
+        {role: c.name() for role, c in const.ROLE_COLORS.items()}
+    assert (GRAY_TEXT, COLLECT_BG, pboq_document.FLAGGED_BG, pboq_document.LINK_CYAN) == (
+        const.COLOR_GRAY_TEXT.name(), const.COLOR_COLLECT.name(), const.COLOR_FLAGGED.name(), const.COLOR_LINK_CYAN.name())
+    assert [pboq_document.column_default_bg(c) for c in (0, 4, 6, 9)] == [
+        c.name() for c in (const.COL_COLOR_BLUE, const.COL_COLOR_YELLOW, const.COL_COLOR_GREEN, const.COL_COLOR_PURPLE)]
+
+
+def test_engine_and_batch_run_without_qt():
+    import subprocess
+    code = "import sys, pboq_document, pboq_batch, pboq_export; sys.exit('PyQt6' in sys.modules)"
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
@@ -3,8 +3,16 @@
 Unit tests for PBOQ Excel exporter and color sanitization (pboq_export.py).
 """
 
+import os
+import sys
 import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from pboq_export import _sanitize_color, PBOQExcelExporter
+from pboq_logic import PBOQLogic
+
+openpyxl = pytest.importorskip("openpyxl")
 
 
 def test_sanitize_color_valid_hex():
@@ -29,3 +37,65 @@ def test_sanitize_color_invalid_or_none():
     assert _sanitize_color(None, fallback="FFFFFF") == "FFFFFF"
     assert _sanitize_color("", fallback="000000") == "000000"
     assert _sanitize_color("invalid_color_xyz", fallback="FFFFFF") == "FFFFFF"
+
+
+def _make_bill(project_dir):
+    import json
+    import sqlite3
+    os.makedirs(os.path.join(project_dir, "PBOQ States"))
+    db_path = os.path.join(project_dir, "PBOQ_Test.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, '
+                 '"Column 3" TEXT, "Column 4" TEXT, "Column 5" TEXT, IsFlagged INTEGER DEFAULT 0)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+        ("Bill 1", "", "ELEMENT 1: CONCRETE", "", "", "", "", 0),
+        ("Bill 1", "A", "Concrete grade 25 in slabs", "1,250.50", "m3", "12.50", "15,631.25", 0),
+        ("Bill 1", "B", "Formwork", "40", "m2", "", "", 1),
+        ("Bill 2", "A", "Blockwork", "3", "m2", "rate", "1,200.00", 0),
+    ])
+    conn.commit()
+    PBOQLogic.ensure_schema(conn)
+    conn.close()
+    PBOQLogic.persist_batch_cell_formatting(db_path, 1, [(0, {'bold': True})])
+    PBOQLogic.persist_batch_cell_formatting(db_path, 5, [(1, {'bg_color': '#e1bee7', 'font_color': '#808080', 'italic': True})])
+    with open(os.path.join(project_dir, "PBOQ States", "PBOQ_Test.db.json"), "w") as f:
+        json.dump({"mappings": {"ref": 0, "desc": 1, "qty": 2, "unit": 3, "bill_rate": 4, "bill_amount": 5}}, f)
+    return db_path
+
+
+def _workbook_cells(path):
+    """{sheet title: (freeze panes, column widths, {coordinate: (value, number format, styles...)})}"""
+    wb = openpyxl.load_workbook(path)
+    return {ws.title: (ws.freeze_panes, {k: d.width for k, d in ws.column_dimensions.items()},
+                       {c.coordinate: (c.value, c.number_format, repr(c.font), repr(c.fill), repr(c.alignment),
+                                       repr(c.border)) for row in ws.iter_rows() for c in row})
+            for ws in wb.worksheets}
+
+
+def test_streaming_export_matches_workbook_export(tmp_path):
+    db_path = _make_bill(str(tmp_path))
+    exporter = PBOQExcelExporter(db_path, str(tmp_path))
+    assert exporter.export(str(tmp_path / "full.xlsx"), streaming=False)[0]
+    ok, message = exporter.export(str(tmp_path / "stream.xlsx"))
+    assert ok and message.startswith("Exported 2 sheet(s)")
+
+    cells = _workbook_cells(str(tmp_path / "stream.xlsx"))
+    assert cells == _workbook_cells(str(tmp_path / "full.xlsx"))
+    assert list(cells) == ["Bill 1", "Bill 2"]
+    bill = cells["Bill 1"][2]
+    assert bill["C3"][:2] == (1250.5, '#,##0.00')
+    assert "E1BEE7" in bill["F3"][3] and "i=True" in bill["F3"][2]
+    assert "FFCDD2" in bill["A4"][3]              # flagged row
+
+
+def test_export_with_pool_and_progress(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    db_path = _make_bill(str(tmp_path))
+    exporter = PBOQExcelExporter(db_path, str(tmp_path))
+    calls = []
+    with ThreadPoolExecutor(2) as pool:
+        ok, _ = exporter.export(str(tmp_path / "pool.xlsx"), pool=pool, progress=lambda *a: calls.append(a))
+    assert ok
+    assert calls == [(3, 4, "Bill 1"), (4, 4, "Bill 2")]
+    assert exporter.export(str(tmp_path / "plain.xlsx"))[0]
+    assert _workbook_cells(str(tmp_path / "pool.xlsx")) == _workbook_cells(str(tmp_path / "plain.xlsx"))
@@ -0,0 +1,70 @@
+# PyTest/test_pboq_flags.py
+"""
+Unit tests for the review queue of a bill (pboq_flags): loading, ordering, navigation and batch writes.
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_flags import FlagSet, write_flags
+
+
+@pytest.fixture
+def bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, IsFlagged INTEGER)')
+    # Bill 2 comes first in the tab order although its rows were added later
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?)", [
+        ("Bill 1", "A", 1), ("Bill 1", "B", 0), ("Bill 1", "C", 1), ("Bill 2", "D", 1), ("", "E", None),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _load(path, sheets=("Bill 2", "Bill 1", "Sheet 1")):
+    conn = sqlite3.connect(path)
+    try:
+        return FlagSet.load(conn, sheets)
+    finally:
+        conn.close()
+
+
+def test_flags_load_in_review_order(bill):
+    flags = _load(bill)
+    assert list(flags) == [4, 1, 3] and len(flags) == 3
+    assert 1 in flags and 2 not in flags
+    assert flags.rowids_of("Bill 1") == {1, 3}
+
+
+def test_following_wraps_in_both_directions(bill):
+    flags = _load(bill)
+    assert flags.following("Bill 2", 4) == ("Bill 1", 1)
+    assert flags.following("Bill 1", 2) == ("Bill 1", 3)       # from an unflagged row
+    assert flags.following("Bill 1", 3) == ("Bill 2", 4)
+    assert flags.following("Bill 2", 4, backwards=True) == ("Bill 1", 3)
+    assert flags.following("Bill 1", None) == ("Bill 1", 1)
+    assert flags.following(None, None) == ("Bill 2", 4)
+    assert FlagSet().following("Bill 1", 1) is None
+
+
+def test_batch_writes_and_reloads(bill):
+    flags = _load(bill)
+    assert write_flags(bill, [1, 3, 5], False)
+    conn = sqlite3.connect(bill)
+    try:
+        flags.reload_rows(conn, [1, 3, 5])
+        assert list(flags) == [4]
+        assert write_flags(bill, [2, 5], True)
+        flags.reload_rows(conn, [2, 5])
+    finally:
+        conn.close()
+    assert list(flags) == [4, 2, 5]
+    assert list(_load(bill)) == list(flags)
+    flags.set("Bill 2", 4, False)
+    assert flags.following("Sheet 1", 5) == ("Bill 1", 2)
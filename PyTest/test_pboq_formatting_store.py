@@ -0,0 +1,78 @@
+# PyTest/test_pboq_formatting_store.py
+"""
+Unit tests for the compact PBOQ formatting store (interned styles + cell style ids).
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE pboq_items (Sheet TEXT)")
+    conn.execute("CREATE TABLE pboq_formatting (row_idx INTEGER, col_idx INTEGER, fmt_json TEXT)")
+    rows = [(r, c, json.dumps({'bold': True})) for r in range(20) for c in range(3)]
+    rows.append((5, 1, json.dumps({'bg_color': '#ffa500'})))  # duplicate cell: last row wins
+    conn.executemany("INSERT INTO pboq_formatting VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_legacy_rows_are_migrated_and_interned(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    PBOQLogic.ensure_schema(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE name='pboq_formatting'")
+    assert cursor.fetchone() is None
+    cursor.execute("SELECT COUNT(*) FROM pboq_styles")
+    assert cursor.fetchone()[0] == 2
+    cursor.execute("SELECT COUNT(*) FROM pboq_cell_styles")
+    assert cursor.fetchone()[0] == 60
+
+    fmt = PBOQLogic.load_formatting(conn)
+    assert len(fmt) == 60
+    assert fmt.get((0, 0)) == {'bold': True}
+    assert fmt.get((5, 1)) == {'bg_color': '#ffa500'}
+    assert fmt.get((99, 0)) is None
+    assert fmt.get((99, 0), {}) == {}
+    assert fmt.style_id((0, 0)) == fmt.style_id((19, 2))
+    conn.close()
+
+
+def test_persist_merges_into_existing_style(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    PBOQLogic.ensure_schema(conn)
+    conn.close()
+
+    PBOQLogic.persist_cell_formatting(legacy_db, 0, 0, bg_color='#ff0000')
+    PBOQLogic.persist_batch_cell_formatting(legacy_db, 2, [(1, {'font_color': '#777777'}),
+                                                           (2, {'font_color': '#777777'})])
+    PBOQLogic.clear_cell_formatting(legacy_db, 3, 2)
+
+    conn = sqlite3.connect(legacy_db)
+    fmt = PBOQLogic.load_formatting(conn)
+    assert fmt[(0, 0)] == {'bold': True, 'bg_color': '#ff0000'}
+    assert fmt[(1, 2)] == {'bold': True, 'font_color': '#777777'}
+    assert fmt.style_id((1, 2)) == fmt.style_id((2, 2))
+    assert (3, 2) not in fmt
+    assert fmt.get((0, 1)) == {'bold': True}
+    conn.close()
+
+
+def test_replace_formatting_discards_previous_styles(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    PBOQLogic.replace_formatting(conn, [((0, 0), {'italic': True})])
+    fmt = PBOQLogic.load_formatting(conn)
+    assert dict(fmt.items()) == {(0, 0): {'italic': True}}
+    conn.close()
@@ -0,0 +1,96 @@
+# PyTest/test_pboq_journal.py
+"""
+Unit tests for the undo/redo journal of PBOQ operations (pboq_journal.py).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic
+from pboq_journal import PBOQJournal
+
+
+@pytest.fixture
+def bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?)",
+                     [("Bill 1", "A", "Concrete", ""), ("Bill 1", "B", "Formwork", "")])
+    conn.commit()
+    _, db_columns = PBOQLogic.ensure_schema(conn)
+    conn.close()
+    return path, db_columns
+
+
+def _values(path, col="Column 2"):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute(f'SELECT "{col}" FROM pboq_items ORDER BY rowid')]
+    finally:
+        conn.close()
+
+
+def _styles(path):
+    conn = sqlite3.connect(path)
+    try:
+        return PBOQLogic._read_cell_styles(conn.cursor())
+    finally:
+        conn.close()
+
+
+def test_undo_redo_replays_values_and_styles(bill):
+    path, db_columns = bill
+    PBOQLogic.persist_batch_cell_formatting(path, 2, [(1, {'bg_color': '#ffff00'})])
+    journal = PBOQJournal(path)
+
+    journal.begin("Extend")
+    journal.begin("Link")      # nested operations join the outer one
+    PBOQLogic.persist_batch_updates(path, db_columns, 2, [(1, "0.10"), (2, "0.10")])
+    PBOQLogic.persist_batch_updates(path, db_columns, 2, [(1, "0.20")])
+    journal.commit()
+    PBOQLogic.persist_batch_cell_formatting(path, 2, [(0, {'font_color': '#808080'}), (1, {'bold': True})])
+    assert journal.commit() == 5
+    assert journal.undo_label() == "Extend" and journal.redo_label() is None
+
+    # Writes outside an operation are not journaled
+    PBOQLogic.persist_batch_updates(path, db_columns, 1, [(2, "Formwork to soffits")])
+
+    change = journal.undo()
+    assert (change.label, change.rowids, change.style_cells) == ("Extend", {1, 2}, {(0, 2), (1, 2)})
+    assert _values(path) == ["", ""]
+    assert _styles(path) == {(1, 2): {'bg_color': '#ffff00'}}
+    assert _values(path, "Column 1") == ["Concrete", "Formwork to soffits"]
+    assert journal.undo() is None and journal.redo_label() == "Extend"
+
+    journal.redo()
+    assert _values(path) == ["0.20", "0.10"]
+    assert _styles(path) == {(0, 2): {'font_color': '#808080'}, (1, 2): {'bg_color': '#ffff00', 'bold': True}}
+
+
+def test_history_survives_reopen_and_new_operation_drops_redo(bill):
+    path, db_columns = bill
+    journal = PBOQJournal(path)
+    for label, value in (("First", "1.00"), ("Second", "2.00")):
+        journal.begin(label)
+        PBOQLogic.persist_batch_updates(path, db_columns, 2, [(1, value)])
+        journal.commit()
+    journal.begin("Nothing")
+    assert journal.commit() == 0
+
+    reopened = PBOQJournal(path)
+    assert reopened.undo_label() == "Second"
+    reopened.undo()
+    assert _values(path)[0] == "1.00"
+
+    reopened.begin("Third")
+    PBOQLogic.persist_batch_updates(path, db_columns, 2, [(2, "3.00")])
+    reopened.commit()
+    assert reopened.redo_label() is None
+    reopened.undo()
+    reopened.undo()
+    assert _values(path) == ["", ""]
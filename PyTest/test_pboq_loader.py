@@ -0,0 +1,86 @@
+# PyTest/test_pboq_loader.py
+"""
+Unit tests for the per-sheet PBOQ reader used by lazy tab loading (pboq_loader.py).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic
+from pboq_loader import read_sheet_index, read_sheet_entries, read_row_entries, iter_sheet_entries, SheetLoadWorker
+
+
+@pytest.fixture
+def bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, "Column 3" TEXT)')
+    conn.executemany('INSERT INTO pboq_items (Sheet, "Column 0", "Column 1", "Column 2", "Column 3") VALUES (?, ?, ?, ?, ?)', [
+        ("Bill 2", "A", "Concrete", "4", "m3"),
+        ("Bill 1", "A", "Brickwork", "10", "m2"),
+        (None, "X", "No sheet", "", ""),
+        ("Bill 2", "B", "Formwork", "6", "m2"),
+        ("Sheet 1", "Y", "Named sheet", "", ""),
+    ])
+    conn.commit()
+    _, db_columns = PBOQLogic.ensure_schema(conn)
+    conn.execute("UPDATE pboq_items SET PlugRate = '12.50', IsFlagged = '1' WHERE rowid = 4")
+    conn.commit()
+    yield path, conn, db_columns
+    conn.close()
+
+
+def test_sheet_index_counts_rows_in_first_appearance_order(bill):
+    _, conn, _ = bill
+    sheets, positions = read_sheet_index(conn)
+    assert sheets == [("Bill 2", 2), ("Bill 1", 1), ("Sheet 1", 2)]
+    assert positions == {1: 0, 2: 1, 3: 2, 4: 3, 5: 4}
+
+
+def test_sheet_entries_merge_logical_store(bill):
+    _, conn, db_columns = bill
+    _, positions = read_sheet_index(conn)
+    plug_col = db_columns.index("PlugRate") - 1
+    entries = read_sheet_entries(conn, db_columns, "Bill 2", {'plug_rate': plug_col}, positions)
+    assert [(g, rid, flagged) for g, rid, _, flagged in entries] == [(0, 1, 0), (3, 4, 1)]
+    assert entries[1][2][:4] == ["B", "Formwork", "6", "m2"]
+    assert entries[1][2][plug_col] == "12.50"
+    # Rows without a sheet name belong to "Sheet 1"
+    assert [rid for _, rid, _, _ in read_sheet_entries(conn, db_columns, "Sheet 1", {}, positions)] == [3, 5]
+    # Single rows are read with the same merge
+    assert read_row_entries(conn, db_columns, {4, 1}, {'plug_rate': plug_col}, positions) == entries
+
+
+def test_sheet_entries_stream_in_chunks(bill):
+    _, conn, db_columns = bill
+    _, positions = read_sheet_index(conn)
+    chunks = list(iter_sheet_entries(conn, db_columns, "Bill 2", {}, positions, chunk_size=1))
+    assert [[rid for _, rid, _, _ in chunk] for chunk in chunks] == [[1], [4]]
+
+
+def test_load_worker_streams_chunks_on_its_own_connection(bill):
+    path, conn, db_columns = bill
+    _, positions = read_sheet_index(conn)
+    chunks, finished = [], []
+    worker = SheetLoadWorker(path, db_columns, "Bill 2", {}, positions, "token", chunk_size=1)
+    worker.signals.chunk.connect(lambda token, entries: chunks.append((token, [rid for _, rid, _, _ in entries])))
+    worker.signals.finished.connect(lambda *args: finished.append(args))
+    worker.run()
+    assert chunks == [("token", [1]), ("token", [4])]
+    assert finished == [("token", False)]
+
+
+def test_cancelled_load_worker_reads_nothing(bill):
+    path, conn, db_columns = bill
+    _, positions = read_sheet_index(conn)
+    chunks, finished = [], []
+    worker = SheetLoadWorker(path, db_columns, "Bill 2", {}, positions, "token")
+    worker.signals.chunk.connect(lambda *args: chunks.append(args))
+    worker.signals.finished.connect(lambda *args: finished.append(args))
+    worker.cancel()
+    worker.run()
+    assert (chunks, finished) == ([], [("token", True)])
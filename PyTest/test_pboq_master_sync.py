@@ -0,0 +1,71 @@
+# PyTest/test_pboq_master_sync.py
+"""
+Unit tests for the batched master library sync (PBOQLogic.sync_rate_to_master_lib).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic
+
+
+@pytest.fixture
+def master(tmp_path):
+    path = str(tmp_path / "Project.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE pboq_items (Sheet TEXT)")
+    PBOQLogic.ensure_schema(conn)
+    conn.executemany('INSERT INTO pboq_items ("Description", PlugCode, SubbeeCode, RateCode) VALUES (?, ?, ?, ?)', [
+        ("Plug row", "PR-1", None, None),
+        ("Sub row", None, "SR-1", None),
+        ("Legacy row", None, None, "PR-2"),
+        ("Second PR-1", "PR-1", None, None),     # only the first row of a code is updated
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT "Description", PlugCode, SubbeeCode, RateCode, PlugRate, SubbeeRate, "Bill Rate", '
+                            'SubbeeMarkup, PlugCategory FROM pboq_items ORDER BY rowid').fetchall()
+    finally:
+        conn.close()
+
+
+def test_sync_updates_existing_codes_and_inserts_new_ones(master):
+    assert PBOQLogic.sync_rate_to_master_lib(master, [
+        {'code': "PR-1", 'desc': "Plug A", 'unit': "m", 'rate': "1,000", 'type': "Plug Rate", 'cat': "Prelims"},
+        {'code': "SR-1", 'desc': "Sub A", 'unit': "m2", 'rate': 50, 'markup': "10%", 'type': "Sub. Rate"},
+        {'code': "PR-2", 'desc': "Legacy", 'unit': "nr", 'rate': 5, 'type': "Plug Rate", 'cat': "Prelims"},
+        {'code': "SR-9", 'desc': "New sub", 'unit': "m", 'rate': 20, 'type': "Sub. Rate"},
+        {'code': "SR-9", 'desc': "New sub v2", 'unit': "m", 'rate': 30, 'type': "Sub. Rate"},  # updates the new row
+    ])
+    assert _rows(master) == [
+        ("Plug A", "PR-1", None, None, "1000.0", None, "1000.0", None, "Prelims"),
+        ("Sub A", None, "SR-1", None, None, "50.0", "55.0", "10.0", None),
+        ("Legacy", "PR-2", None, None, "5.0", None, "5.0", None, "Prelims"),     # RateCode moved to PlugCode
+        ("Second PR-1", "PR-1", None, None, None, None, None, None, None),
+        ("New sub v2", None, "SR-9", None, None, "30.0", "30.0", "0.0", None),
+    ]
+    assert PBOQLogic.sync_rate_to_master_lib(str(master) + ".missing", [{'code': "X"}]) is False
+
+
+def test_code_lookups_use_indexes(master):
+    PBOQLogic.sync_rate_to_master_lib(master, [{'code': "PR-1", 'rate': 1, 'type': "Plug Rate"}])
+    conn = sqlite3.connect(master)
+    try:
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM pboq_items WHERE PlugCode IN ('a') OR SubbeeCode IN ('a') "
+            "OR RateCode IN ('a')"))
+        assert PBOQLogic.master_code_rowids(conn.cursor(), ["PR-1", "SR-1", "none", None]) == {"PR-1": 1, "SR-1": 2}
+    finally:
+        conn.close()
+    for col in ("PlugCode", "SubbeeCode", "RateCode"):
+        assert f"INDEX pboq_code_{col}" in plan
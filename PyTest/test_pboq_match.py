@@ -0,0 +1,118 @@
+# PyTest/test_pboq_match.py
+"""
+Unit tests for the persisted SOR/PBOQ match keys (pboq_match.py).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_match import (load_sor_lookup, load_pboq_keys, near_misses, summarize_misses,
+                        refresh_sor_keys, SOR_KEY_TABLE, FuzzyIndex, build_sor_fuzzy_index)
+
+SOR_ROWS = [
+    ("Bill 1", "A", "Excavation: Trench", "1,000", "m3", "12.50", "GR-001"),
+    ("Bill 1", "B", "Concrete: Grade 25", "4", "m3", "150.00", "GR-002"),
+    ("Bill 1", "C", "Unpriced item", "1", "nr", None, None),
+]
+
+
+@pytest.fixture
+def sor_path(tmp_path):
+    path = str(tmp_path / "SOR_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sor_items (Sheet TEXT, Ref TEXT, Description TEXT, Quantity TEXT, Unit TEXT, GrossRate TEXT, RateCode TEXT)")
+    conn.executemany("INSERT INTO sor_items VALUES (?, ?, ?, ?, ?, ?, ?)", SOR_ROWS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_sor_keys_are_persisted_and_follow_writes(sor_path):
+    lookup = load_sor_lookup(sor_path)
+    assert lookup == {
+        ("bill 1", "a", "trench", "1000.00", "m3"): ("12.50", "GR-001"),
+        ("bill 1", "b", "grade 25", "4.00", "m3"): ("150.00", "GR-002"),
+    }
+    assert load_sor_lookup(sor_path) is lookup     # cached until the file changes
+
+    conn = sqlite3.connect(sor_path)
+    assert conn.execute(f"SELECT COUNT(*) FROM {SOR_KEY_TABLE}").fetchone()[0] == 3
+    assert refresh_sor_keys(conn) == 0             # nothing to normalize again
+    # Any writer invalidates the key of the row it touches, through the triggers
+    conn.execute("UPDATE sor_items SET Quantity = '5' WHERE Ref = 'B'")
+    conn.execute("UPDATE sor_items SET GrossRate = '13.00' WHERE Ref = 'A'")
+    conn.commit()
+    assert conn.execute(f"SELECT COUNT(*) FROM {SOR_KEY_TABLE}").fetchone()[0] == 2
+    conn.close()
+
+    lookup = load_sor_lookup(sor_path)
+    assert lookup[("bill 1", "b", "grade 25", "5.00", "m3")] == ("150.00", "GR-002")
+    assert lookup[("bill 1", "a", "trench", "1000.00", "m3")] == ("13.00", "GR-001")
+
+
+def test_recreated_sor_table_rebuilds_keys(sor_path):
+    load_sor_lookup(sor_path)
+    conn = sqlite3.connect(sor_path)
+    conn.execute("DROP TABLE sor_items")
+    conn.execute("CREATE TABLE sor_items (Sheet TEXT, Ref TEXT, Description TEXT, Quantity TEXT, Unit TEXT, GrossRate TEXT, RateCode TEXT)")
+    conn.execute("INSERT INTO sor_items VALUES ('Bill 1', 'Z', 'New', '2', 'm', '9.00', 'GR-009')")
+    conn.commit()
+    conn.close()
+    assert list(load_sor_lookup(sor_path)) == [("bill 1", "z", "new", "2.00", "m")]
+
+
+def test_pboq_keys_track_mappings_and_report_near_misses(tmp_path, sor_path):
+    db_path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, "Column 3" TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?)", [
+        ("Bill 1", "A", "Trench", "1000", "m3"),
+        ("Bill 1", "B", "Grade 25", "4.5", "m3"),
+        ("Bill 1", "X", "Heading", "", ""),
+    ])
+    conn.commit()
+    conn.close()
+    db_columns = ["Sheet", "Column 0", "Column 1", "Column 2", "Column 3"]
+    mappings = {'ref': 0, 'desc': 1, 'qty': 2, 'unit': 3}
+
+    keys = load_pboq_keys(db_path, db_columns, mappings)
+    lookup = load_sor_lookup(sor_path)
+    assert lookup[keys[1]] == ("12.50", "GR-001")
+    assert near_misses(keys, lookup) == {2: ("qty",)}
+    assert summarize_misses({2: ("qty",), 5: ("qty",), 7: ("desc", "unit")}) == "2 differ in qty, 1 differ in desc+unit"
+
+    # Unmapping the ref column rebuilds every key
+    keys = load_pboq_keys(db_path, db_columns, dict(mappings, ref=-1))
+    assert keys[1] == ("bill 1", "", "trench", "1000.00", "m3")
+
+
+def test_fuzzy_index_scores_wording_typos_and_units():
+    index = FuzzyIndex()
+    index.add("Excavate trench n.e. 1.5m deep", ("12.50", "GR-001"), unit="m3", qty="100")
+    index.add("Excavate trench n.e. 3.0m deep", ("15.00", "GR-002"), unit="m3")
+    index.add("Grade 25 concrete in foundations", ("150.00", "GR-003"), unit="m3")
+    index.add("Formwork to sides of foundations", ("20.00", "GR-004"), unit="m2")
+
+    assert index.best_match("Excavate trench n.e. 1.5m deep", unit="cum") == (("12.50", "GR-001"), 1.0)
+    payload, score = index.best_match("Grade 25 concret in foundation", unit="m³")
+    assert payload == ("150.00", "GR-003") and 0.85 < score < 1.0
+    # Same words, different unit of measurement
+    assert index.best_match("Formwork to sides of foundations", unit="m3")[1] == pytest.approx(0.6)
+    assert index.search("Paint walls") == []
+    # Equal quantity breaks the tie between otherwise identical descriptions
+    index.add("Excavate trench n.e. 1.5m deep", ("99.00", "GR-005"), unit="m3", qty="5")
+    assert index.best_match("Excavate trench n.e. 1.5m deep", unit="m3", qty="5")[0] == ("99.00", "GR-005")
+
+    rows = {1: ("Grade 25 concrete in foundations", "m3", "4", "", ""), 2: ("Paint walls", "m2", "1", "", "")}
+    assert index.match_all(rows, min_score=0.85) == {1: (("150.00", "GR-003"), 1.0)}
+
+
+def test_sor_fuzzy_index_prices_unmatched_rows(sor_path):
+    index = build_sor_fuzzy_index(sor_path)
+    assert len(index) == 2                              # unpriced SOR items are left out
+    assert build_sor_fuzzy_index(sor_path) is index     # cached until the file changes
+    assert index.best_match("Trenches", unit="m3")[0] == ("12.50", "GR-001")
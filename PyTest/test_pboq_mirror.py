@@ -0,0 +1,164 @@
+# PyTest/test_pboq_mirror.py
+"""
+Unit tests for the in-memory bill mirror (pboq_mirror): routing, write-back and crash recovery.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pboq_mirror
+from pboq_mirror import PBOQMirror, connect_bill, mirror_of
+
+
+@pytest.fixture
+def bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 1" TEXT)')
+    conn.execute("INSERT INTO pboq_items VALUES ('Bill 1', 'Concrete')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _disk(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute('SELECT "Column 1" FROM pboq_items ORDER BY rowid')]
+    finally:
+        conn.close()
+
+
+def _write(path, value):
+    conn = connect_bill(path)
+    try:
+        conn.execute('INSERT INTO pboq_items (Sheet, "Column 1") VALUES (\'Bill 1\', ?)', (value,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.02)
+
+
+def _crash(mirror):
+    """Drops a mirror the way a killed process would: no write-back, journal left behind."""
+    mirror._stop.set()
+    mirror._thread.join()
+    pboq_mirror._mirrors.pop(pboq_mirror._key(mirror.db_path), None)
+    mirror._keeper.close()
+
+
+def test_edits_stay_in_memory_until_checkpoint(bill, tmp_path):
+    mirror = PBOQMirror.open(bill, recovery_dir=str(tmp_path / "recovery"), checkpoint_interval=3600)
+    try:
+        _write(bill, "Formwork")
+        assert mirror.dirty and _disk(bill) == ["Concrete"]
+        assert mirror.checkpoint() and not mirror.dirty
+        assert _disk(bill) == ["Concrete", "Formwork"]
+        _write(bill, "Rebar")
+    finally:
+        assert mirror.close()
+    assert mirror_of(bill) is None
+    assert _disk(bill) == ["Concrete", "Formwork", "Rebar"]
+    assert not os.path.exists(mirror.journal_path) and not os.path.exists(bill + ".mirror-tmp")
+
+
+def test_crash_is_recovered_from_the_journal(bill, tmp_path):
+    recovery = str(tmp_path / "recovery")
+    mirror = PBOQMirror.open(bill, recovery_dir=recovery, journal_interval=0.02, checkpoint_interval=3600)
+    _write(bill, "Formwork")
+    _wait_for(lambda: os.path.exists(mirror.manifest_path))
+    _crash(mirror)
+    assert _disk(bill) == ["Concrete"]
+
+    mirror = PBOQMirror.open(bill, recovery_dir=recovery, journal_interval=0.02)
+    try:
+        assert mirror.recovered
+        # Recovered edits are written back on the first tick
+        _wait_for(lambda: _disk(bill) == ["Concrete", "Formwork"])
+        _wait_for(lambda: not os.path.exists(mirror.journal_path))
+    finally:
+        mirror.close()
+
+
+def test_journal_of_a_changed_bill_is_set_aside(bill, tmp_path):
+    recovery = str(tmp_path / "recovery")
+    mirror = PBOQMirror.open(bill, recovery_dir=recovery, journal_interval=0.02, checkpoint_interval=3600)
+    _write(bill, "Formwork")
+    _wait_for(lambda: os.path.exists(mirror.manifest_path))
+    _crash(mirror)
+    conn = sqlite3.connect(bill)
+    conn.execute("INSERT INTO pboq_items VALUES ('Bill 1', 'Saved elsewhere')")
+    conn.commit()
+    conn.close()
+
+    mirror = PBOQMirror.open(bill, recovery_dir=recovery)
+    try:
+        assert not mirror.recovered
+        conn = connect_bill(bill)
+        assert [r[0] for r in conn.execute('SELECT "Column 1" FROM pboq_items')] == ["Concrete", "Saved elsewhere"]
+        conn.close()
+    finally:
+        mirror.close()
+    assert not os.path.exists(mirror.journal_path)
+    assert [f for f in os.listdir(recovery) if f.endswith(".db")]     # kept for manual rescue
+
+
+def test_open_is_reference_counted(bill, tmp_path):
+    mirror = PBOQMirror.open(bill, recovery_dir=str(tmp_path / "recovery"), checkpoint_interval=3600)
+    assert PBOQMirror.open(bill) is mirror and mirror_of(bill) is mirror
+    _write(bill, "Formwork")
+    # The first close only writes back; the bill stays mirrored for the other holder
+    assert mirror.close() and mirror_of(bill) is mirror
+    assert _disk(bill) == ["Concrete", "Formwork"]
+    _write(bill, "Rebar")
+    assert mirror.close() and mirror_of(bill) is None
+    assert mirror.close()                                  # released: nothing left to do
+    assert _disk(bill) == ["Concrete", "Formwork", "Rebar"]
+
+
+def test_bill_changed_on_disk_is_not_overwritten(bill, tmp_path):
+    mirror = PBOQMirror.open(bill, recovery_dir=str(tmp_path / "recovery"), checkpoint_interval=3600)
+    _write(bill, "Formwork")
+    conn = sqlite3.connect(bill)
+    conn.execute("INSERT INTO pboq_items VALUES ('Bill 1', 'Saved elsewhere')")
+    conn.commit()
+    conn.close()
+    assert not mirror.checkpoint() and mirror.conflict
+    assert not mirror.close()
+    assert _disk(bill) == ["Concrete", "Saved elsewhere"]
+    # The mirrored edits are kept aside, out of the way of the next open
+    assert mirror.rescue_path and os.path.exists(mirror.rescue_path)
+    assert not os.path.exists(mirror.journal_path)
+    conn = sqlite3.connect(mirror.rescue_path)
+    assert [r[0] for r in conn.execute('SELECT "Column 1" FROM pboq_items')] == ["Concrete", "Formwork"]
+    conn.close()
+
+
+def test_numeric_shadows_are_built_in_the_mirror(bill, tmp_path):
+    from pboq_numeric import ensure_numbers
+    mirror = PBOQMirror.open(bill, recovery_dir=str(tmp_path / "recovery"), checkpoint_interval=3600)
+    try:
+        _write(bill, "Formwork")
+        # A direct connection to the file leaves it alone; connect_bill() builds them in memory
+        conn = sqlite3.connect(bill)
+        assert ensure_numbers(conn) == []
+        conn.close()
+        conn = connect_bill(bill)
+        assert ensure_numbers(conn) == ["Column 1"]
+        conn.close()
+        _write(bill, "Rebar")
+        assert mirror.checkpoint() and not mirror.conflict
+    finally:
+        assert mirror.close()
+    assert _disk(bill) == ["Concrete", "Formwork", "Rebar"]
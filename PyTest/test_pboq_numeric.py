@@ -0,0 +1,112 @@
+# PyTest/test_pboq_numeric.py
+"""
+Unit tests for the REAL shadows of the PBOQ money and quantity columns (pboq_numeric).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_numeric import (ensure_numbers, numbers_join, number_of, parse_number, register_functions,
+                          sheet_totals, sql_number)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "PBOQ_Test.db"))
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Bill Amount" TEXT, '
+                 'PlugCode TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?)", [
+        ("Bill 1", "A", "Concrete", "1,200.50", "PR-1"),
+        ("Bill 1", "B", "Formwork", "₵ 300", None),
+        ("", "C", "Rebar", "n/a", None),
+        ("Bill 2", "D", "Paint", "50", None),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _shadow(conn, col):
+    shadowed = ensure_numbers(conn)
+    return [r[0] for r in conn.execute(f'SELECT {number_of(col, shadowed, None)} FROM pboq_items '
+                                       f'{numbers_join(shadowed)} ORDER BY pboq_items.rowid')]
+
+
+@pytest.mark.parametrize("text", ["1,234.50", " 12 ", "$5", "₵ 1,000", "-3.5", "1e3", "", "abc", "12 m2",
+                                  "1-2", "1.2.3", "12e", "--5", "5-", "+5", "1e+3", ".5", "-.5", "5.",
+                                  "N/A", "-", "0", "\t7\n"])
+def test_sql_number_matches_parse_number(text):
+    conn = sqlite3.connect(":memory:")
+    register_functions(conn)
+    sql_value = conn.execute(f"SELECT {sql_number('v')} FROM (SELECT ? AS v)", (text,)).fetchone()[0]
+    assert sql_value == parse_number(text)
+
+
+def test_shadows_follow_updates_inserts_and_deletes(conn):
+    assert ensure_numbers(conn) == ["Column 0", "Column 1", "Bill Amount"]
+    assert _shadow(conn, "Bill Amount") == [1200.5, 300.0, None, 50.0]
+    assert sheet_totals(conn, "Bill Amount") == {"Bill 1": 1500.5, "Sheet 1": 0.0, "Bill 2": 50.0}
+
+    conn.execute('UPDATE pboq_items SET "Bill Amount" = \'2,000\' WHERE rowid = 1')
+    conn.execute('UPDATE pboq_items SET PlugCode = \'X\' WHERE rowid = 2')     # not a numeric column
+    conn.execute("DELETE FROM pboq_items WHERE rowid = 3")
+    conn.execute("INSERT INTO pboq_items (Sheet, \"Bill Amount\") VALUES ('Bill 2', '25')")
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM pboq_numbers_dirty").fetchone()[0] == 3
+    assert _shadow(conn, "Bill Amount") == [2000.0, 300.0, 50.0, 25.0]
+    assert conn.execute("SELECT COUNT(*) FROM pboq_numbers").fetchone()[0] == 4
+    assert sheet_totals(conn, "Bill Amount") == {"Bill 1": 2300.0, "Bill 2": 75.0}
+
+
+def test_recreated_table_rebuilds_the_shadows(conn):
+    ensure_numbers(conn)
+    conn.execute("DROP TABLE pboq_items")
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, GrossRate TEXT)')
+    conn.execute("INSERT INTO pboq_items VALUES ('Bill 1', '4', '10.5')")
+    conn.commit()
+    assert ensure_numbers(conn) == ["Column 0", "GrossRate"]
+    assert _shadow(conn, "GrossRate") == [10.5]
+    # Unshadowed columns are parsed inline
+    assert sheet_totals(conn, "Sheet") == {"Bill 1": 0.0}
+    assert sheet_totals(conn, "Missing") == {}
+
+
+def test_read_only_file_parses_inline(conn, tmp_path):
+    ro = sqlite3.connect(f"file:{tmp_path / 'PBOQ_Test.db'}?mode=ro", uri=True)
+    try:
+        assert ensure_numbers(ro) == []
+        assert not ro.in_transaction
+        assert _shadow(ro, "Bill Amount") == [1200.5, 300.0, None, 50.0]
+        assert sheet_totals(ro, "Bill Amount") == {"Bill 1": 1500.5, "Sheet 1": 0.0, "Bill 2": 50.0}
+    finally:
+        ro.close()
+
+
+def test_shadows_of_an_older_parser_are_rebuilt(conn):
+    ensure_numbers(conn)
+    # As left by the previous parser: its triggers, and CAST's prefix read of "1-2"
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'pboq_numbers_ins'").fetchone()[0]
+    conn.execute("DROP TRIGGER pboq_numbers_ins")
+    conn.execute(sql.replace(" /* parser 2 */", ""))
+    conn.execute('UPDATE pboq_items SET "Bill Amount" = \'1-2\' WHERE rowid = 4')
+    conn.execute('UPDATE pboq_numbers SET "Bill Amount" = 1.0 WHERE item_rowid = 4')
+    conn.execute("DELETE FROM pboq_numbers_dirty")
+    conn.commit()
+    assert _shadow(conn, "Bill Amount") == [1200.5, 300.0, None, None]
+    assert sheet_totals(conn, "Bill Amount") == {"Bill 1": 1500.5, "Sheet 1": 0.0, "Bill 2": 0.0}
+
+
+def test_read_only_consumers_never_write(conn):
+    assert ensure_numbers(conn, build=False) == []
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'pboq_numbers'").fetchone()
+    ensure_numbers(conn)
+    assert ensure_numbers(conn, build=False) == ["Column 0", "Column 1", "Bill Amount"]
+    conn.execute('UPDATE pboq_items SET "Bill Amount" = \'75\' WHERE rowid = 4')
+    conn.commit()
+    # Rows waiting to be parsed again: inline parsing, the queue is left for the next build
+    assert ensure_numbers(conn, build=False) == [] and not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM pboq_numbers_dirty").fetchone()[0] == 1
@@ -0,0 +1,63 @@
+# PyTest/test_pboq_package_sync.py
+"""
+Unit tests for the set-based package markup sync (PBOQLogic.apply_package_settings).
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic
+
+
+@pytest.fixture
+def bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE pboq_items (Sheet TEXT, " + ", ".join(f'"Column {i}" TEXT' for i in range(14)) + ")")
+    PBOQLogic.ensure_schema(conn)
+    conn.executemany('INSERT INTO pboq_items (Sheet, "Column 1", "Column 12", SubbeePackage) VALUES (?, ?, ?, ?)', [
+        ("Bill 1", "Conduits", "Electrical", "Electrical"),
+        ("Bill 1", "Sockets", " ELECTRICAL ", ""),         # only in the mapped column, not normalized
+        ("Bill 1", "Pipes", "", "Plumbing"),               # only in the logical store
+        ("Bill 1", "Electrical", "", ""),                  # description is not a package column
+        ("Bill 1", "Paint", "Painting", "Painting"),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT "Column 13", SubbeeMarkup, SubbeeCategory, SubbeeNotes FROM pboq_items '
+                            'ORDER BY rowid').fetchall()
+    finally:
+        conn.close()
+
+
+def test_apply_package_settings_matches_normalized_package_columns(bill):
+    settings = {"Electrical": {'markup': 12.5, 'category': "Services", 'notes': "OH 5%"},
+                "Plumbing": {'markup': 10.0, 'category': "Services", 'notes': ""}}
+    assert PBOQLogic.apply_package_settings(bill, settings, [12]) == 3
+    assert _rows(bill) == [("12.5", "12.5", "Services", "OH 5%"), ("12.5", "12.5", "Services", "OH 5%"),
+                           ("10.0", "10.0", "Services", ""), (None, None, None, None), (None, None, None, None)]
+    assert PBOQLogic.get_package_settings(bill)["Electrical"] == {'category': "Services", 'markup': 12.5, 'notes': "OH 5%"}
+
+    conn = sqlite3.connect(bill)
+    try:
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM pboq_items WHERE lower(trim(SubbeePackage)) = 'painting'"))
+    finally:
+        conn.close()
+    assert "USING INDEX pboq_pkg_SubbeePackage" in plan
+
+
+def test_apply_package_settings_without_mapping_uses_logical_store(bill):
+    assert PBOQLogic.apply_package_settings(bill, {"electrical": {'markup': 7, 'category': "", 'notes': ""}}) == 1
+    assert [r[1] for r in _rows(bill)] == ["7", None, None, None, None]
+    assert PBOQLogic.apply_package_settings(str(bill) + ".missing", {}) == -1
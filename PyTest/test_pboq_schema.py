@@ -0,0 +1,95 @@
+# PyTest/test_pboq_schema.py
+"""
+Unit tests for the schema version stamp (PBOQLogic.ensure_schema / migrate_schema).
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_logic import PBOQLogic, SCHEMA_COLUMNS, SCHEMA_VERSION
+
+
+@pytest.fixture
+def legacy_bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT)')
+    conn.execute("INSERT INTO pboq_items VALUES ('Bill 1', 'A', 'Concrete')")
+    conn.execute("CREATE TABLE pboq_formatting (row_idx INTEGER, col_idx INTEGER, fmt_json TEXT)")
+    conn.execute("INSERT INTO pboq_formatting VALUES (0, 1, ?)", (json.dumps({'bold': True}),))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _tables(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def test_legacy_file_is_migrated_and_stamped(legacy_bill):
+    conn = sqlite3.connect(legacy_bill)
+    try:
+        success, db_columns = PBOQLogic.ensure_schema(conn)
+        assert success and db_columns == ["Sheet", "Column 0", "Column 1"] + SCHEMA_COLUMNS[2:]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert not conn.in_transaction
+        assert "pboq_formatting" not in _tables(conn)
+        assert {"pboq_cell_styles", "subcontractor_quotes", "subcontractor_details"} <= _tables(conn)
+        assert PBOQLogic.load_formatting(conn)[(0, 1)] == {'bold': True}
+
+        # Stamped files skip the migration but return the same columns
+        conn.execute("DROP TABLE subcontractor_details")
+        assert PBOQLogic.ensure_schema(conn) == (True, db_columns)
+        assert "subcontractor_details" not in _tables(conn)
+    finally:
+        conn.close()
+
+
+def test_stamped_file_with_a_bare_table_is_migrated_again(legacy_bill):
+    conn = sqlite3.connect(legacy_bill)
+    try:
+        PBOQLogic.ensure_schema(conn)
+        conn.execute("DROP TABLE pboq_items")
+        conn.execute("CREATE TABLE pboq_items (Sheet TEXT)")
+        _, db_columns = PBOQLogic.ensure_schema(conn)
+        assert db_columns == ["Sheet"] + SCHEMA_COLUMNS
+        # A file stamped by a newer version keeps its stamp
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        PBOQLogic.migrate_schema(conn)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION + 1
+    finally:
+        conn.close()
+
+
+def test_read_only_file_is_read_unstamped(legacy_bill):
+    conn = sqlite3.connect(legacy_bill)
+    _, db_columns = PBOQLogic.ensure_schema(conn)
+    # As a bill written before the stamp: every column, no shadows, user_version 0
+    for name in ("pboq_numbers_upd", "pboq_numbers_ins", "pboq_numbers_del"):
+        conn.execute(f"DROP TRIGGER {name}")
+    conn.execute("DROP TABLE pboq_numbers")
+    conn.execute("DROP TABLE pboq_numbers_dirty")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+    ro = sqlite3.connect(f"file:{legacy_bill}?mode=ro", uri=True)
+    try:
+        assert PBOQLogic.ensure_schema(ro) == (True, db_columns)
+        assert ro.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert not ro.in_transaction
+    finally:
+        ro.close()
+
+
+def test_read_only_legacy_file_keeps_its_columns(legacy_bill):
+    ro = sqlite3.connect(f"file:{legacy_bill}?mode=ro", uri=True)
+    try:
+        assert PBOQLogic.ensure_schema(ro) == (True, ["Sheet", "Column 0", "Column 1"])
+    finally:
+        ro.close()
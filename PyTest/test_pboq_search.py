@@ -0,0 +1,78 @@
+# PyTest/test_pboq_search.py
+"""
+Unit tests for the trigram row index used by the PBOQ/SOR search bars (pboq_search.py).
+"""
+
+import os
+import sys
+import pytest
+from PyQt6.QtWidgets import QApplication, QTableWidget, QTableWidgetItem
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_search import RowTextIndex, TableSearchIndex, apply_row_visibility
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    yield app
+
+
+def _scan_any_cell(rows, term):
+    return {r for r, texts in rows.items() if any(term in t.lower() for t in texts)}
+
+
+def _scan_joined(rows, terms):
+    return {r for r, texts in rows.items() if all(t in " ".join(texts).lower() for t in terms)}
+
+
+def test_index_matches_linear_scan():
+    rows = {
+        0: ["A1", "Concrete grade 25 in slabs", "12.5", "m3"],
+        1: ["A2", "Reinforced CONCRETE beams", "4", "m3"],
+        2: ["B1", "Formwork to soffits", "30", "m2"],
+        3: ["B2", "Excavate", "", "m3"],
+    }
+    index = RowTextIndex()
+    for r, texts in rows.items():
+        index.set_row(r, texts)
+
+    for term in ["concrete", "con", "m3", "m", "", "5 in", "zzz", "a1"]:
+        assert index.rows_containing(term) == _scan_any_cell(rows, term)
+    # Joined-text search also matches across cell boundaries
+    assert index.rows_containing_all(["slabs 12"]) == {0}
+    assert index.rows_containing_all(["concrete", "m3"]) == _scan_joined(rows, ["concrete", "m3"])
+
+
+def test_index_remove_and_update_row():
+    index = RowTextIndex()
+    index.set_row(0, ["Concrete"])
+    index.set_row(0, ["Brickwork"])
+    assert index.rows_containing("concrete") == set()
+    assert index.rows_containing("brick") == {0}
+    index.remove_row(0)
+    assert len(index) == 0
+    assert index.rows_containing("brick") == set()
+
+
+def test_table_index_follows_edits(qapp):
+    table = QTableWidget(3, 2)
+    for r, text in enumerate(["Concrete", "Brickwork", "Blockwork"]):
+        table.setItem(r, 1, QTableWidgetItem(text))
+    index = TableSearchIndex(table)
+    assert index.rows_containing("work") == {1, 2}
+
+    table.item(0, 1).setText("Stonework")
+    assert index.rows_containing("work") == {0, 1, 2}
+
+    table.insertRow(3)
+    table.setItem(3, 1, QTableWidgetItem("Roofwork"))
+    assert index.rows_containing("work") == {0, 1, 2, 3}
+
+    apply_row_visibility(table, {1})
+    assert [table.isRowHidden(r) for r in range(4)] == [True, False, True, True]
+    apply_row_visibility(table, None)
+    assert not any(table.isRowHidden(r) for r in range(4))
@@ -0,0 +1,75 @@
+# PyTest/test_pboq_stats.py
+"""
+Unit tests for the incremental PBOQ statistics engine (pboq_stats.py).
+"""
+
+import os
+import sys
+import pytest
+from PyQt6.QtWidgets import QApplication, QTableWidget, QTableWidgetItem
+from PyQt6.QtCore import Qt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_stats import PBOQStatsEngine, StatsRules
+import pboq_constants as const
+
+# Columns: 0 ref, 1 desc, 2 qty, 3 unit, 4 bill rate, 5 bill amount
+RULES = StatsRules(qty_col=2, rate_col=4, amt_col=5, checked_cols=(0, 1, 2, 3), dummy_rate=0.1)
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    yield app
+
+
+def _make_table(rows):
+    table = QTableWidget(len(rows), 6)
+    for r, values in enumerate(rows):
+        for c, v in enumerate(values):
+            table.setItem(r, c, QTableWidgetItem(v))
+    return table
+
+
+def _totals(stats):
+    return (stats.items, stats.priced, stats.flagged, round(stats.amount, 2))
+
+
+def test_full_refresh_classifies_rows(qapp):
+    table = _make_table([
+        ["A", "Concrete", "10", "m3", "0.10", "1.00"],      # dummy rate -> not priced
+        ["B", "Formwork", "5", "m2", "20.00", "100.00"],    # priced
+        ["C", "Heading", "", "", "", ""],                   # not an item
+        ["D", "Lump sum", "1", "item", "", "500.00"],       # lump sum -> priced
+    ])
+    engine = PBOQStatsEngine()
+    project = engine.refresh([("Bill 1", table)], RULES)
+    assert _totals(project) == (3, 2, 0, 601.0)
+    assert engine.sheet_totals()["Bill 1"].outstanding == 1
+
+
+def test_incremental_updates_match_full_rebuild(qapp):
+    table = _make_table([["A", "Item", "2", "m", "", ""] for _ in range(20)])
+    engine = PBOQStatsEngine()
+    assert _totals(engine.refresh([("S", table)], RULES)) == (20, 0, 0, 0.0)
+
+    table.item(3, 4).setText("12.50")
+    table.item(3, 5).setText("25.00")
+    table.item(7, 4).setBackground(const.COL_COLOR_GREEN)
+    table.item(9, 2).setText("")
+    table.item(0, 0).setData(Qt.ItemDataRole.UserRole + 2, 1)
+
+    incremental = engine.refresh([("S", table)], RULES)
+    fresh = PBOQStatsEngine().refresh([("S", table)], RULES)
+    assert _totals(incremental) == _totals(fresh) == (19, 2, 1, 25.0)
+
+
+def test_rule_change_triggers_rebuild(qapp):
+    table = _make_table([["A", "Item", "2", "m", "0.10", "0.20"]])
+    engine = PBOQStatsEngine()
+    assert engine.refresh([("S", table)], RULES).priced == 0
+    rules = StatsRules(2, 4, 5, (0, 1, 2, 3), 0.0)
+    assert engine.refresh([("S", table)], rules).priced == 1
@@ -88,6 +88,7 @@ def test_pboq_pricing_logic(qapp):
                 def tabText(self, i): return "Sheet1"
             
             self.tabs = MockTabs()
+            self._pending_sheets = {}   # every sheet is loaded
             self.table = PBOQTable()
             self.tabs.table = self.table
             
@@ -129,6 +130,55 @@ def test_pboq_pricing_logic(qapp):
     # Check background color (should be COL_COLOR_GREEN)
     assert dialog.table.item(0, 4).background().color().name() == const.COL_COLOR_GREEN.name()
 
+def test_pboq_similar_descriptions_need_confirmation(qapp, monkeypatch):
+    """PBOQDialog.price_by_description applies similarity matches only once confirmed, as one journaled step."""
+    import pboq_viewer
+
+    class MockPBOQDialog(PBOQDialog):
+        def __init__(self):
+            super(PBOQDialog, self).__init__()
+            self.table = PBOQTable()
+            class MockTabs:
+                def count(self): return 1
+                def widget(self, i): return table
+            table = self.table
+            self.tabs = MockTabs()
+            self._pending_sheets = {}
+            class MockTools:
+                def get_mappings(self):
+                    return {'desc': 1, 'qty': 2, 'unit': 3, 'rate': 4, 'rate_code': 5}
+            self.tools_pane = MockTools()
+            self.table.setColumnCount(6)
+            self.table.setRowCount(2)
+            for r, desc in enumerate(["Excavation in sand", "Excavation in sands"]):
+                self.table.setItem(r, 0, QTableWidgetItem())
+                self.table.item(r, 0).setData(Qt.ItemDataRole.UserRole, 101 + r)
+                self.table.setItem(r, 1, QTableWidgetItem(desc))
+            self.journaled = []
+
+        def _run_journaled(self, label, operation, *args):
+            self.journaled.append(label)
+            return operation(*args)
+
+        def _persist_updates(self, col, updates): pass
+        def _update_stats(self): pass
+        def _run_link_bill_to_rate_logic(self): pass
+
+    mapping = {"excavation in sand": ("15.50", "C001")}
+    dialog = MockPBOQDialog()
+    monkeypatch.setattr(pboq_viewer.QMessageBox, "question",
+                        staticmethod(lambda *a, **k: pboq_viewer.QMessageBox.StandardButton.No))
+    assert dialog.price_by_description(mapping) == (1, 0)
+    assert dialog.table.item(1, 4) is None
+    monkeypatch.setattr(pboq_viewer.QMessageBox, "question",
+                        staticmethod(lambda *a, **k: pboq_viewer.QMessageBox.StandardButton.Yes))
+    dialog = MockPBOQDialog()
+    assert dialog.price_by_description(mapping) == (2, 1)
+    assert dialog.table.item(1, 4).text() == "15.50"
+    assert dialog.journaled == ["Price by Description"]
+    # Without a score the plain entry point stays on exact matches
+    assert MockPBOQDialog()._price_by_description(mapping) == 1
+
 def test_sor_pricing_logic(qapp):
     """Tests that SORDialog._price_by_description correctly updates its table."""
     class MockSORDialog(SORDialog):
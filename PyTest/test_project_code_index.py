@@ -0,0 +1,103 @@
+# PyTest/test_project_code_index.py
+"""
+Unit tests for the project code index (project_code_index): lookups and incremental refresh.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pboq_mirror import PBOQMirror, connect_bill
+from project_code_index import CodeUse, ProjectCodeIndex
+
+
+def _make_bill(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE pboq_items (Sheet TEXT, "Column 0" TEXT, "Column 1" TEXT, "Column 2" TEXT, '
+                 'RateCode TEXT, PlugCode TEXT)')
+    conn.executemany("INSERT INTO pboq_items VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def _execute(path, sql, params=()):
+    conn = connect_bill(path)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def project(tmp_path):
+    for folder in ("Priced BOQs", "SOR", "PBOQ States", "Project Database"):
+        os.makedirs(tmp_path / folder)
+    _make_bill(str(tmp_path / "Priced BOQs" / "PBOQ_A.db"), [
+        ("Bill 1", "A", "Concrete", "rc-1 ", "RC-1", None),
+        ("Bill 1", "B", "Formwork", "", None, "pr-9"),
+        ("", "C", "Rebar RC-1", "", "RC-2", None),
+    ])
+    _make_bill(str(tmp_path / "Priced BOQs" / "PBOQ_B.db"), [("Bill 1", "A", "Paint", "", "RC-2", None)])
+    conn = sqlite3.connect(str(tmp_path / "SOR" / "SOR_A.db"))
+    conn.execute("CREATE TABLE sor_items (Sheet TEXT, Description TEXT, RateCode TEXT)")
+    conn.executemany("INSERT INTO sor_items VALUES (?, ?, ?)", [("S", "Concrete", " Rc-1"), ("S", "Paint", "RC-2")])
+    conn.commit()
+    conn.close()
+    # Bill A maps display column 2 ("Column 2") as its Rate Code
+    with open(tmp_path / "PBOQ States" / "PBOQ_A.db.json", "w") as f:
+        json.dump({'mappings': {'rate_code': 2}}, f)
+    return str(tmp_path)
+
+
+def test_lookup_covers_code_columns_of_bills_and_sors(project):
+    index = ProjectCodeIndex(project)
+    bill_a = os.path.join(project, "Priced BOQs", "PBOQ_A.db")
+    uses = index.where_used("  rc-1")
+    assert set(uses) == {
+        CodeUse('pboq', bill_a, "Bill 1", 1, 'rate_code'),
+        CodeUse('sor', os.path.join(project, "SOR", "SOR_A.db"), "S", 1, 'rate_code'),
+    }
+    # Descriptions are not codes; the sheet name follows the viewer's 'Sheet 1' default
+    assert index.where_used("PR-9") == [CodeUse('pboq', bill_a, "Bill 1", 2, 'plug_code')]
+    assert index.counts("RC-2", kind='pboq') == {bill_a: 1, os.path.join(project, "Priced BOQs", "PBOQ_B.db"): 1}
+    assert index.where_used("RC-2", kind='pboq', path=bill_a)[0].sheet == "Sheet 1"
+    assert index.where_used("") == [] and index.where_used("RC-404") == []
+
+
+def test_refresh_rereads_only_changed_files(project):
+    index = ProjectCodeIndex(project)
+    assert index.refresh() == 3
+    assert index.refresh() == 0
+    bill_b = os.path.join(project, "Priced BOQs", "PBOQ_B.db")
+    _execute(bill_b, "UPDATE pboq_items SET RateCode = 'RC-1'")
+    assert index.refresh() == 1
+    assert index.counts("RC-1", kind='pboq')[bill_b] == 1
+
+    # A remapped code column re-reads the bill
+    with open(os.path.join(project, "PBOQ States", "PBOQ_A.db.json"), "w") as f:
+        json.dump({'mappings': {'rate_code': 0}}, f)
+    os.utime(os.path.join(project, "PBOQ States", "PBOQ_A.db.json"), ns=(1, 1))
+    assert index.refresh() == 1
+    assert [u.rowid for u in index.where_used("A")] == [1]
+
+    os.remove(bill_b)
+    assert index.counts("RC-1", kind='pboq') == {os.path.join(project, "Priced BOQs", "PBOQ_A.db"): 1}
+    assert index.refresh(rebuild=True) == 2
+
+
+def test_edits_of_a_mirrored_bill_are_seen(project, tmp_path):
+    bill_a = os.path.join(project, "Priced BOQs", "PBOQ_A.db")
+    index = ProjectCodeIndex(project)
+    index.refresh()
+    mirror = PBOQMirror.open(bill_a, recovery_dir=str(tmp_path / "recovery"), checkpoint_interval=3600)
+    try:
+        _execute(bill_a, "UPDATE pboq_items SET PlugCode = 'PR-10' WHERE rowid = 3")
+        assert [u.rowid for u in index.where_used("pr-10")] == [3]
+    finally:
+        mirror.close()
+    assert [u.rowid for u in index.where_used("pr-10")] == [3]
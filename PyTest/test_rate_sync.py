@@ -0,0 +1,81 @@
+# PyTest/test_rate_sync.py
+"""
+Unit tests for the global rate sync (rate_sync): written cells and the deltas reported for them.
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rate_sync import SyncDelta, count_code_rows, sync_pboq_rate, sync_sor_rate
+
+MAPPINGS = {'ref': 0, 'desc': 1, 'qty': 2, 'unit': 3, 'bill_rate': 4, 'bill_amount': 5, 'rate': 6, 'rate_code': 7}
+
+
+@pytest.fixture
+def bill(tmp_path):
+    path = str(tmp_path / "PBOQ_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE pboq_items (Sheet TEXT, " + ", ".join(f'"Column {i}" TEXT' for i in range(8))
+                 + ", GrossRate TEXT, RateCode TEXT)")
+    conn.executemany("INSERT INTO pboq_items VALUES (" + ", ".join("?" * 11) + ")", [
+        ("Bill 1", "A", "Concrete", "10", "m3", "", "", "", "rc-1 ", None, None),
+        ("Bill 1", "B", "Formwork", "2.5", "m2", "", "", "", "RC-2", None, None),
+        ("Bill 1", "C", "Blinding", "", "m3", "1,500.00", "", "1,500.00", "RC-1", "1,500.00", "RC-1"),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _cells(path, table="pboq_items"):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.execute(f"SELECT rowid, * FROM {table} ORDER BY rowid")
+        cols = [d[0] for d in cursor.description][1:]
+        return {(row[0], col): val for row in cursor.fetchall() for col, val in zip(cols, row[1:])}
+    finally:
+        conn.close()
+
+
+def _changed(before, after):
+    return {key for key in after if before[key] != after[key]}
+
+
+def test_pboq_sync_reports_exactly_the_cells_it_changed(bill):
+    before = _cells(bill)
+    deltas = sync_pboq_rate(bill, "RC-1", 1500, MAPPINGS)
+    after = _cells(bill)
+    assert {(d.rowid, d.column) for d in deltas} == _changed(before, after)
+    assert all(after[(d.rowid, d.column)] == d.value and d.path == bill for d in deltas)
+    assert [after[(1, f"Column {i}")] for i in (4, 5, 6, 7)] == ["1,500.00", "15,000.00", "1,500.00", "RC-1"]
+    assert after[(1, "GrossRate")] == "1,500.00" and after[(2, "Column 4")] == ""
+    # Row 3 already held the rate and has no quantity to extend
+    assert not [d for d in deltas if d.rowid == 3]
+
+
+def test_pboq_sync_falls_back_to_any_column(bill):
+    deltas = sync_pboq_rate(bill, "Formwork", 20, {**MAPPINGS, 'rate_code': 3})
+    assert SyncDelta(bill, 2, "Column 5", "50.00") in deltas
+    assert {d.rowid for d in deltas} == {2}
+
+
+def test_code_row_count_matches_the_sync_fallback(bill):
+    assert count_code_rows(bill, "formwork ") == 1
+    assert count_code_rows(bill, "RC-1") == 2
+    assert count_code_rows(bill, "RC-9") == 0
+
+
+def test_sor_sync_reports_changed_rates(tmp_path):
+    path = str(tmp_path / "SOR_Test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sor_items (Sheet TEXT, Ref TEXT, Description TEXT, GrossRate TEXT, RateCode TEXT)")
+    conn.executemany("INSERT INTO sor_items VALUES (?, ?, ?, ?, ?)", [
+        ("S", "1", "Concrete", "", " rc-1"), ("S", "2", "Paint", "", "RC-2"), ("S", "3", "Blinding", "99.00", "RC-1")])
+    conn.commit()
+    conn.close()
+    assert sync_sor_rate(path, "RC-1", 99) == [SyncDelta(path, 1, "GrossRate", "99.00")]
+    assert _cells(path, "sor_items")[(1, "GrossRate")] == "99.00"
@@ -3,6 +3,7 @@ import sqlite3
 import json
 from sqlalchemy import create_engine
 from database import DatabaseManager
+from pboq_mirror import connect_bill
 from orm_models import Material, Labor, Equipment, Plant, IndirectCost, DBEstimate, DBTask
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -179,7 +180,7 @@ def query_active_estimate_summary(main_window=None):
                         except: pass
                         
                     try:
-                        conn = sqlite3.connect(path)
+                        conn = connect_bill(path)
                         cursor = conn.cursor()
                         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
                         if not cursor.fetchone():
@@ -537,7 +538,7 @@ def get_outlier_items(pboq_db_path=None, threshold=0.15):
     # 3. Scan specified PBOQ database for direct plug rates and flagged anomalies
     if pboq_db_path and os.path.exists(pboq_db_path):
         try:
-            conn = sqlite3.connect(pboq_db_path)
+            conn = connect_bill(pboq_db_path)
             cursor = conn.cursor()
             # Read schema to get available columns dynamically
             cursor.execute("PRAGMA table_info(pboq_items)")
@@ -1064,7 +1065,7 @@ def ingest_project_domains(project_dir=None):
                     except: pass
                     
                 try:
-                    conn = sqlite3.connect(db_path)
+                    conn = connect_bill(db_path)
                     cursor = conn.cursor()
                     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
                     if not cursor.fetchone():
@@ -1335,7 +1336,7 @@ def build_unified_knowledge_graph(project_dir=None):
             if f.lower().endswith('.db'):
                 db_path = os.path.join(pboq_dir, f)
                 try:
-                    conn = sqlite3.connect(db_path)
+                    conn = connect_bill(db_path)
                     cursor = conn.cursor()
                     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
                     if cursor.fetchone():
@@ -1616,7 +1617,7 @@ def get_active_project_priced_items(project_dir=None):
                 except: pass
                 
             try:
-                conn = sqlite3.connect(path)
+                conn = connect_bill(path)
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
                 if not cursor.fetchone():
@@ -1884,7 +1885,7 @@ def get_subcontractor_quotes(project_dir=None):
         db_files = [f for f in os.listdir(pboq_dir) if f.lower().endswith('.db')]
         for db_file in db_files:
             db_path = os.path.join(pboq_dir, db_file)
-            conn = sqlite3.connect(db_path)
+            conn = connect_bill(db_path)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
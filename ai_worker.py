@@ -6,6 +6,7 @@ import urllib.request
 import urllib.error
 from PyQt6.QtCore import QRunnable, QObject, pyqtSignal
 import ai_tools
+from pboq_mirror import connect_bill
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_AI_MODEL = "lfm2.5:8b"
@@ -212,7 +213,7 @@ class AICopilotWorker(QRunnable):
                         max_items = -1
                         for p in dbs:
                             try:
-                                conn = sqlite3.connect(p)
+                                conn = connect_bill(p)
                                 cursor = conn.cursor()
                                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
                                 if cursor.fetchone():
@@ -1030,7 +1031,7 @@ class AICopilotWorker(QRunnable):
                                 pass
                                 
                         try:
-                            conn = sqlite3.connect(path)
+                            conn = connect_bill(path)
                             cursor = conn.cursor()
                             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
                             if not cursor.fetchone():
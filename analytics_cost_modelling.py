@@ -10,6 +10,8 @@ from PyQt6.QtCore import Qt, QRectF, QPointF, QSize, QUrl
 from PyQt6.QtGui import QColor, QPainter, QBrush, QPen, QFont, QLinearGradient, QFontMetrics, QDesktopServices
 
 from analytics_components import get_project_currency_symbol, MetricCard
+from pboq_mirror import connect_bill
+from pboq_numeric import ensure_numbers, numbers_join, number_of
 
 class GfaSpinBox(QSpinBox):
     def __init__(self, parent=None):
@@ -352,12 +354,6 @@ class ParametricBenchmarkingAnalytic(QWidget):
         }
         return fallbacks.get(self.currency_code, 1.0)
 
-    def _to_float(self, val):
-        if not val: return 0.0
-        if isinstance(val, (int, float)): return float(val)
-        try: return float(str(val).replace(',', '').replace(' ', '').replace('₵','').replace('$','').strip())
-        except: return 0.0
-
     def _get_pboq_mapping(self, db_filename):
         """Loads column mapping from PBOQ States if available."""
         mapping_file = os.path.join(self.project_dir, "PBOQ States", db_filename + ".json")
@@ -510,7 +506,7 @@ class ParametricBenchmarkingAnalytic(QWidget):
             mapping = self._get_pboq_mapping(f)
             
             try:
-                conn = sqlite3.connect(db_path)
+                conn = connect_bill(db_path)
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(pboq_items)")
                 cols = [info[1] for info in cursor.fetchall()]
@@ -542,27 +538,27 @@ class ParametricBenchmarkingAnalytic(QWidget):
                     'pc_cat': next((c for c in cols if c.lower() in ["pcsumcategory", "pc_sum_category"]), None)
                 }
                 
-                query_parts = ["Sheet", f"\"{d_col}\"", f"\"{q_col}\"", f"\"{b_col}\""]
+                # Money and quantity columns come pre-parsed from their numeric shadows
+                shadowed = ensure_numbers(conn, build=False)
+                query_parts = ["pboq_items.Sheet", f"pboq_items.\"{d_col}\"", number_of(q_col, shadowed), number_of(b_col, shadowed)]
                 for k in ['plug', 'plug_code', 'plug_cat', 'sub', 'gross', 'rate_code', 'prov', 'pc', 'dw', 'sub_pkg', 'sub_name', 'prov_cat', 'pc_cat', 'sub_cat']:
                     v = src_cols.get(k)
-                    query_parts.append(f"\"{v}\"" if v else "''")
+                    if k in ('plug', 'sub', 'gross', 'prov', 'pc', 'dw'): query_parts.append(number_of(v, shadowed))
+                    else: query_parts.append(f"pboq_items.\"{v}\"" if v else "''")
                 
-                query = f"SELECT {', '.join(query_parts)} FROM pboq_items"
+                query = f"SELECT {', '.join(query_parts)} FROM pboq_items {numbers_join(shadowed)}"
                 cursor.execute(query)
                 rows = cursor.fetchall()
 
                 for r in rows:
-                    sheet, desc, q, b, plug, p_code, p_cat, sub, gross, r_code, prov, pc, dw, s_pkg, s_n, pr_cat, pc_c, s_cat = r
+                    sheet, desc, qty_f, bill_f, p_val, p_code, p_cat, s_val, g_val, r_code, pr_val, pc_val, d_val, s_pkg, s_n, pr_cat, pc_c, s_cat = r
                     desc_low = (desc or "").lower()
                     
                     if "collection" in desc_low or "summary" in desc_low:
                         continue
                         
-                    qty_f, bill_f = self._to_float(q), self._to_float(b)
                     if bill_f == 0 and qty_f == 0: continue
                     
-                    p_val, s_val, g_val, pr_val, pc_val, d_val = [self._to_float(x) for x in [plug, sub, gross, prov, pc, dw]]
-                    
                     is_prelim = (str(p_cat).lower() == "preliminaries" or "prelim" in desc_low) if p_cat or desc else False
                     is_fixed = (pr_val > 0 or pc_val > 0 or d_val > 0 or is_prelim)
                     
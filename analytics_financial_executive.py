@@ -8,6 +8,8 @@ from PyQt6.QtGui import QColor, QPainter, QBrush, QPen, QFont, QLinearGradient,
 
 from analytics_components import get_project_currency_symbol, MetricCard, SelectionFrame, ChartWidget, DonutChart, ParetoBarChart, WaterfallChart
 from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
+from pboq_numeric import ensure_numbers, numbers_join, number_of
 
 class MetricRow(QFrame):
     clicked = pyqtSignal(object) # Custom signal that sends the row instance
@@ -485,7 +487,7 @@ class FinancialExecutiveAnalytic(QWidget):
             mapping = self._get_pboq_mapping(f)
             
             try:
-                conn = sqlite3.connect(db_path)
+                conn = connect_bill(db_path)
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(pboq_items)")
                 cols = [info[1] for info in cursor.fetchall()]
@@ -518,28 +520,28 @@ class FinancialExecutiveAnalytic(QWidget):
                     'sub_code': next((c for c in cols if c.lower() in ["subbeecode", "sub_code"]), None)
                 }
                 
-                query_parts = ["Sheet", f"\"{d_col}\"", f"\"{q_col}\"", f"\"{b_col}\""]
+                # Money and quantity columns come pre-parsed from their numeric shadows
+                shadowed = ensure_numbers(conn, build=False)
+                query_parts = ["pboq_items.Sheet", f"pboq_items.\"{d_col}\"", number_of(q_col, shadowed), number_of(b_col, shadowed)]
                 for k in ['plug', 'plug_code', 'plug_cat', 'sub', 'gross', 'rate_code', 'prov', 'pc', 'dw', 'sub_pkg', 'sub_name', 'prov_cat', 'pc_cat', 'sub_cat', 'sub_code']:
                     v = src_cols.get(k)
-                    query_parts.append(f"\"{v}\"" if v else "''")
+                    if k in ('plug', 'sub', 'gross', 'prov', 'pc', 'dw'): query_parts.append(number_of(v, shadowed))
+                    else: query_parts.append(f"pboq_items.\"{v}\"" if v else "''")
                 
-                query = f"SELECT {', '.join(query_parts)} FROM pboq_items"
+                query = f"SELECT {', '.join(query_parts)} FROM pboq_items {numbers_join(shadowed)}"
                 cursor.execute(query)
                 rows = cursor.fetchall()
                 s_agg = {} # Sectional aggregate (Per File)
 
                 for r in rows:
-                    sheet, desc, q, b, plug, p_code, p_cat, sub, gross, r_code, prov, pc, dw, s_pkg, s_n, pr_cat, pc_c, s_cat, s_code = r
+                    sheet, desc, qty_f, bill_f, p_val, p_code, p_cat, s_val, g_val, r_code, pr_val, pc_val, d_val, s_pkg, s_n, pr_cat, pc_c, s_cat, s_code = r
                     desc_low = (desc or "").lower()
                     
                     if "collection" in desc_low or "summary" in desc_low:
                         continue
                         
-                    qty_f, bill_f = self._to_float(q), self._to_float(b)
                     if bill_f == 0 and qty_f == 0: continue
                     
-                    p_val, s_val, g_val, pr_val, pc_val, d_val = [self._to_float(x) for x in [plug, sub, gross, prov, pc, dw]]
-                    
                     # 1. CORE FIX: Pricing Category based detection
                     # Check if the item is explicitly categorized as Preliminaries
                     is_prelim = (str(p_cat).lower() == "preliminaries" or "prelim" in desc_low) if p_cat or desc else False
@@ -746,12 +748,6 @@ class FinancialExecutiveAnalytic(QWidget):
         if sub_list:
             self._add_table_row(self.sub_table_list, {'name': 'TOTAL SUB-CONTRACT SUMMARY', 'bid': sub_total_bid, 'cost': sub_total_cost}, is_total=True)
         
-    def _to_float(self, val):
-        if not val: return 0.0
-        if isinstance(val, (int, float)): return float(val)
-        try: return float(str(val).replace(',', '').replace(' ', '').replace('₵','').replace('$','').strip())
-        except: return 0.0
-
     def _clear_table(self, layout):
         while layout.count() > 1:
             it = layout.takeAt(0)
@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QFrame, QScrollArea, QSpacerItem, QSizePolicy)
 from PyQt6.QtCore import Qt, pyqtSignal
 from analytics_components import get_project_currency_symbol, MetricCard, DonutChart, ParetoBarChart, ChartWidget
+from pboq_mirror import connect_bill
 
 class LogisticsRow(QFrame):
     clicked = pyqtSignal(object)
@@ -350,7 +351,7 @@ class ProcurementLogisticsAnalytic(QWidget):
             try:
                 db_path = os.path.join(self.pboq_folder, f)
                 mapping = self._get_pboq_mapping(f)
-                conn = sqlite3.connect(db_path)
+                conn = connect_bill(db_path)
                 # We need qty, rate code, sub info
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(pboq_items)")
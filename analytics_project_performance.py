@@ -7,6 +7,8 @@ from PyQt6.QtCore import Qt, pyqtSignal
 
 from analytics_components import get_project_currency_symbol, MetricCard, SelectionFrame, DonutChart, ParetoBarChart
 from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
+from pboq_numeric import ensure_numbers, numbers_join, number_of
 
 class ProjectPerformanceAnalytic(QWidget):
     """Analytic view for Project Performance."""
@@ -152,12 +154,6 @@ class ProjectPerformanceAnalytic(QWidget):
                     conn.close()
         except: pass
 
-    def _to_float(self, val):
-        if not val: return 0.0
-        if isinstance(val, (int, float)): return float(val)
-        try: return float(str(val).replace(',', '').replace(' ', '').replace('₵','').replace('$','').strip())
-        except: return 0.0
-
     def _get_net_rate(self, rate_code):
         """Fetches the pure net total from the estimates database."""
         if not rate_code: return 0.0
@@ -234,7 +230,7 @@ class ProjectPerformanceAnalytic(QWidget):
                 dummy_val = state_data.get('dummy_rate', 0.1)
                     
                 try:
-                    conn = sqlite3.connect(db_path)
+                    conn = connect_bill(db_path)
                     PBOQLogic.ensure_schema(conn)
                     cursor = conn.cursor()
                     cursor.execute("PRAGMA table_info(pboq_items)")
@@ -265,34 +261,26 @@ class ProjectPerformanceAnalytic(QWidget):
                     if not (col_map['desc'] and col_map['qty']):
                         continue
                         
+                    # Money and quantity columns come pre-parsed from their numeric shadows
+                    shadowed = ensure_numbers(conn, build=False)
                     query_cols = []
                     for k in ['sheet', 'desc', 'qty', 'bill_rate', 'bill_amt', 'gross', 'plug', 'sub', 'prov', 'pc', 'dw', 'flag', 'rcode', 'pcode']:
-                        if col_map[k]: query_cols.append(f"\"{col_map[k]}\"")
+                        if k in ('qty', 'bill_rate', 'bill_amt', 'gross', 'plug', 'sub', 'prov', 'pc', 'dw'): query_cols.append(number_of(col_map[k], shadowed))
+                        elif col_map[k]: query_cols.append(f"pboq_items.\"{col_map[k]}\"")
                         else: query_cols.append("''")
                         
-                    cursor.execute(f"SELECT {', '.join(query_cols)} FROM pboq_items")
+                    cursor.execute(f"SELECT {', '.join(query_cols)} FROM pboq_items {numbers_join(shadowed)}")
                     rows = cursor.fetchall()
                     
                     for r in rows:
-                        sheet, desc, q, br, ba, gross, plug, sub, prov, pc, dw, flag, rcode, pcode = r
+                        sheet, desc, qty_f, bill_rate_f, bill_amt_f, g_val, p_val, s_val, pr_val, pc_val, d_val, flag, rcode, pcode = r
                         desc_low = (desc or "").lower()
                         if not str(desc).strip() or "collection" in desc_low or "summary" in desc_low:
                             continue
-                            
-                        qty_f = self._to_float(q)
-                        bill_rate_f = self._to_float(br)
-                        bill_amt_f = self._to_float(ba)
                         
                         if qty_f == 0 and bill_amt_f == 0:
                             continue
                         
-                        g_val = self._to_float(gross)
-                        p_val = self._to_float(plug)
-                        s_val = self._to_float(sub)
-                        pr_val = self._to_float(prov)
-                        pc_val = self._to_float(pc)
-                        d_val = self._to_float(dw)
-                        
                         # Dummy rate exclusion: bill_rate_f is only priced if it's NOT the dummy rate.
                         # However, if any other tool (Gross, Plug, etc) has a value, it's always priced.
                         is_row_priced = (g_val > 0 or p_val > 0 or s_val > 0 or pr_val > 0 or pc_val > 0 or d_val > 0)
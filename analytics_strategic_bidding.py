@@ -9,6 +9,8 @@ from PyQt6.QtGui import QColor, QPainter, QBrush, QPen, QFont, QLinearGradient,
 
 from analytics_components import get_project_currency_symbol, MetricCard, ChartWidget, WaterfallChart
 from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
+from pboq_numeric import ensure_numbers, numbers_join, number_of
 
 
 class StrategicBiddingAnalytic(QWidget):
@@ -275,7 +277,7 @@ class StrategicBiddingAnalytic(QWidget):
             db_path = os.path.join(pboq_folder, f)
             mapping = self._get_pboq_mapping(f)
             try:
-                conn = sqlite3.connect(db_path)
+                conn = connect_bill(db_path)
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(pboq_items)")
                 cols = [info[1] for info in cursor.fetchall()]
@@ -302,24 +304,24 @@ class StrategicBiddingAnalytic(QWidget):
                     'dw': next((c for c in cols if c.lower() in ["daywork"]), None)
                 }
                 
-                query_parts = [f"\"{d_col}\"", f"\"{q_col}\"", f"\"{b_col}\""]
+                # Money and quantity columns come pre-parsed from their numeric shadows
+                shadowed = ensure_numbers(conn, build=False)
+                query_parts = [f"pboq_items.\"{d_col}\"", number_of(q_col, shadowed), number_of(b_col, shadowed)]
                 for k in ['plug', 'plug_code', 'plug_cat', 'sub', 'gross', 'rate_code', 'prov', 'pc', 'dw']:
                     v = src_cols.get(k)
-                    query_parts.append(f"\"{v}\"" if v else "''")
+                    if k in ('plug', 'sub', 'gross', 'prov', 'pc', 'dw'): query_parts.append(number_of(v, shadowed))
+                    else: query_parts.append(f"pboq_items.\"{v}\"" if v else "''")
                 
-                cursor.execute(f"SELECT {', '.join(query_parts)} FROM pboq_items")
+                cursor.execute(f"SELECT {', '.join(query_parts)} FROM pboq_items {numbers_join(shadowed)}")
                 rows = cursor.fetchall()
 
                 for r in rows:
-                    desc, q, b, plug, p_code, p_cat, sub, gross, r_code, prov, pc, dw = r
+                    desc, qty_f, bill_f, p_val, p_code, p_cat, s_val, g_val, r_code, pr_val, pc_val, d_val = r
                     desc_low = (desc or "").lower()
                     if "collection" in desc_low or "summary" in desc_low: continue
                         
-                    qty_f, bill_f = self._to_float(q), self._to_float(b)
                     if bill_f == 0 and qty_f == 0: continue
                     
-                    p_val, s_val, g_val, pr_val, pc_val, d_val = [self._to_float(x) for x in [plug, sub, gross, prov, pc, dw]]
-                    
                     # 1. CORE SYNC Logic
                     is_prelim = (str(p_cat).lower() == "preliminaries" or "prelim" in desc_low) if p_cat or desc else False
                     is_fixed_type = (pr_val > 0 or pc_val > 0 or d_val > 0 or is_prelim)
@@ -7,6 +7,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt6.QtCore import Qt, pyqtSignal, QRectF, QPointF
 from PyQt6.QtGui import QColor, QPainter, QBrush, QPen, QFont, QLinearGradient
 from analytics_components import get_project_currency_symbol, MetricCard, ChartWidget
+from pboq_mirror import connect_bill
 
 class BidderRow(QFrame):
     """A row in the submitted bidders table, matching analytics UI consistency."""
@@ -547,7 +548,7 @@ class SupplyChainIntelligenceAnalytic(QWidget):
             if q_idx is None or br_idx is None or pkg_idx is None: continue
             
             try:
-                conn = sqlite3.connect(db_path)
+                conn = connect_bill(db_path)
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(pboq_items)")
                 cols = [info[1] for info in cursor.fetchall()]
@@ -11,6 +11,8 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QColor, QFont
 
 import pboq_constants as const
+from pboq_logic import PBOQLogic
+from grid_sizing import fit_columns, longest_rows, VisibleRowSizer
 
 class BOQToolsPane(QWidget):
     """Encapsulates the tools for BOQ Setup into a scrollable pane."""
@@ -413,17 +415,15 @@ class BOQSetupWindow(QWidget):
                 # Re-enable updates before resize so Qt can compute layout once
                 table.setUpdatesEnabled(True)
                 
-                # Automatically align column widths to content
-                table.resizeColumnsToContents()
-                # Enforce a maximum column width so that long descriptions are forced to wrap
-                for c in range(table.columnCount()):
-                    if table.columnWidth(c) > 400:
-                        table.setColumnWidth(c, 400)
+                # Align column widths to a sample of the content (plus each column's longest text),
+                # capped so that long descriptions are forced to wrap
+                fit_columns(table, longest_rows(df), max_width=400)
                 
-                # Resize rows to fit wrapped content based on new capped column widths
-                table.resizeRowsToContents()
-                # Automatically resize row height as user resizes columns/modifies layout
-                table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+                # Fit wrapped rows to the capped widths as they scroll into view,
+                # and again whenever the user resizes a column
+                table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+                table.row_sizer = VisibleRowSizer(table)
+                table.row_sizer.set_enabled(True)
                 
                 self.sheet_data[sheet_name] = {
                     'df': df,
@@ -671,9 +671,9 @@ class BOQSetupWindow(QWidget):
     def _save_to_priced_boq(self):
         """Creates a SQLite DB for the raw BOQ data (from Excel) in a 'Priced BOQs' folder."""
         import os
-        import sqlite3
         import pandas as pd
         import json
+        from pboq_mirror import connect_bill
         
         if not self.sheet_data:
             QMessageBox.warning(self, "Warning", "No data loaded to save.")
@@ -769,11 +769,7 @@ class BOQSetupWindow(QWidget):
                         except: pass
                     
                     if fmt:
-                        all_formats.append({
-                            'row_idx': global_row_idx,
-                            'col_idx': c,
-                            'fmt_json': json.dumps(fmt)
-                        })
+                        all_formats.append(((global_row_idx, c), fmt))
                 
                 all_rows.append({"Sheet": sheet_name, "row_values": row_values})
                 global_row_idx += 1
@@ -803,26 +799,13 @@ class BOQSetupWindow(QWidget):
         try:
             # Create DataFrame with the explicit column order
             df_out = pd.DataFrame(records, columns=full_schema_cols)
-            conn = sqlite3.connect(pboq_file_path)
+            # An open PBOQ viewer may be editing the bill in memory
+            conn = connect_bill(pboq_file_path)
             df_out.to_sql('pboq_items', conn, if_exists='replace', index=False)
 
             
-            # Save formatting data
-            cursor = conn.cursor()
-            cursor.execute("DROP TABLE IF EXISTS pboq_formatting")
-            cursor.execute("""
-                CREATE TABLE pboq_formatting (
-                    row_idx INTEGER,
-                    col_idx INTEGER,
-                    fmt_json TEXT
-                )
-            """)
-            if all_formats:
-                cursor.executemany(
-                    "INSERT INTO pboq_formatting (row_idx, col_idx, fmt_json) VALUES (?, ?, ?)",
-                    [(f['row_idx'], f['col_idx'], f['fmt_json']) for f in all_formats]
-                )
-            conn.commit()
+            # Save formatting data (interned styles + per-cell style ids)
+            PBOQLogic.replace_formatting(conn, all_formats)
             conn.close()
             QMessageBox.information(self, "Success", f"Successfully saved Priced BOQ to:\n{pboq_file_path}")
         except Exception as e:
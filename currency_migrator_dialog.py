@@ -9,6 +9,8 @@ from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QDoubleValidator
 
 from database import DatabaseManager
+from pboq_mirror import connect_bill
+from pboq_numeric import parse_number
 
 
 class MigrationWorker(QThread):
@@ -166,7 +168,7 @@ class MigrationWorker(QThread):
                 except:
                     pass
             
-            conn = sqlite3.connect(db_path)
+            conn = connect_bill(db_path)
             cursor = conn.cursor()
             
             try:
@@ -208,18 +210,15 @@ class MigrationWorker(QThread):
                     for i, v in enumerate(vals):
                         if v is None or str(v).strip() == "": continue
                         
-                        try:
-                            # Parse out comma-formatted string, scale, format back
-                            numeric_val = float(str(v).replace(',', ''))
-                            if self.operator == '*':
-                                scaled_val = numeric_val * self.rate
-                            else:
-                                scaled_val = numeric_val / self.rate
-                            formatted_val = f"{scaled_val:,.2f}"
-                            updates.append((f'"{cols_to_scale[i]}" = ?', formatted_val))
-                        except ValueError:
-                            # Not a number, skip
-                            pass
+                        # Parse out comma-formatted string, scale, format back
+                        numeric_val = parse_number(v)
+                        if numeric_val is None: continue    # Not a number, skip
+                        if self.operator == '*':
+                            scaled_val = numeric_val * self.rate
+                        else:
+                            scaled_val = numeric_val / self.rate
+                        formatted_val = f"{scaled_val:,.2f}"
+                        updates.append((f'"{cols_to_scale[i]}" = ?', formatted_val))
                             
                     if updates:
                         set_clause = ", ".join([u[0] for u in updates])
@@ -0,0 +1,169 @@
+"""
+Export Jobs — Background Excel exports with progress, for one file or a whole project.
+
+An ExportJob runs a list of export tasks on a QThreadPool worker, one file after the
+other, so the GUI stays responsive. PBOQ sheets are prepared (value cleaning, numeric
+parsing, style resolution) in a process pool while the job thread writes earlier
+sheets into the workbook. ExportProgressDialog shows the file being exported, a
+per-file progress bar and an overall one, and lets the user stop after the current file.
+
+Usage:
+    from export_jobs import ExportJob, ExportProgressDialog, pboq_export_task, rs_export_task
+    job = ExportJob([pboq_export_task(db_path, project_dir, output_path)])
+    dialog = ExportProgressDialog(job, parent)
+    results = dialog.run()              # [(output_path, ok, message)] once the job ends
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from threading import Event
+from typing import Callable
+
+from PyQt6.QtCore import QRunnable, QObject, QThreadPool, pyqtSignal
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar, QPushButton
+from logger import get_logger
+
+log = get_logger("export_jobs")
+
+
+def pool_workers():
+    """Processes used to prepare sheets; 0 (prepare on the job thread) on one or two cores."""
+    cpus = os.cpu_count() or 1
+    return 0 if cpus <= 2 else min(cpus - 1, 4)
+
+
+# ─── Tasks ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class ExportTask:
+    """One output file: run(pool, progress) -> (ok, message)."""
+    label: str
+    output_path: str
+    run: Callable
+
+
+def pboq_export_task(db_path, project_dir, output_path):
+    from pboq_export import PBOQExcelExporter
+
+    def run(pool, progress):
+        return PBOQExcelExporter(db_path, project_dir).export(output_path, pool=pool, progress=progress)
+    return ExportTask(os.path.basename(db_path), output_path, run)
+
+
+def rs_export_task(rs_result, output_path):
+    from rs_export import RSExcelExporter
+
+    def run(pool, progress):
+        return RSExcelExporter(rs_result).export(output_path)
+    return ExportTask(os.path.basename(output_path), output_path, run)
+
+
+# ─── Job ─────────────────────────────────────────────────────────────────────
+
+class ExportJobSignals(QObject):
+    fileStarted = pyqtSignal(int, int, str)             # file index, file count, label
+    progress = pyqtSignal(int, int, str)                # rows written, rows in file, sheet name
+    fileFinished = pyqtSignal(int, bool, str)           # file index, ok, message
+    finished = pyqtSignal(list)                         # [(output_path, ok, message)]
+
+
+class ExportJob(QRunnable):
+    """Runs export tasks one after the other on a worker thread."""
+
+    def __init__(self, tasks, workers=None):
+        super().__init__()
+        self.tasks = list(tasks)
+        self.workers = pool_workers() if workers is None else workers
+        self.signals = ExportJobSignals()
+        self._cancel = Event()
+
+    def cancel(self):
+        """Stops the job once the file being written is finished."""
+        self._cancel.set()
+
+    def run(self):
+        results = []
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers else None
+        try:
+            for i, task in enumerate(self.tasks):
+                if self._cancel.is_set():
+                    results.append((task.output_path, False, "Export cancelled"))
+                    continue
+                self.signals.fileStarted.emit(i, len(self.tasks), task.label)
+                try:
+                    ok, message = task.run(pool, lambda done, total, sheet: self.signals.progress.emit(done, total, sheet))
+                except Exception as e:
+                    log.error(f"Export of '{task.label}' failed: {e}", exc_info=True)
+                    ok, message = False, f"Export failed: {e}"
+                results.append((task.output_path, ok, message))
+                self.signals.fileFinished.emit(i, ok, message)
+        finally:
+            if pool is not None: pool.shutdown(cancel_futures=True)
+            self.signals.finished.emit(results)
+
+
+# ─── Progress Dialog ─────────────────────────────────────────────────────────
+
+class ExportProgressDialog(QDialog):
+    """Modal progress of an ExportJob: current file, its rows, and files done."""
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.job = job
+        self.results = []
+        self.setWindowTitle("Exporting to Excel")
+        self.setMinimumWidth(420)
+
+        layout = QVBoxLayout(self)
+        self.file_label = QLabel("Preparing...")
+        layout.addWidget(self.file_label)
+        self.file_bar = QProgressBar()
+        layout.addWidget(self.file_bar)
+        self.overall_bar = QProgressBar()
+        self.overall_bar.setRange(0, len(job.tasks))
+        self.overall_bar.setFormat("%v of %m file(s)")
+        self.overall_bar.setVisible(len(job.tasks) > 1)
+        layout.addWidget(self.overall_bar)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setVisible(len(job.tasks) > 1)
+        self.cancel_btn.clicked.connect(self._cancel)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+
+        signals = job.signals
+        signals.fileStarted.connect(self._on_file_started)
+        signals.progress.connect(self._on_progress)
+        signals.fileFinished.connect(lambda i, ok, msg: self.overall_bar.setValue(i + 1))
+        signals.finished.connect(self._on_finished)
+
+    def run(self):
+        """Starts the job and blocks (with a live event loop) until it ends; returns its results."""
+        QThreadPool.globalInstance().start(self.job)
+        self.exec()
+        return self.results
+
+    def _on_file_started(self, index, count, label):
+        self.file_label.setText(f"Exporting {label}" + (f" ({index + 1} of {count})" if count > 1 else "") + "...")
+        self.file_bar.setRange(0, 0)        # busy until the first rows are written
+
+    def _on_progress(self, done, total, sheet):
+        self.file_bar.setRange(0, max(total, 1))
+        self.file_bar.setValue(done)
+        self.file_bar.setFormat(f"{sheet}: %p%")
+
+    def _cancel(self):
+        self.job.cancel()
+        self.cancel_btn.setEnabled(False)
+        self.file_label.setText(self.file_label.text() + " (stopping after this file)")
+
+    def _on_finished(self, results):
+        self.results = results
+        self.accept()
+
+    def reject(self):
+        # Escape / closing the window stops the job instead of leaving it running unseen
+        self._cancel()
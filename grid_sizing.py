@@ -0,0 +1,130 @@
+"""
+Grid Sizing — Sampled column widths and on-demand row heights for large grids.
+
+QTableWidget.resizeColumnsToContents() and resizeRowsToContents() measure the text
+of every cell, which dominates the load time of big bills once word wrap is on.
+fit_columns() only measures a sample of rows per column: the first and last rows,
+the rows currently on screen and the row holding the column's longest text (which
+the caller tracks while filling the grid, from its own data). Widths are measured
+through the view's item delegate, exactly as Qt does for the rows it looks at.
+
+VisibleRowSizer sizes wrapped rows to their contents only when they scroll into
+view, and again when a column is resized or the row's cells change.
+
+Usage:
+    from grid_sizing import fit_columns, longest_rows, VisibleRowSizer
+    fit_columns(table, longest={2: 1187}, max_width=400)   # col -> row of longest text
+    longest = longest_rows(df)                             # same from a DataFrame
+    sizer = VisibleRowSizer(table)
+    sizer.set_enabled(True)                                # replaces resizeRowsToContents()
+"""
+
+from PyQt6.QtCore import QObject, QEvent, QTimer
+from PyQt6.QtWidgets import QStyleOptionViewItem
+
+# Rows measured at each end of a grid when estimating column widths
+SAMPLE_EDGE_ROWS = 50
+
+
+# ─── Column Widths ───────────────────────────────────────────────────────────
+
+def sample_rows(table, edge=SAMPLE_EDGE_ROWS):
+    """First and last `edge` rows plus the rows currently on screen."""
+    count = table.rowCount()
+    rows = set(range(min(edge, count))) | set(range(max(0, count - edge), count))
+    first = table.rowAt(0)
+    if first >= 0:
+        last = table.rowAt(table.viewport().height() - 1)
+        rows.update(range(first, (last if last >= 0 else count - 1) + 1))
+    return rows
+
+
+def longest_rows(df):
+    """{column position: row position} of the longest displayed text of each DataFrame column."""
+    if not len(df): return {}
+    lengths = df.astype(str).apply(lambda col: col.str.len())
+    return {c: int(lengths.iloc[:, c].values.argmax()) for c in range(lengths.shape[1])}
+
+
+def fit_columns(table, longest=None, edge=SAMPLE_EDGE_ROWS, max_width=None):
+    """Sizes every column to its header and its sampled rows (see sample_rows and `longest`)."""
+    longest = longest or {}
+    rows = sample_rows(table, edge)
+    delegate = table.itemDelegate()
+    model = table.model()
+    header = table.horizontalHeader()
+    option = QStyleOptionViewItem()
+    option.font = table.font()
+    grid = 1 if table.showGrid() else 0
+    for c in range(table.columnCount()):
+        if table.isColumnHidden(c): continue
+        width = header.sectionSizeHint(c)
+        col_rows = rows if c not in longest else rows | {longest[c]}
+        for r in col_rows:
+            if table.item(r, c) is None: continue
+            width = max(width, delegate.sizeHint(option, model.index(r, c)).width() + grid)
+        if max_width: width = min(width, max_width)
+        table.setColumnWidth(c, width)
+
+
+# ─── Row Heights ─────────────────────────────────────────────────────────────
+
+class VisibleRowSizer(QObject):
+    """Sizes the rows of a word-wrapped table to their contents as they come into view."""
+
+    def __init__(self, table):
+        super().__init__(table)
+        self._table = table
+        self._enabled = False
+        self._sized = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.size_visible_rows)
+
+        table.verticalScrollBar().valueChanged.connect(self._schedule)
+        table.horizontalHeader().sectionResized.connect(self.invalidate)
+        model = table.model()
+        model.dataChanged.connect(self._rows_changed)
+        for sig in (model.rowsInserted, model.rowsRemoved, model.modelReset, model.layoutChanged):
+            sig.connect(self.invalidate)
+        table.viewport().installEventFilter(self)
+
+    def set_enabled(self, enabled):
+        self._enabled = enabled
+        self._sized.clear()
+        if enabled: self.size_visible_rows()
+        else: self._timer.stop()
+
+    def invalidate(self, *args):
+        self._sized.clear()
+        self._schedule()
+
+    def _rows_changed(self, top_left, bottom_right, roles=None):
+        if not self._enabled or not self._sized: return
+        self._sized.difference_update(range(top_left.row(), bottom_right.row() + 1))
+        self._schedule()
+
+    def _schedule(self, *args):
+        if self._enabled: self._timer.start()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Resize: self._schedule()
+        return False
+
+    def size_visible_rows(self):
+        """Sizes the on-screen rows not sized yet; sizing can bring more rows into view."""
+        if not self._enabled: return
+        table = self._table
+        count = table.rowCount()
+        if not count: return
+        height = table.viewport().height()
+        while True:
+            first = max(table.rowAt(0), 0)
+            last = table.rowAt(height - 1)
+            last = count - 1 if last < 0 else last
+            todo = [r for r in range(first, last + 1) if r not in self._sized and not table.isRowHidden(r)]
+            if not todo: break
+            for r in todo:
+                table.resizeRowToContents(r)
+                self._sized.add(r)
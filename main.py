@@ -2,6 +2,7 @@ import sys
 import os
 import time
 import ctypes
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QDialog
 from PyQt6.QtGui import QIcon
 from PyQt6.QtCore import Qt, qInstallMessageHandler
@@ -10,6 +11,9 @@ from version import APP_VERSION
 from logger import setup_logging, setup_exception_hook, qt_message_handler, get_logger
 
 if __name__ == "__main__":
+    # Export worker processes of a frozen build start here; let them run their task and exit
+    multiprocessing.freeze_support()
+
     # 0. Initialize centralized logging and exception hook
     setup_logging()
     setup_exception_hook()
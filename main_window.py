@@ -303,6 +303,8 @@ class MainWindow(QMainWindow):
         
         export_pboq_action = self._create_action("Export PBOQ to Excel...", None, self._export_pboq_to_excel)
         file_menu.addAction(export_pboq_action)
+        export_all_action = self._create_action("Export All PBOQs to Excel...", None, self._export_all_pboqs_to_excel)
+        file_menu.addAction(export_all_action)
         
         file_menu.addSeparator()
         
@@ -680,7 +682,7 @@ class MainWindow(QMainWindow):
     def _export_pboq_to_excel(self):
         """Exports a PBOQ to Excel — uses active viewer if available, otherwise prompts for file."""
         from PyQt6.QtWidgets import QFileDialog
-        from pboq_export import PBOQExcelExporter
+        from export_jobs import ExportJob, ExportProgressDialog, pboq_export_task
         from pboq_viewer import PBOQDialog
 
         db_path = None
@@ -725,9 +727,9 @@ class MainWindow(QMainWindow):
         if not output_path:
             return
 
-        # 4. Export
-        exporter = PBOQExcelExporter(db_path, project_dir)
-        success, message = exporter.export(output_path)
+        # 4. Export (in the background, with progress)
+        job = ExportJob([pboq_export_task(db_path, project_dir, output_path)])
+        _, success, message = ExportProgressDialog(job, self).run()[0]
 
         if success:
             reply = QMessageBox.information(
@@ -739,6 +741,46 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "Export Failed", message)
 
+    def _export_all_pboqs_to_excel(self):
+        """Exports every PBOQ of a project to Excel as one background job with per-file progress."""
+        from PyQt6.QtWidgets import QFileDialog
+        from export_jobs import ExportJob, ExportProgressDialog, pboq_export_task
+        from pboq_batch import find_bills
+        from pboq_viewer import PBOQDialog
+
+        # Project of the active PBOQ viewer, else the last opened project
+        project_dir = self.db_manager.get_setting('last_project_dir', '')
+        for sub in self.mdi_area.subWindowList():
+            widget = sub.widget()
+            if isinstance(widget, PBOQDialog):
+                project_dir = widget.project_dir
+                break
+
+        bills = find_bills(project_dir) if project_dir else []
+        if not bills:
+            QMessageBox.warning(self, "Export All PBOQs", "No PBOQ files found in the current project.")
+            return
+
+        out_dir = QFileDialog.getExistingDirectory(
+            self, f"Export {len(bills)} PBOQ(s) to Folder", os.path.join(project_dir, "Priced BOQs")
+        )
+        if not out_dir:
+            return
+
+        tasks = [pboq_export_task(db_path, project_dir,
+                                  os.path.join(out_dir, os.path.splitext(os.path.basename(db_path))[0] + ".xlsx"))
+                 for db_path in bills]
+        results = ExportProgressDialog(ExportJob(tasks), self).run()
+
+        failed = [(os.path.basename(path), msg) for path, ok, msg in results if not ok]
+        exported = len(results) - len(failed)
+        summary = f"Exported {exported} of {len(bills)} PBOQ(s) to:\n{out_dir}"
+        if failed:
+            details = "\n".join(f"{name}: {msg}" for name, msg in failed)
+            QMessageBox.warning(self, "Export All PBOQs", f"{summary}\n\nNot exported:\n{details}")
+        else:
+            QMessageBox.information(self, "Export All PBOQs", summary)
+
     def _open_resources_schedule(self):
         """Opens the Resources Schedule dialog for the active PBOQ."""
         from PyQt6.QtWidgets import QFileDialog
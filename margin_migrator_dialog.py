@@ -4,6 +4,9 @@ import json
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QDialogButtonBox, QMessageBox, QProgressBar)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
+from pboq_numeric import parse_number
 
 class MarginMigrationWorker(QThread):
     progress = pyqtSignal(int, str)
@@ -253,7 +256,7 @@ class MarginMigrationWorker(QThread):
                             m_plug_code = pst['mappings'].get('plug_code', -1)
                             
                 except: pass
-            conn = sqlite3.connect(db_path)
+            conn = connect_bill(db_path)
             cursor = conn.cursor()
             
             try:
@@ -261,14 +264,7 @@ class MarginMigrationWorker(QThread):
                 all_rows = cursor.fetchall()
                 rowid_to_gidx = {r[0]: idx for idx, r in enumerate(all_rows)}
                 
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_formatting'")
-                has_fmt_table = bool(cursor.fetchone())
-                formatting_map = {}
-                if has_fmt_table:
-                    cursor.execute('SELECT row_idx, col_idx, fmt_json FROM pboq_formatting')
-                    for r_idx, c_idx, fmt_str in cursor.fetchall():
-                        try: formatting_map[(r_idx, c_idx)] = json.loads(fmt_str)
-                        except: pass
+                formatting_map = PBOQLogic.load_formatting(conn)
  
                 cursor.execute("PRAGMA table_info(pboq_items)")
                 db_cols = [info[1] for info in cursor.fetchall()]
@@ -394,10 +390,10 @@ class MarginMigrationWorker(QThread):
                     is_pc_dw = False
                     if 'PCSum' in cols_to_update:
                         pc_idx = cols_to_update.index('PCSum') + 1
-                        if float(str(row[pc_idx] or 0).replace(',', '') or 0) > 0: is_pc_dw = True
+                        if (parse_number(row[pc_idx]) or 0) > 0: is_pc_dw = True
                     if 'Daywork' in cols_to_update:
                         dw_idx = cols_to_update.index('Daywork') + 1
-                        if float(str(row[dw_idx] or 0).replace(',', '') or 0) > 0: is_pc_dw = True
+                        if (parse_number(row[dw_idx]) or 0) > 0: is_pc_dw = True
                         
                     is_fixed_row = is_prov or is_prelim or is_pc_dw
                     
@@ -494,10 +490,8 @@ class MarginMigrationWorker(QThread):
                         scaled_plug = None # Use None to signify "don't calculate"
                         item_plug_factor = 1.0
                         if 'PlugFactor' in cols_to_update:
-                            try:
-                                pf_val = row[cols_to_update.index('PlugFactor') + 1]
-                                if pf_val: item_plug_factor = float(str(pf_val).replace(',', ''))
-                            except: pass
+                            pf_val = parse_number(row[cols_to_update.index('PlugFactor') + 1])
+                            if pf_val is not None: item_plug_factor = pf_val
  
                         if plug_code_val:
                             # Re-calculate from formula if available
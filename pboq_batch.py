@@ -0,0 +1,377 @@
+"""
+PBOQ Batch — Command-line runner for a pipeline of pricing operations over every
+Priced BOQ of a project.
+
+Each bill in '<project>/Priced BOQs' is loaded headlessly into a PBOQDocument using
+the column mappings and tool settings saved by the PBOQ viewer in
+'<project>/PBOQ States/<bill>.db.json'. The pipeline steps run in order and their
+changes are persisted in one transaction per bill. Bills are processed in parallel
+worker processes and a timing/summary report is written when all have finished.
+
+Steps:
+    price_sor   Strict match against SOR/SOR_<bill>.db (Gross Rate + Rate Code);
+                {"op": "price_sor", "fuzzy": 0.85} also prices similar descriptions
+    link        Link Bill columns to the saved price type (or "price_type" override)
+    extend      Fill empty Bill Rates with the dummy rate (saved Extend criteria)
+    revert      Clear dummy-rate extensions
+    recalc      Recalculate every Bill Amount from Qty x Bill Rate
+    collect     Sum Bill Amounts into the saved collection keyword rows
+    export      Write the bill to Excel (<export dir>/<bill>.xlsx)
+
+Usage:
+    python pboq_batch.py "C:/Projects/Tender 12"
+    python pboq_batch.py "C:/Projects/Tender 12" --steps price_sor,link,extend,recalc,collect,export
+    python pboq_batch.py "C:/Projects/Tender 12" --pipeline overnight.json --workers 4
+
+    A pipeline file is a JSON list of step names or {"op": name, ...overrides}, e.g.
+    ["price_sor", {"op": "link", "price_type": "Gross Rate"}, {"op": "extend", "dummy_rate": 0.1}, "recalc"]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from logger import get_logger
+from pboq_mirror import connect_bill
+
+log = get_logger("pboq_batch")
+
+
+# ─── Pipeline Definition ─────────────────────────────────────────────────────
+
+STEPS = ("price_sor", "link", "extend", "revert", "recalc", "collect", "export")
+DEFAULT_PIPELINE = "price_sor,link,extend,recalc,collect,export"
+
+# Role -> database column auto-detected by the PBOQ viewer (populate_column_combos)
+SMART_COLUMNS = {
+    'bill_rate': "Bill Rate", 'bill_amount': "Bill Amount",
+    'rate': "GrossRate", 'rate_code': "RateCode",
+    'plug_rate': "PlugRate", 'plug_code': "PlugCode",
+    'prov_sum': "ProvSum", 'prov_sum_code': "ProvSumCode",
+    'pc_sum': "PCSum", 'pc_sum_code': "PCSumCode",
+    'daywork': "Daywork", 'daywork_code': "DayworkCode",
+    'sub_package': "SubbeePackage", 'sub_name': "SubbeeName", 'sub_rate': "SubbeeRate",
+    'sub_markup': "SubbeeMarkup", 'sub_category': "SubbeeCategory", 'sub_code': "SubbeeCode",
+}
+USER_ROLES = ('ref', 'desc', 'qty', 'unit')
+
+
+def parse_pipeline(spec):
+    """Accepts "a,b,c", a list of names/dicts, or a path to a JSON pipeline file.
+    Returns a list of {'op': name, ...} dicts."""
+    if isinstance(spec, str):
+        if os.path.isfile(spec):
+            with open(spec, 'r') as f:
+                spec = json.load(f)
+        else:
+            spec = [s.strip() for s in spec.split(',') if s.strip()]
+
+    pipeline = []
+    for step in spec:
+        step = {'op': step} if isinstance(step, str) else dict(step)
+        op = step.get('op', '').strip().lower()
+        if op not in STEPS:
+            raise ValueError(f"Unknown pipeline step '{op}'. Expected one of: {', '.join(STEPS)}")
+        step['op'] = op
+        pipeline.append(step)
+    return pipeline
+
+
+# ─── Project Helpers ─────────────────────────────────────────────────────────
+
+def find_bills(project_dir):
+    pboq_dir = os.path.join(project_dir, "Priced BOQs")
+    if not os.path.isdir(pboq_dir): return []
+    return sorted(os.path.join(pboq_dir, f) for f in os.listdir(pboq_dir) if f.lower().endswith(".db"))
+
+
+def load_state(project_dir, db_path):
+    """The PBOQ viewer's saved tools state for a bill ({} if it was never opened)."""
+    state_path = os.path.join(project_dir, "PBOQ States", os.path.basename(db_path) + ".json")
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            log.warning(f"Could not read state file '{state_path}': {e}")
+    return {}
+
+
+def resolve_mappings(db_columns, saved):
+    """Mirrors the viewer: Ref/Desc/Qty/Unit come from the saved state, every other
+    role is auto-detected from the database column names."""
+    column_names = db_columns[1:]       # Indices exclude the leading 'Sheet' column
+    saved = saved or {}
+    m = {role: saved.get(role, i) for i, role in enumerate(USER_ROLES)}
+
+    def clean(name): return name.lower().replace(" ", "").replace("_", "")
+    cleaned = [clean(c) for c in column_names]
+    for role, db_name in SMART_COLUMNS.items():
+        if db_name in column_names: m[role] = column_names.index(db_name)
+        elif clean(db_name) in cleaned: m[role] = cleaned.index(clean(db_name))
+        else: m[role] = saved.get(role, -1)
+
+    # Fallback for Bill Rate/Amount on bills whose pricing columns were imported as "Column X"
+    for role, name in (('bill_rate', "Column 4"), ('bill_amount', "Column 5")):
+        if m[role] < 0 and name in column_names: m[role] = column_names.index(name)
+    return m
+
+
+def sor_path_for(project_dir, db_path):
+    pboq_filename = os.path.basename(db_path)
+    sor_filename = "SOR_" + (pboq_filename[5:] if pboq_filename.startswith("PBOQ_") else pboq_filename)
+    if not sor_filename.endswith(".db"): sor_filename += ".db"
+    return os.path.join(project_dir, "SOR", sor_filename)
+
+
+def load_markup_map(db_path):
+    """{rowid: markup %} for Subcontractor Rate linking."""
+    markup_map = {}
+    conn = connect_bill(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT rowid, SubbeeMarkup FROM pboq_items WHERE SubbeeMarkup IS NOT NULL AND SubbeeMarkup != ''")
+        for rid, m_str in cursor.fetchall():
+            try:
+                clean_m = str(m_str).replace('%', '').replace(',', '').strip()
+                if clean_m: markup_map[rid] = float(clean_m)
+            except ValueError: pass
+    except sqlite3.Error: pass
+    finally:
+        conn.close()
+    return markup_map
+
+
+# ─── Worker ──────────────────────────────────────────────────────────────────
+
+def _run_step(step, doc, db_path, db_columns, project_dir, state, export_dir):
+    """Runs one step; returns (deltas, note)."""
+    op = step['op']
+    m = doc.mappings
+    if op == "price_sor":
+        from pboq_match import load_sor_lookup, load_pboq_keys, near_misses, summarize_misses
+        sor_path = sor_path_for(project_dir, db_path)
+        if not os.path.exists(sor_path): return [], f"SOR not found: {os.path.basename(sor_path)}"
+        if m['rate'] < 0 or m['rate_code'] < 0: return [], "Gross Rate/Rate Code not mapped"
+        sor_lookup = load_sor_lookup(sor_path)
+        row_keys = load_pboq_keys(db_path, db_columns, m)
+        misses = near_misses(row_keys, sor_lookup)
+        note = f"near matches: {summarize_misses(misses)}" if misses else ""
+        deltas = doc.price_sor(sor_lookup, row_keys)
+        if step.get('fuzzy'):
+            # {"op": "price_sor", "fuzzy": 0.85}: also price unmatched rows by description similarity
+            from pboq_match import build_sor_fuzzy_index
+            fuzzy = doc.fuzzy_matches(build_sor_fuzzy_index(sor_path), float(step['fuzzy']))
+            deltas += doc.price_rows({rid: hit for rid, (hit, _) in fuzzy.items()})
+            if fuzzy:
+                mean_score = sum(score for _, score in fuzzy.values()) / len(fuzzy)
+                note = "; ".join(filter(None, [f"{len(fuzzy)} fuzzy (avg {mean_score:.2f})", note]))
+        return deltas, note
+
+    if op == "link":
+        from pboq_document import LINK_SOURCES
+        price_type = step.get('price_type') or state.get('price_tools', {}).get('price_type') or "Gross Rate"
+        source_role = LINK_SOURCES.get(price_type, LINK_SOURCES["Gross Rate"])[0]
+        if m[source_role] < 0: return [], f"'{price_type}' source column not mapped"
+        markup_map = load_markup_map(db_path) if price_type == "Subcontractor Rate" else None
+        return doc.link_bill_to_rate(price_type, markup_map), price_type
+
+    if op in ("extend", "revert"):
+        if m['qty'] < 0 or m['bill_rate'] < 0: return [], "Qty/Bill Rate not mapped"
+        dummy_rate = float(step.get('dummy_rate', state.get('dummy_rate', 0.0)))
+        if op == "revert": return doc.revert_extend(dummy_rate), ""
+        checked = step.get('checked_cols')
+        if checked is None:
+            checked = [i for i in range(4) if state.get(f'extend_cb{i}', False)]
+        return doc.extend(checked, dummy_rate), ""
+
+    if op == "recalc":
+        if m['qty'] < 0 or m['bill_rate'] < 0 or m['bill_amount'] < 0: return [], "Qty/Bill columns not mapped"
+        return doc.recalculate(), ""
+
+    if op == "collect":
+        if m['desc'] < 0 or m['bill_amount'] < 0: return [], "Description/Bill Amount not mapped"
+        kw = str(step.get('keyword', state.get('collect_kw', ''))).lower().strip()
+        if not kw: return [], "no collection keyword"
+        return doc.collect(kw, step.get('search_desc', state.get('collect_desc', True)),
+                           step.get('search_amount', state.get('collect_amount', False))), ""
+
+    if op == "export":
+        from pboq_export import PBOQExcelExporter
+        out_dir = step.get('dir') or export_dir or os.path.dirname(db_path)
+        os.makedirs(out_dir, exist_ok=True)
+        output_path = os.path.join(out_dir, os.path.splitext(os.path.basename(db_path))[0] + ".xlsx")
+        success, message = PBOQExcelExporter(db_path, project_dir).export(output_path)
+        if not success: raise RuntimeError(message)
+        return [], output_path
+    return [], ""
+
+
+def process_bill(db_path, project_dir, pipeline, export_dir=None, dry_run=False):
+    """Runs the pipeline over one bill. Returns a picklable result dict for the report."""
+    from pboq_document import PBOQDocument
+    from pboq_logic import PBOQLogic
+
+    result = {'bill': os.path.basename(db_path), 'ok': True, 'error': "", 'rows': 0,
+              'steps': [], 'changed_cells': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+    try:
+        conn = connect_bill(db_path)
+        try: _, db_columns = PBOQLogic.ensure_schema(conn)
+        finally: conn.close()
+
+        state = load_state(project_dir, db_path)
+        t0 = time.perf_counter()
+        doc, db_columns = PBOQDocument.load(db_path, resolve_mappings(db_columns, state.get('mappings')))
+        result['rows'] = sum(len(s) for s in doc.sheets)
+        result['steps'].append({'op': "load", 'deltas': 0, 'seconds': time.perf_counter() - t0, 'note': ""})
+
+        pending = []
+        for step in pipeline:
+            t0 = time.perf_counter()
+            if step['op'] == "export" and pending and not dry_run:
+                # The exporter reads the database, so flush everything before it
+                doc.persist(db_path, db_columns, pending)
+                pending = []
+            if step['op'] == "export" and dry_run:
+                deltas, note = [], "skipped (dry run)"
+            else:
+                deltas, note = _run_step(step, doc, db_path, db_columns, project_dir, state, export_dir)
+            pending.extend(deltas)
+            result['changed_cells'] += len(deltas)
+            result['steps'].append({'op': step['op'], 'deltas': len(deltas),
+                                    'seconds': time.perf_counter() - t0, 'note': note})
+
+        if pending and not dry_run:
+            t0 = time.perf_counter()
+            doc.persist(db_path, db_columns, pending)
+            result['steps'].append({'op': "persist", 'deltas': len(pending),
+                                    'seconds': time.perf_counter() - t0, 'note': ""})
+    except Exception as e:
+        log.error(f"Batch pricing failed for '{db_path}': {e}", exc_info=True)
+        result['ok'] = False
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+# ─── Runner & Report ─────────────────────────────────────────────────────────
+
+def run_batch(project_dir, pipeline, workers=None, export_dir=None, dry_run=False, bills=None):
+    """Processes every bill (or the given subset) and returns the report dict.
+    workers=1 runs in-process; otherwise one worker process per bill up to `workers`."""
+    pipeline = parse_pipeline(pipeline)
+    bills = bills if bills is not None else find_bills(project_dir)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(bills) or 1))
+
+    started = time.perf_counter()
+    results = []
+    if workers == 1:
+        for db_path in bills:
+            results.append(process_bill(db_path, project_dir, pipeline, export_dir, dry_run))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(process_bill, db_path, project_dir, pipeline, export_dir, dry_run)
+                       for db_path in bills]
+            for future in as_completed(futures):
+                results.append(future.result())
+        results.sort(key=lambda r: r['bill'])
+
+    step_totals = {}
+    for res in results:
+        for s in res['steps']:
+            total = step_totals.setdefault(s['op'], {'deltas': 0, 'seconds': 0.0})
+            total['deltas'] += s['deltas']
+            total['seconds'] += s['seconds']
+
+    return {
+        'project_dir': project_dir,
+        'pipeline': pipeline,
+        'workers': workers,
+        'dry_run': dry_run,
+        'started': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'wall_seconds': time.perf_counter() - started,
+        'bills': len(results),
+        'failed': sum(1 for r in results if not r['ok']),
+        'changed_cells': sum(r['changed_cells'] for r in results),
+        'step_totals': step_totals,
+        'results': results,
+    }
+
+
+def format_report(report):
+    lines = [
+        f"PBOQ batch pricing — {report['project_dir']}",
+        f"Pipeline: {' > '.join(s['op'] for s in report['pipeline'])}"
+        + ("  (dry run)" if report['dry_run'] else ""),
+        f"{report['bills']} bill(s), {report['failed']} failed, {report['changed_cells']} cell(s) changed, "
+        f"{report['wall_seconds']:.2f}s wall on {report['workers']} worker(s)",
+        "",
+    ]
+    for res in report['results']:
+        status = "OK " if res['ok'] else "ERR"
+        lines.append(f"[{status}] {res['bill']}: {res['rows']} rows, {res['changed_cells']} changes, {res['seconds']:.2f}s")
+        for s in res['steps']:
+            note = f"  ({s['note']})" if s['note'] else ""
+            lines.append(f"        {s['op']:<10} {s['deltas']:>7} {s['seconds']:>8.3f}s{note}")
+        if res['error']: lines.append(f"        error: {res['error']}")
+    lines.append("")
+    lines.append("Step totals (CPU seconds across workers):")
+    for op, total in report['step_totals'].items():
+        lines.append(f"    {op:<10} {total['deltas']:>7} {total['seconds']:>8.3f}s")
+    return "\n".join(lines)
+
+
+def write_report(report, report_path):
+    """Writes the JSON report plus a readable .txt summary next to it."""
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.splitext(report_path)[0] + ".txt", 'w', encoding='utf-8') as f:
+        f.write(format_report(report))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a pricing pipeline over every Priced BOQ of a project.")
+    parser.add_argument("project_dir", help="Project folder containing 'Priced BOQs' and 'PBOQ States'")
+    parser.add_argument("--steps", default=None, help=f"Comma-separated steps (default: {DEFAULT_PIPELINE})")
+    parser.add_argument("--pipeline", default=None, help="JSON pipeline file (overrides --steps)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--export-dir", default=None, help="Folder for exported .xlsx files (default: next to each bill)")
+    parser.add_argument("--report", default=None, help="Report path (default: <project>/Batch Reports/batch_<time>.json)")
+    parser.add_argument("--only", nargs="*", default=None, help="Bill file names to process (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Run the pipeline without writing to the bills")
+    args = parser.parse_args(argv)
+
+    project_dir = os.path.abspath(args.project_dir)
+    bills = find_bills(project_dir)
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        bills = [b for b in bills if os.path.basename(b).lower() in wanted]
+    if not bills:
+        print(f"No Priced BOQs found in '{os.path.join(project_dir, 'Priced BOQs')}'")
+        return 1
+
+    try:
+        pipeline = parse_pipeline(args.pipeline or args.steps or DEFAULT_PIPELINE)
+    except (ValueError, OSError, json.JSONDecodeError) as e:
+        print(f"Invalid pipeline: {e}")
+        return 2
+
+    report = run_batch(project_dir, pipeline, args.workers, args.export_dir, args.dry_run, bills)
+    report_path = args.report or os.path.join(project_dir, "Batch Reports",
+                                              time.strftime("batch_%Y%m%d_%H%M%S.json"))
+    write_report(report, report_path)
+    print(format_report(report))
+    print(f"\nReport written to {report_path}")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    from logger import setup_logging
+    setup_logging(log_to_console=False)
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import os
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+                             QHeaderView, QMessageBox, QInputDialog, QLabel)
+from PyQt6.QtCore import Qt, pyqtSignal
+import pboq_branches as branches
+
+
+class BranchesDialog(QDialog):
+    """Snapshots and what-if branches of the open bill, compared by bill totals per sheet."""
+    billChanged = pyqtSignal()
+
+    def __init__(self, db_path, db_columns, mappings, journal, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.db_columns = db_columns
+        self.mappings = mappings
+        self.journal = journal
+        self.setWindowTitle(f"Snapshots & Branches - {os.path.basename(db_path)}")
+        self.setMinimumWidth(850)
+        self.setMinimumHeight(400)
+        self._init_ui()
+        self._load_data()
+
+    def _init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Branches hold only the cells they change; totals are compared against the bill (Base)."))
+
+        self.table = QTableWidget()
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        self.table.verticalHeader().setDefaultSectionSize(24)
+        self.table.itemSelectionChanged.connect(self._update_buttons)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        self.snapshot_btn = QPushButton("Take Snapshot")
+        self.snapshot_btn.setToolTip("Save a compact copy of the bill in its Snapshots folder")
+        self.snapshot_btn.clicked.connect(self._take_snapshot)
+        self.restore_btn = QPushButton("Restore Snapshot...")
+        self.restore_btn.clicked.connect(self._restore_snapshot)
+        self.branch_btn = QPushButton("Last Operation to Branch")
+        self.branch_btn.setToolTip("Move the last bill operation into a new branch (the bill is put back as it was)")
+        self.branch_btn.clicked.connect(self._branch_last_operation)
+        self.diff_btn = QPushButton("Show Changes")
+        self.diff_btn.clicked.connect(self._show_diff)
+        self.merge_btn = QPushButton("Merge into Bill")
+        self.merge_btn.clicked.connect(self._merge_branch)
+        self.delete_btn = QPushButton("Delete Branch")
+        self.delete_btn.clicked.connect(self._delete_branch)
+
+        for btn in (self.snapshot_btn, self.restore_btn):
+            btn_layout.addWidget(btn)
+        btn_layout.addStretch()
+        for btn in (self.branch_btn, self.diff_btn, self.merge_btn, self.delete_btn):
+            btn_layout.addWidget(btn)
+        layout.addLayout(btn_layout)
+
+    def _load_data(self):
+        branch_rows = branches.list_branches(self.db_path)
+        totals = branches.compare_branches(self.db_path, self.db_columns, self.mappings)
+        base = totals.get(branches.BASE, {})
+        sheets = list(base.keys())
+
+        self.table.clear()
+        self.table.setColumnCount(len(sheets) + 4)
+        self.table.setHorizontalHeaderLabels(["Branch", "Changed Cells"] + sheets + ["Bill Total", "Difference"])
+        self.table.setRowCount(len(branch_rows) + 1)
+        base_total = sum(base.values())
+        for r, (name, cells) in enumerate([(branches.BASE, "")] + [(n, str(c)) for n, _, c in branch_rows]):
+            sheet_totals = totals.get(name, {})
+            total = sum(sheet_totals.values())
+            texts = [name, cells] + ["{:,.2f}".format(sheet_totals.get(s, 0.0)) for s in sheets]
+            texts += ["{:,.2f}".format(total), "" if r == 0 else "{:+,.2f}".format(total - base_total)]
+            for c, text in enumerate(texts):
+                item = QTableWidgetItem(text)
+                if c >= 2: item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(r, c, item)
+        self.table.resizeColumnsToContents()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self._update_buttons()
+
+    def _selected_branch(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows or rows[0].row() == 0: return None
+        return self.table.item(rows[0].row(), 0).text()
+
+    def _update_buttons(self):
+        selected = self._selected_branch() is not None
+        for btn in (self.diff_btn, self.merge_btn, self.delete_btn):
+            btn.setEnabled(selected)
+        label = self.journal.undo_label() if self.journal else None
+        self.branch_btn.setEnabled(label is not None)
+        self.branch_btn.setToolTip(f"Move '{label}' into a new branch (the bill is put back as it was)"
+                                   if label else "No operation to move into a branch")
+
+    # --- Snapshots ---
+    def _take_snapshot(self):
+        label, ok = QInputDialog.getText(self, "Take Snapshot", "Snapshot label (optional):")
+        if not ok: return
+        try:
+            path = branches.create_snapshot(self.db_path, label)
+        except Exception as e:
+            QMessageBox.critical(self, "Snapshot Failed", str(e))
+            return
+        QMessageBox.information(self, "Snapshot Saved", f"Saved {os.path.basename(path)}")
+
+    def _restore_snapshot(self):
+        snapshots = branches.list_snapshots(self.db_path)
+        if not snapshots:
+            QMessageBox.information(self, "Restore Snapshot", "This bill has no snapshots yet.")
+            return
+        names = [os.path.basename(p) for p in snapshots]
+        name, ok = QInputDialog.getItem(self, "Restore Snapshot", "Replace the bill with:", names, 0, False)
+        if not ok: return
+        if QMessageBox.question(self, "Restore Snapshot",
+                                f"Replace the current bill with '{name}'?\nChanges since the snapshot are lost "
+                                "(take a snapshot first to keep them).") != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            branches.restore_snapshot(snapshots[names.index(name)], self.db_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Restore Failed", str(e))
+            return
+        self.billChanged.emit()
+        self._load_data()
+
+    # --- Branches ---
+    def _branch_last_operation(self):
+        label = self.journal.undo_label()
+        cells = self.journal.last_operation_cells()
+        if not cells:
+            QMessageBox.information(self, "Branch", f"'{label}' changed formatting only; nothing to branch.")
+            return
+        name, ok = QInputDialog.getText(self, "New Branch", "Branch name:", text=label)
+        name = name.strip()
+        if not ok or not name: return
+        try:
+            branches.create_branch(self.db_path, name, cells)
+        except Exception as e:
+            QMessageBox.critical(self, "Branch Failed", f"Could not create branch '{name}': {e}")
+            return
+        self.journal.undo()
+        self.billChanged.emit()
+        self._load_data()
+
+    def _show_diff(self):
+        name = self._selected_branch()
+        if not name: return
+        diff = branches.branch_diff(self.db_path, name)
+        lines = [f"Row {rowid}, {col}: '{base or ''}' -> '{value or ''}'"
+                 for rowid, col, base, value in diff]
+        box = QMessageBox(QMessageBox.Icon.Information, f"Branch '{name}'",
+                          f"{len(diff)} cell(s) differ from the bill.", parent=self)
+        if lines: box.setDetailedText("\n".join(lines))
+        box.exec()
+
+    def _merge_branch(self):
+        name = self._selected_branch()
+        if not name: return
+        if QMessageBox.question(self, "Merge Branch", f"Write the cells of '{name}' into the bill?") \
+                != QMessageBox.StandardButton.Yes:
+            return
+        # One undo step, like any other bill operation
+        self.journal.begin(f"Merge {name}")
+        try:
+            branches.merge_branch(self.db_path, name)
+        except Exception as e:
+            QMessageBox.critical(self, "Merge Failed", str(e))
+        finally:
+            self.journal.commit()
+        self.billChanged.emit()
+        self._load_data()
+
+    def _delete_branch(self):
+        name = self._selected_branch()
+        if not name: return
+        if QMessageBox.question(self, "Delete Branch", f"Delete branch '{name}'?") != QMessageBox.StandardButton.Yes:
+            return
+        branches.delete_branch(self.db_path, name)
+        self._load_data()
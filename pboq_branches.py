@@ -0,0 +1,280 @@
+"""
+PBOQ Branches — Snapshots and what-if branches of a Priced BOQ.
+
+A snapshot is a compact point-in-time copy of a bill, written with VACUUM INTO
+into the "Snapshots" folder next to it and restored with the SQLite backup API.
+
+A branch is a named overlay of changed cells kept inside the bill itself
+(pboq_branch_cells), so a "what if we swap to subbie X" variant costs only the
+cells it changes instead of a copy of the .db file. A branch can be diffed
+against the bill, merged back into it in one transaction, and compared by bill
+totals per sheet: the base totals are one SUM over the bill's numeric shadows
+(pboq_numeric) and only the rows a branch overlays are re-priced.
+
+Usage:
+    from pboq_branches import (create_snapshot, list_snapshots, restore_snapshot, create_branch,
+                               list_branches, branch_diff, merge_branch, delete_branch, compare_branches)
+    path = create_snapshot(db_path, "Before adjudication")
+    create_branch(db_path, "Subbie X", cells)              # cells: [(rowid, col_name, value)]
+    branch_diff(db_path, "Subbie X")                       # [(rowid, col_name, base, branch)]
+    compare_branches(db_path, db_columns, mappings)        # {"Base": {sheet: total}, "Subbie X": {...}}
+    merge_branch(db_path, "Subbie X")
+"""
+
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+from pboq_logic import PBOQLogic
+from pboq_loader import SHEET_NAME_SQL
+from pboq_document import extension_amount, YELLOW
+from pboq_numeric import ensure_numbers, numbers_join, number_of, parse_number, sheet_totals
+from pboq_mirror import connect_bill
+
+SNAPSHOT_DIR = "Snapshots"
+BASE = "Base"       # name of the bill itself in compare_branches()
+
+
+def _amount(value):
+    """Bill Amount cell as a number (0.0 when empty or not numeric), parsed like its numeric shadow."""
+    number = parse_number(value)
+    return 0.0 if number is None else number
+
+
+# ─── Snapshots ───────────────────────────────────────────────────────────────
+
+def snapshot_dir(db_path):
+    return os.path.join(os.path.dirname(db_path), SNAPSHOT_DIR)
+
+
+def create_snapshot(db_path, label=""):
+    """Writes a compacted copy of the bill into its Snapshots folder; returns the snapshot path."""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    label = re.sub(r"[^\w\- ]", "", label).strip()
+    name = f"{stem} @ {datetime.now().strftime('%Y-%m-%d %H%M%S')}" + (f" {label}" if label else "")
+    os.makedirs(snapshot_dir(db_path), exist_ok=True)
+    path = os.path.join(snapshot_dir(db_path), name + ".db")
+    conn = connect_bill(db_path)
+    try:
+        conn.execute("VACUUM INTO ?", (path,))
+    finally:
+        conn.close()
+    return path
+
+
+def list_snapshots(db_path):
+    """Snapshot paths of a bill, newest first."""
+    folder = snapshot_dir(db_path)
+    if not os.path.isdir(folder): return []
+    prefix = os.path.splitext(os.path.basename(db_path))[0] + " @ "
+    names = [f for f in os.listdir(folder) if f.startswith(prefix) and f.lower().endswith(".db")]
+    return [os.path.join(folder, f) for f in sorted(names, reverse=True)]
+
+
+def restore_snapshot(snapshot_path, db_path):
+    """Overwrites the bill with a snapshot, page by page through the backup API."""
+    src = sqlite3.connect(snapshot_path)
+    dst = connect_bill(db_path)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+# ─── Branches ────────────────────────────────────────────────────────────────
+
+def _ensure_tables(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS pboq_branches ("
+                   "branch_id INTEGER PRIMARY KEY, name TEXT UNIQUE, created TEXT)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS pboq_branch_cells ("
+                   "branch_id INTEGER, item_rowid INTEGER, col_name TEXT, value, "
+                   "PRIMARY KEY (branch_id, item_rowid, col_name)) WITHOUT ROWID")
+
+
+def _connect(db_path):
+    conn = connect_bill(db_path)
+    _ensure_tables(conn.cursor())
+    return conn
+
+
+def _branch_id(cursor, name):
+    cursor.execute("SELECT branch_id FROM pboq_branches WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    if not row: raise KeyError(f"No branch named '{name}'")
+    return row[0]
+
+
+def list_branches(db_path):
+    """[(name, created, changed_cells)] in creation order."""
+    conn = _connect(db_path)
+    try:
+        return conn.execute("SELECT b.name, b.created, COUNT(c.item_rowid) FROM pboq_branches b "
+                            "LEFT JOIN pboq_branch_cells c ON c.branch_id = b.branch_id "
+                            "GROUP BY b.branch_id ORDER BY b.branch_id").fetchall()
+    finally:
+        conn.close()
+
+
+def create_branch(db_path, name, cells=()):
+    """Creates a branch holding cells [(rowid, col_name, value)]; later cells win."""
+    conn = _connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO pboq_branches (name, created) VALUES (?, ?)",
+                       (name, datetime.now().isoformat(timespec='seconds')))
+        branch_id = cursor.lastrowid
+        cursor.executemany("INSERT OR REPLACE INTO pboq_branch_cells VALUES (?, ?, ?, ?)",
+                           [(branch_id, rowid, col, value) for rowid, col, value in cells])
+        conn.commit()
+        return branch_id
+    finally:
+        conn.close()
+
+
+def set_branch_cells(db_path, name, cells):
+    """Adds or replaces cells [(rowid, col_name, value)] of an existing branch."""
+    conn = _connect(db_path)
+    try:
+        cursor = conn.cursor()
+        branch_id = _branch_id(cursor, name)
+        cursor.executemany("INSERT OR REPLACE INTO pboq_branch_cells VALUES (?, ?, ?, ?)",
+                           [(branch_id, rowid, col, value) for rowid, col, value in cells])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_branch(db_path, name):
+    conn = _connect(db_path)
+    try:
+        cursor = conn.cursor()
+        branch_id = _branch_id(cursor, name)
+        cursor.execute("DELETE FROM pboq_branch_cells WHERE branch_id = ?", (branch_id,))
+        cursor.execute("DELETE FROM pboq_branches WHERE branch_id = ?", (branch_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _overlay(cursor, branch_id):
+    """{col_name: {rowid: value}} of a branch."""
+    cursor.execute("SELECT item_rowid, col_name, value FROM pboq_branch_cells WHERE branch_id = ?", (branch_id,))
+    overlay = {}
+    for rowid, col, value in cursor.fetchall():
+        overlay.setdefault(col, {})[rowid] = value
+    return overlay
+
+
+def _base_values(cursor, col, rowids):
+    values = {}
+    rowids = sorted(rowids)
+    for i in range(0, len(rowids), 500):
+        batch = rowids[i:i + 500]
+        cursor.execute(f'SELECT rowid, "{col}" FROM pboq_items WHERE rowid IN ({", ".join("?" * len(batch))})', batch)
+        values.update(cursor.fetchall())
+    return values
+
+
+def branch_diff(db_path, name):
+    """[(rowid, col_name, base_value, branch_value)] of the cells where the branch differs from the bill."""
+    conn = _connect(db_path)
+    try:
+        cursor = conn.cursor()
+        diff = []
+        for col, cells in _overlay(cursor, _branch_id(cursor, name)).items():
+            base = _base_values(cursor, col, cells)
+            diff.extend((rowid, col, base.get(rowid), value) for rowid, value in cells.items()
+                        if rowid in base and base[rowid] != value)
+        return sorted(diff)
+    finally:
+        conn.close()
+
+
+def merge_branch(db_path, name, drop=True):
+    """Writes a branch's cells into the bill in one transaction; returns the rowids changed."""
+    conn = _connect(db_path)
+    try:
+        cursor = conn.cursor()
+        branch_id = _branch_id(cursor, name)
+        rowids = set()
+        for col, cells in _overlay(cursor, branch_id).items():
+            cursor.executemany(f'UPDATE pboq_items SET "{col}" = ? WHERE rowid = ?',
+                               [(value, rowid) for rowid, value in cells.items()])
+            rowids.update(cells)
+        if drop:
+            cursor.execute("DELETE FROM pboq_branch_cells WHERE branch_id = ?", (branch_id,))
+            cursor.execute("DELETE FROM pboq_branches WHERE branch_id = ?", (branch_id,))
+        conn.commit()
+        return rowids
+    finally:
+        conn.close()
+
+
+def compare_branches(db_path, db_columns, mappings, names=None):
+    """{BASE or branch name: {sheet_name: bill total}} without materializing any branch.
+
+    Rows a branch overlays are re-priced: an overlaid Bill Amount is taken as is, and an
+    overlaid Qty or Bill Rate re-extends the row like the viewer does.
+    """
+    def col_of(role):
+        idx = mappings.get(role, -1)
+        return db_columns[idx + 1] if 0 <= idx and idx + 1 < len(db_columns) else None
+    amt_col, qty_col, rate_col = col_of('bill_amount'), col_of('qty'), col_of('bill_rate')
+    if not amt_col: return {}
+
+    conn = _connect(db_path)
+    try:
+        shadowed = ensure_numbers(conn)
+        base_totals = sheet_totals(conn, amt_col)
+        cursor = conn.cursor()
+        result = {BASE: base_totals}
+        if names is None:
+            names = [r[0] for r in cursor.execute("SELECT name FROM pboq_branches ORDER BY branch_id").fetchall()]
+        if not names: return result
+
+        # Extension colours come from the stored cell styles, like the viewer's items
+        PBOQLogic.ensure_formatting_store(conn)
+        styles = {}
+        for role in ('bill_amount', 'bill_rate'):
+            if mappings.get(role, -1) >= 0:
+                styles[role] = PBOQLogic._read_cell_styles(cursor, mappings[role])
+        positions = {}
+
+        def bg(role, g_idx):
+            fmt = styles.get(role, {}).get((g_idx, mappings.get(role, -1)), {})
+            return str(fmt.get('bg_color', YELLOW)).lower()
+
+        def text(value):
+            return "" if value is None else str(value)
+
+        for name in names:
+            overlay = _overlay(cursor, _branch_id(cursor, name))
+            rowids = set().union(*(overlay.get(c, {}) for c in (amt_col, qty_col, rate_col) if c))
+            totals = dict(base_totals)
+            if rowids:
+                if not positions:
+                    positions = {r[0]: g for g, r in enumerate(cursor.execute("SELECT rowid FROM pboq_items ORDER BY rowid"))}
+                cols = [f'pboq_items."{c}"' if c else "NULL" for c in (amt_col, qty_col, rate_col)]
+                ordered = sorted(rowids)
+                for i in range(0, len(ordered), 500):
+                    batch = ordered[i:i + 500]
+                    # The base amount is taken off as the total counted it: from its numeric shadow
+                    cursor.execute(f"SELECT pboq_items.rowid, {SHEET_NAME_SQL}, {', '.join(cols)}, {number_of(amt_col, shadowed)} "
+                                   f"FROM pboq_items {numbers_join(shadowed)} "
+                                   f"WHERE pboq_items.rowid IN ({', '.join('?' * len(batch))})", batch)
+                    for rowid, sheet, amt, qty, rate, base_amt in cursor.fetchall():
+                        new_amt = overlay.get(amt_col, {}).get(rowid, amt)
+                        if rowid not in overlay.get(amt_col, {}):
+                            new_qty = overlay.get(qty_col, {}).get(rowid, qty)
+                            new_rate = overlay.get(rate_col, {}).get(rowid, rate)
+                            g_idx = positions.get(rowid)
+                            extended = extension_amount(text(new_qty), text(new_rate), bg('bill_amount', g_idx),
+                                                        bg('bill_rate', g_idx) if rate_col else "")
+                            if extended is not None: new_amt = extended
+                        totals[sheet] = totals.get(sheet, 0.0) + _amount(new_amt) - base_amt
+            result[name] = totals
+        return result
+    finally:
+        conn.close()
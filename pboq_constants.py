@@ -33,3 +33,16 @@ COLOR_FREEZE_GRAY = QColor("#9E9E9E")
 COLOR_FREEZE_GREEN = QColor("#2E7D32")
 COLOR_FREEZE_YELLOW = QColor("#FFEB3B")
 COLOR_FLAGGED = QColor("#FFCDD2")  # Soft red for flagged items
+
+# Identifying column color per mapped role (pboq_document.ROLE_BGS holds the same colours as hex)
+ROLE_COLORS = {
+    'ref': COL_COLOR_BLUE, 'desc': COL_COLOR_BLUE, 'qty': COL_COLOR_BLUE, 'unit': COL_COLOR_BLUE,
+    'bill_rate': COL_COLOR_YELLOW, 'bill_amount': COL_COLOR_YELLOW,
+    'rate': COL_COLOR_GREEN, 'rate_code': COL_COLOR_GREEN,
+    'plug_rate': COL_COLOR_PURPLE, 'plug_code': COL_COLOR_PURPLE,
+    'prov_sum': COLOR_PROV_SUM, 'prov_sum_code': COLOR_PROV_SUM,
+    'pc_sum': COL_COLOR_LIME, 'pc_sum_code': COL_COLOR_LIME,
+    'daywork': COL_COLOR_BROWN, 'daywork_code': COL_COLOR_BROWN,
+    'sub_package': COL_COLOR_ORANGE, 'sub_name': COL_COLOR_ORANGE, 'sub_rate': COL_COLOR_ORANGE,
+    'sub_markup': COL_COLOR_ORANGE, 'sub_category': COL_COLOR_ORANGE, 'sub_code': COL_COLOR_ORANGE,
+}
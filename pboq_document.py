@@ -0,0 +1,860 @@
+"""
+PBOQ Document — Headless pricing engine over the rows of a Priced BOQ.
+
+Holds the cells of a bill column-wise per sheet (text, background and font colour
+as lowercase hex, exactly as the PBOQ viewer shows them) and implements the bulk
+pricing operations on top of them. Every operation updates the document and
+returns the list of CellDelta objects it applied, which the PBOQ viewer renders
+into its QTableWidgets, or which can be persisted directly with persist().
+
+Usage:
+    from pboq_document import PBOQDocument
+    doc, db_columns = PBOQDocument.load(db_path, mappings)
+    deltas = doc.extend(checked_cols=[0, 1, 2, 3], dummy_rate=0.10)
+    deltas += doc.recalculate()
+    doc.persist(db_path, db_columns, deltas)
+"""
+
+import os
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pboq_logic import PBOQLogic
+from pboq_match import pboq_key, normalize_desc
+from pboq_mirror import connect_bill
+from pboq_numeric import number_text, parse_number
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# ─── Colours & Rules ─────────────────────────────────────────────────────────
+
+# Lowercase hex of the pboq_constants colours, so the engine runs without Qt
+BLACK = "#000000"               # QBrush() default: item exists without an explicit colour
+GRAY_TEXT = "#777777"
+COLLECT_BG = "#ffa500"          # "orange"
+SOR_PRICED_BG = "#e8f5e9"
+BLUE = "#e3f2fd"
+YELLOW = "#fff9c4"
+GREEN = "#e8f5e9"
+PURPLE = "#f3e5f5"
+ORANGE = "#ffe0b2"
+LIME = "#d4ff99"
+BROWN = "#d7ccc8"
+LINK_CYAN = "#00ffff"
+PROV_SUM_BG = "#e0ffff"
+FLAGGED_BG = "#ffcdd2"
+
+# Identifying column colour per mapped role (pboq_constants.ROLE_COLORS as hex)
+ROLE_BGS = {
+    'ref': BLUE, 'desc': BLUE, 'qty': BLUE, 'unit': BLUE,
+    'bill_rate': YELLOW, 'bill_amount': YELLOW,
+    'rate': GREEN, 'rate_code': GREEN,
+    'plug_rate': PURPLE, 'plug_code': PURPLE,
+    'prov_sum': PROV_SUM_BG, 'prov_sum_code': PROV_SUM_BG,
+    'pc_sum': LIME, 'pc_sum_code': LIME,
+    'daywork': BROWN, 'daywork_code': BROWN,
+    'sub_package': ORANGE, 'sub_name': ORANGE, 'sub_rate': ORANGE,
+    'sub_markup': ORANGE, 'sub_category': ORANGE, 'sub_code': ORANGE,
+}
+
+# Bill Rate backgrounds marking a rate-based (Qty x Rate) item
+RATE_BASED_BGS = frozenset([PURPLE, GREEN, ORANGE, LINK_CYAN])
+
+# Roles whose columns keep their colour when a row is flagged for review
+PRICING_ROLES = frozenset([
+    'rate', 'bill_rate', 'bill_amount', 'rate_code',
+    'plug_rate', 'plug_code',
+    'prov_sum', 'prov_sum_code',
+    'pc_sum', 'pc_sum_code',
+    'daywork', 'daywork_code',
+    'sub_package', 'sub_name', 'sub_rate', 'sub_markup', 'sub_category', 'sub_code'])
+
+# Physical display roles mirrored into their logical store column on write
+MIRROR_COLUMNS = {
+    'sub_name': 'SubbeeName', 'sub_package': 'SubbeePackage', 'sub_category': 'SubbeeCategory',
+    'sub_code': 'SubbeeCode', 'sub_rate': 'SubbeeRate', 'sub_markup': 'SubbeeMarkup',
+    'plug_rate': 'PlugRate', 'plug_code': 'PlugCode', 'rate': 'GrossRate', 'rate_code': 'RateCode',
+    'prov_sum': 'ProvSum', 'prov_sum_code': 'ProvSumCode', 'pc_sum': 'PCSum', 'pc_sum_code': 'PCSumCode'}
+
+# Logical store columns read next to pboq_items' physical columns (order matters)
+LOGICAL_COLUMNS = [
+    "SubbeePackage", "SubbeeName", "SubbeeRate", "SubbeeMarkup", "SubbeeCategory", "SubbeeCode",
+    "ProvSum", "ProvSumCode", "ProvSumFormula", "ProvSumCategory", "ProvSumCurrency", "ProvSumExchangeRates",
+    "PCSum", "PCSumCode", "PCSumFormula", "PCSumCategory", "PCSumCurrency", "PCSumExchangeRates",
+    "PlugRate", "PlugCode", "PlugFormula", "PlugCategory", "PlugCurrency", "PlugExchangeRates", "PlugFactor", "IsFlagged"]
+
+# Role -> offset into LOGICAL_COLUMNS for roles that can be served from the logical store
+LOGICAL_ROLES = {
+    'sub_package': 0, 'sub_name': 1, 'sub_rate': 2,
+    'sub_markup': 3, 'sub_category': 4, 'sub_code': 5,
+    'prov_sum': 6, 'prov_sum_code': 7,
+    'pc_sum': 12, 'pc_sum_code': 13,
+    'plug_rate': 18, 'plug_code': 19, 'plug_factor': 24}
+
+# Roles where the logical store is ALWAYS authoritative over the physical spreadsheet cell
+LOGICAL_AUTHORITATIVE = frozenset(['sub_category', 'sub_code', 'prov_sum_code', 'pc_sum_code',
+                                   'plug_code', 'plug_rate', 'prov_sum', 'pc_sum', 'plug_factor'])
+
+
+# Price type -> (source role, Bill target role); Plug Rate targets are chosen per row
+LINK_SOURCES = {
+    "Gross Rate": ('rate', 'bill_rate'),
+    "Plug Rate": ('plug_rate', None),
+    "Prov Sum": ('prov_sum', 'bill_amount'),
+    "PC Sum": ('pc_sum', 'bill_amount'),
+    "Subcontractor Rate": ('sub_rate', 'bill_rate'),
+}
+
+
+def column_default_bg(col_idx):
+    """Identifying colour (hex) of an unmapped display column."""
+    if col_idx < 4: return BLUE     # Ref, Desc, Qty, Unit
+    if col_idx < 6: return YELLOW   # Bill Rate/Amt
+    if col_idx < 8: return GREEN    # Gross Rate/Code
+    return PURPLE                   # Plug Rate/Code and others
+
+
+def compile_merge_plan(mappings, num_physical):
+    """[(physical_idx, logical_idx, authoritative)] of the mapped logical roles, in merge order.
+
+    physical_idx indexes pboq_items' physical columns (0 is Sheet); compiled once per load
+    instead of re-reading the role tables for every row.
+    """
+    plan = []
+    for role, l_idx in LOGICAL_ROLES.items():
+        p_idx = mappings.get(role, -1)
+        if 0 <= p_idx < num_physical - 1:
+            plan.append((p_idx + 1, l_idx, role in LOGICAL_AUTHORITATIVE))
+    return plan
+
+
+def apply_merge_plan(physical_data, logical_data, plan):
+    """Overlays logical-store values onto a pboq_items row (in place) following a compiled plan."""
+    for p_idx, l_idx, authoritative in plan:
+        logical_val = logical_data[l_idx]
+        if logical_val is None or str(logical_val).strip() == "" or str(logical_val) == "None": continue
+        if authoritative:
+            physical_data[p_idx] = logical_val
+        else:
+            # Fallback: only use logical if physical is empty
+            phys = physical_data[p_idx]
+            if not phys or str(phys).strip() == "" or phys == "None":
+                physical_data[p_idx] = logical_val
+    return physical_data
+
+
+# Characters str.strip() removes that can realistically appear in a cell
+_SQL_WHITESPACE = "char(32, 9, 10, 11, 12, 13, 28, 29, 30, 31, 133, 160)"
+
+
+def _sql_has_value(expr):
+    return f"({expr} IS NOT NULL AND TRIM(CAST({expr} AS TEXT), {_SQL_WHITESPACE}) <> '' AND CAST({expr} AS TEXT) <> 'None')"
+
+
+def _sql_is_empty(expr):
+    # Mirrors Python's `not v or str(v).strip() == "" or v == "None"`, numeric zero included
+    return (f"({expr} IS NULL OR (typeof({expr}) IN ('integer', 'real') AND {expr} = 0)"
+            f" OR TRIM(CAST({expr} AS TEXT), {_SQL_WHITESPACE}) = '' OR {expr} = 'None')")
+
+
+def merged_select(db_columns, plan):
+    """SELECT expressions for pboq_items' physical columns with a merge plan applied by SQLite.
+
+    Yields exactly what apply_merge_plan() makes of the physical and logical columns, so
+    readers get merged rows straight from the cursor with no per-row Python work.
+    """
+    exprs = [f'"{c}"' for c in db_columns]
+    for p_idx, l_idx, authoritative in plan:
+        logical = LOGICAL_COLUMNS[l_idx]
+        condition = _sql_has_value(logical)
+        if not authoritative:
+            condition = f"{condition} AND {_sql_is_empty(exprs[p_idx])}"
+        exprs[p_idx] = f"CASE WHEN {condition} THEN {logical} ELSE {exprs[p_idx]} END"
+    return exprs
+
+
+def extension_amount(qty_text, rate_text, amt_bg, rate_bg):
+    """Bill Amount text for a rate-based row (Qty 4dp x Rate 2dp, rounded 2dp), else None.
+
+    Colours mark the price type: a purple/cyan Bill Amount is a lump sum plug and a
+    light-cyan one a Prov Sum; a purple/green/orange/cyan Bill Rate is rate based, and
+    an uncoloured or default yellow Bill Rate is assumed to extend unless the amount is
+    marked as a lump sum. rate_bg is "" when the row has no Bill Rate cell at all.
+    """
+    is_lumpsum_plug = amt_bg in (PURPLE, LINK_CYAN)
+    is_prov_sum = amt_bg == PROV_SUM_BG
+    is_rate_based = rate_bg in RATE_BASED_BGS
+    if not is_rate_based and not (is_lumpsum_plug or is_prov_sum):
+        if rate_bg == "" or rate_bg == YELLOW:
+            is_rate_based = True
+    if not is_rate_based or qty_text is None or rate_text is None:
+        return None
+
+    q_val, r_val = parse_number(qty_text), parse_number(rate_text)
+    if q_val is None or r_val is None: return None
+    # Rounding values to standard construction precision (Qty:4, Rate:2)
+    # to match Excel's "Precision as Displayed" math.
+    return "{:,.2f}".format(round(round(q_val, 4) * round(r_val, 2), 2))
+
+
+_LUMP_SUM_BGS = frozenset([PURPLE, LINK_CYAN, PROV_SUM_BG])
+
+
+def _parse_numbers(texts):
+    """float64 array of texts parsed like pboq_numeric.parse_number, plus a validity mask.
+
+    Texts that can be numbers are converted by NumPy in one call; when one of them is
+    malformed (e.g. "1.2.3" or "--5") they all go through parse_number one by one.
+    """
+    n = len(texts)
+    values = np.full(n, np.nan)
+    valid = np.zeros(n, dtype=bool)
+    bulk_idx, bulk = [], []
+    for i, t in enumerate(texts):
+        if not t: continue
+        t = number_text(t)
+        if t is None: continue
+        bulk_idx.append(i)
+        bulk.append(t)
+    if bulk:
+        try:
+            values[bulk_idx] = np.array(bulk, dtype=np.float64)
+            valid[bulk_idx] = True
+        except ValueError:
+            for i in bulk_idx:
+                number = parse_number(texts[i])
+                if number is not None:
+                    values[i] = number
+                    valid[i] = True
+    return values, valid
+
+
+def _round_exact(values, ndigits):
+    """Element-wise round() with Python's exact (correctly rounded, half-even) result.
+
+    rint(x * 10**n) / 10**n only differs from round(x, n) when the scaled value lands
+    next to a .5 tie (or is too large to be an exact integer); those few elements are
+    re-rounded with Python's round().
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    result = np.rint(scaled) / scale
+    frac = np.abs(scaled - np.floor(scaled) - 0.5)
+    suspect = (frac <= np.abs(scaled) * 1e-12 + 1e-9) | ~(np.abs(scaled) < 2.0 ** 52)
+    for i in np.flatnonzero(suspect):
+        result[i] = round(float(values[i]), ndigits)
+    return result
+
+
+def extension_amounts(qty_texts, rate_texts, amt_bgs, rate_bgs):
+    """Bulk extension_amount(): one Bill Amount text (or None) per row, identical to the scalar rules.
+
+    The Qty and Bill Rate columns are parsed into float arrays once and rounded, multiplied
+    and rounded again as whole arrays; only the eligible, numeric rows are formatted.
+    """
+    if not HAS_NUMPY:
+        return [extension_amount(q, r, a, b) for q, r, a, b in zip(qty_texts, rate_texts, amt_bgs, rate_bgs)]
+
+    n = len(qty_texts)
+    eligible = np.fromiter(((q is not None and r is not None and
+                             (rb in RATE_BASED_BGS or (ab not in _LUMP_SUM_BGS and rb in ("", YELLOW))))
+                            for q, r, ab, rb in zip(qty_texts, rate_texts, amt_bgs, rate_bgs)), dtype=bool, count=n)
+    if not eligible.any(): return [None] * n
+
+    q_vals, q_ok = _parse_numbers([q if e else None for q, e in zip(qty_texts, eligible)])
+    r_vals, r_ok = _parse_numbers([r if e else None for r, e in zip(rate_texts, eligible)])
+    ok = eligible & q_ok & r_ok
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        # Rounding values to standard construction precision (Qty:4, Rate:2)
+        # to match Excel's "Precision as Displayed" math.
+        amounts = _round_exact(_round_exact(q_vals, 4) * _round_exact(r_vals, 2), 2)
+
+    result = [None] * n
+    values = amounts.tolist()
+    for i in np.flatnonzero(ok).tolist():
+        result[i] = "{:,.2f}".format(values[i])
+    return result
+
+
+# ─── Data Classes ────────────────────────────────────────────────────────────
+
+ALL_COLUMNS = -1        # CellDelta.col value addressing every display column of the row
+_UNSET = object()
+
+
+@dataclass
+class CellDelta:
+    """One cell change produced by a document operation."""
+    rowid: int
+    col: int                        # display column index, or ALL_COLUMNS
+    text: str = None                # new text (None: unchanged)
+    bg: str = None                  # new background hex (None: unchanged)
+    fg: str = None                  # new font colour hex (None: unchanged)
+    fmt: dict = None                # formatting to merge into the stored cell style
+    clear_fmt: bool = False         # drop the stored cell style
+    sor_mark: bool = False          # cell priced from the SOR (keeps its previous text for revert)
+    value: object = _UNSET          # value written to the database when it differs from text
+
+    @property
+    def db_value(self):
+        return self.text if self.value is _UNSET else self.value
+
+
+@dataclass
+class DocSheet:
+    """Column-wise cell store for one sheet; text is None where the row has no cell."""
+    name: str
+    rowids: list = field(default_factory=list)
+    g_idx: list = field(default_factory=list)
+    text: dict = field(default_factory=dict)    # col -> [str | None]
+    bg: dict = field(default_factory=dict)      # col -> [hex]
+    fg: dict = field(default_factory=dict)      # col -> [hex]
+
+    def __len__(self):
+        return len(self.rowids)
+
+    def cell_text(self, col, r):
+        column = self.text.get(col)
+        return column[r] if column is not None else None
+
+    def cell_bg(self, col, r):
+        column = self.bg.get(col)
+        return column[r] if column is not None and self.text[col][r] is not None else ""
+
+    def cell_fg(self, col, r):
+        column = self.fg.get(col)
+        return column[r] if column is not None and self.text[col][r] is not None else ""
+
+
+# ─── Document ────────────────────────────────────────────────────────────────
+
+class PBOQDocument:
+    """Headless bill: mappings plus per-sheet cell columns, with the bulk pricing operations."""
+
+    def __init__(self, mappings, num_cols):
+        self.mappings = dict(mappings)
+        self.num_cols = num_cols
+        self.columns = sorted({c for c in self.mappings.values() if 0 <= c < num_cols} |
+                              set(range(min(4, num_cols))))
+        self.sheets = []
+        self._locations = {}    # rowid -> (sheet, r)
+        self._watchers = []     # callables(sheet, r) told about every row change
+
+    def watch(self, callback):
+        if callback not in self._watchers: self._watchers.append(callback)
+
+    def unwatch(self, callback):
+        if callback in self._watchers: self._watchers.remove(callback)
+
+    def _notify(self, sheet, r):
+        for callback in self._watchers: callback(sheet, r)
+
+    def add_sheet(self, name):
+        sheet = DocSheet(name)
+        for c in self.columns:
+            sheet.text[c], sheet.bg[c], sheet.fg[c] = [], [], []
+        self.sheets.append(sheet)
+        return sheet
+
+    def append_row(self, sheet, rowid, g_idx, cells):
+        """cells: {col: (text, bg_hex, fg_hex) or None} for the document's columns."""
+        r = len(sheet.rowids)
+        sheet.rowids.append(rowid)
+        sheet.g_idx.append(g_idx)
+        for c in self.columns:
+            cell = cells.get(c)
+            text, bg, fg = cell if cell is not None else (None, "", "")
+            sheet.text[c].append(text)
+            sheet.bg[c].append(bg)
+            sheet.fg[c].append(fg)
+        if rowid is not None: self._locations[rowid] = (sheet, r)
+        if self._watchers: self._notify(sheet, r)
+
+    def set_row(self, sheet, r, rowid, g_idx, cells):
+        old = sheet.rowids[r]
+        if old is not None and old != rowid: self._locations.pop(old, None)
+        sheet.rowids[r] = rowid
+        sheet.g_idx[r] = g_idx
+        for c in self.columns:
+            cell = cells.get(c)
+            text, bg, fg = cell if cell is not None else (None, "", "")
+            sheet.text[c][r], sheet.bg[c][r], sheet.fg[c][r] = text, bg, fg
+        if rowid is not None: self._locations[rowid] = (sheet, r)
+        if self._watchers: self._notify(sheet, r)
+
+    def locate(self, rowid):
+        return self._locations.get(rowid)
+
+    def rows(self):
+        for sheet in self.sheets:
+            for r in range(len(sheet)):
+                if sheet.rowids[r] is not None:
+                    yield sheet, r
+
+    def apply(self, deltas):
+        """Applies deltas to the document's own cells (columns it does not track are ignored)."""
+        for d in deltas:
+            loc = self._locations.get(d.rowid)
+            if loc is None: continue
+            sheet, r = loc
+            cols = self.columns if d.col == ALL_COLUMNS else [d.col]
+            for c in cols:
+                if c not in sheet.text: continue
+                if sheet.text[c][r] is None:
+                    # New cells start out like a fresh QTableWidgetItem
+                    sheet.text[c][r], sheet.bg[c][r], sheet.fg[c][r] = "", BLACK, BLACK
+                if d.text is not None: sheet.text[c][r] = d.text
+                if d.bg is not None: sheet.bg[c][r] = d.bg
+                if d.fg is not None: sheet.fg[c][r] = d.fg
+            if self._watchers: self._notify(sheet, r)
+        return deltas
+
+    # ── Operations ──
+
+    def extend(self, checked_cols, dummy_rate):
+        """Fills empty Bill Rates of aligned, positive-quantity items with the dummy rate (gray)."""
+        m = self.mappings
+        rate_col, amt_col, qty_col = m['bill_rate'], m['bill_amount'], m['qty']
+        d_rate_str = "{:,.2f}".format(dummy_rate)
+        gray_fmt = {'font_color': GRAY_TEXT}
+        deltas = []
+        if not checked_cols: return deltas
+
+        for sheet, r in self.rows():
+            # Extend Logic: every criteria column must hold text
+            if not all((sheet.cell_text(c, r) or "").strip() for c in checked_cols): continue
+            qty_text = sheet.cell_text(qty_col, r)
+            if not qty_text or not qty_text.strip(): continue
+            # Already has a rate?
+            rate_text = sheet.cell_text(rate_col, r)
+            if rate_text and rate_text.strip(): continue
+            try:
+                qty_val = float(qty_text.replace(',', ''))
+            except ValueError: continue
+            if qty_val <= 0: continue
+
+            rowid = sheet.rowids[r]
+            deltas.append(CellDelta(rowid, rate_col, text=d_rate_str, fg=GRAY_TEXT, fmt=gray_fmt))
+            if amt_col >= 0:
+                amt_str = "{:,.2f}".format(qty_val * dummy_rate)
+                deltas.append(CellDelta(rowid, amt_col, text=amt_str, fg=GRAY_TEXT, fmt=gray_fmt))
+        return self.apply(deltas)
+
+    def revert_extend(self, dummy_rate):
+        """Clears gray dummy Bill Rates (and their amounts) written by extend()."""
+        m = self.mappings
+        rate_col, amt_col = m['bill_rate'], m['bill_amount']
+        d_rate_str = "{:,.2f}".format(dummy_rate)
+        deltas = []
+        for sheet, r in self.rows():
+            if sheet.cell_text(rate_col, r) == d_rate_str and sheet.cell_fg(rate_col, r) == GRAY_TEXT:
+                rowid = sheet.rowids[r]
+                deltas.append(CellDelta(rowid, rate_col, text="", fg=BLACK, clear_fmt=True))
+                if amt_col >= 0:
+                    deltas.append(CellDelta(rowid, amt_col, text="", fg=BLACK, clear_fmt=True))
+        return self.apply(deltas)
+
+    def recalculate(self, rowids=None):
+        """Re-extends Bill Amount for rate-based rows; returns deltas only for changed amounts."""
+        m = self.mappings
+        qty_col, rate_col, amt_col = m.get('qty', -1), m.get('bill_rate', -1), m.get('bill_amount', -1)
+        if amt_col < 0: return []
+
+        if rowids is None:
+            groups = [(sheet, [r for r in range(len(sheet)) if sheet.rowids[r] is not None]) for sheet in self.sheets]
+        else:
+            by_sheet = {}
+            for loc in map(self._locations.get, rowids):
+                if loc is not None: by_sheet.setdefault(id(loc[0]), (loc[0], set()))[1].add(loc[1])
+            groups = [(sheet, sorted(rs)) for sheet, rs in by_sheet.values()]
+
+        deltas = []
+        for sheet, rs in groups:
+            if not rs: continue
+            qty_texts = self._column(sheet.text, qty_col, rs, None)
+            rate_texts = self._column(sheet.text, rate_col, rs, None)
+            amt_texts = self._column(sheet.text, amt_col, rs, None)
+            amt_bgs = [b if t is not None else BLACK
+                       for t, b in zip(amt_texts, self._column(sheet.bg, amt_col, rs, ""))]
+            rate_bgs = [b if t is not None else ""
+                        for t, b in zip(rate_texts, self._column(sheet.bg, rate_col, rs, ""))]
+            amounts = extension_amounts(qty_texts, rate_texts, amt_bgs, rate_bgs)
+            for r, amt_text, amt_str in zip(rs, amt_texts, amounts):
+                if amt_str is not None and (amt_text or "") != amt_str:
+                    deltas.append(CellDelta(sheet.rowids[r], amt_col, text=amt_str))
+        return self.apply(deltas)
+
+    @staticmethod
+    def _column(store, col, rs, missing):
+        """Values of one column at the sorted, unique rows rs (the list itself when rs covers it)."""
+        column = store.get(col) if col >= 0 else None
+        if column is None: return [missing] * len(rs)
+        return column if len(rs) == len(column) else [column[r] for r in rs]
+
+    def collect(self, keyword, search_desc=True, search_amount=False):
+        """Writes the running Bill Amount total into each keyword row (orange), per sheet."""
+        index = CollectionIndex()
+        try:
+            return index.collect(self, keyword, search_desc, search_amount, full=True)
+        finally:
+            index.detach()
+
+    def revert_collect(self):
+        """Clears every collection cell back to the column's default colour."""
+        amt_col = self.mappings['bill_amount']
+        default_bg = column_default_bg(amt_col)
+        deltas = [CellDelta(sheet.rowids[r], amt_col, text="", bg=default_bg, fg=BLACK, clear_fmt=True)
+                  for sheet, r in self.rows() if sheet.cell_bg(amt_col, r) == COLLECT_BG]
+        return self.apply(deltas)
+
+    def price_sor(self, sor_lookup, row_keys=None):
+        """Strict (sheet, ref, desc, qty, unit) match against an SOR lookup from load_sor_lookup().
+
+        row_keys ({rowid: key} from pboq_match.load_pboq_keys) supplies the persisted
+        keys of the bill; rows without one are normalized from their cell texts.
+        """
+        row_keys = row_keys or {}
+        hits = {}
+        for sheet in self.sheets:
+            for r in range(len(sheet)):
+                rowid = sheet.rowids[r]
+                if rowid is None: continue
+                key = row_keys.get(rowid) or self.match_key(sheet, r)
+                hit = sor_lookup.get(key)
+                if hit is not None: hits[rowid] = hit
+        return self.price_rows(hits)
+
+    def price_rows(self, hits):
+        """Writes {rowid: (gross, code)} into the Gross Rate / Rate Code columns as SOR pricing."""
+        m = self.mappings
+        rate_col, code_col = m['rate'], m['rate_code']
+        deltas = []
+        for rowid, (gross, code) in hits.items():
+            deltas.append(CellDelta(rowid, rate_col, text=str(gross) if gross else "", sor_mark=True, value=gross))
+            deltas.append(CellDelta(rowid, code_col, text=str(code) if code else "", sor_mark=True, value=code))
+            # Highlight row (Light Green)
+            deltas.append(CellDelta(rowid, ALL_COLUMNS, bg=SOR_PRICED_BG))
+        return self.apply(deltas)
+
+    def fuzzy_matches(self, index, min_score=0.85, skip=()):
+        """{rowid: ((gross, code), score)} of unpriced quantity rows against a pboq_match.FuzzyIndex.
+
+        Rows in skip, rows without a quantity and rows whose Gross Rate already holds
+        text are left out, so this is meant to run after the strict price_sor() pass.
+        """
+        m = self.mappings
+        rate_col = m['rate']
+        rows = {}
+        for sheet, r in self.rows():
+            rowid = sheet.rowids[r]
+            if rowid in skip: continue
+            desc = normalize_desc(sheet.cell_text(m['desc'], r))
+            qty = (sheet.cell_text(m['qty'], r) or "").strip()
+            if not desc or not qty: continue
+            if (sheet.cell_text(rate_col, r) or "").strip(): continue
+            unit = sheet.cell_text(m['unit'], r) if m['unit'] >= 0 else None
+            ref = sheet.cell_text(m['ref'], r) if m['ref'] >= 0 else None
+            rows[rowid] = (desc, unit or "", qty, sheet.name, ref or "")
+        return index.match_all(rows, min_score)
+
+    def match_key(self, sheet, r):
+        """SOR match key of a row from its current cell texts."""
+        m = self.mappings
+        return pboq_key(sheet.name,
+                        sheet.cell_text(m['ref'], r) if m['ref'] >= 0 else None,
+                        sheet.cell_text(m['desc'], r),
+                        sheet.cell_text(m['qty'], r),
+                        sheet.cell_text(m['unit'], r) if m['unit'] >= 0 else None)
+
+    def link_bill_to_rate(self, price_type, markup_map=None):
+        """Copies the chosen price source (Gross/Plug/Sub Rate, Prov/PC Sum) into the Bill columns."""
+        m = self.mappings
+        source_role, static_target_role = LINK_SOURCES.get(price_type, LINK_SOURCES["Gross Rate"])
+
+        source_col = m[source_role]
+        source_bg = ROLE_BGS.get(source_role) or LINK_CYAN
+        fmt = {'bg_color': source_bg, 'font_color': GRAY_TEXT}
+        markup_map = markup_map or {}
+        deltas = []
+
+        for sheet, r in self.rows():
+            rowid = sheet.rowids[r]
+            source_text = sheet.cell_text(source_col, r)
+            if not source_text or not source_text.strip(): continue
+
+            # If PC Sum, only link if it has the PC- prefix
+            if price_type == "PC Sum":
+                code_col = m.get('pc_sum_code', -1)
+                if code_col < 0: continue
+                if not (sheet.cell_text(code_col, r) or "").strip().upper().startswith("PC-"): continue
+
+            # Determine Target Role for this row (Plug Rates on zero/empty qty are lump sums)
+            target_role = static_target_role
+            if price_type == "Plug Rate":
+                qty_text = sheet.cell_text(m['qty'], r) if m['qty'] >= 0 else None
+                if not qty_text or not qty_text.strip():
+                    target_role = 'bill_amount'
+                else:
+                    try: target_role = 'bill_amount' if float(qty_text.replace(',', '')) == 0 else 'bill_rate'
+                    except ValueError: target_role = 'bill_rate'
+
+            target_col = m.get(target_role, -1)
+            if target_col < 0: continue
+
+            val_str = source_text.strip()
+            active_val_str = val_str
+            try:
+                # Always treat linked rates as 2-decimal rounded figures
+                r_val = float(val_str.replace(',', ''))
+                if price_type == "Subcontractor Rate":
+                    effective_markup = markup_map.get(rowid, 0.0)
+                    if effective_markup != 0:
+                        r_val = r_val * (1 + (effective_markup / 100.0))
+                active_val_str = "{:,.2f}".format(r_val)
+            except ValueError: pass
+
+            deltas.append(CellDelta(rowid, target_col, text=active_val_str, bg=source_bg, fg=GRAY_TEXT, fmt=fmt))
+        return self.apply(deltas)
+
+    # ── Database I/O ──
+
+    @classmethod
+    def load(cls, db_path, mappings):
+        """Builds a document straight from a Priced BOQ database, styled as the PBOQ viewer loads it.
+        Returns (document, db_columns)."""
+        conn = connect_bill(db_path)
+        try:
+            success, db_columns = PBOQLogic.ensure_schema(conn)
+            formatting = PBOQLogic.load_formatting(conn)
+            merged = merged_select(db_columns, compile_merge_plan(mappings, len(db_columns)))
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT rowid, {', '.join(merged)}, IsFlagged FROM pboq_items")
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        num_cols = len(db_columns) - 1
+        doc = cls(mappings, num_cols)
+        m = doc.mappings
+        map_inv = {v: k for k, v in m.items() if v >= 0}
+        sub_markup_idx = m.get('sub_markup', -1)
+        flagged_bg = FLAGGED_BG
+        pricing_cols = {m.get(role, -1) for role in PRICING_ROLES}
+        base_bg = {}
+        for c in doc.columns:
+            role = map_inv.get(c)
+            base_bg[c] = (ROLE_BGS.get(role) if role else column_default_bg(c)) or BLACK
+
+        sheets = {}
+        for g_idx, row in enumerate(rows):
+            physical = row[1:-1]
+            is_flagged = row[-1] in [1, '1', True, 'True']
+            sheet_name = str(physical[0]) if physical[0] else "Sheet 1"
+            sheet = sheets.get(sheet_name)
+            if sheet is None: sheet = sheets[sheet_name] = doc.add_sheet(sheet_name)
+
+            cells = {}
+            for c in doc.columns:
+                val = physical[c + 1] if c + 1 < len(physical) else ""
+                text = str(val) if val is not None else ""
+                if c == sub_markup_idx and text:
+                    try: text = "{:,.2f}%".format(float(text.replace('%', '').replace(',', '')))
+                    except ValueError: pass
+                bg, fg = base_bg[c], BLACK
+                if is_flagged and c not in pricing_cols: bg = flagged_bg
+                fmt = formatting.get((g_idx, c))
+                if fmt:
+                    if 'font_color' in fmt: fg = fmt['font_color'].lower()
+                    if 'bg_color' in fmt: bg = fmt['bg_color'].lower()
+                if text == "0.00": fg = GRAY_TEXT
+                cells[c] = (text, bg, fg)
+            doc.append_row(sheet, row[0], g_idx, cells)
+        return doc, db_columns
+
+    def persist(self, db_path, db_columns, deltas):
+        """Writes deltas to pboq_items (mirroring logical columns) and the formatting store in one transaction."""
+        if not deltas or not db_path or not os.path.exists(db_path): return
+        role_of = {v: k for k, v in self.mappings.items() if v >= 0}
+        values, fmt_merge, fmt_clear = {}, {}, set()
+        for d in deltas:
+            if d.col == ALL_COLUMNS: continue
+            loc = self._locations.get(d.rowid)
+            if d.text is not None:
+                values.setdefault(d.col, {})[d.rowid] = d.db_value
+            if loc is None: continue
+            g_idx = loc[0].g_idx[loc[1]]
+            if d.clear_fmt:
+                fmt_clear.add((g_idx, d.col))
+                fmt_merge.pop((g_idx, d.col), None)
+            if d.fmt:
+                fmt_merge.setdefault((g_idx, d.col), {}).update(d.fmt)
+
+        conn = connect_bill(db_path)
+        try:
+            cursor = conn.cursor()
+            for col, updates in values.items():
+                if col + 1 >= len(db_columns): continue
+                targets = [db_columns[col + 1]]
+                mirror = MIRROR_COLUMNS.get(role_of.get(col))
+                if mirror and mirror != targets[0]: targets.append(mirror)
+                params = [(v, rid) for rid, v in updates.items()]
+                for name in targets:
+                    cursor.executemany(f'UPDATE pboq_items SET "{name}" = ? WHERE rowid = ?', params)
+
+            if fmt_clear:
+                cursor.executemany("DELETE FROM pboq_cell_styles WHERE row_idx=? AND col_idx=?", list(fmt_clear))
+            if fmt_merge:
+                existing = {}
+                for col in {c for _, c in fmt_merge}:
+                    existing.update(PBOQLogic._read_cell_styles(cursor, col))
+                merged = []
+                for key, fmt in fmt_merge.items():
+                    base = dict(existing.get(key, {})) if key not in fmt_clear else {}
+                    base.update(fmt)
+                    merged.append((key, base))
+                PBOQLogic._write_cell_styles(cursor, merged)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# ─── Collections ─────────────────────────────────────────────────────────────
+
+class _SheetCollections:
+    """Collection rows of one sheet with the Bill Amount contribution of every row."""
+
+    def __init__(self, n):
+        self.marks = []                 # sorted rows holding a collection (keyword) cell
+        self.is_mark = [False] * n
+        self.contrib = [None] * n       # float added to the next collection, or None
+        self.sums = {}                  # mark row -> total of its section
+        self.dirty = set()
+        self.stale = False
+
+    def section_sum(self, pos):
+        """Sums the section above marks[pos] in row order, exactly as a top-down pass would."""
+        end = self.marks[pos]
+        start = self.marks[pos - 1] + 1 if pos > 0 else 0
+        cur_sum = 0.0
+        for value in self.contrib[start:end]:
+            if value is not None: cur_sum += value
+        return cur_sum
+
+
+class CollectionIndex:
+    """Incremental "Collect" over a PBOQDocument.
+
+    Each sheet keeps its collection rows sorted plus one contribution per row, and the
+    total of every section (the rows between two collection rows). The index watches
+    the document, so after an edit only the touched rows are re-classified and only
+    the sections they belong to are re-summed; the rest of the collection cells are
+    left alone. Sections are re-summed in row order so totals stay bit-identical to a
+    single top-down pass.
+    """
+
+    def __init__(self):
+        self.document = None
+        self._rules = None
+        self._sheets = {}       # id(sheet) -> _SheetCollections
+
+    def detach(self):
+        if self.document is not None: self.document.unwatch(self._row_changed)
+        self.document = None
+        self._sheets = {}
+
+    def _row_changed(self, sheet, r):
+        state = self._sheets.get(id(sheet))
+        if state is None: return
+        if r >= len(state.contrib): state.stale = True
+        elif not state.stale: state.dirty.add(r)
+
+    def _row_state(self, sheet, r):
+        """(is collection row, contribution) for one row under the current rules."""
+        if sheet.rowids[r] is None: return False, None
+        kw, search_desc, search_amount, desc_col, amt_col = self._rules
+        desc_text = sheet.cell_text(desc_col, r)
+        amt_text = sheet.cell_text(amt_col, r)
+
+        # Check for matches based on user selection
+        if bool(kw) and ((search_desc and desc_text is not None and kw in desc_text.lower()) or
+                         (search_amount and amt_text is not None and kw in amt_text.lower())):
+            return True, None
+        if amt_text and amt_text.strip() and sheet.cell_bg(amt_col, r) != COLLECT_BG:
+            # Add to sum if not a logic cell
+            try: return False, float(amt_text.replace(',', ''))
+            except ValueError: pass
+        return False, None
+
+    def _build(self, sheet):
+        state = _SheetCollections(len(sheet))
+        for r in range(len(sheet)):
+            state.is_mark[r], state.contrib[r] = self._row_state(sheet, r)
+        state.marks = [r for r, mark in enumerate(state.is_mark) if mark]
+        state.sums = {mark: state.section_sum(pos) for pos, mark in enumerate(state.marks)}
+        state.stale = False
+        return state
+
+    def _update(self, sheet, state):
+        """Re-classifies the dirty rows; returns the marks whose cell needs checking."""
+        marks, check = state.marks, set()
+        for r in sorted(state.dirty):
+            mark, value = self._row_state(sheet, r)
+            if mark != state.is_mark[r]:
+                state.is_mark[r] = mark
+                pos = bisect_left(marks, r)
+                if mark:
+                    marks.insert(pos, r)
+                    check.add(r)
+                    if pos + 1 < len(marks): check.add(marks[pos + 1])
+                else:
+                    marks.pop(pos)
+                    state.sums.pop(r, None)
+                    if pos < len(marks): check.add(marks[pos])
+            elif mark:
+                check.add(r)    # the collection cell itself was touched
+            if value != state.contrib[r] or (value is not None and value != value):
+                state.contrib[r] = value
+                pos = bisect_left(marks, r)
+                if pos < len(marks): check.add(marks[pos])
+        state.dirty.clear()
+        for mark in check:
+            state.sums[mark] = state.section_sum(bisect_left(marks, mark))
+        return check
+
+    def collect(self, doc, keyword, search_desc=True, search_amount=False, full=False):
+        """Returns (and applies) the deltas that bring every collection cell up to date.
+
+        full=True re-emits every collection cell (the Collect button); otherwise only
+        cells whose total or colours are out of date are returned (auto-collect).
+        """
+        m = doc.mappings
+        amt_col = m['bill_amount']
+        rules = (keyword.lower().strip(), search_desc, search_amount, m['desc'], amt_col)
+        if doc is not self.document or rules != self._rules:
+            self.detach()
+            self.document, self._rules = doc, rules
+            doc.watch(self._row_changed)
+
+        fmt = {'bg_color': COLLECT_BG, 'font_color': GRAY_TEXT}
+        deltas = []
+        sheets = {}
+        for sheet in doc.sheets:
+            state = self._sheets.get(id(sheet))
+            if state is None or state.stale:
+                state = self._build(sheet)
+                check = state.marks
+            else:
+                check = self._update(sheet, state)
+            sheets[id(sheet)] = state
+            for r in (state.marks if full else sorted(check)):
+                f_sum = "{:,.2f}".format(state.sums[r])
+                if full or sheet.cell_text(amt_col, r) != f_sum or sheet.cell_bg(amt_col, r) != COLLECT_BG \
+                        or sheet.cell_fg(amt_col, r) != GRAY_TEXT:
+                    deltas.append(CellDelta(sheet.rowids[r], amt_col, text=f_sum, bg=COLLECT_BG, fg=GRAY_TEXT, fmt=fmt))
+        self._sheets = sheets
+        return doc.apply(deltas)
@@ -9,14 +9,15 @@ Prov Sum, Prov Sum Code, PC Sum, PC Sum Code, Daywork, Daywork Code).
 
 import os
 import json
-import sqlite3
 from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
 from logger import get_logger
 
 log = get_logger("pboq_export")
 
 try:
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, numbers
     from openpyxl.utils import get_column_letter
     HAS_OPENPYXL = True
@@ -61,6 +62,15 @@ def _sanitize_color(color_val, fallback="FFFFFF"):
     return fallback
 
 
+# Rows written between progress callbacks of a streaming export
+PROGRESS_ROWS = 500
+
+
+def prepare_sheet(rows, mappings, db_columns, formatting_data):
+    """[[(cell_value, style_key), ...] per row] of one sheet; picklable for process pools."""
+    return list(PBOQExcelExporter._sheet_cells(rows, mappings, db_columns, formatting_data))
+
+
 class PBOQExcelExporter:
     """Exports a PBOQ .db file to a styled .xlsx workbook."""
 
@@ -92,7 +102,8 @@ class PBOQExcelExporter:
     # Header row style
     HEADER_FILL = PatternFill(start_color="1b5e20", end_color="1b5e20", fill_type="solid") if HAS_OPENPYXL else None
     HEADER_FONT = Font(name="Arial", bold=True, color="FFFFFF", size=10) if HAS_OPENPYXL else None
-    FLAGGED_FILL = PatternFill(start_color="FFCDD2", end_color="FFCDD2", fill_type="solid") if HAS_OPENPYXL else None
+    HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center") if HAS_OPENPYXL else None
+    FLAGGED_COLOR = "FFCDD2"
     THIN_BORDER = Border(
         bottom=Side(style="thin", color="CCCCCC"),
         right=Side(style="thin", color="CCCCCC")
@@ -110,12 +121,20 @@ class PBOQExcelExporter:
 
     # ── Public API ────────────────────────────────────────────────────────
 
-    def export(self, output_path):
+    def export(self, output_path, streaming=True, pool=None, progress=None):
         """
         Exports the PBOQ database to an Excel workbook.
 
         Args:
             output_path: Destination .xlsx file path.
+            streaming:   Write through write-only worksheets, which serialize each row as
+                         it is written instead of holding every cell of the workbook in
+                         memory. The file looks the same either way.
+            pool:        Optional concurrent.futures executor (streaming only). Sheets are
+                         prepared (value cleaning, numeric parsing, style resolution) in it
+                         while earlier sheets are being written.
+            progress:    Optional callable(done_rows, total_rows, sheet_name), called while
+                         sheets are written (streaming only).
 
         Returns:
             (True, message) on success, (False, error_message) on failure.
@@ -143,17 +162,46 @@ class PBOQExcelExporter:
                 return False, msg
 
             # 3. Build workbook
-            wb = Workbook()
-            # Remove the default sheet created by openpyxl
-            wb.remove(wb.active)
-
-            for sheet_name, rows in sheet_groups.items():
-                ws = wb.create_sheet(title=self._sanitize_sheet_name(sheet_name))
-                self._write_sheet(ws, rows, mappings, db_columns, logical_col_names, formatting_data)
+            if streaming:
+                wb = Workbook(write_only=True)
+                total_rows = sum(len(rows) for rows in sheet_groups.values())
+                if pool is not None:
+                    # Each worker only receives the formatting of its own sheet's rows
+                    sheet_of = {g_idx: name for name, rows in sheet_groups.items() for g_idx, *_ in rows}
+                    sheet_formatting = {name: {} for name in sheet_groups}
+                    for key, fmt in formatting_data.items():
+                        name = sheet_of.get(key[0])
+                        if name is not None: sheet_formatting[name][key] = fmt
+                    prepared = {name: pool.submit(prepare_sheet, rows, mappings, db_columns, sheet_formatting[name])
+                                for name, rows in sheet_groups.items()}
+
+                done_rows = 0
+                for sheet_name in list(sheet_groups):
+                    # Rows already written to the file are not needed any more
+                    rows = sheet_groups.pop(sheet_name)
+                    if pool is not None: sheet_cells = prepared.pop(sheet_name).result()
+                    else: sheet_cells = prepare_sheet(rows, mappings, db_columns, formatting_data)
+                    ws = wb.create_sheet(title=self._sanitize_sheet_name(sheet_name))
+                    sheet_progress = None
+                    if progress:
+                        sheet_progress = lambda n, start=done_rows, name=sheet_name: progress(start + n, total_rows, name)
+                    self._stream_sheet(ws, sheet_cells, sheet_progress)
+                    done_rows += len(rows)
+                sheet_count = len(wb.worksheets)
+            else:
+                wb = Workbook()
+                # Remove the default sheet created by openpyxl
+                wb.remove(wb.active)
+
+                style_cache = {}
+                for sheet_name, rows in sheet_groups.items():
+                    ws = wb.create_sheet(title=self._sanitize_sheet_name(sheet_name))
+                    self._write_sheet(ws, rows, mappings, db_columns, logical_col_names, formatting_data, style_cache)
+                sheet_count = len(sheet_groups)
 
             # 4. Save
             wb.save(output_path)
-            msg = f"Exported {len(sheet_groups)} sheet(s) to:\n{output_path}"
+            msg = f"Exported {sheet_count} sheet(s) to:\n{output_path}"
             log.info(f"PBOQ Excel export completed successfully: {output_path}")
             return True, msg
 
@@ -185,9 +233,9 @@ class PBOQExcelExporter:
             sheet_groups:    dict  {sheet_name: [(global_row_idx, physical_data_list, logical_data_dict, is_flagged), ...]}
             db_columns:      list  of physical column names (including 'Sheet' at index 0)
             logical_col_names: list  of logical column names queried
-            formatting_data: dict  {(global_row_idx, col_idx): {fmt_dict}} from pboq_formatting
+            formatting_data: dict  {(global_row_idx, col_idx): {fmt_dict}} from the formatting store
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_bill(self.db_path)
         PBOQLogic.ensure_schema(conn)
         cursor = conn.cursor()
 
@@ -276,20 +324,9 @@ class PBOQExcelExporter:
 
         return sheet_groups, physical_cols, logical_col_names, formatting_data
 
-    def _write_sheet(self, ws, rows, mappings, db_columns, logical_col_names, formatting_data):
-        """Writes a single worksheet with headers, data, and styling."""
-        num_cols = len(self.COLUMN_SPEC)
-
-        # ── Write header row ──────────────────────────────────────────────
-        for col_idx, (header, _, _, _, _) in enumerate(self.COLUMN_SPEC, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = self.HEADER_FONT
-            cell.fill = self.HEADER_FILL
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        # Freeze header row
-        ws.freeze_panes = "A2"
-
+    @classmethod
+    def _sheet_cells(cls, rows, mappings, db_columns, formatting_data):
+        """Yields one list of (cell_value, style_key) per data row; see _style_objects for the key."""
         # ── Build physical column index map ───────────────────────────────
         # db_columns includes 'Sheet' at [0], display columns start at [1]
         # mappings values are 0-based indices into display columns (i.e., db_columns[1:])
@@ -298,22 +335,19 @@ class PBOQExcelExporter:
 
         # ── Build reverse map: export column index → display column index ──
         # This maps each Excel column (0-based) back to the display col_idx
-        # used as the key in pboq_formatting, so we can look up cell formatting.
+        # used as the key in the formatting store, so we can look up cell formatting.
         export_to_display = {}
-        for export_idx, (_, source_type, source_key, _, _) in enumerate(self.COLUMN_SPEC):
+        for export_idx, (_, source_type, source_key, _, _) in enumerate(cls.COLUMN_SPEC):
             if source_type == "physical":
                 mapped_display_idx = mappings.get(source_key, -1)
                 if mapped_display_idx >= 0:
                     export_to_display[export_idx] = mapped_display_idx
 
-        # ── Write data rows ──────────────────────────────────────────────
-        # Track max content widths for auto-fit
-        col_widths = [len(spec[0]) + 2 for spec in self.COLUMN_SPEC]
-
-        for row_offset, (global_row_idx, physical_data, logical_data, is_flagged) in enumerate(rows):
-            excel_row = row_offset + 2  # Row 1 is header
-
-            for col_idx, (header, source_type, source_key, hex_fill, is_numeric) in enumerate(self.COLUMN_SPEC, start=1):
+        # Equal keys share one tuple, which keeps prepared sheets small when pickled
+        interned = {}
+        for global_row_idx, physical_data, logical_data, is_flagged in rows:
+            cells = []
+            for col_idx, (header, source_type, source_key, hex_fill, is_numeric) in enumerate(cls.COLUMN_SPEC, start=1):
                 raw_value = None
 
                 if source_type == "physical":
@@ -329,48 +363,30 @@ class PBOQExcelExporter:
                     raw_value = logical_data.get(source_key)
 
                 # Convert to proper type
-                cell_value = self._clean_value(raw_value, is_numeric)
-                cell = ws.cell(row=excel_row, column=col_idx, value=cell_value)
+                cell_value = cls._clean_value(raw_value, is_numeric)
 
                 # ── Look up persisted cell formatting ──
-                # For physical columns, check pboq_formatting using (global_row_idx, display_col_idx)
+                # For physical columns, check the formatting store using (global_row_idx, display_col_idx)
                 cell_fmt = None
                 display_col_idx = export_to_display.get(col_idx - 1)  # col_idx is 1-based
                 if display_col_idx is not None:
                     cell_fmt = formatting_data.get((global_row_idx, display_col_idx))
 
-                # ── Cell styling ──
                 # Background fill: persisted bg_color > flagged > default role color
                 if cell_fmt and 'bg_color' in cell_fmt:
-                    bg_hex = _sanitize_color(cell_fmt['bg_color'], fallback="FFFFFF")
-                    try:
-                        cell.fill = PatternFill(start_color=bg_hex, end_color=bg_hex, fill_type="solid")
-                    except Exception as fill_err:
-                        log.warning(f"Could not apply cell background color '{bg_hex}': {fill_err}")
+                    fill = _sanitize_color(cell_fmt['bg_color'], fallback="FFFFFF")
                 elif is_flagged and col_idx <= 2:
-                    if self.FLAGGED_FILL:
-                        cell.fill = self.FLAGGED_FILL
+                    fill = cls.FLAGGED_COLOR
                 else:
-                    safe_fill = _sanitize_color(hex_fill, fallback="FFFFFF")
-                    try:
-                        cell.fill = PatternFill(
-                            start_color=safe_fill, end_color=safe_fill, fill_type="solid"
-                        )
-                    except Exception:
-                        pass
+                    fill = _sanitize_color(hex_fill, fallback="FFFFFF")
 
                 # Number format
-                if is_numeric and isinstance(cell_value, (int, float)):
-                    cell.number_format = '#,##0.00'
+                number_format = '#,##0.00' if is_numeric and isinstance(cell_value, (int, float)) else None
 
                 # Alignment — enable wrap_text on Description column
-                wrap = source_key == "desc"
-                if is_numeric:
-                    cell.alignment = Alignment(horizontal="right", vertical="center", wrap_text=wrap)
-                elif source_key == "unit":
-                    cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=wrap)
-                else:
-                    cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=wrap)
+                if is_numeric: horizontal = "right"
+                elif source_key == "unit": horizontal = "center"
+                else: horizontal = "left"
 
                 # Font: apply persisted bold/italic/font_color, fall back to defaults
                 font_bold = False
@@ -382,27 +398,107 @@ class PBOQExcelExporter:
                     if 'font_color' in cell_fmt:
                         font_color = _sanitize_color(cell_fmt['font_color'], fallback="000000")
 
-                try:
-                    cell.font = Font(name="Arial", size=10, bold=font_bold, italic=font_italic, color=font_color)
-                except Exception as font_err:
-                    log.warning(f"Could not apply font color '{font_color}': {font_err}")
-                    cell.font = Font(name="Arial", size=10, bold=font_bold, italic=font_italic)
+                key = (fill, number_format, horizontal, source_key == "desc", font_bold, font_italic, font_color)
+                cells.append((cell_value, interned.setdefault(key, key)))
+            yield cells
 
+    def _column_widths(self, sheet_cells):
+        """Auto-fit widths per export column: the longest value (capped at 50) plus padding."""
+        col_widths = [len(spec[0]) + 2 for spec in self.COLUMN_SPEC]
+        for cells in sheet_cells:
+            for i, (cell_value, _) in enumerate(cells):
+                display_len = len(str(cell_value)) if cell_value else 0
+                if display_len > col_widths[i]:
+                    col_widths[i] = min(display_len, 50)
+        return [max(width + 3, 10) for width in col_widths]
+
+    def _style_objects(self, key, cache):
+        """Font, fill, alignment and number format of a style key, built once per workbook."""
+        styles = cache.get(key)
+        if styles is None:
+            fill, number_format, horizontal, wrap, bold, italic, font_color = key
+            styles = cache[key] = (
+                Font(name="Arial", size=10, bold=bold, italic=italic, color=font_color),
+                PatternFill(start_color=fill, end_color=fill, fill_type="solid"),
+                Alignment(horizontal=horizontal, vertical="center", wrap_text=wrap),
+                number_format,
+            )
+        return styles
+
+    def _write_sheet(self, ws, rows, mappings, db_columns, logical_col_names, formatting_data, style_cache=None):
+        """Writes a single worksheet with headers, data, and styling."""
+        style_cache = {} if style_cache is None else style_cache
+
+        # ── Write header row ──────────────────────────────────────────────
+        for col_idx, (header, _, _, _, _) in enumerate(self.COLUMN_SPEC, start=1):
+            cell = ws.cell(row=1, column=col_idx, value=header)
+            cell.font = self.HEADER_FONT
+            cell.fill = self.HEADER_FILL
+            cell.alignment = self.HEADER_ALIGNMENT
+
+        # Freeze header row
+        ws.freeze_panes = "A2"
+
+        # ── Write data rows ──────────────────────────────────────────────
+        sheet_cells = list(self._sheet_cells(rows, mappings, db_columns, formatting_data))
+        for excel_row, cells in enumerate(sheet_cells, start=2):  # Row 1 is header
+            for col_idx, (cell_value, key) in enumerate(cells, start=1):
+                cell = ws.cell(row=excel_row, column=col_idx, value=cell_value)
+                font, fill, alignment, number_format = self._style_objects(key, style_cache)
+                cell.font = font
+                cell.fill = fill
+                cell.alignment = alignment
+                if number_format: cell.number_format = number_format
                 # Subtle row border
                 cell.border = self.THIN_BORDER
 
-                # Track column width
-                display_len = len(str(cell_value)) if cell_value else 0
-                if display_len > col_widths[col_idx - 1]:
-                    col_widths[col_idx - 1] = min(display_len, 50)
-
         # ── Auto-fit column widths ────────────────────────────────────────
-        for col_idx in range(1, num_cols + 1):
-            # Add a small padding
-            width = col_widths[col_idx - 1] + 3
-            ws.column_dimensions[get_column_letter(col_idx)].width = max(width, 10)
+        for col_idx, width in enumerate(self._column_widths(sheet_cells), start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    def _stream_sheet(self, ws, sheet_cells, progress=None):
+        """Writes a single write-only worksheet of prepare_sheet() rows: widths first, then
+        rows of pre-styled cells. progress(rows_written) is called every PROGRESS_ROWS rows.
 
-    def _clean_value(self, raw, is_numeric):
+        Each column/style combination gets one WriteOnlyCell, styled once. A write-only
+        sheet serializes each appended row before the next one is built, so that cell is
+        re-used (with a new value) for every cell sharing its style.
+        """
+        # Column widths and panes of a write-only sheet must be set before any row
+        for col_idx, width in enumerate(self._column_widths(sheet_cells), start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+        ws.freeze_panes = "A2"
+
+        header = []
+        for col_idx, (title, _, _, _, _) in enumerate(self.COLUMN_SPEC, start=1):
+            cell = WriteOnlyCell(ws, value=title)
+            cell.font = self.HEADER_FONT
+            cell.fill = self.HEADER_FILL
+            cell.alignment = self.HEADER_ALIGNMENT
+            header.append(cell)
+        ws.append(header)
+
+        style_cache, style_cells = {}, {}
+        for row_count, cells in enumerate(sheet_cells, start=1):
+            row = []
+            for col_idx, (cell_value, key) in enumerate(cells):
+                cell = style_cells.get((col_idx, key))
+                if cell is None:
+                    cell = style_cells[(col_idx, key)] = WriteOnlyCell(ws)
+                    font, fill, alignment, number_format = self._style_objects(key, style_cache)
+                    cell.font = font
+                    cell.fill = fill
+                    cell.alignment = alignment
+                    if number_format: cell.number_format = number_format
+                    cell.border = self.THIN_BORDER
+                cell.value = cell_value
+                row.append(cell)
+            ws.append(row)
+            if progress and (row_count % PROGRESS_ROWS == 0 or row_count == len(sheet_cells)):
+                progress(row_count)
+
+    @staticmethod
+    def _clean_value(raw, is_numeric):
         """Converts a raw DB value to an appropriate Python type for Excel."""
         if raw is None or str(raw).strip() == "" or str(raw).strip() == "None":
             return ""
@@ -0,0 +1,105 @@
+"""
+PBOQ Flags — The review queue of a bill: the rows flagged for review (IsFlagged).
+
+The viewer used to find flagged rows by walking every row of every sheet and reading
+the flag stored on the row's first item, so filtering on '@review' or stepping to the
+next flagged row cost a full scan of the bill. FlagSet holds the flagged rowids of
+the open bill, read with one SELECT when the bill is loaded and kept in step with
+every flag write, ordered the way the viewer shows them (sheet tab, then rowid).
+Stepping through the queue is a bisect; a filter touches only the flagged rows.
+
+Usage:
+    from pboq_flags import FlagSet, write_flags
+    flags = FlagSet.load(conn, sheet_names)          # sheet names in tab order
+    rowid in flags; len(flags); flags.rowids_of("Bill 1")
+    flags.following("Bill 1", rowid)                 # next flagged (sheet, rowid), wrapping
+    flags.following("Bill 1", rowid, backwards=True)
+    write_flags(db_path, rowids, True)               # batch flag/unflag in one transaction
+    flags.reload_rows(conn, rowids)                  # after rows were rewritten elsewhere
+"""
+
+import sqlite3
+from bisect import bisect_left, bisect_right, insort
+
+from logger import get_logger
+from pboq_loader import SHEET_NAME_SQL
+from pboq_mirror import connect_bill
+
+log = get_logger("pboq_flags")
+
+
+class FlagSet:
+    """Flagged rowids of one bill in review order."""
+
+    def __init__(self, sheet_names=()):
+        self._sheet_pos = {name: i for i, name in enumerate(sheet_names)}
+        self._sheet_of = {}      # rowid -> sheet name
+        self._keys = []          # sorted (sheet position, rowid)
+
+    @classmethod
+    def load(cls, conn, sheet_names):
+        flags = cls(sheet_names)
+        flags._read(conn, "IsFlagged = 1", ())
+        return flags
+
+    def _key(self, sheet, rowid):
+        return (self._sheet_pos.get(sheet, len(self._sheet_pos)), rowid)
+
+    def _read(self, conn, where, params):
+        for rowid, sheet in conn.execute(f"SELECT rowid, {SHEET_NAME_SQL} FROM pboq_items WHERE {where}", params):
+            self.set(sheet, rowid, True)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, rowid):
+        return rowid in self._sheet_of
+
+    def __iter__(self):
+        return (rowid for _, rowid in self._keys)
+
+    def rowids_of(self, sheet):
+        return {rowid for rowid, s in self._sheet_of.items() if s == sheet}
+
+    def set(self, sheet, rowid, flagged):
+        """Adds (flagged=True) or removes a row."""
+        if flagged and rowid not in self._sheet_of:
+            self._sheet_of[rowid] = sheet
+            insort(self._keys, self._key(sheet, rowid))
+        elif not flagged and rowid in self._sheet_of:
+            key = self._key(self._sheet_of.pop(rowid), rowid)
+            del self._keys[bisect_left(self._keys, key)]
+
+    def reload_rows(self, conn, rowids):
+        """Re-reads the flag of the given rows from the bill."""
+        rowids = list(rowids)
+        for rowid in rowids: self.set(None, rowid, False)
+        for i in range(0, len(rowids), 500):
+            chunk = rowids[i:i + 500]
+            self._read(conn, f"IsFlagged = 1 AND rowid IN ({', '.join('?' * len(chunk))})", chunk)
+
+    def following(self, sheet, rowid, backwards=False):
+        """(sheet, rowid) of the flagged row after (or before) a position, wrapping around
+        the bill; None when nothing is flagged. rowid None starts at the top of the sheet."""
+        if not self._keys: return None
+        key = self._key(sheet, 0 if rowid is None else rowid)
+        if backwards:
+            _, found = self._keys[bisect_left(self._keys, key) - 1]
+        else:
+            _, found = self._keys[bisect_right(self._keys, key) % len(self._keys)]
+        return self._sheet_of[found], found
+
+
+def write_flags(db_path, rowids, flagged):
+    """Sets or clears IsFlagged on rows of a bill in one transaction; True on success."""
+    conn = connect_bill(db_path)
+    try:
+        conn.executemany("UPDATE pboq_items SET IsFlagged = ? WHERE rowid = ?",
+                         [(1 if flagged else 0, rowid) for rowid in rowids])
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        log.warning(f"Could not write review flags: {e}")
+        return False
+    finally:
+        conn.close()
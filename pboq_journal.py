@@ -0,0 +1,268 @@
+"""
+PBOQ Journal — Undo/redo history of bill operations, stored in the PBOQ database.
+
+While an operation is being recorded, triggers on pboq_items and pboq_cell_styles
+copy the old and new value of every cell the operation writes into side tables, no
+matter which code path does the writing (document deltas, recalculation, code
+sync, logical mirror columns). Undo and redo replay only those cells, grouped per
+column, in one transaction; nothing is re-scanned and the history survives closing
+the bill. Recording a new operation discards the operations that were undone.
+
+Usage:
+    from pboq_journal import PBOQJournal
+    journal = PBOQJournal(db_path)
+    journal.begin("Extend")                 # nested begin/commit pairs form one operation
+    ...                                     # any writes to the bill
+    journal.commit()
+    change = journal.undo()                 # JournalChange or None
+    change.rowids, change.style_cells       # what the caller has to re-read
+    journal.redo()
+    journal.undo_label(), journal.redo_label()
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
+from logger import get_logger
+
+log = get_logger("pboq_journal")
+
+# Operations kept for undo; older ones are dropped when a new one is recorded
+JOURNAL_LIMIT = 50
+
+
+@dataclass
+class JournalChange:
+    """Cells an undo/redo wrote back, for the viewer to re-read."""
+    label: str
+    rowids: set = field(default_factory=set)          # pboq_items rows whose values changed
+    style_cells: set = field(default_factory=set)     # (row_idx, col_idx) whose stored format changed
+
+
+# ─── Schema ──────────────────────────────────────────────────────────────────
+
+def _ensure_journal(cursor):
+    """Creates the journal tables and (re)creates the triggers for the current pboq_items columns."""
+    cursor.execute("CREATE TABLE IF NOT EXISTS pboq_journal ("
+                   "op_id INTEGER PRIMARY KEY, label TEXT, created TEXT, state TEXT)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS pboq_journal_items ("
+                   "seq INTEGER PRIMARY KEY, op_id INTEGER, item_rowid INTEGER, col_name TEXT, "
+                   "old_value, new_value)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS pboq_journal_styles ("
+                   "seq INTEGER PRIMARY KEY, op_id INTEGER, row_idx INTEGER, col_idx INTEGER, "
+                   "old_fmt TEXT, new_fmt TEXT)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS pboq_journal_items_op ON pboq_journal_items (op_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS pboq_journal_styles_op ON pboq_journal_styles (op_id)")
+
+    recording = "FROM pboq_journal WHERE state = 'recording'"
+    style_of = "(SELECT fmt_json FROM pboq_styles WHERE style_id = {}.style_id)"
+    stored_style = ("(SELECT s.fmt_json FROM pboq_cell_styles c JOIN pboq_styles s ON s.style_id = c.style_id "
+                    "WHERE c.row_idx = new.row_idx AND c.col_idx = new.col_idx)")
+    cursor.execute("PRAGMA table_info(pboq_items)")
+    triggers = {}
+    for i, (_, name, *_rest) in enumerate(cursor.fetchall()):
+        col = name.replace('"', '""')
+        triggers[f"pboq_journal_item_{i}"] = (
+            f'CREATE TRIGGER pboq_journal_item_{i} AFTER UPDATE OF "{col}" ON pboq_items '
+            f'WHEN old."{col}" IS NOT new."{col}" '
+            f"BEGIN INSERT INTO pboq_journal_items (op_id, item_rowid, col_name, old_value, new_value) "
+            f"""SELECT op_id, new.rowid, '{name.replace("'", "''")}', old."{col}", new."{col}" {recording}; END""")
+    # INSERT OR REPLACE does not fire delete triggers, so inserts read the style they replace first
+    triggers["pboq_journal_style_ins"] = (
+        "CREATE TRIGGER pboq_journal_style_ins BEFORE INSERT ON pboq_cell_styles "
+        "BEGIN INSERT INTO pboq_journal_styles (op_id, row_idx, col_idx, old_fmt, new_fmt) "
+        f"SELECT op_id, new.row_idx, new.col_idx, {stored_style}, {style_of.format('new')} {recording} "
+        f"AND {stored_style} IS NOT {style_of.format('new')}; END")
+    triggers["pboq_journal_style_upd"] = (
+        "CREATE TRIGGER pboq_journal_style_upd AFTER UPDATE OF style_id ON pboq_cell_styles "
+        "WHEN old.style_id IS NOT new.style_id "
+        "BEGIN INSERT INTO pboq_journal_styles (op_id, row_idx, col_idx, old_fmt, new_fmt) "
+        f"SELECT op_id, new.row_idx, new.col_idx, {style_of.format('old')}, {style_of.format('new')} {recording}; END")
+    triggers["pboq_journal_style_del"] = (
+        "CREATE TRIGGER pboq_journal_style_del AFTER DELETE ON pboq_cell_styles "
+        "BEGIN INSERT INTO pboq_journal_styles (op_id, row_idx, col_idx, old_fmt, new_fmt) "
+        f"SELECT op_id, old.row_idx, old.col_idx, {style_of.format('old')}, NULL {recording}; END")
+
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE 'pboq_journal_%'")
+    existing = dict(cursor.fetchall())
+    if existing == triggers: return
+    for name in existing:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for sql in triggers.values():
+        cursor.execute(sql)
+
+
+# ─── Journal ─────────────────────────────────────────────────────────────────
+
+class PBOQJournal:
+    """Records bill operations as cell deltas and replays them for undo/redo."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._depth = 0
+        self._ready = False
+
+    def _connect(self):
+        if not self.db_path or not os.path.exists(self.db_path): return None
+        conn = connect_bill(self.db_path)
+        if not self._ready:
+            cursor = conn.cursor()
+            PBOQLogic.ensure_formatting_store(conn)
+            _ensure_journal(cursor)
+            # An operation left recording by a crash is kept as a finished one
+            cursor.execute("UPDATE pboq_journal SET state = 'done' WHERE state = 'recording'")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    # ── Recording ──
+
+    def begin(self, label):
+        """Starts recording an operation; a begin inside a running operation joins it."""
+        self._depth += 1
+        if self._depth > 1: return
+        conn = self._connect()
+        if not conn: return
+        try:
+            cursor = conn.cursor()
+            # Pboq_items may have gained columns (ensure_schema) since the triggers were made
+            _ensure_journal(cursor)
+            self._drop_ops(cursor, "state = 'undone'")
+            cursor.execute("INSERT INTO pboq_journal (label, created, state) VALUES (?, ?, 'recording')",
+                           (label, datetime.now().isoformat(timespec='seconds')))
+            conn.commit()
+        except sqlite3.Error as e:
+            log.warning(f"Journal begin failed: {e}")
+        finally:
+            conn.close()
+
+    def commit(self):
+        """Stops recording; returns the number of cells the operation changed."""
+        if self._depth == 0: return 0
+        self._depth -= 1
+        if self._depth > 0: return 0
+        conn = self._connect()
+        if not conn: return 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT op_id FROM pboq_journal WHERE state = 'recording'")
+            row = cursor.fetchone()
+            if not row: return 0
+            op_id = row[0]
+            changed = sum(cursor.execute(f"SELECT COUNT(*) FROM {t} WHERE op_id = ?", (op_id,)).fetchone()[0]
+                          for t in ("pboq_journal_items", "pboq_journal_styles"))
+            if changed:
+                cursor.execute("UPDATE pboq_journal SET state = 'done' WHERE op_id = ?", (op_id,))
+                cursor.execute("SELECT op_id FROM pboq_journal WHERE state = 'done' ORDER BY op_id DESC LIMIT -1 OFFSET ?",
+                               (JOURNAL_LIMIT,))
+                old = [r[0] for r in cursor.fetchall()]
+                if old: self._drop_ops(cursor, f"op_id <= {max(old)}")
+            else:
+                # Nothing was written (cancelled dialog, no matches): not worth an undo step
+                self._drop_ops(cursor, f"op_id = {op_id}")
+            conn.commit()
+            return changed
+        except sqlite3.Error as e:
+            log.warning(f"Journal commit failed: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _drop_ops(cursor, where):
+        ops = f"SELECT op_id FROM pboq_journal WHERE {where}"
+        cursor.execute(f"DELETE FROM pboq_journal_items WHERE op_id IN ({ops})")
+        cursor.execute(f"DELETE FROM pboq_journal_styles WHERE op_id IN ({ops})")
+        cursor.execute(f"DELETE FROM pboq_journal WHERE {where}")
+
+    # ── Undo / Redo ──
+
+    def _label(self, sql):
+        conn = self._connect()
+        if not conn: return None
+        try:
+            row = conn.execute(sql).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def undo_label(self):
+        """Label of the operation undo() would revert, or None."""
+        return self._label("SELECT label FROM pboq_journal WHERE state = 'done' ORDER BY op_id DESC LIMIT 1")
+
+    def redo_label(self):
+        """Label of the operation redo() would re-apply, or None."""
+        return self._label("SELECT label FROM pboq_journal WHERE state = 'undone' ORDER BY op_id LIMIT 1")
+
+    def last_operation_cells(self):
+        """[(rowid, col_name, new_value)] the operation undo() would revert wrote, last write per cell."""
+        conn = self._connect()
+        if not conn: return []
+        try:
+            cells = {}
+            for rowid, col_name, value in conn.execute(
+                    "SELECT item_rowid, col_name, new_value FROM pboq_journal_items WHERE op_id = "
+                    "(SELECT MAX(op_id) FROM pboq_journal WHERE state = 'done') ORDER BY seq"):
+                cells[(rowid, col_name)] = value
+            return [(rowid, col_name, value) for (rowid, col_name), value in cells.items()]
+        finally:
+            conn.close()
+
+    def undo(self):
+        return self._replay("done", "DESC", undo=True)
+
+    def redo(self):
+        return self._replay("undone", "ASC", undo=False)
+
+    def _replay(self, state, order, undo):
+        if self._depth: return None     # never replay into an operation being recorded
+        conn = self._connect()
+        if not conn: return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT op_id, label FROM pboq_journal WHERE state = ? ORDER BY op_id {order} LIMIT 1", (state,))
+            row = cursor.fetchone()
+            if not row: return None
+            op_id, label = row
+            change = JournalChange(label)
+
+            # Undo restores each cell's first old value, redo its last new value
+            seq_order = "DESC" if undo else "ASC"
+            values = {}
+            cursor.execute(f"SELECT item_rowid, col_name, {'old_value' if undo else 'new_value'} "
+                           f"FROM pboq_journal_items WHERE op_id = ? ORDER BY seq {seq_order}", (op_id,))
+            for rowid, col_name, value in cursor.fetchall():
+                values.setdefault(col_name, {})[rowid] = value
+            for col_name, updates in values.items():
+                col = col_name.replace('"', '""')
+                cursor.executemany(f'UPDATE pboq_items SET "{col}" = ? WHERE rowid = ?',
+                                   [(v, rid) for rid, v in updates.items()])
+                change.rowids.update(updates)
+
+            styles = {}
+            cursor.execute(f"SELECT row_idx, col_idx, {'old_fmt' if undo else 'new_fmt'} "
+                           f"FROM pboq_journal_styles WHERE op_id = ? ORDER BY seq {seq_order}", (op_id,))
+            for row_idx, col_idx, fmt_json in cursor.fetchall():
+                styles[(row_idx, col_idx)] = fmt_json
+            cleared = [key for key, fmt_json in styles.items() if fmt_json is None]
+            cursor.executemany("DELETE FROM pboq_cell_styles WHERE row_idx = ? AND col_idx = ?", cleared)
+            cursor.executemany("INSERT OR IGNORE INTO pboq_styles (fmt_json) VALUES (?)",
+                               [(f,) for f in {f for f in styles.values() if f is not None}])
+            cursor.executemany("INSERT OR REPLACE INTO pboq_cell_styles (row_idx, col_idx, style_id) "
+                               "SELECT ?, ?, style_id FROM pboq_styles WHERE fmt_json = ?",
+                               [(r, c, f) for (r, c), f in styles.items() if f is not None])
+            change.style_cells.update(styles)
+
+            cursor.execute("UPDATE pboq_journal SET state = ? WHERE op_id = ?", ("undone" if undo else "done", op_id))
+            conn.commit()
+            return change
+        except sqlite3.Error as e:
+            conn.rollback()
+            log.warning(f"Journal {'undo' if undo else 'redo'} failed: {e}")
+            return None
+        finally:
+            conn.close()
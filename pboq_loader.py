@@ -0,0 +1,158 @@
+"""
+PBOQ Loader — Per-sheet, background reading of a Priced BOQ.
+
+Opening a bill only reads the sheet list and row counts (one GROUP BY query) plus
+the rowid order that defines each row's global index. The rows of a sheet are read
+(merged with the logical award/plug/sum store by the query) on a QThreadPool worker that
+streams them to the viewer in chunks, so the first rows can be shown, scrolled and
+searched while the rest of the sheet is still being read. A cancelled worker stops
+at the next chunk and interrupts the query it is running.
+
+Usage:
+    from pboq_loader import read_sheet_index, read_sheet_entries, read_row_entries, SheetLoadWorker
+    sheets, positions = read_sheet_index(conn)          # [(name, count)], {rowid: g_idx}
+    entries = read_sheet_entries(conn, db_columns, "Bill 1", mappings, positions)
+    entries = read_row_entries(conn, db_columns, {4, 9}, mappings, positions)
+    worker = SheetLoadWorker(db_path, db_columns, "Bill 2", mappings, positions, token)
+    worker.signals.chunk.connect(on_chunk)              # (token, entries)
+    worker.signals.finished.connect(on_finished)        # (token, cancelled)
+    QThreadPool.globalInstance().start(worker)
+    worker.cancel()
+"""
+
+import threading
+from dataclasses import dataclass, field
+from PyQt6.QtCore import QRunnable, QObject, pyqtSignal
+
+from logger import get_logger
+from pboq_document import compile_merge_plan, merged_select
+from pboq_mirror import connect_bill
+
+log = get_logger("pboq_loader")
+
+# Rows without a sheet name are shown on "Sheet 1", as the viewer always did
+SHEET_NAME_SQL = "CASE WHEN Sheet IS NULL OR Sheet = '' THEN 'Sheet 1' ELSE CAST(Sheet AS TEXT) END"
+
+
+# ─── Reading ─────────────────────────────────────────────────────────────────
+
+def read_sheet_index(conn):
+    """[(sheet_name, row_count)] in order of first appearance, and {rowid: global row index}."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {SHEET_NAME_SQL} AS name, COUNT(*) FROM pboq_items GROUP BY name ORDER BY MIN(rowid)")
+    sheets = cursor.fetchall()
+    cursor.execute("SELECT rowid FROM pboq_items ORDER BY rowid")
+    positions = {row[0]: g_idx for g_idx, row in enumerate(cursor.fetchall())}
+    return sheets, positions
+
+
+def iter_sheet_entries(conn, db_columns, sheet_name, mappings, positions, chunk_size=500):
+    """Yields lists of (global_row_idx, rowid, display_values, is_flagged) of one sheet, in rowid order."""
+    # The logical store is merged into the physical columns by the SELECT itself
+    merged = merged_select(db_columns, compile_merge_plan(mappings, len(db_columns)))
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT rowid, {', '.join(merged[1:])}, IsFlagged FROM pboq_items "
+                   f"WHERE {SHEET_NAME_SQL} = ? ORDER BY rowid", (sheet_name,))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows: break
+        yield [_entry(row, positions) for row in rows]
+
+
+def _entry(row, positions):
+    return (positions.get(row[0]), row[0], list(row[1:-1]), 1 if row[-1] in [1, '1', True, 'True'] else 0)
+
+
+def read_sheet_entries(conn, db_columns, sheet_name, mappings, positions):
+    """[(global_row_idx, rowid, display_values, is_flagged)] of one sheet, in rowid order."""
+    entries = []
+    for chunk in iter_sheet_entries(conn, db_columns, sheet_name, mappings, positions):
+        entries.extend(chunk)
+    return entries
+
+
+def read_row_entries(conn, db_columns, rowids, mappings, positions):
+    """Entries (as read_sheet_entries) of the given rows only, in rowid order."""
+    merged = merged_select(db_columns, compile_merge_plan(mappings, len(db_columns)))
+    rowids = sorted(rowids)
+    cursor = conn.cursor()
+    entries = []
+    for i in range(0, len(rowids), 500):
+        batch = rowids[i:i + 500]
+        cursor.execute(f"SELECT rowid, {', '.join(merged[1:])}, IsFlagged FROM pboq_items "
+                       f"WHERE rowid IN ({', '.join('?' * len(batch))}) ORDER BY rowid", batch)
+        entries.extend(_entry(row, positions) for row in cursor.fetchall())
+    return entries
+
+
+# ─── Background Loading ──────────────────────────────────────────────────────
+
+@dataclass(eq=False)
+class SheetLoad:
+    """Viewer-side state of one sheet being read by a SheetLoadWorker."""
+    table: object
+    sheet_name: str
+    row_count: int
+    mappings: dict
+    worker: object = None
+    buffer: list = field(default_factory=list)  # entries received but not yet shown
+    rendered: int = 0                           # rows already built into the table
+    live: bool = False                          # render into the table (False: read ahead only)
+    done: bool = False
+    scheduled: bool = False                     # a render slice is queued on the event loop
+
+
+class SheetLoadSignals(QObject):
+    """Delivers the rows of a sheet back to the GUI thread."""
+    chunk = pyqtSignal(object, list)
+    finished = pyqtSignal(object, bool)
+
+
+class SheetLoadWorker(QRunnable):
+    """Reads and merges the rows of one sheet on a pool thread, on its own connection."""
+
+    def __init__(self, db_path, db_columns, sheet_name, mappings, positions, token, chunk_size=500):
+        super().__init__()
+        self.db_path = db_path
+        self.db_columns = list(db_columns)
+        self.sheet_name = sheet_name
+        self.mappings = dict(mappings)
+        self.positions = positions
+        self.token = token
+        self.chunk_size = chunk_size
+        self.signals = SheetLoadSignals()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def cancel(self):
+        """Stops the worker at its next chunk, interrupting a running query."""
+        self._cancelled.set()
+        with self._lock:
+            if self._conn is not None: self._conn.interrupt()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        cancelled = self.cancelled
+        try:
+            if not cancelled:
+                with self._lock:
+                    self._conn = connect_bill(self.db_path)
+                try:
+                    for entries in iter_sheet_entries(self._conn, self.db_columns, self.sheet_name,
+                                                      self.mappings, self.positions, self.chunk_size):
+                        if self.cancelled: break
+                        self.signals.chunk.emit(self.token, entries)
+                finally:
+                    with self._lock:
+                        self._conn.close()
+                        self._conn = None
+                cancelled = self.cancelled
+        except Exception as e:
+            # An interrupted query raises here too; only a genuine failure is worth logging
+            if not self.cancelled: log.warning(f"Loading sheet '{self.sheet_name}' failed: {e}")
+            cancelled = True
+        self.signals.finished.emit(self.token, cancelled)
@@ -2,8 +2,75 @@ import os
 import sqlite3
 import json
 import re
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor
+from pboq_numeric import ensure_numbers
+from pboq_mirror import connect_bill
+
+# Columns a master library row can hold its rate code in (historical layouts included)
+MASTER_CODE_COLUMNS = ("PlugCode", "SubbeeCode", "RateCode")
+
+# Standard and named pboq_items columns, in their preferred order
+SCHEMA_COLUMNS = [f"Column {i}" for i in range(4)] + [
+    "Description", "Unit", "Bill Rate", "Bill Amount", "GrossRate", "RateCode", "PlugRate", "PlugCode", "PlugFormula", "PlugFactor",
+    "PlugCategory", "PlugCurrency", "PlugExchangeRates",
+    "ProvSum", "ProvSumCode", "ProvSumFormula", "ProvSumCategory", "ProvSumCurrency", "ProvSumExchangeRates",
+    "PCSum", "PCSumCode", "PCSumFormula", "PCSumCategory", "PCSumCurrency", "PCSumExchangeRates",
+    "Daywork", "DayworkCode", "DayworkFormula", "DayworkCategory", "DayworkCurrency", "DayworkExchangeRates",
+    "SubbeePackage", "SubbeeName", "SubbeeRate", "SubbeeMarkup", "SubbeeNotes",
+    "SubbeeCategory", "SubbeeCode", "IsFlagged"]
+_SCHEMA_COLUMN_SET = frozenset(SCHEMA_COLUMNS)
+
+# PRAGMA user_version stamped by migrate_schema; bump it whenever the schema above (or a
+# table migrate_schema creates) changes so existing files are brought forward again
+SCHEMA_VERSION = 2
+
+
+class CellFormatMap:
+    """Read-only {(row_idx, col_idx): fmt_dict} view over the compact formatting store.
+
+    Holds one integer style id per formatted cell and decodes each distinct style's
+    JSON only the first time it is requested, so opening a heavily formatted bill
+    costs one decode per unique style rather than one per cell.
+    """
+
+    def __init__(self, cell_styles=None, style_json=None):
+        self._cells = cell_styles or {}      # (row_idx, col_idx) -> style_id
+        self._style_json = style_json or {}  # style_id -> fmt_json
+        self._decoded = {}                   # style_id -> fmt_dict
+
+    def style(self, style_id):
+        fmt = self._decoded.get(style_id)
+        if fmt is None:
+            try: fmt = json.loads(self._style_json.get(style_id) or "{}")
+            except (ValueError, TypeError): fmt = {}
+            self._decoded[style_id] = fmt
+        return fmt
+
+    def style_id(self, key):
+        return self._cells.get(key)
+
+    def get(self, key, default=None):
+        style_id = self._cells.get(key)
+        return self.style(style_id) if style_id is not None else default
+
+    def __getitem__(self, key):
+        return self.style(self._cells[key])
+
+    def __contains__(self, key):
+        return key in self._cells
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __iter__(self):
+        return iter(self._cells)
+
+    def keys(self):
+        return self._cells.keys()
+
+    def items(self):
+        for key, style_id in self._cells.items():
+            yield key, self.style(style_id)
+
 
 class PBOQLogic:
     """Handles database interactions and business logic for the PBOQ viewer."""
@@ -43,93 +110,206 @@ class PBOQLogic:
     def connect_db(file_path):
         if not file_path or not os.path.exists(file_path):
             return None
-        return sqlite3.connect(file_path)
+        return connect_bill(file_path)
 
     @staticmethod
     def ensure_schema(conn):
+        """Makes sure pboq_items has every standard column and the side tables exist.
+        Returns (True, db_columns). Files stamped with SCHEMA_VERSION (PRAGMA user_version)
+        that still hold every standard column skip the checks; others go through migrate_schema."""
         cursor = conn.cursor()
-        # Check for pboq_items table
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items';")
-        if not cursor.fetchone():
-            cursor.execute("CREATE TABLE pboq_items (Sheet TEXT)")
-        
-        # Get column info
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
         cursor.execute("PRAGMA table_info(pboq_items)")
         db_columns = [info[1] for info in cursor.fetchall()]
-        
-        # Standard Columns and Named Columns in a fixed preferred order
-        standard_cols = [f"Column {i}" for i in range(4)]
-        named_cols = ["Description", "Unit", "Bill Rate", "Bill Amount", "GrossRate", "RateCode", "PlugRate", "PlugCode", "PlugFormula", "PlugFactor", 
-                      "PlugCategory", "PlugCurrency", "PlugExchangeRates",
-                      "ProvSum", "ProvSumCode", "ProvSumFormula", "ProvSumCategory", "ProvSumCurrency", "ProvSumExchangeRates",
-                      "PCSum", "PCSumCode", "PCSumFormula", "PCSumCategory", "PCSumCurrency", "PCSumExchangeRates",
-                      "Daywork", "DayworkCode", "DayworkFormula", "DayworkCategory", "DayworkCurrency", "DayworkExchangeRates",
-                      "SubbeePackage", "SubbeeName", "SubbeeRate", "SubbeeMarkup", "SubbeeNotes",
-                      "SubbeeCategory", "SubbeeCode", "IsFlagged"]
-        
-        for col_name in standard_cols + named_cols:
-            if col_name not in db_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE pboq_items ADD COLUMN \"{col_name}\" TEXT")
-                    db_columns.append(col_name)
-                except sqlite3.OperationalError:
-                    pass # Probably already exists but missed by table_info
-        
+        # A stamped file can still get a bare pboq_items back (e.g. BOQ Setup re-saving the bill)
+        if version >= SCHEMA_VERSION and _SCHEMA_COLUMN_SET.issubset(db_columns):
+            return True, db_columns
+        return True, PBOQLogic.migrate_schema(conn)
+
+    @staticmethod
+    def migrate_schema(conn):
+        """Brings a legacy file forward in one transaction: pboq_items and its standard
+        columns, the formatting store, the subcontractor tables and the numeric shadows
+        (pboq_numeric), then stamps SCHEMA_VERSION. Returns the pboq_items column names; a
+        read-only file is left as it is and unstamped."""
+        cursor = conn.cursor()
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        try:
+            # Check for pboq_items table
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items';")
+            if not cursor.fetchone():
+                cursor.execute("CREATE TABLE pboq_items (Sheet TEXT)")
+
+            # Get column info
+            cursor.execute("PRAGMA table_info(pboq_items)")
+            db_columns = [info[1] for info in cursor.fetchall()]
+
+            for col_name in SCHEMA_COLUMNS:
+                if col_name not in db_columns:
+                    try:
+                        cursor.execute(f"ALTER TABLE pboq_items ADD COLUMN \"{col_name}\" TEXT")
+                        db_columns.append(col_name)
+                    except sqlite3.OperationalError:
+                        pass # Probably already exists but missed by table_info
+
+            # Ensure compact formatting store exists (migrates legacy pboq_formatting rows)
+            PBOQLogic._create_formatting_store(cursor)
+
+            # Ensure Subcontractor Quotes table exists
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS subcontractor_quotes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    package_name TEXT,
+                    row_idx INTEGER,
+                    subcontractor_name TEXT,
+                    rate REAL,
+                    FOREIGN KEY(row_idx) REFERENCES pboq_items(rowid)
+                )
+            """)
+
+            # Ensure Subcontractor Package Metadata Table exists
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS subcontractor_package_settings (
+                    package_name TEXT PRIMARY KEY,
+                    category_name TEXT,
+                    markup_default REAL,
+                    notes TEXT
+                )
+            """)
+
+            # Ensure Subcontractor Details table exists for contact info
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS subcontractor_details (
+                    name TEXT PRIMARY KEY,
+                    phone TEXT,
+                    email TEXT
+                )
+            """)
+
+            # Typed REAL shadows of the money/quantity columns, kept current by triggers
+            ensure_numbers(conn)
+
+            cursor.execute("PRAGMA user_version")
+            version = max(cursor.fetchone()[0], SCHEMA_VERSION)   # never stamp a newer file down
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if "readonly" not in str(e): raise
+            # Read-only share or archived tender: use the file as it is, unstamped
+            cursor.execute("PRAGMA table_info(pboq_items)")
+            return [info[1] for info in cursor.fetchall()]
+        except Exception:
+            conn.rollback()
+            raise
+        return db_columns
+
+    @staticmethod
+    def ensure_formatting_store(conn):
+        """Creates the compact formatting tables and folds any legacy per-cell
+        pboq_formatting rows into them (the legacy table is dropped afterwards)."""
+        PBOQLogic._create_formatting_store(conn.cursor())
         conn.commit()
 
-        
-        # Ensure Formatting table exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pboq_formatting (
-                row_idx INTEGER,
-                col_idx INTEGER,
-                fmt_json TEXT,
-                PRIMARY KEY (row_idx, col_idx)
-            )
-        """)
-        
-        # Ensure Subcontractor Quotes table exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS subcontractor_quotes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                package_name TEXT,
-                row_idx INTEGER,
-                subcontractor_name TEXT,
-                rate REAL,
-                FOREIGN KEY(row_idx) REFERENCES pboq_items(rowid)
-            )
-        """)
-        
-        # Ensure Subcontractor Package Metadata Table exists
+    @staticmethod
+    def _create_formatting_store(cursor):
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS subcontractor_package_settings (
-                package_name TEXT PRIMARY KEY,
-                category_name TEXT,
-                markup_default REAL,
-                notes TEXT
+            CREATE TABLE IF NOT EXISTS pboq_styles (
+                style_id INTEGER PRIMARY KEY,
+                fmt_json TEXT NOT NULL UNIQUE
             )
         """)
-        
-        # Ensure Subcontractor Details table exists for contact info
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS subcontractor_details (
-                name TEXT PRIMARY KEY,
-                phone TEXT,
-                email TEXT
-            )
+            CREATE TABLE IF NOT EXISTS pboq_cell_styles (
+                row_idx INTEGER NOT NULL,
+                col_idx INTEGER NOT NULL,
+                style_id INTEGER NOT NULL,
+                PRIMARY KEY (row_idx, col_idx)
+            ) WITHOUT ROWID
         """)
-        
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_formatting'")
+        if cursor.fetchone():
+            legacy = {}
+            cursor.execute("SELECT row_idx, col_idx, fmt_json FROM pboq_formatting")
+            for row_idx, col_idx, fmt_json in cursor.fetchall():
+                try: legacy[(row_idx, col_idx)] = json.loads(fmt_json)
+                except (ValueError, TypeError): continue
+            if legacy:
+                # Legacy rows can only be newer than the compact store, so they win key by key
+                existing = PBOQLogic._read_cell_styles(cursor)
+                merged = []
+                for key, fmt in legacy.items():
+                    base = dict(existing.get(key, {}))
+                    base.update(fmt)
+                    merged.append((key, base))
+                PBOQLogic._write_cell_styles(cursor, merged)
+            cursor.execute("DROP TABLE pboq_formatting")
+
+    @staticmethod
+    def _style_key(fmt):
+        """Canonical JSON for a format dict so identical styles intern to one row."""
+        return json.dumps(fmt, sort_keys=True)
+
+    @staticmethod
+    def _read_cell_styles(cursor, col_idx=None, row_idx=None):
+        """Returns {(row_idx, col_idx): fmt_dict}, optionally restricted to one column/cell."""
+        sql = ("SELECT c.row_idx, c.col_idx, s.fmt_json FROM pboq_cell_styles c "
+               "JOIN pboq_styles s ON s.style_id = c.style_id")
+        clauses, params = [], []
+        if col_idx is not None:
+            clauses.append("c.col_idx = ?"); params.append(col_idx)
+        if row_idx is not None:
+            clauses.append("c.row_idx = ?"); params.append(row_idx)
+        if clauses: sql += " WHERE " + " AND ".join(clauses)
+        cursor.execute(sql, params)
+
+        decoded, result = {}, {}
+        for r, c, fmt_json in cursor.fetchall():
+            fmt = decoded.get(fmt_json)
+            if fmt is None:
+                try: fmt = json.loads(fmt_json)
+                except (ValueError, TypeError): fmt = {}
+                decoded[fmt_json] = fmt
+            result[(r, c)] = fmt
+        return result
+
+    @staticmethod
+    def _write_cell_styles(cursor, entries):
+        """Interns each format and upserts (row_idx, col_idx, style_id) triples in bulk.
+        entries: iterable of ((row_idx, col_idx), fmt_dict)."""
+        rows = [(r, c, PBOQLogic._style_key(fmt)) for (r, c), fmt in entries]
+        if not rows: return
+        cursor.executemany("INSERT OR IGNORE INTO pboq_styles (fmt_json) VALUES (?)",
+                           [(k,) for k in {k for _, _, k in rows}])
+        cursor.execute("SELECT fmt_json, style_id FROM pboq_styles")
+        style_ids = dict(cursor.fetchall())
+        cursor.executemany("INSERT OR REPLACE INTO pboq_cell_styles (row_idx, col_idx, style_id) VALUES (?, ?, ?)",
+                           [(r, c, style_ids[k]) for r, c, k in rows])
+
+    @staticmethod
+    def replace_formatting(conn, entries):
+        """Discards all stored formatting and writes entries ((row_idx, col_idx), fmt_dict) in its place."""
+        cursor = conn.cursor()
+        for table in ("pboq_formatting", "pboq_cell_styles", "pboq_styles"):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        PBOQLogic.ensure_formatting_store(conn)
+        PBOQLogic._write_cell_styles(cursor, entries)
         conn.commit()
-        return True, db_columns
 
     @staticmethod
     def load_formatting(conn):
-        formatting_data = {}
+        """Returns a lazy CellFormatMap of every formatted cell, keyed by (row_idx, col_idx).
+        Format dicts are shared between cells with the same style; treat them as read-only."""
+        PBOQLogic.ensure_formatting_store(conn)
         cursor = conn.cursor()
-        cursor.execute("SELECT row_idx, col_idx, fmt_json FROM pboq_formatting")
-        for row_idx, col_idx, fmt_json in cursor.fetchall():
-            formatting_data[(row_idx, col_idx)] = json.loads(fmt_json)
-        return formatting_data
+        cursor.execute("SELECT style_id, fmt_json FROM pboq_styles")
+        style_json = dict(cursor.fetchall())
+        cursor.execute("SELECT row_idx, col_idx, style_id FROM pboq_cell_styles")
+        cell_styles = {(r, c): sid for r, c, sid in cursor.fetchall()}
+        return CellFormatMap(cell_styles, style_json)
 
 
 
@@ -139,7 +319,7 @@ class PBOQLogic:
         if not file_path or not os.path.exists(file_path): return False
         
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             
             # col_idx_in_display is 0-based index of the column in the displayed table (e.g., 0-7)
@@ -162,7 +342,7 @@ class PBOQLogic:
         """Updates a named column (like SubbeeName) directly by rowid."""
         if not file_path or not os.path.exists(file_path): return False
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             for rowid, val in updates:
                 cursor.execute(f'UPDATE pboq_items SET "{col_name}" = ? WHERE rowid = ?', (val, rowid))
@@ -171,6 +351,59 @@ class PBOQLogic:
             return True
         except sqlite3.Error: return False
 
+    @staticmethod
+    def ensure_code_indexes(cursor):
+        """Indexes the code columns rates are looked up by in a master pboq_items table."""
+        for col in MASTER_CODE_COLUMNS:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS "pboq_code_{col}" ON pboq_items ("{col}")')
+
+    @staticmethod
+    def master_code_rowids(cursor, codes):
+        """{code: rowid} of the first row holding each code in any of the code columns,
+        resolved through the code indexes in chunks of 300 codes."""
+        codes = list(dict.fromkeys(str(c) for c in codes if c is not None))
+        found = {}
+        for i in range(0, len(codes), 300):
+            chunk = codes[i:i + 300]
+            wanted = set(chunk)
+            marks = ", ".join("?" * len(chunk))
+            where = " OR ".join(f'"{col}" IN ({marks})' for col in MASTER_CODE_COLUMNS)
+            cols = ", ".join(f'"{col}"' for col in MASTER_CODE_COLUMNS)
+            for rowid, *values in cursor.execute(f"SELECT rowid, {cols} FROM pboq_items WHERE {where}",
+                                                 chunk * len(MASTER_CODE_COLUMNS)):
+                for v in values:
+                    key = None if v is None else str(v)
+                    if key in wanted and rowid < found.get(key, rowid + 1):
+                        found[key] = rowid
+        return found
+
+    @staticmethod
+    def write_master_rows(cursor, entries, insert_sql, update_sql):
+        """Inserts or updates master rows by code, as if entries were applied one by one.
+        entries is [(code, insert_params, update_params)] with named params; update_sql
+        ends in 'WHERE rowid = :rowid'. The first entry of a code not in the table is
+        inserted and later entries of that code update the new row. All inserts go in
+        one executemany, then all updates (in entry order) in another.
+        Returns (inserted, updated)."""
+        PBOQLogic.ensure_code_indexes(cursor)
+        rowids = PBOQLogic.master_code_rowids(cursor, [code for code, _, _ in entries])
+        inserts, updates, new_codes = [], [], set()
+        for code, insert_params, update_params in entries:
+            key = None if code is None else str(code)
+            if key in rowids or key in new_codes:
+                updates.append((key, update_params))
+            else:
+                inserts.append(insert_params)
+                if key is not None: new_codes.add(key)
+
+        if inserts:
+            cursor.executemany(insert_sql, inserts)
+        if new_codes:
+            rowids.update(PBOQLogic.master_code_rowids(cursor, new_codes))
+        if updates:
+            cursor.executemany(update_sql, [dict(params, rowid=rowids[key]) for key, params in updates])
+        return len(inserts), len(updates)
+
     @staticmethod
     def sync_rate_to_master_lib(master_db_path, rate_data_list):
         """
@@ -178,6 +411,8 @@ class PBOQLogic:
         rate_data_list is a list of dicts: [
             {'code': '...', 'desc': '...', 'unit': '...', 'rate': 10.0, 'type': 'Plug Rate', 'curr': '...', 'cat': '...'}
         ]
+        Existing codes are looked up once for the whole list and every row is written in
+        one transaction (see write_master_rows).
         """
         if not master_db_path or not os.path.exists(master_db_path) or not rate_data_list:
             return False
@@ -185,22 +420,18 @@ class PBOQLogic:
         try:
             conn = sqlite3.connect(master_db_path)
             # Ensure schema exists in master lib (standardizing even if it's a fresh DB)
-            PBOQLogic.ensure_schema(conn)
+            _, db_columns = PBOQLogic.ensure_schema(conn)
             
             cursor = conn.cursor()
             
             # Map types to logical columns in pboq_items
             # Plug Rate -> PlugRate / PlugCode
             # Sub. Rate -> SubbeeRate / SubbeeCode
-            
+            entries = []
             for data in rate_data_list:
                 code = data.get('code')
-                desc = data.get('desc', '')
-                unit = data.get('unit', '')
                 rate = data.get('rate')
                 rtype = data.get('type', 'Plug Rate')
-                curr = data.get('curr', 'GHS (₵)')
-                cat = data.get('cat', 'Miscellaneous')
                 
                 # Determine the final "Bill Rate" (Marked-up rate)
                 try:
@@ -227,79 +458,47 @@ class PBOQLogic:
                 else:
                     final_bill_rate = base_rate * (1 + (markup_val / 100.0)) if markup_val else base_rate
 
-                if rtype == "Sub. Rate" or rtype == "Subcontractor Rate":
-                    val_col, code_col = "SubbeeRate", "SubbeeCode"
-                    extra_fields = "SubbeeName = ?, SubbeeCategory = ?, SubbeeMarkup = ?"
-                    extra_params = (data.get('sub_name', 'Subcontractor'), cat, markup_val)
-                else: # Plug Rate
-                    val_col, code_col = "PlugRate", "PlugCode"
-                    extra_fields = "PlugCurrency = ?, PlugCategory = ?"
-                    extra_params = (curr, cat)
-
-                # Check if this code already exists in ANY of the code columns of the master pboq_items table
-                # Search across all possible historical code columns to avoid duplicate rows.
-                cursor.execute("""
-                    SELECT rowid FROM pboq_items 
-                    WHERE PlugCode = ? OR SubbeeCode = ? OR RateCode = ?
-                """, (code, code, code))
-                res = cursor.fetchone()
-                if res:
-                    # Detect which 'Bill Rate' variants exist to avoid crashes
-                    cursor.execute("PRAGMA table_info(pboq_items)")
-                    actual_cols = [c[1] for c in cursor.fetchall()]
-                    
-                    # Construct smart SET clause for Bill Rate
-                    br_sets = []
-                    br_params = []
-                    for variant in ["Bill Rate", "BillRate", "Bill Rate "]:
-                        if variant in actual_cols:
-                            br_sets.append(f"\"{variant}\" = ?")
-                            br_params.append(final_bill_rate)
-                    
-                    br_clause = ", " + ", ".join(br_sets) if br_sets else ""
-
-                    rowid = res[0]
-                    cursor.execute(f"""
-                        UPDATE pboq_items 
-                        SET "{val_col}" = ?, "Description" = ?, "Unit" = ? {br_clause},
-                            {extra_fields},
-                            RateCode = NULL
-                        WHERE rowid = ?
-                    """, (base_rate, desc, unit) + tuple(br_params) + extra_params + (rowid,))
-
-
-
+                is_sub = rtype == "Sub. Rate" or rtype == "Subcontractor Rate"
+                params = {'sub': int(is_sub), 'code': code, 'desc': data.get('desc', ''), 'unit': data.get('unit', ''),
+                          'rate': base_rate, 'bill_rate': final_bill_rate, 'cat': data.get('cat', 'Miscellaneous'),
+                          'sub_name': data.get('sub_name', 'Subcontractor') if is_sub else None,
+                          'markup': markup_val if is_sub else None,
+                          'curr': None if is_sub else data.get('curr', 'GHS (₵)')}
+                entries.append((code, params, params))
 
-
-                else:
-                    # Insert new row
-                    cols = ["Description", "Unit", code_col, val_col, "\"Bill Rate\""]
-                    placeholders = ["?", "?", "?", "?", "?"]
-                    params = [desc, unit, code, base_rate, final_bill_rate]
-
-                    
-                    if rtype == "Sub. Rate" or rtype == "Subcontractor Rate":
-                        cols.extend(["SubbeeName", "SubbeeCategory", "SubbeeMarkup"])
-                        placeholders.extend(["?", "?", "?"])
-                        params.extend([data.get('sub_name', 'Subcontractor'), cat, markup_val])
-                    else:
-                        cols.extend(["PlugCurrency", "PlugCategory"])
-                        placeholders.extend(["?", "?"])
-                        params.extend([curr, cat])
-
-
-                        
-                    cursor.execute(f"""
-                        INSERT INTO pboq_items ({', '.join(cols)})
-                        VALUES ({', '.join(placeholders)})
-                    """, tuple(params))
-            
+            # One statement shape for both types: a Sub. Rate writes the Subbee* columns and a
+            # Plug Rate the Plug* ones, leaving the other type's columns as they are.
+            insert_sql = """
+                INSERT INTO pboq_items ("Description", "Unit", PlugCode, SubbeeCode, PlugRate, SubbeeRate, "Bill Rate",
+                                        SubbeeName, SubbeeCategory, SubbeeMarkup, PlugCurrency, PlugCategory)
+                VALUES (:desc, :unit, CASE WHEN :sub THEN NULL ELSE :code END, CASE WHEN :sub THEN :code END,
+                        CASE WHEN :sub THEN NULL ELSE :rate END, CASE WHEN :sub THEN :rate END, :bill_rate,
+                        :sub_name, CASE WHEN :sub THEN :cat END, :markup, :curr, CASE WHEN :sub THEN NULL ELSE :cat END)
+            """
+            # Every 'Bill Rate' variant present in the table gets the marked-up rate
+            br_clause = "".join(f', "{variant}" = :bill_rate' for variant in ["Bill Rate", "BillRate", "Bill Rate "]
+                                if variant in db_columns)
+            update_sql = f"""
+                UPDATE pboq_items
+                SET PlugRate = CASE WHEN :sub THEN PlugRate ELSE :rate END,
+                    SubbeeRate = CASE WHEN :sub THEN :rate ELSE SubbeeRate END,
+                    PlugCode = CASE WHEN NOT :sub AND RateCode = :code THEN :code ELSE PlugCode END,
+                    SubbeeCode = CASE WHEN :sub AND RateCode = :code THEN :code ELSE SubbeeCode END,
+                    "Description" = :desc, "Unit" = :unit {br_clause},
+                    SubbeeName = CASE WHEN :sub THEN :sub_name ELSE SubbeeName END,
+                    SubbeeCategory = CASE WHEN :sub THEN :cat ELSE SubbeeCategory END,
+                    SubbeeMarkup = CASE WHEN :sub THEN :markup ELSE SubbeeMarkup END,
+                    PlugCurrency = CASE WHEN :sub THEN PlugCurrency ELSE :curr END,
+                    PlugCategory = CASE WHEN :sub THEN PlugCategory ELSE :cat END,
+                    RateCode = NULL             -- a legacy RateCode moves to the type's code column above
+                WHERE rowid = :rowid
+            """
+            PBOQLogic.write_master_rows(cursor, entries, insert_sql, update_sql)
             conn.commit()
             conn.close()
             return True
         except Exception as e:
-            item_desc = data.get('desc', 'Unknown') if 'data' in locals() else 'Unknown'
-            print(f"Master Lib Sync Error [{item_desc}]: {e}")
+            print(f"Master Lib Sync Error: {e}")
             return False
 
     @staticmethod
@@ -310,23 +509,21 @@ class PBOQLogic:
 
     @staticmethod
     def persist_cell_formatting(file_path, global_row_idx, col_idx, bg_color=None, fg_color=None, bold=None):
-        """Persists cell-level formatting (colors, bold) to the pboq_formatting table."""
+        """Persists cell-level formatting (colors, bold) to the compact formatting store."""
         if not file_path or not os.path.exists(file_path): return
         
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             
-            cursor.execute("SELECT fmt_json FROM pboq_formatting WHERE row_idx=? AND col_idx=?", (global_row_idx, col_idx))
-            row = cursor.fetchone()
-            fmt = json.loads(row[0]) if row else {}
+            existing = PBOQLogic._read_cell_styles(cursor, col_idx, global_row_idx)
+            fmt = dict(existing.get((global_row_idx, col_idx), {}))
             
             if bg_color: fmt['bg_color'] = bg_color if isinstance(bg_color, str) else bg_color.name()
             if fg_color: fmt['font_color'] = fg_color if isinstance(fg_color, str) else fg_color.name()
             if bold is not None: fmt['bold'] = bold
             
-            cursor.execute("INSERT OR REPLACE INTO pboq_formatting (row_idx, col_idx, fmt_json) VALUES (?, ?, ?)", 
-                         (global_row_idx, col_idx, json.dumps(fmt)))
+            PBOQLogic._write_cell_styles(cursor, [((global_row_idx, col_idx), fmt)])
             
             conn.commit()
             conn.close()
@@ -339,17 +536,17 @@ class PBOQLogic:
         Updates is a list of (global_row_idx, {fmt_dict})"""
         if not file_path or not os.path.exists(file_path): return
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             
+            existing = PBOQLogic._read_cell_styles(cursor, col_idx)
+            merged = {}
             for g_idx, fmt in updates:
-                cursor.execute("SELECT fmt_json FROM pboq_formatting WHERE row_idx=? AND col_idx=?", (g_idx, col_idx))
-                row = cursor.fetchone()
-                existing_fmt = json.loads(row[0]) if row else {}
-                existing_fmt.update(fmt)
-                
-                cursor.execute("INSERT OR REPLACE INTO pboq_formatting (row_idx, col_idx, fmt_json) VALUES (?, ?, ?)", 
-                             (g_idx, col_idx, json.dumps(existing_fmt)))
+                key = (g_idx, col_idx)
+                if key not in merged: merged[key] = dict(existing.get(key, {}))
+                merged[key].update(fmt)
+            
+            PBOQLogic._write_cell_styles(cursor, merged.items())
             
             conn.commit()
             conn.close()
@@ -358,11 +555,17 @@ class PBOQLogic:
 
     @staticmethod
     def clear_cell_formatting(file_path, global_row_idx, col_idx):
+        PBOQLogic.clear_batch_cell_formatting(file_path, col_idx, [global_row_idx])
+
+    @staticmethod
+    def clear_batch_cell_formatting(file_path, col_idx, row_indices):
+        """Removes stored formatting for several rows of one column in a single transaction."""
         if not file_path or not os.path.exists(file_path): return
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM pboq_formatting WHERE row_idx=? AND col_idx=?", (global_row_idx, col_idx))
+            cursor.executemany("DELETE FROM pboq_cell_styles WHERE row_idx=? AND col_idx=?",
+                               [(g_idx, col_idx) for g_idx in row_indices])
             conn.commit()
             conn.close()
         except Exception:
@@ -375,7 +578,7 @@ class PBOQLogic:
         if not db_path or not os.path.exists(db_path): return {}
         settings = {}
         try:
-            conn = sqlite3.connect(db_path)
+            conn = connect_bill(db_path)
             cursor = conn.cursor()
             cursor.execute("SELECT package_name, category_name, markup_default, notes FROM subcontractor_package_settings")
             for pkg, cat, mk, notes in cursor.fetchall():
@@ -389,7 +592,7 @@ class PBOQLogic:
         """Bulk saves package meta-data like category mappings."""
         if not db_path or not os.path.exists(db_path): return
         try:
-            conn = sqlite3.connect(db_path)
+            conn = connect_bill(db_path)
             cursor = conn.cursor()
             for pkg, data in settings_dict.items():
                 cursor.execute("""
@@ -401,12 +604,63 @@ class PBOQLogic:
         except Exception as e:
             print(f"Error saving package settings: {e}")
 
+    @staticmethod
+    def ensure_package_index(cursor, pkg_columns):
+        """Indexes the normalized package name (lower(trim(col))) of each package column."""
+        for col in pkg_columns:
+            name = "pboq_pkg_" + re.sub(r"\W", "_", col)
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON pboq_items (lower(trim("{col}")))')
+
+    @staticmethod
+    def apply_package_settings(file_path, package_settings, pkg_display_cols=()):
+        """Writes package markups/categories/notes to every row of their package and stores
+        them as the file's package settings, in one transaction. Rows are matched on the
+        normalized package name of SubbeePackage or of the display columns pkg_display_cols
+        (the file's mapped Subbee Package column) through their indexes, all packages in
+        one UPDATE ... FROM.
+        Returns the number of rows updated, or -1 if the file has no PBOQ schema."""
+        conn = PBOQLogic.connect_db(file_path)
+        if not conn: return -1
+        try:
+            success, db_cols = PBOQLogic.ensure_schema(conn)
+            if not success: return -1
+            cursor = conn.cursor()
+            markup_col = db_cols[14] if len(db_cols) > 14 else "Column 13"  # Standardized Markup col
+            columns = ["SubbeePackage"] + [db_cols[i + 1] for i in pkg_display_cols
+                                           if 0 <= i < len(db_cols) - 1 and db_cols[i + 1] != "SubbeePackage"]
+            PBOQLogic.ensure_package_index(cursor, columns)
+
+            # Later settings win when two package names normalize to the same key
+            by_key = {pkg.strip().lower(): (str(d['markup']), d['category'], d['notes'])
+                      for pkg, d in package_settings.items() if pkg.strip()}
+            values = [(key,) + data for key, data in by_key.items()]
+            match = " OR ".join(f'lower(trim(pboq_items."{c}")) = v.column1' for c in columns)
+            updated = 0
+            for i in range(0, len(values), 200):
+                batch = values[i:i + 200]
+                cursor.execute(f"""
+                    UPDATE pboq_items
+                    SET "{markup_col}" = v.column2, SubbeeMarkup = v.column2, SubbeeCategory = v.column3, SubbeeNotes = v.column4
+                    FROM (VALUES {", ".join(["(?, ?, ?, ?)"] * len(batch))}) AS v
+                    WHERE {match}
+                """, [p for row in batch for p in row])
+                updated += cursor.rowcount
+
+            cursor.executemany("""
+                INSERT OR REPLACE INTO subcontractor_package_settings (package_name, category_name, markup_default, notes)
+                VALUES (?, ?, ?, ?)
+            """, [(pkg, d['category'], d['markup'], d['notes']) for pkg, d in package_settings.items()])
+            conn.commit()
+            return updated
+        finally:
+            conn.close()
+
     @staticmethod
     def bulk_update_currencies(file_path, new_currency):
         """Updates all logical currency columns in the PBOQ database."""
         if not file_path or not os.path.exists(file_path): return
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             cols = ["PlugCurrency", "ProvSumCurrency", "PCSumCurrency", "DayworkCurrency"]
             
@@ -0,0 +1,452 @@
+"""
+PBOQ Match — Persisted, normalized match keys for pricing a Priced BOQ from its SOR.
+
+A bill row matches an SOR item when (sheet, ref, description tail, qty at 2dp, unit)
+agree after normalization. Instead of re-normalizing both databases on every run,
+each database keeps the normalized key of every row in a side table:
+
+    sor_match_keys   (SOR db,  one row per sor_items row)
+    pboq_match_keys  (PBOQ db, one row per pboq_items row, for the current column mappings)
+
+SQLite triggers on the source table drop a key whenever one of its key columns is
+written, inserted or deleted, so the keys are maintained by every writer without any
+Python involvement. Before use, only rows without a key are normalized again. A
+recreated source table (or changed PBOQ mappings) is detected through the trigger
+definitions and rebuilds the side table. The SOR lookup dict is additionally cached
+per process until the SOR file changes.
+
+Rows that strict matching leaves unpriced can be matched by description similarity
+through a FuzzyIndex (token inverted index with trigram typo correction).
+
+Usage:
+    from pboq_match import load_sor_lookup, load_pboq_keys, near_misses
+    sor_lookup = load_sor_lookup(sor_path)                       # {key: (gross, code)}
+    row_keys = load_pboq_keys(pboq_db_path, db_columns, mappings)  # {rowid: key}
+    priced = {rid: sor_lookup[k] for rid, k in row_keys.items() if k in sor_lookup}
+    near_misses(row_keys, sor_lookup)                            # {rowid: ('qty',)}
+    build_sor_fuzzy_index(sor_path).best_match(desc, unit="m2")  # ((gross, code), score)
+"""
+
+import os
+import re
+import math
+import sqlite3
+from collections import defaultdict
+
+from logger import get_logger
+from pboq_mirror import connect_bill
+
+log = get_logger("pboq_match")
+
+KEY_PARTS = ("sheet", "ref", "desc", "qty", "unit")
+SOR_KEY_TABLE = "sor_match_keys"
+PBOQ_KEY_TABLE = "pboq_match_keys"
+FUZZY_MIN_SCORE = 0.85     # default confidence for applying a fuzzy description match
+
+_sor_cache = {}     # sor_path -> (file stamp, lookup)
+_fuzzy_cache = {}   # sor_path -> (file stamp, FuzzyIndex)
+
+
+# ─── Normalization ───────────────────────────────────────────────────────────
+
+def normalize_desc(d):
+    if not d: return ""
+    return str(d).rsplit(':', 1)[-1].strip().lower()
+
+
+def normalize_qty(q):
+    try:
+        # Remove commas and convert to float for comparison
+        clean = str(q).replace(',', '').strip()
+        if not clean: return "0.00"
+        return "{:.2f}".format(float(clean))
+    except (ValueError, TypeError):
+        return str(q).strip().lower()
+
+
+def sor_key(sheet, ref, desc, qty, unit):
+    """Match key of an sor_items row (raw database values)."""
+    return (str(sheet).strip().lower(), str(ref).strip().lower(),
+            normalize_desc(desc), normalize_qty(qty), str(unit).strip().lower())
+
+
+def pboq_key(sheet_name, ref, desc, qty, unit):
+    """Match key of a bill row from its displayed texts (None for a missing cell)."""
+    return (sheet_name.strip().lower(), (ref or "").strip().lower(),
+            normalize_desc((desc or "").strip()), normalize_qty((qty or "").strip()),
+            (unit or "").strip().lower())
+
+
+def _text(value):
+    return str(value) if value is not None else ""
+
+
+def _pboq_db_key(sheet, ref, desc, qty, unit):
+    # Same texts the PBOQ viewer displays for the raw values
+    return pboq_key(str(sheet) if sheet else "Sheet 1", _text(ref), _text(desc), _text(qty), _text(unit))
+
+
+# ─── Key Tables ──────────────────────────────────────────────────────────────
+
+def _ensure_key_table(cursor, key_table, source_table, key_columns):
+    """Creates the side table and its invalidation triggers. Clears the keys when the
+    triggers are missing or watch different columns (recreated table, new mappings)."""
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {key_table} ("
+                   "item_rowid INTEGER PRIMARY KEY, sheet_key TEXT, ref_key TEXT, "
+                   "desc_key TEXT, qty_key TEXT, unit_key TEXT)")
+    watched = ", ".join(f'"{c}"' for c in key_columns)
+    triggers = {
+        f"{key_table}_upd": f"CREATE TRIGGER {key_table}_upd AFTER UPDATE OF {watched} ON {source_table} "
+                            f"BEGIN DELETE FROM {key_table} WHERE item_rowid IN (old.rowid, new.rowid); END",
+        f"{key_table}_ins": f"CREATE TRIGGER {key_table}_ins AFTER INSERT ON {source_table} "
+                            f"BEGIN DELETE FROM {key_table} WHERE item_rowid = new.rowid; END",
+        f"{key_table}_del": f"CREATE TRIGGER {key_table}_del AFTER DELETE ON {source_table} "
+                            f"BEGIN DELETE FROM {key_table} WHERE item_rowid = old.rowid; END",
+    }
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name=?", (source_table,))
+    existing = dict(cursor.fetchall())
+    if all(existing.get(name) == sql for name, sql in triggers.items()):
+        return
+    for name in triggers:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute(f"DELETE FROM {key_table}")
+    for sql in triggers.values():
+        cursor.execute(sql)
+
+
+def _refresh_keys(cursor, key_table, source_table, select_sql, make_key):
+    """Normalizes only the source rows that have no key yet. Returns the number of new keys."""
+    cursor.execute(f"SELECT i.rowid, {select_sql} FROM {source_table} i "
+                   f"LEFT JOIN {key_table} k ON k.item_rowid = i.rowid WHERE k.item_rowid IS NULL")
+    entries = [(row[0],) + make_key(*row[1:]) for row in cursor.fetchall()]
+    if entries:
+        cursor.executemany(f"INSERT OR REPLACE INTO {key_table} VALUES (?, ?, ?, ?, ?, ?)", entries)
+    return len(entries)
+
+
+# ─── SOR ─────────────────────────────────────────────────────────────────────
+
+def refresh_sor_keys(conn):
+    """Brings sor_match_keys up to date; returns the number of rows normalized."""
+    cursor = conn.cursor()
+    _ensure_key_table(cursor, SOR_KEY_TABLE, "sor_items", ["Sheet", "Ref", "Description", "Quantity", "Unit"])
+    count = _refresh_keys(cursor, SOR_KEY_TABLE, "sor_items",
+                          "i.Sheet, i.Ref, i.Description, i.Quantity, i.Unit", sor_key)
+    conn.commit()
+    return count
+
+
+def _stamp(path):
+    """Changes whenever a transaction is committed to the database file."""
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        header = f.read(28)     # bytes 24-27: SQLite file change counter
+    wal = path + "-wal"
+    wal_stamp = (os.stat(wal).st_mtime_ns, os.stat(wal).st_size) if os.path.exists(wal) else None
+    return (st.st_mtime_ns, st.st_size, header[24:28], wal_stamp)
+
+
+def load_sor_lookup(sor_path):
+    """{(sheet, ref, desc tail, qty 2dp, unit): (gross, code)} for every priced SOR item."""
+    cached = _sor_cache.get(sor_path)
+    if cached and cached[0] == _stamp(sor_path):
+        return cached[1]
+
+    sor_lookup = {}
+    conn = sqlite3.connect(sor_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(sor_items)")
+        cols = [info[1] for info in cursor.fetchall()]
+        gross_sql = "i.GrossRate" if "GrossRate" in cols else "NULL"
+        code_sql = "i.RateCode" if "RateCode" in cols else "NULL"
+
+        try:
+            refresh_sor_keys(conn)
+            cursor.execute(f"SELECT k.sheet_key, k.ref_key, k.desc_key, k.qty_key, k.unit_key, {gross_sql}, {code_sql} "
+                           f"FROM sor_items i JOIN {SOR_KEY_TABLE} k ON k.item_rowid = i.rowid ORDER BY i.rowid")
+            for sheet, ref, desc, qty, unit, gross, code in cursor.fetchall():
+                if not (gross or code): continue
+                sor_lookup[(sheet, ref, desc, qty, unit)] = (gross, code)
+        except sqlite3.OperationalError as e:
+            # Read-only or locked SOR: normalize in memory for this run
+            log.warning(f"Could not maintain SOR match keys for '{sor_path}': {e}")
+            conn.rollback()
+            cursor.execute(f"SELECT Sheet, Ref, Description, Quantity, Unit, {gross_sql.replace('i.', '')}, "
+                           f"{code_sql.replace('i.', '')} FROM sor_items")
+            for sheet, ref, desc, qty, unit, gross, code in cursor.fetchall():
+                if not (gross or code): continue
+                sor_lookup[sor_key(sheet, ref, desc, qty, unit)] = (gross, code)
+    finally:
+        conn.close()
+
+    _sor_cache[sor_path] = (_stamp(sor_path), sor_lookup)
+    return sor_lookup
+
+
+# ─── PBOQ ────────────────────────────────────────────────────────────────────
+
+def _pboq_key_columns(db_columns, mappings):
+    """Database column (or None) for sheet, ref, desc, qty and unit under the mappings."""
+    cols = [db_columns[0]]
+    for role in ('ref', 'desc', 'qty', 'unit'):
+        idx = mappings.get(role, -1)
+        cols.append(db_columns[idx + 1] if 0 <= idx < len(db_columns) - 1 else None)
+    return cols
+
+
+def refresh_pboq_keys(conn, db_columns, mappings):
+    """Brings pboq_match_keys up to date for the given mappings; returns the number of rows normalized."""
+    cursor = conn.cursor()
+    cols = _pboq_key_columns(db_columns, mappings)
+    _ensure_key_table(cursor, PBOQ_KEY_TABLE, "pboq_items", [c for c in cols if c])
+    select_sql = ", ".join(f'i."{c}"' if c else "NULL" for c in cols)
+    count = _refresh_keys(cursor, PBOQ_KEY_TABLE, "pboq_items", select_sql, _pboq_db_key)
+    conn.commit()
+    return count
+
+
+def load_pboq_keys(db_path, db_columns, mappings):
+    """{rowid: key} for every bill row, maintained in the bill's pboq_match_keys table."""
+    conn = connect_bill(db_path)
+    try:
+        refresh_pboq_keys(conn, db_columns, mappings)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT item_rowid, sheet_key, ref_key, desc_key, qty_key, unit_key FROM {PBOQ_KEY_TABLE}")
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+    except sqlite3.OperationalError as e:
+        log.warning(f"Could not maintain PBOQ match keys for '{db_path}': {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+# ─── Diagnostics ─────────────────────────────────────────────────────────────
+
+def near_misses(row_keys, sor_lookup, max_candidates=50):
+    """{rowid: failed key parts} for unmatched rows that share their sheet and ref (or
+    sheet and description) with a priced SOR item; the closest item decides which
+    parts failed, e.g. ('qty',) or ('desc', 'unit')."""
+    by_ref, by_desc = defaultdict(list), defaultdict(list)
+    for key in sor_lookup:
+        if key[1]: by_ref[(key[0], key[1])].append(key)
+        if key[2]: by_desc[(key[0], key[2])].append(key)
+
+    misses = {}
+    for rowid, key in row_keys.items():
+        if key in sor_lookup: continue
+        candidates = (by_ref.get((key[0], key[1])) if key[1] else None) or \
+                     (by_desc.get((key[0], key[2])) if key[2] else None)
+        if not candidates: continue
+        best = min(candidates[:max_candidates], key=lambda c: sum(a != b for a, b in zip(key, c)))
+        misses[rowid] = tuple(part for part, a, b in zip(KEY_PARTS, key, best) if a != b)
+    return misses
+
+
+def summarize_misses(misses):
+    """"12 differ in qty, 3 differ in desc+unit" style summary, most frequent first."""
+    counts = defaultdict(int)
+    for parts in misses.values(): counts["+".join(parts)] += 1
+    return ", ".join(f"{n} differ in {parts}" for parts, n in sorted(counts.items(), key=lambda kv: -kv[1]))
+
+
+# ─── Fuzzy Matching ──────────────────────────────────────────────────────────
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = frozenset(["a", "an", "and", "the", "of", "to", "in", "on", "for", "with", "or", "as", "be", "per", "at", "by"])
+
+# Spellings of the same unit of measurement
+_UNIT_ALIASES = {
+    "m2": "m2", "m²": "m2", "sqm": "m2", "sq.m": "m2", "sq m": "m2", "sq.m.": "m2",
+    "m3": "m3", "m³": "m3", "cum": "m3", "cu.m": "m3", "cu m": "m3", "cu.m.": "m3",
+    "m": "m", "lm": "m", "rm": "m", "l.m": "m", "lin.m": "m",
+    "nr": "nr", "no": "nr", "no.": "nr", "nos": "nr", "each": "nr", "ea": "nr", "pcs": "nr",
+    "item": "item", "sum": "item", "ls": "item", "l.s": "item", "lump sum": "item",
+    "kg": "kg", "t": "t", "tonne": "t", "tonnes": "t", "ton": "t",
+}
+
+
+def tokenize(text):
+    """Lowercase word/number tokens of a description; punctuation and stop words are ignored."""
+    return [t for t in _TOKEN_RE.findall(str(text or "").lower()) if t not in _STOPWORDS]
+
+
+def normalize_unit(unit):
+    u = str(unit or "").strip().lower()
+    return _UNIT_ALIASES.get(u, u)
+
+
+def _trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """Token inverted index over priced descriptions with a scored candidate search.
+
+    A query only scores entries that share one of its rarest tokens, so pricing a
+    whole bill costs roughly (rows x candidates) rather than (rows x entries).
+    Tokens the index has never seen are mapped to the closest known token through a
+    trigram index, which absorbs typos and plural/singular differences.
+
+    Score (0..1) is the IDF-weighted Dice overlap of the two token sets, scaled down
+    when both sides carry different units; an equal quantity, sheet or ref only
+    breaks ties between otherwise equal candidates.
+
+    Usage:
+        index = FuzzyIndex()
+        index.add("Excavate trench n.e. 1.5m deep", ("12.50", "GR-001"), unit="m3", qty="100")
+        index.best_match("Excavate trenches not exceeding 1.5 m deep", unit="m³")  # (payload, score)
+        index.match_all({rowid: (desc, unit, qty, sheet, ref)}, min_score=0.8)
+    """
+
+    UNIT_MISMATCH = 0.6         # score factor when both units are known and differ
+    TIE_BREAK = 0.001           # bonus per matching qty / sheet / ref
+    FUZZY_TOKEN_MIN = 0.5       # trigram Jaccard needed to substitute an unknown token
+
+    def __init__(self, max_candidates=50, rare_tokens=4):
+        self.max_candidates = max_candidates
+        self.rare_tokens = rare_tokens
+        self._entries = []      # (tokens, unit, qty, sheet, ref, payload)
+        self._postings = defaultdict(list)
+        self._ready = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, desc, payload, unit="", qty=None, sheet="", ref=""):
+        tokens = frozenset(tokenize(desc))
+        if not tokens: return
+        eid = len(self._entries)
+        self._entries.append((tokens, normalize_unit(unit), normalize_qty(qty) if qty is not None else None,
+                              str(sheet or "").strip().lower(), str(ref or "").strip().lower(), payload))
+        for t in tokens: self._postings[t].append(eid)
+        self._ready = False
+
+    def _prepare(self):
+        n = len(self._entries)
+        self._idf = {t: math.log(1.0 + n / len(eids)) for t, eids in self._postings.items()}
+        self._max_idf = math.log(1.0 + n) if n else 1.0
+        self._weights = [sum(self._idf[t] for t in entry[0]) for entry in self._entries]
+        self._grams = defaultdict(list)
+        for t in self._postings:
+            for g in _trigrams(t): self._grams[g].append(t)
+        self._expansions = {}
+        self._ready = True
+
+    def _expand(self, token):
+        """(known token, similarity) for a query token, or (None, 0) if nothing is close."""
+        if token in self._postings: return token, 1.0
+        hit = self._expansions.get(token)
+        if hit is None:
+            grams = _trigrams(token)
+            overlap = defaultdict(int)
+            for g in grams:
+                for t in self._grams.get(g, ()): overlap[t] += 1
+            best, best_sim = None, 0.0
+            for t, shared in overlap.items():
+                sim = shared / (len(grams) + len(_trigrams(t)) - shared)
+                if sim > best_sim or (sim == best_sim and best is not None and t < best):
+                    best, best_sim = t, sim
+            hit = (best, best_sim) if best_sim >= self.FUZZY_TOKEN_MIN else (None, 0.0)
+            self._expansions[token] = hit
+        return hit
+
+    def search(self, desc, unit="", qty=None, sheet="", ref="", limit=1, min_score=0.0):
+        """Best [(score, payload)] candidates for one description, highest score first.
+        Candidates that cannot reach min_score are never looked at."""
+        if not self._ready: self._prepare()
+        query = {}
+        q_weight = 0.0
+        for token in set(tokenize(desc)):
+            known, sim = self._expand(token)
+            if known is None:
+                q_weight += self._max_idf         # unknown words count against every candidate
+                continue
+            w = self._idf[known] * sim
+            if w > query.get(known, 0.0):
+                q_weight += w - query.get(known, 0.0)
+                query[known] = w
+        if not query: return []
+
+        # Candidates: entries sharing one of the query's rarest tokens, ranked by that overlap.
+        # With a threshold, Dice >= t needs a shared weight of t*Wq/(2-t), so an entry missing
+        # every token of the rarest prefix holding more than the rest of that weight can be skipped.
+        by_rarity = sorted(query, key=lambda t: len(self._postings[t]))
+        threshold = min_score - 3 * self.TIE_BREAK
+        if threshold > 0:
+            slack = sum(query.values()) - threshold * q_weight / (2.0 - threshold)
+            if slack < 0: return []
+            rare, covered = [], 0.0
+            for t in by_rarity:
+                rare.append(t)
+                covered += query[t]
+                if covered > slack: break
+        else:
+            rare = by_rarity[:self.rare_tokens]
+        partial = defaultdict(float)
+        for t in rare:
+            w = query[t]
+            for eid in self._postings[t]: partial[eid] += w
+        if len(partial) > self.max_candidates:
+            candidates = sorted(partial, key=partial.get, reverse=True)[:self.max_candidates]
+        else:
+            candidates = partial
+
+        unit = normalize_unit(unit)
+        qty = normalize_qty(qty) if qty not in (None, "") else None
+        sheet = str(sheet or "").strip().lower()
+        ref = str(ref or "").strip().lower()
+        scored = []
+        for eid in candidates:
+            tokens, e_unit, e_qty, e_sheet, e_ref, payload = self._entries[eid]
+            shared = sum(w for t, w in query.items() if t in tokens)
+            score = 2.0 * shared / (q_weight + self._weights[eid])
+            if unit and e_unit and unit != e_unit: score *= self.UNIT_MISMATCH
+            score = min(score, 1.0) + self.TIE_BREAK * ((qty is not None and qty == e_qty) +
+                                                        (bool(sheet) and sheet == e_sheet) +
+                                                        (bool(ref) and ref == e_ref))
+            scored.append((score, -eid, payload))
+        scored.sort(reverse=True)
+        return [(min(score, 1.0), payload) for score, _, payload in scored[:limit]]
+
+    def best_match(self, desc, unit="", qty=None, sheet="", ref="", min_score=0.0):
+        """(payload, score) of the best candidate, or None."""
+        hits = self.search(desc, unit, qty, sheet, ref, limit=1, min_score=min_score)
+        return (hits[0][1], hits[0][0]) if hits else None
+
+    def match_all(self, rows, min_score=0.8):
+        """{key: (payload, score)} for rows {key: (desc, unit, qty, sheet, ref)} scoring at least min_score."""
+        matches = {}
+        cache = {}
+        for key, row in rows.items():
+            hit = cache.get(row)
+            if hit is None and row not in cache:
+                hit = cache[row] = self.best_match(*row, min_score=min_score)
+            if hit is not None and hit[1] >= min_score:
+                matches[key] = hit
+        return matches
+
+
+def build_sor_fuzzy_index(sor_path):
+    """FuzzyIndex over every priced SOR item (description tail, unit, qty); payload (gross, code).
+    Cached per process until the SOR file changes."""
+    cached = _fuzzy_cache.get(sor_path)
+    if cached and cached[0] == _stamp(sor_path):
+        return cached[1]
+    index = FuzzyIndex()
+    conn = sqlite3.connect(sor_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(sor_items)")
+        cols = [info[1] for info in cursor.fetchall()]
+        gross_sql = "GrossRate" if "GrossRate" in cols else "NULL"
+        code_sql = "RateCode" if "RateCode" in cols else "NULL"
+        cursor.execute(f"SELECT Sheet, Ref, Description, Quantity, Unit, {gross_sql}, {code_sql} FROM sor_items")
+        for sheet, ref, desc, qty, unit, gross, code in cursor.fetchall():
+            if not (gross or code): continue
+            index.add(normalize_desc(desc), (gross, code), unit=unit, qty=qty, sheet=sheet, ref=ref)
+    finally:
+        conn.close()
+    _fuzzy_cache[sor_path] = (_stamp(sor_path), index)
+    return index
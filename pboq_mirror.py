@@ -0,0 +1,313 @@
+"""
+PBOQ Mirror — Opt-in resident in-memory copy of the open Priced BOQ, written back on a timer.
+
+Bills often live on a network share, where every edit pays a round trip for its own
+connection and commit. While a mirror is open, the bill is loaded once into an
+in-memory SQLite database (memdb VFS, shared by every connection in the process)
+through the backup API, and connect_bill() hands out connections to that copy, so
+every reader and writer of the open bill works at memory speed with the usual SQLite
+locking between threads.
+
+A background thread keeps the edits durable:
+  - every JOURNAL_INTERVAL seconds with unsaved edits, it writes a recovery journal
+    (a copy of the mirror plus a small manifest) to a local folder;
+  - every CHECKPOINT_INTERVAL seconds, and on close, it writes the mirror back over
+    the bill atomically (a temp file next to the bill, then a rename) and drops the
+    journal once everything in it is on the share.
+A journal left by a crash is restored by the next open() of the bill as long as the
+bill file has not changed since the journal was written; otherwise it is set aside
+in the recovery folder.
+
+The mirror never writes over changes it has not seen: when the bill file changed on
+disk since it was loaded or last written back (another program or user saved it),
+write-backs stop, the edits go on being kept in the recovery journal and `conflict`
+is set; close() then moves the journal aside as `rescue_path` for the user to
+reconcile by hand.
+
+open() is reference counted: every open() of a bill must be paired with a close(),
+and the mirror is written back and released by the last one.
+
+Usage:
+    from pboq_mirror import PBOQMirror, connect_bill
+    mirror = PBOQMirror.open(db_path)     # load the bill (or its recovery journal) into memory
+    conn = connect_bill(db_path)          # the mirror while one is open, else the file itself
+    mirror.checkpoint()                   # write back now; True when the bill is up to date
+    mirror.close()                        # last close: final checkpoint, then connect_bill() opens the file again
+    mirror.conflict, mirror.rescue_path   # bill changed on disk meanwhile; where the edits were kept
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import itertools
+import threading
+from datetime import datetime
+
+from logger import get_logger
+
+log = get_logger("pboq_mirror")
+
+# Seconds between recovery journal writes and between write-backs to the bill
+JOURNAL_INTERVAL = 2.0
+CHECKPOINT_INTERVAL = 30.0
+
+_mirrors = {}                      # normalized bill path -> open PBOQMirror
+_registry_lock = threading.Lock()
+_names = itertools.count(1)
+
+
+def _key(db_path):
+    return os.path.normcase(os.path.abspath(db_path))
+
+
+def _stamp(path):
+    """(mtime_ns, size, SQLite change counter) of a file, None when it is missing. The
+    counter (header bytes 24-27) moves on every commit, even within a coarse share mtime."""
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            header = f.read(28)
+    except OSError:
+        return None
+    counter = int.from_bytes(header[24:28], "big") if len(header) == 28 else 0
+    return [st.st_mtime_ns, st.st_size, counter]
+
+
+def default_recovery_dir():
+    """Local per-user folder for recovery journals (never on the bill's share, nor in a
+    source checkout): %APPDATA%/EstimatorPro/recovery, else ~/.local/share/EstimatorPro/recovery."""
+    base = os.environ.get("APPDATA") or os.environ.get("XDG_DATA_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "EstimatorPro", "recovery")
+
+
+def connect_bill(db_path, **kwargs):
+    """sqlite3 connection to a bill: its in-memory mirror when one is open, else the file."""
+    mirror = _mirrors.get(_key(db_path)) if db_path else None
+    if mirror is not None:
+        return sqlite3.connect(mirror.uri, uri=True, **kwargs)
+    return sqlite3.connect(db_path, **kwargs)
+
+
+def mirror_of(db_path):
+    """The open PBOQMirror of a bill, or None."""
+    return _mirrors.get(_key(db_path)) if db_path else None
+
+
+def bypasses_mirror(conn):
+    """True when conn was opened on the file of a mirrored bill rather than through
+    connect_bill(): writing through it would change the bill under its mirror, which
+    then stops writing back as a conflict."""
+    path = next((p for _, name, p in conn.execute("PRAGMA database_list") if name == "main"), "")
+    return bool(path) and mirror_of(path) is not None
+
+
+# ─── Mirror ──────────────────────────────────────────────────────────────────
+
+class PBOQMirror:
+    """In-memory copy of one bill with a checkpoint thread and a local recovery journal."""
+
+    def __init__(self, db_path, recovery_dir=None, journal_interval=JOURNAL_INTERVAL,
+                 checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.db_path = os.path.abspath(db_path)
+        self.uri = f"file:/pboq_mirror_{next(_names)}?vfs=memdb"
+        self.recovery_dir = recovery_dir or default_recovery_dir()
+        digest = hashlib.sha1(_key(db_path).encode("utf-8")).hexdigest()[:16]
+        self.journal_path = os.path.join(self.recovery_dir, digest + ".db")
+        self.manifest_path = os.path.join(self.recovery_dir, digest + ".json")
+        self.journal_interval = journal_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.recovered = False            # loaded from a crash's recovery journal
+        self.conflict = False             # bill changed on disk since loaded; write-backs stopped
+        self.rescue_path = None           # journal kept aside by close() after a conflict
+        self._refs = 0                    # open() calls not yet matched by close()
+        self._closed_result = None        # close() result once released
+        self._keeper = None               # holds the memdb alive; used by the checkpoint thread only
+        self._lock = threading.Lock()     # one journal write / write-back at a time
+        self._stop = threading.Event()
+        self._thread = None
+        self._saved_version = None        # data_version last written back to the bill
+        self._journal_version = None      # data_version last written to the journal
+        self._disk_stamp = None           # the bill file as last loaded or written back
+        self._next_checkpoint = 0.0
+
+    @classmethod
+    def open(cls, db_path, **kwargs):
+        """Loads a bill into memory and routes connect_bill() to it; returns the mirror
+        (the already open one, with one more reference, when the bill is mirrored)."""
+        with _registry_lock:
+            key = _key(db_path)
+            if key in _mirrors:
+                _mirrors[key]._refs += 1
+                return _mirrors[key]
+            mirror = cls(db_path, **kwargs)
+            mirror._load()
+            mirror._refs = 1
+            _mirrors[key] = mirror
+        mirror._thread = threading.Thread(target=mirror._run, name="pboq-mirror", daemon=True)
+        mirror._thread.start()
+        return mirror
+
+    def _load(self):
+        self._disk_stamp = _stamp(self.db_path)
+        source = self.db_path
+        if self._journal_is_current():
+            source = self.journal_path
+            self.recovered = True
+            log.warning(f"Restoring unsaved edits of {os.path.basename(self.db_path)} from {self.journal_path}")
+        else:
+            self._set_journal_aside()
+
+        self._keeper = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        src = sqlite3.connect(source)
+        try:
+            src.backup(self._keeper)
+        except sqlite3.Error:
+            self._keeper.close()
+            raise
+        finally:
+            src.close()
+        version = self._version()
+        # Recovered edits are not on the share yet
+        self._saved_version = None if self.recovered else version
+        self._journal_version = version if self.recovered else None
+        self._next_checkpoint = time.monotonic() + (0 if self.recovered else self.checkpoint_interval)
+        log.info(f"Mirrored {os.path.basename(self.db_path)} in memory")
+
+    def _version(self):
+        # data_version moves whenever another connection commits to the mirror
+        return self._keeper.execute("PRAGMA data_version").fetchone()[0]
+
+    @property
+    def dirty(self):
+        """True while the mirror holds edits not yet written back to the bill."""
+        with self._lock:
+            return self._version() != self._saved_version
+
+    @property
+    def version(self):
+        """data_version of the in-memory copy; moves with every write committed to it."""
+        with self._lock:
+            return self._version()
+
+    # ── Checkpoints ──
+
+    def _run(self):
+        while not self._stop.wait(self.journal_interval):
+            try:
+                with self._lock:
+                    version = self._version()
+                    if version == self._saved_version: continue
+                    if version != self._journal_version: self._write_journal(version)
+                    if time.monotonic() >= self._next_checkpoint: self._write_back(version)
+            except Exception as e:
+                log.error(f"Mirror checkpoint of {os.path.basename(self.db_path)} failed: {e}")
+
+    def checkpoint(self):
+        """Writes the mirror back to the bill now if it holds unsaved edits; True when the
+        bill is up to date afterwards."""
+        with self._lock:
+            version = self._version()
+            if version == self._saved_version: return True
+            return self._write_back(version)
+
+    def _copy_to(self, path):
+        tmp = path + ".mirror-tmp"
+        dst = sqlite3.connect(tmp)
+        try:
+            self._keeper.backup(dst)
+        finally:
+            dst.close()
+        os.replace(tmp, path)
+
+    def _write_back(self, version):
+        self._next_checkpoint = time.monotonic() + self.checkpoint_interval
+        if not self.conflict and _stamp(self.db_path) != self._disk_stamp:
+            self.conflict = True
+            log.warning(f"{os.path.basename(self.db_path)} was changed on disk while it was mirrored; "
+                        f"edits are kept in the recovery journal instead of being written over it")
+        if self.conflict:
+            if version != self._journal_version: self._write_journal(version)
+            return False
+        try:
+            self._copy_to(self.db_path)
+        except (OSError, sqlite3.Error) as e:
+            log.warning(f"Could not write {os.path.basename(self.db_path)} back, edits kept in memory: {e}")
+            try: os.remove(self.db_path + ".mirror-tmp")
+            except OSError: pass
+            return False
+        self._saved_version = version
+        self._disk_stamp = _stamp(self.db_path)
+        if self._journal_version == version: self._drop_journal()
+        return True
+
+    # ── Recovery Journal ──
+
+    def _write_journal(self, version):
+        try:
+            os.makedirs(self.recovery_dir, exist_ok=True)
+            self._copy_to(self.journal_path)
+            with open(self.manifest_path, "w", encoding="utf-8") as f:
+                json.dump({'bill': self.db_path, 'disk_stamp': self._disk_stamp,
+                           'written': datetime.now().isoformat(timespec='seconds')}, f)
+            self._journal_version = version
+        except (OSError, sqlite3.Error) as e:
+            log.warning(f"Could not write the recovery journal of {os.path.basename(self.db_path)}: {e}")
+
+    def _drop_journal(self):
+        for path in (self.manifest_path, self.journal_path):
+            try: os.remove(path)
+            except OSError: pass
+        self._journal_version = None
+
+    def _journal_is_current(self):
+        """A crash's journal is restored only while the bill is as it was when the journal was written."""
+        if not (os.path.exists(self.journal_path) and os.path.exists(self.manifest_path)): return False
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return manifest.get('disk_stamp') == self._disk_stamp
+
+    def _set_journal_aside(self):
+        """Moves the journal out of the way of later opens; returns where it went."""
+        if not os.path.exists(self.journal_path): return None
+        aside = os.path.splitext(self.journal_path)[0] + f" {datetime.now().strftime('%Y-%m-%d %H%M%S')}.db"
+        try:
+            os.replace(self.journal_path, aside)
+            log.warning(f"{os.path.basename(self.db_path)} changed since its recovery journal was written; "
+                        f"journal kept as {aside}")
+        except OSError:
+            aside = self.journal_path
+        try: os.remove(self.manifest_path)
+        except OSError: pass
+        return aside
+
+    # ── Close ──
+
+    def close(self):
+        """Releases one open(). The last one stops the checkpoint thread, writes the mirror
+        back and routes connect_bill() to the file again; when the write-back fails the edits
+        stay in the recovery journal (set aside as rescue_path after a conflict). Returns True
+        when the bill holds every edit; closing a released mirror again does nothing."""
+        # Held throughout, so no open() picks up a mirror being released
+        with _registry_lock:
+            if self._refs == 0: return self._closed_result
+            self._refs -= 1
+            if self._refs > 0: return self.checkpoint()
+            self._stop.set()
+            if self._thread: self._thread.join()
+            saved = self.checkpoint()
+            if not saved:
+                with self._lock:
+                    version = self._version()
+                    if version != self._journal_version: self._write_journal(version)
+                if self.conflict: self.rescue_path = self._set_journal_aside()
+            _mirrors.pop(_key(self.db_path), None)
+            self._keeper.close()
+            self._closed_result = saved
+        log.info(f"Closed the mirror of {os.path.basename(self.db_path)}")
+        return saved
@@ -0,0 +1,219 @@
+"""
+PBOQ Numeric — Typed REAL shadows of the money and quantity columns of a Priced BOQ.
+
+pboq_items keeps every cell as display text ("1,234.50"), so any total used to mean
+re-parsing each cell in Python. pboq_numbers holds one row per pboq_items row with
+its sheet name and a REAL column for each physical "Column k" and each named money
+column (Bill Rate, GrossRate, PlugRate, SubbeeRate, ProvSum, PCSum, Daywork, ...),
+under the same column name. Whatever mapping a tool resolves to a text column, the
+parsed value sits in the pboq_numbers column of that name.
+
+SQLite triggers on pboq_items queue the rowid of every row whose sheet or numeric
+cells are written, inserted or deleted (pboq_numbers_dirty), so every writer keeps
+the shadows in step without any Python involvement and without slowing its writes
+down. ensure_numbers() re-parses the queued rows in one SQL statement before the
+shadows are read. A recreated pboq_items or a changed column layout is detected
+through the trigger definitions and rebuilds the table. Aggregations become SQL
+SUMs over pboq_numbers.
+
+Usage:
+    from pboq_numeric import ensure_numbers, numbers_join, number_of, sheet_totals
+    shadowed = ensure_numbers(conn)                           # build or bring the shadows up to date
+    shadowed = ensure_numbers(conn, build=False)              # read-only: current shadows, else inline
+    cursor.execute(f'SELECT {number_of("Column 5", shadowed)} FROM pboq_items {numbers_join(shadowed)}')
+    sheet_totals(conn, "Column 5")                            # {sheet_name: total}
+    parse_number("1,234.50")                                  # the same parse in Python
+
+    sql_number() reads plain numbers in SQL and hands anything unusual (exponents,
+    stray signs, several dots) to parse_number itself, registered on the connection by
+    ensure_numbers() (or register_functions()), so both sides always agree.
+"""
+
+import re
+import sqlite3
+
+from logger import get_logger
+from pboq_mirror import bypasses_mirror
+
+log = get_logger("pboq_numeric")
+
+NUMBERS_TABLE = "pboq_numbers"
+NUMBER_FUNCTION = "pboq_number"       # parse_number as a SQL function
+PARSER_VERSION = 2                    # bumped when parsing changes, so existing shadows are rebuilt
+DIRTY_TABLE = "pboq_numbers_dirty"
+
+# Named pboq_items columns holding money or quantities (physical "Column k" are always shadowed)
+NUMERIC_NAMED_COLUMNS = ["Bill Rate", "Bill Amount", "GrossRate", "PlugRate", "SubbeeRate",
+                         "ProvSum", "PCSum", "Daywork"]
+
+# Thousands separators, whitespace and currency symbols ignored in a number
+_IGNORED_CHARS = (",", " ", "₵", "$", "\t", "\n", "\r")
+# Number characters only, with at least one digit; and the common "-1,234.50" form of it
+_NUMBER_TEXT = re.compile(r"[-+.eE]*[0-9][-+.eE0-9]*")
+_PLAIN_TEXT = re.compile(r"-?(?=[,.]*[0-9])[0-9,]*\.?[0-9,]*")
+
+# Same text as pboq_loader.SHEET_NAME_SQL, for the shadow's sheet name
+_SHEET_NAME = "CASE WHEN Sheet IS NULL OR Sheet = '' THEN 'Sheet 1' ELSE CAST(Sheet AS TEXT) END"
+
+
+# ─── Parsing ─────────────────────────────────────────────────────────────────
+
+def number_text(value):
+    """Text of a cell with separators and currency symbols removed when it can be a number
+    (a digit and nothing but number characters), else None; float() still rejects
+    malformed text such as "1-2"."""
+    text = str(value)
+    if _PLAIN_TEXT.fullmatch(text): return text.replace(",", "")
+    for ch in _IGNORED_CHARS:
+        text = text.replace(ch, "")
+    return text if _NUMBER_TEXT.fullmatch(text) else None
+
+
+def parse_number(value):
+    """Cell value as a float, or None when it is empty or not a number; malformed text
+    such as "1-2" or "1.2.3" is not a number."""
+    if value is None: return None
+    if isinstance(value, (int, float)): return float(value)
+    text = number_text(value)
+    if text is None: return None
+    try: return float(text)
+    except ValueError: return None
+
+
+def register_functions(conn):
+    """Makes parse_number available to sql_number() on a connection."""
+    conn.create_function(NUMBER_FUNCTION, 1, parse_number, deterministic=True)
+
+
+def sql_number(expr):
+    """SQL expression parsing a text cell to REAL, NULL when empty or not a number,
+    with exactly the result of parse_number.
+
+    The text must hold a digit and nothing but number characters once separators and
+    currency symbols are ignored. Plain numbers (digits, at most one dot, a leading
+    minus) are read by CAST; the rare rest, where CAST would read a malformed text's
+    numeric prefix, goes to parse_number through register_functions().
+    """
+    cleaned = expr
+    for ch in _IGNORED_CHARS:
+        cleaned = f"REPLACE({cleaned}, '{ch}', '')"
+    ignored = "".join(_IGNORED_CHARS)
+    return (f"CASE WHEN {expr} NOT GLOB '*[0-9]*' THEN NULL "
+            f"WHEN {expr} NOT GLOB '*[^0-9.{ignored}]*' AND {expr} NOT GLOB '*.*.*' THEN CAST({cleaned} AS REAL) "
+            f"WHEN {expr} GLOB '*[^-0-9.eE+{ignored}]*' THEN NULL "
+            f"WHEN {expr} NOT GLOB '*[eE+]*' AND {expr} NOT GLOB '*.*.*' AND {expr} NOT GLOB '*[0-9.]*-*' "
+            f"AND {expr} NOT GLOB '*-*-*' THEN CAST({cleaned} AS REAL) "
+            f"ELSE {NUMBER_FUNCTION}({expr}) END")
+
+
+# ─── Shadow Table ────────────────────────────────────────────────────────────
+
+def numeric_columns(db_columns):
+    """pboq_items columns that get a REAL shadow, in table order."""
+    named = set(NUMERIC_NAMED_COLUMNS)
+    return [c for c in db_columns if c.startswith("Column ") or c in named]
+
+
+def _quote(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _triggers(columns):
+    watched = ", ".join(_quote(c) for c in ["Sheet"] + columns)
+    queue = f"BEGIN /* parser {PARSER_VERSION} */ INSERT OR IGNORE INTO {DIRTY_TABLE} VALUES ({{}}.rowid); END"
+    return {
+        f"{NUMBERS_TABLE}_upd": f"CREATE TRIGGER {NUMBERS_TABLE}_upd AFTER UPDATE OF {watched} ON pboq_items "
+                                + queue.format("new"),
+        f"{NUMBERS_TABLE}_ins": f"CREATE TRIGGER {NUMBERS_TABLE}_ins AFTER INSERT ON pboq_items " + queue.format("new"),
+        f"{NUMBERS_TABLE}_del": f"CREATE TRIGGER {NUMBERS_TABLE}_del AFTER DELETE ON pboq_items " + queue.format("old"),
+    }
+
+
+def _parse_rows(cursor, columns, where=""):
+    targets = ", ".join(_quote(c) for c in columns)
+    values = ", ".join(sql_number(_quote(c)) for c in columns)
+    cursor.execute(f"INSERT OR REPLACE INTO {NUMBERS_TABLE} (item_rowid, sheet_name, {targets}) "
+                   f"SELECT rowid, {_SHEET_NAME}, {values} FROM pboq_items {where}")
+
+
+def ensure_numbers(conn, build=True):
+    """Creates pboq_numbers and its triggers (or rebuilds them when pboq_items' numeric
+    columns changed or the table was recreated), then re-parses the rows written since
+    the last call. Returns the shadowed column names, or [] when the shadows cannot be
+    written (e.g. a read-only file, or a direct connection to a mirrored bill) so callers
+    fall back to parsing inline. build=False never writes: read-only consumers such as
+    the dashboards use the shadows only when they are already up to date."""
+    register_functions(conn)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(pboq_items)")
+    columns = numeric_columns([info[1] for info in cursor.fetchall()])
+    if not columns: return []
+    triggers = _triggers(columns)
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE ?", (NUMBERS_TABLE + "_%",))
+    existing = dict(cursor.fetchall())
+    if existing == triggers:
+        cursor.execute(f"SELECT 1 FROM {DIRTY_TABLE} LIMIT 1")
+        if not cursor.fetchone(): return columns
+    # The shadows of a mirrored bill are built in its mirror, never in the file under it
+    if not build or bypasses_mirror(conn): return []
+
+    started = not conn.in_transaction
+    if started: cursor.execute("BEGIN")
+    try:
+        if existing == triggers:
+            # Rows queued by the triggers: deleted ones go, the others are parsed again
+            cursor.execute(f"DELETE FROM {NUMBERS_TABLE} WHERE item_rowid IN (SELECT item_rowid FROM {DIRTY_TABLE})")
+            _parse_rows(cursor, columns, f"WHERE rowid IN (SELECT item_rowid FROM {DIRTY_TABLE})")
+            cursor.execute(f"DELETE FROM {DIRTY_TABLE}")
+        else:
+            for name in set(existing) | set(triggers):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for table in (NUMBERS_TABLE, DIRTY_TABLE):
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE TABLE {NUMBERS_TABLE} (item_rowid INTEGER PRIMARY KEY, sheet_name TEXT, "
+                           + ", ".join(f"{_quote(c)} REAL" for c in columns) + ")")
+            cursor.execute(f"CREATE TABLE {DIRTY_TABLE} (item_rowid INTEGER PRIMARY KEY)")
+            _parse_rows(cursor, columns)
+            for sql in triggers.values():
+                cursor.execute(sql)
+            log.info(f"Built numeric shadows of {len(columns)} column(s)")
+        if started: conn.commit()
+    except sqlite3.Error as e:
+        if not started: raise
+        conn.rollback()
+        log.warning(f"Numeric shadows unavailable, parsing inline: {e}")
+        return []
+    return columns
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+
+def numbers_join(shadowed):
+    """LEFT JOIN clause bringing a pboq_items row's shadows in under the alias n (shadows
+    share their text column's name, so qualify pboq_items columns in such a query); empty
+    when nothing is shadowed."""
+    if not shadowed: return ""
+    return f"LEFT JOIN {NUMBERS_TABLE} n ON n.item_rowid = pboq_items.rowid"
+
+
+def number_of(col, shadowed, default=0.0):
+    """Select expression for the number in text column col: its shadow when col is in
+    shadowed (from ensure_numbers), else parsed inline; default when empty or not numeric."""
+    if not col: expr = "NULL"
+    elif col in shadowed: expr = f"n.{_quote(col)}"
+    else: expr = sql_number(f"pboq_items.{_quote(col)}")
+    return expr if default is None else f"COALESCE({expr}, {default!r})"
+
+
+def sheet_totals(conn, col):
+    """{sheet_name: total of col} over the bill in bill order, as one aggregate query."""
+    cursor = conn.cursor()
+    if col in ensure_numbers(conn):
+        cursor.execute(f"SELECT sheet_name, TOTAL({_quote(col)}) FROM {NUMBERS_TABLE} "
+                       "GROUP BY sheet_name ORDER BY MIN(item_rowid)")
+    else:
+        cursor.execute("PRAGMA table_info(pboq_items)")
+        if col not in [info[1] for info in cursor.fetchall()]: return {}
+        cursor.execute(f"SELECT {_SHEET_NAME} AS sheet_name, TOTAL({sql_number(_quote(col))}) FROM pboq_items "
+                       "GROUP BY sheet_name ORDER BY MIN(rowid)")
+    return dict(cursor.fetchall())
@@ -1,9 +1,13 @@
 import os
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, 
-                             QPushButton, QHBoxLayout, QMessageBox, QHeaderView, QLineEdit, QTextEdit, QComboBox, QWidget)
+                             QPushButton, QHBoxLayout, QMessageBox, QHeaderView, QLineEdit, QTextEdit, QComboBox, QWidget,
+                             QApplication)
 from PyQt6.QtCore import Qt, pyqtSignal
 from pboq_logic import PBOQLogic
+from pboq_batch import load_state
+from pboq_mirror import connect_bill
 
 
 class PackageSummaryDialog(QDialog):
@@ -78,7 +82,7 @@ class PackageSummaryDialog(QDialog):
 
     def _load_data(self):
         self.table.blockSignals(True)
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_bill(self.db_path)
         cursor = conn.cursor()
         try:
             # Ensure schema is up to date with new fields
@@ -177,7 +181,7 @@ class PackageSummaryDialog(QDialog):
                 self._adjust_row_height(i, w)
 
     def _save_changes(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_bill(self.db_path)
         cursor = conn.cursor()
         settings_to_save = {}
         try:
@@ -275,56 +279,37 @@ class PackageSummaryDialog(QDialog):
         if not package_settings: return
 
         db_files = [f for f in os.listdir(pboq_folder) if f.lower().endswith('.db')]
+        project_dir = os.path.dirname(pboq_folder)
         updated_count = 0
         total_rows_updated = 0
-        
-        for db_name in db_files:
+
+        def sync_file(db_name):
+            # Rows are also matched on the bill's own mapped Subbee Package column
             target_path = os.path.join(pboq_folder, db_name)
-            try:
-                conn = sqlite3.connect(target_path)
-                success, db_cols = PBOQLogic.ensure_schema(conn)
-                if not success:
-                    conn.close()
-                    continue
-                
-                cursor = conn.cursor()
-                target_markup_col = db_cols[14] if len(db_cols) > 14 else "Column 13" # Standardized Markup col
-                
-                rows_in_file = 0
-                for pkg, data in package_settings.items():
-                    # Update data rows
-                    cols_to_search = [f'"{c}"' for c in db_cols if c != 'Sheet']
-                    where_clause = " OR ".join([f"{c} LIKE ? COLLATE NOCASE" for c in cols_to_search])
-                    
-                    sql = f"""
-                        UPDATE pboq_items 
-                        SET "{target_markup_col}" = ?, SubbeeMarkup = ?, "SubbeeCategory" = ?, "SubbeeNotes" = ?
-                        WHERE {where_clause}
-                    """
-                    params = [str(data['markup']), str(data['markup']), data['category'], data['notes']] + [pkg] * len(cols_to_search)
-                    
-                    cursor.execute(sql, tuple(params))
-                    rows_in_file += cursor.rowcount
+            pkg_display_col = load_state(project_dir, target_path).get('mappings', {}).get('sub_package', -1)
+            return PBOQLogic.apply_package_settings(target_path, package_settings, [pkg_display_col])
+
+        # Files are independent and SQLite releases the GIL while a statement runs
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            with ThreadPoolExecutor(max_workers=min(8, len(db_files) or 1)) as pool:
+                futures = {pool.submit(sync_file, db_name): db_name for db_name in db_files}
+                for future in as_completed(futures):
+                    try:
+                        rows_in_file = future.result()
+                    except Exception as e:
+                        print(f"Failed to sync {futures[future]}: {e}")
+                        continue
+                    if rows_in_file > 0:
+                        updated_count += 1
+                        total_rows_updated += rows_in_file
+        finally:
+            QApplication.restoreOverrideCursor()
 
-                    # Update Package Settings Table
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO subcontractor_package_settings (package_name, category_name, markup_default, notes)
-                        VALUES (?, ?, ?, ?)
-                    """, (pkg, data['category'], data['markup'], data['notes']))
-                    
-                conn.commit()
-                conn.close()
-                if rows_in_file > 0:
-                    updated_count += 1
-                    total_rows_updated += rows_in_file
-            except Exception as e:
-                print(f"Failed to sync {db_name}: {e}")
-                
         self.dataChanged.emit() # Refresh current view too
 
         
         # Ensure UI repaints before we show the blocking popup
-        from PyQt6.QtWidgets import QApplication
         QApplication.processEvents()
         
         msg = (f"Successfully synced markups in {updated_count} PBOQ file(s).\n"
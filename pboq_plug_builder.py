@@ -5,10 +5,10 @@ from PyQt6.QtGui import QPainter, QColor
 import re
 import os
 import json
-import sqlite3
 from edit_item_dialog import ZebraInput
 from database import DatabaseManager
 from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
 
 class PlugRateBuilderDialog(QDialog):
     """
@@ -285,7 +285,7 @@ class PlugRateBuilderDialog(QDialog):
             
         existing_codes = []
         try:
-            conn = sqlite3.connect(self.pboq_file_path)
+            conn = connect_bill(self.pboq_file_path)
             cursor = conn.cursor()
             cursor.execute(f"SELECT {existing_cols[0]} FROM pboq_items WHERE {existing_cols[0]} LIKE ?", (f"{code_prefix}%",))
             existing_codes = [r[0] for r in cursor.fetchall() if r[0]]
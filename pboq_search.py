@@ -0,0 +1,163 @@
+"""
+PBOQ Search — In-memory trigram index for instant row filtering in the PBOQ and
+SOR grids.
+
+Each row's cell texts are lowercased once and indexed by trigram. A query only
+verifies the rows that share every trigram of the search term, so typing into
+the search bar no longer re-reads every QTableWidgetItem of every tab. The index
+follows edits through the model's dataChanged signal (only touched rows are
+re-indexed on the next query) and is rebuilt when rows/columns are added or removed.
+
+Usage:
+    from pboq_search import TableSearchIndex, apply_row_visibility
+    index = TableSearchIndex(table)
+    rows = index.rows_containing("concrete")            # any single cell contains term
+    rows = index.rows_containing_all(["conc", "m3"])    # all terms in the joined row text
+    apply_row_visibility(table, rows)                   # None shows every row
+"""
+
+from collections import defaultdict
+from PyQt6.QtCore import QObject
+
+
+# ─── Pure Index ──────────────────────────────────────────────────────────────
+
+class RowTextIndex:
+    """Trigram inverted index over {row: (cell_text, ...)}; texts are stored lowercased."""
+
+    def __init__(self):
+        self._rows = {}                  # row -> (lowercased cell texts)
+        self._joined = {}                # row -> " ".join(texts)
+        self._grams = defaultdict(set)   # trigram -> {row}
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def set_row(self, row, texts):
+        self.remove_row(row)
+        texts = tuple(t.lower() for t in texts)
+        joined = " ".join(texts)
+        self._rows[row] = texts
+        self._joined[row] = joined
+        # Joined-text trigrams cover every per-cell trigram plus the cross-cell ones
+        for gram in self._trigrams(joined):
+            self._grams[gram].add(row)
+
+    def remove_row(self, row):
+        joined = self._joined.pop(row, None)
+        if joined is None: return
+        del self._rows[row]
+        for gram in self._trigrams(joined):
+            bucket = self._grams.get(gram)
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket: del self._grams[gram]
+
+    def _candidates(self, term):
+        grams = self._trigrams(term)
+        if not grams:
+            return self._rows.keys()
+        buckets = []
+        for gram in grams:
+            bucket = self._grams.get(gram)
+            if not bucket: return set()
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        result = set(buckets[0])
+        for bucket in buckets[1:]:
+            result &= bucket
+            if not result: break
+        return result
+
+    def rows_containing(self, term):
+        """Rows where at least one cell contains term (case-insensitive)."""
+        term = term.lower()
+        if not term: return set(self._rows)
+        rows = self._rows
+        return {r for r in self._candidates(term) if any(term in t for t in rows[r])}
+
+    def rows_containing_all(self, terms):
+        """Rows whose space-joined cell text contains every term (case-insensitive)."""
+        terms = [t.lower() for t in terms if t]
+        if not terms: return set(self._rows)
+        # Verify against the rarest term's candidates first
+        candidates = min((self._candidates(t) for t in terms), key=len)
+        joined = self._joined
+        return {r for r in candidates if all(t in joined[r] for t in terms)}
+
+
+# ─── Qt Binding ──────────────────────────────────────────────────────────────
+
+class TableSearchIndex(QObject):
+    """Keeps a RowTextIndex in step with a QTableWidget.
+
+    The index is built lazily on the first query; edits only mark rows dirty, and
+    dirty rows are re-read just before the next query.
+    """
+
+    def __init__(self, table):
+        super().__init__(table)
+        self._table = table
+        self._index = None
+        self._dirty = set()
+        self._connected = False
+
+    def _connect_model(self):
+        # Connected on first use so bulk-filling a fresh table pays no per-cell slot cost
+        model = self._table.model()
+        model.dataChanged.connect(self._mark_dirty)
+        for sig in (model.rowsInserted, model.rowsRemoved, model.columnsInserted,
+                    model.columnsRemoved, model.modelReset, model.layoutChanged):
+            sig.connect(self.invalidate)
+        self._connected = True
+
+    def invalidate(self, *args):
+        self._index = None
+        self._dirty.clear()
+
+    def _mark_dirty(self, top_left, bottom_right, roles=None):
+        if self._index is None: return
+        self._dirty.update(range(top_left.row(), bottom_right.row() + 1))
+
+    def _row_texts(self, row):
+        table = self._table
+        texts = []
+        for col in range(table.columnCount()):
+            item = table.item(row, col)
+            if item: texts.append(item.text())
+        return texts
+
+    def _refresh(self):
+        if not self._connected: self._connect_model()
+        if self._index is None:
+            self._index = RowTextIndex()
+            for row in range(self._table.rowCount()):
+                self._index.set_row(row, self._row_texts(row))
+        elif self._dirty:
+            row_count = self._table.rowCount()
+            for row in self._dirty:
+                if row < row_count: self._index.set_row(row, self._row_texts(row))
+        self._dirty.clear()
+        return self._index
+
+    def rows_containing(self, term):
+        return self._refresh().rows_containing(term)
+
+    def rows_containing_all(self, terms):
+        return self._refresh().rows_containing_all(terms)
+
+
+def apply_row_visibility(table, visible_rows):
+    """Shows only visible_rows (None shows all), touching only rows whose state changes."""
+    table.setUpdatesEnabled(False)
+    try:
+        for row in range(table.rowCount()):
+            hide = visible_rows is not None and row not in visible_rows
+            if table.isRowHidden(row) != hide:
+                table.setRowHidden(row, hide)
+    finally:
+        table.setUpdatesEnabled(True)
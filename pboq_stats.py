@@ -0,0 +1,205 @@
+"""
+PBOQ Stats — Incremental item/priced/flagged aggregates for the PBOQ viewer.
+
+Each table row is classified once into a RowStat (is it a priceable item, is it
+priced, is it flagged, what is its bill amount). Per-sheet SheetStats are kept as
+running sums of those row stats. Edits only mark the touched rows dirty (via the
+model's dataChanged signal); the next refresh re-classifies just those rows and
+applies the difference to the sheet aggregates. A full rebuild only happens when
+the classification rules themselves change (mappings, Extend criteria, dummy rate)
+or when rows are inserted/removed.
+
+Usage:
+    from pboq_stats import PBOQStatsEngine, StatsRules
+    engine = PBOQStatsEngine()
+    project = engine.refresh([(sheet_name, table), ...], rules)
+    engine.sheet_totals()       # {sheet_name: SheetStats}
+"""
+
+from dataclasses import dataclass
+from PyQt6.QtCore import Qt
+import pboq_constants as const
+
+
+# ─── Data Classes ────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class RowStat:
+    """Classification of a single table row."""
+    counted: bool = False       # passes the Extend criteria and has a positive quantity
+    priced: bool = False
+    flagged: bool = False
+    amount: float = 0.0         # bill amount of counted rows
+
+
+EMPTY_ROW = RowStat()
+
+
+@dataclass
+class SheetStats:
+    """Aggregates for one sheet (or the whole project)."""
+    items: int = 0
+    priced: int = 0
+    flagged: int = 0
+    amount: float = 0.0
+
+    @property
+    def outstanding(self):
+        return self.items - self.priced
+
+    def add(self, row, sign=1):
+        self.items += sign * row.counted
+        self.priced += sign * (row.counted and row.priced)
+        self.flagged += sign * row.flagged
+        if row.counted: self.amount += sign * row.amount
+
+
+@dataclass(frozen=True)
+class StatsRules:
+    """Everything the row classification depends on besides the row itself."""
+    qty_col: int
+    rate_col: int
+    amt_col: int
+    checked_cols: tuple
+    dummy_rate: float
+
+    @classmethod
+    def from_dialog(cls, dialog):
+        m = dialog.tools_pane.get_mappings()
+        tp = dialog.tools_pane
+        checked = tuple(i for i, cb in enumerate([tp.extend_cb0, tp.extend_cb1, tp.extend_cb2, tp.extend_cb3])
+                        if cb.isChecked())
+        return cls(m['qty'], m.get('bill_rate', -1), m.get('bill_amount', -1), checked, tp.dummy_rate_spin.value())
+
+
+# Colors that indicate a tool has been used for pricing
+PRICING_HEXES = frozenset(c.name().lower() for c in [
+    const.COL_COLOR_GREEN, const.COL_COLOR_PURPLE, const.COL_COLOR_ORANGE,
+    const.COLOR_PROV_SUM, const.COL_COLOR_LIME, const.COL_COLOR_BROWN, const.COLOR_LINK_CYAN,
+])
+
+
+def _num(text):
+    try: return float(text.replace(',', '').strip())
+    except (ValueError, TypeError, AttributeError): return None
+
+
+def classify_row(table, r, rules):
+    """Mirrors the Extend tool's gatekeeping and the priced detection of the stats bar."""
+    item0 = table.item(r, 0)
+    flagged = bool(item0 and item0.data(Qt.ItemDataRole.UserRole + 2) == 1)
+
+    # 1. Alignment Check (Mirroring the Extend Tool's gatekeeper)
+    if not rules.checked_cols:
+        return RowStat(flagged=flagged) if flagged else EMPTY_ROW
+    for c in rules.checked_cols:
+        it = table.item(r, c)
+        if not (it and it.text().strip()):
+            return RowStat(flagged=flagged) if flagged else EMPTY_ROW
+
+    # 2. Quantity Check
+    qty_item = table.item(r, rules.qty_col)
+    qty_val = _num(qty_item.text()) if qty_item and qty_item.text().strip() else None
+    if qty_val is None or qty_val <= 0:
+        return RowStat(flagged=flagged) if flagged else EMPTY_ROW
+
+    # 3. Pricing Detection
+    rate_it = table.item(r, rules.rate_col) if rules.rate_col >= 0 else None
+    amt_it = table.item(r, rules.amt_col) if rules.amt_col >= 0 else None
+    rate_val = _num(rate_it.text()) if rate_it else None
+    amt_val = _num(amt_it.text()) if amt_it else None
+    is_dummy = rate_val is not None and abs(rate_val - rules.dummy_rate) < 0.0001
+
+    # Manual rate (not the dummy) or a lump-sum amount on a non-dummy rate
+    priced = (rate_val is not None and rate_val > 0 and abs(rate_val - rules.dummy_rate) > 0.0001) or \
+             (amt_val is not None and amt_val > 0 and not is_dummy)
+
+    # OVERRIDE: Any Tool-based background color always counts as priced regardless of value
+    if not priced:
+        for it in (rate_it, amt_it):
+            if it:
+                bg = it.background().color()
+                if bg.isValid() and bg.name().lower() in PRICING_HEXES:
+                    priced = True
+                    break
+
+    return RowStat(True, priced, flagged, amt_val or 0.0)
+
+
+# ─── Engine ──────────────────────────────────────────────────────────────────
+
+class _TableState:
+    def __init__(self, table, sheet_name):
+        self.table = table
+        self.sheet_name = sheet_name
+        self.rows = []          # RowStat per table row
+        self.dirty = set()
+        self.stale = True       # needs a full rebuild
+        self.totals = SheetStats()
+
+        # Connected after the table has been filled, so loading pays no per-cell slot cost
+        model = table.model()
+        model.dataChanged.connect(self._mark_dirty)
+        for sig in (model.rowsInserted, model.rowsRemoved, model.modelReset, model.layoutChanged):
+            sig.connect(self._mark_stale)
+
+    def _mark_dirty(self, top_left, bottom_right, roles=None):
+        if not self.stale: self.dirty.update(range(top_left.row(), bottom_right.row() + 1))
+
+    def _mark_stale(self, *args):
+        self.stale = True
+        self.dirty.clear()
+
+    def refresh(self, rules):
+        if self.stale:
+            self.rows = [classify_row(self.table, r, rules) for r in range(self.table.rowCount())]
+            self.totals = SheetStats()
+            for row in self.rows: self.totals.add(row)
+            self.stale = False
+        else:
+            for r in self.dirty:
+                if r >= len(self.rows): continue
+                new = classify_row(self.table, r, rules)
+                old = self.rows[r]
+                if new != old:
+                    self.totals.add(old, -1)
+                    self.totals.add(new)
+                    self.rows[r] = new
+        self.dirty.clear()
+
+
+class PBOQStatsEngine:
+    """Keeps per-sheet aggregates for the tables currently shown by a PBOQDialog."""
+
+    def __init__(self):
+        self._states = {}       # id(table) -> _TableState
+        self._rules = None
+
+    def refresh(self, sheets, rules):
+        """sheets: iterable of (sheet_name, table). Returns project-wide SheetStats."""
+        if rules != self._rules:
+            for state in self._states.values(): state._mark_stale()
+            self._rules = rules
+
+        current = {}
+        for sheet_name, table in sheets:
+            state = self._states.get(id(table))
+            if state is None or state.table is not table:
+                state = _TableState(table, sheet_name)
+            state.sheet_name = sheet_name
+            state.refresh(rules)
+            current[id(table)] = state
+        self._states = current
+        return self.project_totals()
+
+    def sheet_totals(self):
+        return {s.sheet_name: s.totals for s in self._states.values()}
+
+    def project_totals(self):
+        total = SheetStats()
+        for s in self._states.values():
+            total.items += s.totals.items
+            total.priced += s.totals.priced
+            total.flagged += s.totals.flagged
+            total.amount += s.totals.amount
+        return total
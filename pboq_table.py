@@ -2,6 +2,9 @@ from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView, QMenu
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QAction, QColor
 import pboq_constants as const
+from pboq_search import TableSearchIndex, apply_row_visibility
+from pboq_document import column_default_bg
+from grid_sizing import fit_columns, VisibleRowSizer
 
 class PBOQTable(QTableWidget):
     """Custom table widget for PBOQ viewing with context menus and specialized logic."""
@@ -24,6 +27,14 @@ class PBOQTable(QTableWidget):
         self.verticalHeader().setMinimumSectionSize(24)
         self.verticalHeader().setDefaultSectionSize(24)
         self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        
+        # Trigram index over cell texts for the global search bar
+        self.search_index = TableSearchIndex(self)
+        
+        # col -> (length, row) of the longest text loaded into each column, for fit_columns()
+        self.longest_text = {}
+        # Wrapped rows are sized as they scroll into view rather than all at once
+        self.row_sizer = VisibleRowSizer(self)
 
     def _show_context_menu(self, pos):
         """Shows a context menu for the clicked column."""
@@ -45,21 +56,10 @@ class PBOQTable(QTableWidget):
             self.main_dialog._handle_context_menu(self, pos, row, col, rowid)
 
     def get_column_default_color(self, col_idx):
-        if col_idx < 4: return const.COL_COLOR_BLUE # Ref, Desc, Qty, Unit
-        if col_idx < 6: return const.COL_COLOR_YELLOW # Bill Rate/Amt
-        if col_idx < 8: return const.COL_COLOR_GREEN # Gross Rate/Code
-        return const.COL_COLOR_PURPLE # Plug Rate/Code and others
+        return QColor(column_default_bg(col_idx))
 
     def get_role_color(self, role):
-        if role in ['ref', 'desc', 'qty', 'unit']: return const.COL_COLOR_BLUE
-        if role in ['bill_rate', 'bill_amount']: return const.COL_COLOR_YELLOW
-        if role in ['rate', 'rate_code']: return const.COL_COLOR_GREEN
-        if role in ['plug_rate', 'plug_code']: return const.COL_COLOR_PURPLE
-        if role in ['prov_sum', 'prov_sum_code']: return const.COLOR_PROV_SUM
-        if role in ['pc_sum', 'pc_sum_code']: return const.COL_COLOR_LIME
-        if role in ['daywork', 'daywork_code']: return const.COL_COLOR_BROWN
-        if role in ['sub_package', 'sub_name', 'sub_rate', 'sub_markup', 'sub_category', 'sub_code']: return const.COL_COLOR_ORANGE
-        return None
+        return const.ROLE_COLORS.get(role)
 
     def apply_column_colors(self, mappings, num_display_cols):
         """Applies identifying pastel colors based on column roles from mappings."""
@@ -151,15 +151,12 @@ class PBOQTable(QTableWidget):
                     item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
 
     def set_row_hidden_by_text(self, search_text):
-        for row in range(self.rowCount()):
-            row_texts = []
-            for col in range(self.columnCount()):
-                item = self.item(row, col)
-                if item:
-                    row_texts.append(item.text().lower())
-            
-            full_row_text = " ".join(row_texts)
-            self.setRowHidden(row, search_text not in full_row_text if search_text else False)
+        visible = self.search_index.rows_containing_all([search_text]) if search_text else None
+        apply_row_visibility(self, visible)
+
+    def fit_columns_to_contents(self):
+        """Sizes columns from sampled rows plus each column's longest text (see grid_sizing)."""
+        fit_columns(self, {c: row for c, (_, row) in self.longest_text.items()})
 
     def set_word_wrap_enabled(self, enabled):
         """Toggles word wrap and updates row heights accordingly."""
@@ -168,8 +165,9 @@ class PBOQTable(QTableWidget):
         if enabled:
             # Allow rows to be resized by content
             vh.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
-            self.resizeRowsToContents()
+            self.row_sizer.set_enabled(True)
         else:
+            self.row_sizer.set_enabled(False)
             # Revert to fixed 24px height
             vh.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
             vh.setDefaultSectionSize(24)
@@ -6,12 +6,19 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QMessageBox, QComboBox, QTabWidget, QWidget,
                              QDockWidget, QApplication, QProgressDialog, QTableWidgetItem, QMenu,
                              QLineEdit, QPushButton, QInputDialog)
-from PyQt6.QtCore import Qt, QUrl, QTimer
-from PyQt6.QtGui import QColor, QBrush, QAction
+from PyQt6.QtCore import Qt, QUrl, QTimer, QThreadPool
+from PyQt6.QtGui import QColor, QBrush, QAction, QKeySequence, QShortcut
 
 import pboq_constants as const
 from pboq_logic import PBOQLogic
 from pboq_table import PBOQTable
+from pboq_search import apply_row_visibility
+from pboq_stats import PBOQStatsEngine, StatsRules
+from pboq_document import PBOQDocument, CollectionIndex, ALL_COLUMNS, COLLECT_BG, LINK_SOURCES, extension_amount
+from pboq_match import (load_sor_lookup, load_pboq_keys, near_misses, summarize_misses,
+                        build_sor_fuzzy_index, FuzzyIndex, FUZZY_MIN_SCORE)
+from pboq_loader import read_sheet_index, read_sheet_entries, read_row_entries, SheetLoad, SheetLoadWorker
+from pboq_journal import PBOQJournal
 from pboq_tools import PBOQToolsPane
 from pboq_price import PBOQPricePane
 from edit_item_dialog import EditItemDialog
@@ -19,6 +26,86 @@ from database import DatabaseManager
 from pboq_plug_builder import PlugRateBuilderDialog
 from subcontractor_adjudicator import PackageAdjudicatorDialog
 from pboq_package_summary import PackageSummaryDialog
+from pboq_branch_dialog import BranchesDialog
+from pboq_mirror import PBOQMirror, connect_bill
+from rate_sync import same_file
+from project_code_index import ProjectCodeIndex
+from pboq_flags import FlagSet, write_flags
+
+# Rows built into a sheet per event-loop turn while it streams in
+SHEET_RENDER_SLICE = 500
+
+
+class TableDocumentSync:
+    """Keeps a PBOQDocument in step with the PBOQ viewer's tables.
+
+    The first refresh snapshots the tracked columns of every table; afterwards only
+    rows reported by the model's dataChanged signal are re-read. Any change of
+    mappings, table set or row layout triggers a fresh snapshot.
+    """
+
+    def __init__(self):
+        self.document = None
+        self._key = None
+        self._dirty = {}        # id(table) -> set(rows)
+        self._stale = True
+        self._connected = set()
+
+    def invalidate(self, *args):
+        self._stale = True
+
+    def _connect(self, table):
+        if id(table) in self._connected: return
+        tid = id(table)
+        model = table.model()
+        model.dataChanged.connect(lambda tl, br, roles=None, tid=tid: self._mark_dirty(tid, tl, br))
+        for sig in (model.rowsInserted, model.rowsRemoved, model.columnsInserted,
+                    model.columnsRemoved, model.modelReset, model.layoutChanged):
+            sig.connect(self.invalidate)
+        self._connected.add(tid)
+
+    def _mark_dirty(self, tid, top_left, bottom_right):
+        if self._stale: return
+        rows = self._dirty.get(tid)
+        if rows is not None: rows.update(range(top_left.row(), bottom_right.row() + 1))
+
+    @staticmethod
+    def _read_row(table, r, columns):
+        item0 = table.item(r, 0)
+        rowid = item0.data(Qt.ItemDataRole.UserRole) if item0 else None
+        g_idx = item0.data(Qt.ItemDataRole.UserRole + 1) if item0 else None
+        cells = {}
+        for c in columns:
+            item = table.item(r, c)
+            if item is not None:
+                cells[c] = (item.text(), item.background().color().name().lower(),
+                            item.foreground().color().name().lower())
+        return rowid, g_idx, cells
+
+    def refresh(self, tables, mappings):
+        """tables: list of (sheet_name, table). Returns the up-to-date PBOQDocument."""
+        num_cols = max((t.columnCount() for _, t in tables), default=0)
+        key = (tuple(sorted(mappings.items())), tuple(id(t) for _, t in tables), num_cols)
+        if self._stale or key != self._key or self.document is None:
+            doc = PBOQDocument(mappings, num_cols)
+            for name, table in tables:
+                sheet = doc.add_sheet(name)
+                for r in range(table.rowCount()):
+                    doc.append_row(sheet, *self._read_row(table, r, doc.columns))
+                self._connect(table)
+            self.document, self._key, self._stale = doc, key, False
+            self._dirty = {id(t): set() for _, t in tables}
+            return doc
+
+        doc = self.document
+        for (name, table), sheet in zip(tables, doc.sheets):
+            rows = self._dirty.get(id(table))
+            if not rows: continue
+            for r in rows:
+                if r < len(sheet): doc.set_row(sheet, r, *self._read_row(table, r, doc.columns))
+            rows.clear()
+        return doc
+
 
 class PBOQDialog(QDialog):
     """Priced Bill of Quantities viewer - Modularized and Maintainable."""
@@ -31,6 +118,13 @@ class PBOQDialog(QDialog):
         
         self.logic = PBOQLogic()
         self.rowid_to_item0 = {}   # rowid -> QTableWidgetItem (the one in column 0)
+        self.flags = FlagSet()     # rows of the open bill flagged for review
+        self._pending_sheets = {}  # not yet loaded PBOQTable -> (sheet_name, row_count)
+        self._sheet_loads = {}     # PBOQTable -> SheetLoad being read by a background worker
+        self._load_context = {}
+        self._logical_sync_pending = False  # a logical backfill ran while some sheets were not loaded
+        self.journal = PBOQJournal(None)     # undo/redo history of the open bill
+        self.mirror = None                   # PBOQMirror of the open bill in in-memory editing mode
         self.db_columns = []
         self.is_updating_logic = False
         self.clipboard_data = None  # Store copied rate data for Plug pricing
@@ -42,6 +136,13 @@ class PBOQDialog(QDialog):
         # Synchronization Flags
         self._is_syncing_codes = False
         
+        # Incremental per-sheet/project stats
+        self.stats_engine = PBOQStatsEngine()
+        
+        # Headless document mirrored from the tables for bulk pricing operations
+        self.doc_sync = TableDocumentSync()
+        self.collect_index = CollectionIndex()
+        
         # Auto-Collect Debounce
         self._collect_pending = False
         self._auto_collect_timer = QTimer(self)
@@ -49,6 +150,11 @@ class PBOQDialog(QDialog):
         self._auto_collect_timer.setInterval(100)  # 100ms debounce
         self._auto_collect_timer.timeout.connect(self._fire_deferred_collect)
         
+        # Watches the in-memory bill for changes made to the file by someone else
+        self._mirror_watch = QTimer(self)
+        self._mirror_watch.setInterval(5000)
+        self._mirror_watch.timeout.connect(self._check_mirror_conflict)
+        
         self.setWindowTitle("Priced Bills of Quantities (PBOQ)")
         self.setMinimumSize(950, 400)
         
@@ -90,29 +196,32 @@ class PBOQDialog(QDialog):
         self.tools_pane.columnHeadersRequested.connect(self._update_column_headers)
         self.tools_pane.wrapTextToggled.connect(self._toggle_wrap_text)
         self.tools_pane.alignTextLeftToggled.connect(self._toggle_left_align)
-        self.tools_pane.extendRequested.connect(self._run_extend_logic)
-        self.tools_pane.revertRequested.connect(self._run_revert_logic)
-        self.tools_pane.recalculateRequested.connect(self._run_recalculate_all_logic)
-        self.tools_pane.clearBillRequested.connect(self._clear_bill_rates)
-        self.tools_pane.collectRequested.connect(self._run_collect_logic)
-        self.tools_pane.collectRevertRequested.connect(self._run_collect_revert_logic)
+        # Bill-wide operations are recorded in the bill's journal as one undoable step each
+        self.tools_pane.extendRequested.connect(lambda: self._run_journaled("Extend", self._run_extend_logic))
+        self.tools_pane.revertRequested.connect(lambda: self._run_journaled("Revert Extend", self._run_revert_logic))
+        self.tools_pane.recalculateRequested.connect(lambda: self._run_journaled("Recalculate", self._run_recalculate_all_logic))
+        self.tools_pane.clearBillRequested.connect(lambda: self._run_journaled("Clear Bill Rates", self._clear_bill_rates))
+        self.tools_pane.collectRequested.connect(lambda: self._run_journaled("Collect", self._run_collect_logic))
+        self.tools_pane.collectRevertRequested.connect(lambda: self._run_journaled("Revert Collect", self._run_collect_revert_logic))
         self.tools_pane.stateChanged.connect(self._update_stats)
         
         # Connect Price Pane signals
         self.price_pane.rateVisibilityChanged.connect(self._toggle_rate_visibility)
         self.price_pane.stateChanged.connect(self._save_pboq_state)
         self.price_pane.stateChanged.connect(self._update_column_headers)
-        self.price_pane.priceSORRequested.connect(self._run_price_sor_logic)
-        self.price_pane.linkBillRateRequested.connect(self._run_link_bill_to_rate_logic)
-        self.price_pane.clearPlugRequested.connect(self._clear_plug_and_code)
-        self.price_pane.clearProvRequested.connect(self._clear_prov_and_code)
-        self.price_pane.linkBillProvRequested.connect(self._run_link_bill_to_rate_logic) # Reusing generic logic
-        self.price_pane.clearPCRequested.connect(self._clear_pc_and_code)
-        self.price_pane.linkBillPCRequested.connect(self._run_link_bill_to_rate_logic) # Reusing generic logic
-        self.price_pane.clearDayworkRequested.connect(self._clear_daywork_and_code)
-        self.price_pane.linkBillDayworkRequested.connect(self._run_link_bill_to_rate_logic) # Reusing generic logic
+        self.price_pane.priceSORRequested.connect(lambda apply: self._run_journaled(
+            "Price with SOR" if apply else "Revert SOR Pricing", self._run_price_sor_logic, apply))
+        link = lambda: self._run_journaled("Link Bill Rate", self._run_link_bill_to_rate_logic)
+        self.price_pane.linkBillRateRequested.connect(link)
+        self.price_pane.clearPlugRequested.connect(lambda: self._run_journaled("Clear Plug Rates", self._clear_plug_and_code))
+        self.price_pane.clearProvRequested.connect(lambda: self._run_journaled("Clear Prov Sums", self._clear_prov_and_code))
+        self.price_pane.linkBillProvRequested.connect(link) # Reusing generic logic
+        self.price_pane.clearPCRequested.connect(lambda: self._run_journaled("Clear PC Sums", self._clear_pc_and_code))
+        self.price_pane.linkBillPCRequested.connect(link) # Reusing generic logic
+        self.price_pane.clearDayworkRequested.connect(lambda: self._run_journaled("Clear Dayworks", self._clear_daywork_and_code))
+        self.price_pane.linkBillDayworkRequested.connect(link) # Reusing generic logic
         self.price_pane.openAdjudicatorRequested.connect(self._open_package_adjudicator)
-        self.price_pane.clearSubcontractorRequested.connect(self._clear_sub_and_code)
+        self.price_pane.clearSubcontractorRequested.connect(lambda: self._run_journaled("Clear Subcontractors", self._clear_sub_and_code))
         self.price_pane.assignPackageRequested.connect(self._assign_package_to_selected)
         self.price_pane.managePackagesRequested.connect(self._open_packages_summary)
         self.price_pane.openDirectoryRequested.connect(self._open_subcontractor_directory)
@@ -139,7 +248,12 @@ class PBOQDialog(QDialog):
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search for items or @review.")
         self.search_bar.setMinimumWidth(250)
-        self.search_bar.textChanged.connect(self._run_global_search)
+        self.search_bar.textChanged.connect(self._schedule_global_search)
+        # Debounce keystrokes so a burst of typing runs a single search
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(lambda: self._run_global_search(self.search_bar.text()))
         top_bar.addWidget(self.search_bar)
         
         self.tool_toggle_btn = QPushButton("Price Tools")
@@ -155,6 +269,25 @@ class PBOQDialog(QDialog):
         self.export_excel_btn.clicked.connect(self._export_to_excel)
         top_bar.addWidget(self.export_excel_btn)
         
+        # Undo / Redo of bill operations (history is kept in the bill itself)
+        self.undo_btn = QPushButton("Undo")
+        self.undo_btn.setFixedWidth(60)
+        self.undo_btn.clicked.connect(self._undo_operation)
+        top_bar.addWidget(self.undo_btn)
+        self.redo_btn = QPushButton("Redo")
+        self.redo_btn.setFixedWidth(60)
+        self.redo_btn.clicked.connect(self._redo_operation)
+        top_bar.addWidget(self.redo_btn)
+        self.branches_btn = QPushButton("Branches")
+        self.branches_btn.setToolTip("Snapshots and what-if branches of this bill")
+        self.branches_btn.clicked.connect(self._open_branches)
+        top_bar.addWidget(self.branches_btn)
+        QShortcut(QKeySequence.StandardKey.Undo, self, self._undo_operation)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self._redo_operation)
+        # Review queue: step through the rows flagged for review
+        QShortcut(QKeySequence("F8"), self, self._goto_next_flag)
+        QShortcut(QKeySequence("Shift+F8"), self, self._goto_previous_flag)
+        
         # Connect signals for global persistence as well
         self.tools_pane.wrapTextToggled.connect(self._save_viewer_state)
         self.tools_pane.alignTextLeftToggled.connect(self._save_viewer_state)
@@ -164,6 +297,16 @@ class PBOQDialog(QDialog):
         self.stats_label.setStyleSheet("font-weight: bold; margin-left: 20px;")
         top_bar.addWidget(self.stats_label)
         
+        # Progress of sheets still streaming in, with a way to stop them
+        self.load_status_label = QLabel()
+        self.load_status_label.setStyleSheet("color: #555; margin-left: 20px;")
+        self.load_status_label.hide()
+        top_bar.addWidget(self.load_status_label)
+        self.load_cancel_btn = QPushButton("Stop Loading")
+        self.load_cancel_btn.clicked.connect(self._cancel_sheet_loads)
+        self.load_cancel_btn.hide()
+        top_bar.addWidget(self.load_cancel_btn)
+        
         top_bar.addStretch()
         self.main_layout.addLayout(top_bar)
 
@@ -203,6 +346,9 @@ class PBOQDialog(QDialog):
 
         file_path = self.pboq_file_selector.itemData(index)
         self._save_viewer_state() # Save selection change
+        self._cancel_sheet_loads()
+        self._close_mirror()
+        self._open_mirror(file_path)
         
         self.tabs.blockSignals(True)
         # Clear existing tabs
@@ -223,61 +369,19 @@ class PBOQDialog(QDialog):
         num_display_cols = len(display_col_names)
         
         formatting_data = self.logic.load_formatting(conn)
-        cursor = conn.cursor()
-        quoted_cols = [f'"{c}"' for c in self.db_columns]
-        
-        logical_cols = [
-            "SubbeePackage", "SubbeeName", "SubbeeRate", "SubbeeMarkup", "SubbeeCategory", "SubbeeCode",
-            "ProvSum", "ProvSumCode", "ProvSumFormula", "ProvSumCategory", "ProvSumCurrency", "ProvSumExchangeRates",
-            "PCSum", "PCSumCode", "PCSumFormula", "PCSumCategory", "PCSumCurrency", "PCSumExchangeRates",
-            "PlugRate", "PlugCode", "PlugFormula", "PlugCategory", "PlugCurrency", "PlugExchangeRates", "PlugFactor", "IsFlagged"
-        ]
-        query = f"SELECT rowid, {', '.join(quoted_cols)}, {', '.join(logical_cols)} FROM pboq_items"
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        # Only the sheet list and row order are read up front; rows are read per sheet on first view
+        sheet_index, positions = read_sheet_index(conn)
+        self.flags = FlagSet.load(conn, [name for name, _ in sheet_index])
         conn.close()
         
         self.rowid_to_item0 = {}
-        sheet_groups = {}
-        # logical_start_idx is row[0] (rowid) + physical_cols (len(db_columns))
-        logical_start_idx = 1 + len(self.db_columns)
-        
-        for g_idx, row in enumerate(rows):
-            row_id = row[0]
-            physical_data = list(row[1:logical_start_idx])
-            logical_data = row[logical_start_idx:]
-            is_flagged = 1 if logical_data[25] in [1, '1', True, 'True'] else 0
-            
-            # --- Logic Layer MERGE ---
-            # For subbee roles, prefer logical store values.
-            # Category and Code ALWAYS use logical store (they are the source of truth).
-            # Other roles only pull from logical store when the physical cell is empty.
-            m = self.tools_pane.get_mappings()
-            sub_roles = {
-                'sub_package': 0, 'sub_name': 1, 'sub_rate': 2, 
-                'sub_markup': 3, 'sub_category': 4, 'sub_code': 5,
-                'prov_sum': 6, 'prov_sum_code': 7,
-                'pc_sum': 12, 'pc_sum_code': 13,
-                'plug_rate': 18, 'plug_code': 19, 'plug_factor': 24
-            }
-            # Roles where the logical store is ALWAYS authoritative and should overwrite physical spreadsheet cells
-            logical_authoritative = {'sub_category', 'sub_code', 'prov_sum_code', 'pc_sum_code', 'plug_code', 'plug_rate', 'prov_sum', 'pc_sum', 'plug_factor'}
-            
-            for role, l_idx in sub_roles.items():
-                p_idx = m.get(role, -1)
-                if p_idx >= 0 and p_idx < len(physical_data) - 1:
-                    logical_val = logical_data[l_idx]
-                    if logical_val is not None and str(logical_val).strip() != "" and str(logical_val) != "None":
-                        if role in logical_authoritative:
-                            physical_data[p_idx + 1] = logical_val
-                        else:
-                            # Fallback: only use logical if physical is empty
-                            if not physical_data[p_idx + 1] or str(physical_data[p_idx + 1]).strip() == "" or physical_data[p_idx + 1] == "None":
-                                physical_data[p_idx + 1] = logical_val
-
-            sheet_name = str(physical_data[0]) if physical_data[0] else "Sheet 1"
-            if sheet_name not in sheet_groups: sheet_groups[sheet_name] = []
-            sheet_groups[sheet_name].append((g_idx, row_id, physical_data[1:], is_flagged))
+        self._pending_sheets = {}
+        self._logical_sync_pending = False
+        self.journal = PBOQJournal(file_path)
+        self._load_context = {
+            'file_path': file_path, 'formatting': formatting_data, 'positions': positions,
+            'num_cols': num_display_cols,
+        }
             
         self.tools_pane.populate_column_combos(display_col_names)
         
@@ -287,103 +391,16 @@ class PBOQDialog(QDialog):
         self._load_pboq_state(index)
         self.tools_pane.blockSignals(False)
         
-        progress = QProgressDialog("Loading Sheets...", None, 0, len(rows), self)
-        progress.setWindowModality(Qt.WindowModality.WindowModal)
-        progress.setMinimumDuration(0)
-        progress.setValue(0)
-        
-        # Cache UI states and mappings before entering the dense rendering loops
-        m = self.tools_pane.get_mappings()
-        map_inv = {v: k for k, v in m.items() if v >= 0}
-        sub_markup_idx = m.get('sub_markup', -1)
-        align_left = self.tools_pane.align_left_btn.isChecked()
-        align_excludes = [m.get('ref', -1), m.get('desc', -1), m.get('qty', -1), m.get('unit', -1)]
-        
-        rows_loaded = 0
         try:
-            for sheet_name, sheet_entries in sheet_groups.items():
+            for sheet_name, row_count in sheet_index:
                 table = PBOQTable(self)
-                table._is_loading = True
-                table.setRowCount(len(sheet_entries))
                 table.setColumnCount(num_display_cols)
                 table.setHorizontalHeaderLabels([f"Column {i}" for i in range(num_display_cols)])
                 table.cellUpdated.connect(self._handle_cell_updated)
                 table.cellClicked.connect(self._on_table_cell_clicked)
-                
-                for r_idx, (global_row_idx, row_id, row_data, is_flagged) in enumerate(sheet_entries):
-                    for c_idx in range(num_display_cols):
-                        val = row_data[c_idx] if c_idx < len(row_data) else ""
-                        display_val = str(val) if val is not None else ""
-                        
-                        # Format Subbee Markup if mapped
-                        if c_idx == sub_markup_idx and display_val:
-                            try:
-                                f_val = float(display_val.replace('%','').replace(',',''))
-                                display_val = "{:,.2f}%".format(f_val)
-                            except: pass
-                             
-                        item = QTableWidgetItem(display_val)
-                        
-                        # Apply Role-based or Default Column Color
-                        role = map_inv.get(c_idx)
-                        color = table.get_role_color(role) if role else table.get_column_default_color(c_idx)
-                        if color: item.setBackground(color)
-                        
-                        # Apply Alignment
-                        if c_idx in align_excludes:
-                            if role == 'unit':
-                                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                            elif role == 'qty':
-                                item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-                            else:
-                                item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-                        else:
-                            if align_left:
-                                item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-                            else:
-                                item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-
-                        if c_idx == 0:
-                            item.setData(Qt.ItemDataRole.UserRole, row_id)
-                            item.setData(Qt.ItemDataRole.UserRole + 2, is_flagged) # Store flag state
-                            self.rowid_to_item0[row_id] = item
-                        item.setData(Qt.ItemDataRole.UserRole + 1, global_row_idx)
-
-                        # Apply Flagged Highlighting (Highest Priority Visual)
-                        if is_flagged and not self._is_pricing_column(c_idx):
-                            item.setBackground(const.COLOR_FLAGGED)
-                        
-                        # Apply Specific Saved Formatting (overwrites default)
-                        fmt = formatting_data.get((global_row_idx, c_idx))
-                        if fmt:
-                            self._apply_item_format(item, fmt)
-                        
-                        if item.text() == "0.00":
-                            item.setForeground(const.COLOR_GRAY_TEXT)
-                            # Removed hardcoded AlignRight, will be handled by _update_column_headers
-                            # item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-                            
-                        table.setItem(r_idx, c_idx, item)
-                    
-                    rows_loaded += 1
-                    if rows_loaded % 100 == 0:
-                        progress.setValue(rows_loaded)
-                        QApplication.processEvents()
-                    if progress.wasCanceled():
-                        break
-                
-                    if progress.wasCanceled():
-                        break
-                
-                table.resizeColumnsToContents()
-                table._is_loading = False
+                self._pending_sheets[table] = (sheet_name, row_count)
                 self.tabs.addTab(table, sheet_name)
-                if progress.wasCanceled():
-                    break
-            
-            progress.setValue(len(rows))
         finally:
-            progress.close()
             self.tabs.blockSignals(False)
         
         # Restore active tab
@@ -396,49 +413,304 @@ class PBOQDialog(QDialog):
                     if self.tools_pane.collect_btn.text() == "Revert":
                         self._run_collect_logic(force_refresh=True)
             except: pass
+        self._activate_sheet(self.tabs.currentIndex())
             
         self._update_column_headers(skip_cells=True)
         self._toggle_wrap_text(self.tools_pane.wrap_text_btn.isChecked())
         self._update_stats()
+        self._update_undo_buttons()
         
         # Only apply search filter if there's an active search term
         search_text = self.search_bar.text().strip()
         if search_text:
             self._run_global_search(search_text)
 
+    def _activate_sheet(self, index):
+        """Starts (or takes over) the background load of a sheet whose tab is being shown."""
+        table = self.tabs.widget(index) if index >= 0 else None
+        if table not in self._pending_sheets: return
+        load = self._sheet_loads.get(table)
+        if load is not None and load.mappings != self.tools_pane.get_mappings():
+            # Read ahead with other mappings; the merge has to be redone
+            self._cancel_sheet_load(load)
+            load = None
+        if load is None:
+            self._reset_partial_sheet(table)
+            load = self._start_sheet_load(table)
+        load.live = True
+        self._show_load_progress()
+        self._render_sheet_load(load)
+
+    def _start_sheet_load(self, table):
+        sheet_name, row_count = self._pending_sheets[table]
+        load = SheetLoad(table, sheet_name, row_count, self.tools_pane.get_mappings())
+        load.worker = SheetLoadWorker(self._load_context['file_path'], self.db_columns, sheet_name,
+                                      load.mappings, self._load_context['positions'], load)
+        load.worker.signals.chunk.connect(self._on_sheet_chunk)
+        load.worker.signals.finished.connect(self._on_sheet_load_finished)
+        self._sheet_loads[table] = load
+        table._is_loading = True
+        QThreadPool.globalInstance().start(load.worker)
+        return load
+
+    def _on_sheet_chunk(self, load, entries):
+        if self._sheet_loads.get(load.table) is not load: return    # Cancelled or superseded
+        load.buffer.extend(entries)
+        self._render_sheet_load(load)
+
+    def _on_sheet_load_finished(self, load, cancelled):
+        if self._sheet_loads.get(load.table) is not load: return
+        if cancelled:
+            # The rows shown so far stay; the sheet is read again the next time it is shown
+            del self._sheet_loads[load.table]
+            self._show_load_progress()
+            return
+        load.done = True
+        self._render_sheet_load(load)
+
+    def _render_sheet_load(self, load):
+        """Builds the next slice of received rows, yielding to the event loop between slices."""
+        load.scheduled = False
+        if not load.live or self._sheet_loads.get(load.table) is not load: return
+        if load.buffer:
+            entries, load.buffer = load.buffer[:SHEET_RENDER_SLICE], load.buffer[SHEET_RENDER_SLICE:]
+            first = load.rendered == 0
+            self._populate_sheet_table(load.table, entries, start_row=load.rendered)
+            load.rendered += len(entries)
+            if first: load.table.fit_columns_to_contents()
+            if self._active_search_text():
+                self._filter_new_rows(load.table, load.rendered - len(entries), self._active_search_text())
+            self._show_load_progress()
+        if load.buffer:
+            if not load.scheduled:
+                load.scheduled = True
+                QTimer.singleShot(0, lambda: self._render_sheet_load(load))
+        elif load.done:
+            del self._sheet_loads[load.table]
+            self._finish_sheet_load(load.table)
+            self._show_load_progress()
+            self._update_stats()
+            self._prefetch_next_sheet(self.tabs.indexOf(load.table))
+
+    def _finish_sheet_load(self, table):
+        """Final layout of a fully built sheet; it counts as loaded from here on."""
+        self._pending_sheets.pop(table, None)
+        table.fit_columns_to_contents()
+        table._is_loading = False
+        
+        wrap = self.tools_pane.wrap_text_btn.isChecked()
+        desc_col = self.tools_pane.get_mappings().get('desc', -1)
+        if wrap and desc_col >= 0 and table.columnWidth(desc_col) > 400:
+            table.setColumnWidth(desc_col, 400)
+        table.set_word_wrap_enabled(wrap)
+        
+        if self._logical_sync_pending:
+            self._sync_logical_assignment_columns([table])
+        search_text = self._active_search_text()
+        if search_text:
+            self._filter_table(table, search_text)
+
+    def _reset_partial_sheet(self, table):
+        """Drops the rows of a sheet whose load was cancelled part way."""
+        for r in range(table.rowCount()):
+            item0 = table.item(r, 0)
+            if item0: self.rowid_to_item0.pop(item0.data(Qt.ItemDataRole.UserRole), None)
+        table.setRowCount(0)
+        table.longest_text = {}
+
+    def _cancel_sheet_load(self, load):
+        load.worker.cancel()
+        self._sheet_loads.pop(load.table, None)
+
+    def _cancel_sheet_loads(self):
+        """Stops every background sheet read (bill switch, dialog close, Stop button)."""
+        for load in list(self._sheet_loads.values()):
+            self._cancel_sheet_load(load)
+        self._show_load_progress()
+
+    def _show_load_progress(self):
+        live = [load for load in self._sheet_loads.values() if load.live]
+        if live:
+            text = ", ".join(f"{load.sheet_name}: {load.rendered:,}/{load.row_count:,}" for load in live)
+            self.load_status_label.setText(f"Loading {text}")
+        self.load_status_label.setVisible(bool(live))
+        self.load_cancel_btn.setVisible(bool(live))
+
+    def _ensure_sheet_loaded(self, index):
+        """Loads a sheet completely before returning, taking over any background read of it."""
+        table = self.tabs.widget(index) if index >= 0 else None
+        if table not in self._pending_sheets: return
+        sheet_name, row_count = self._pending_sheets[table]
+        mappings = self.tools_pane.get_mappings()
+        
+        load = self._sheet_loads.get(table)
+        if load is not None and load.done and load.mappings == mappings:
+            # Everything has been read already; only the rows not shown yet are left to build
+            del self._sheet_loads[table]
+            entries, start_row = load.buffer, load.rendered
+        else:
+            if load is not None: self._cancel_sheet_load(load)
+            self._reset_partial_sheet(table)
+            conn = self.logic.connect_db(self._load_context['file_path'])
+            if not conn: return
+            try:
+                entries = read_sheet_entries(conn, self.db_columns, sheet_name, mappings, self._load_context['positions'])
+            finally:
+                conn.close()
+            start_row = 0
+        
+        table._is_loading = True
+        self._populate_sheet_table(table, entries, start_row=start_row)
+        self._finish_sheet_load(table)
+        self._show_load_progress()
+
+    def _populate_sheet_table(self, table, entries, start_row=0):
+        formatting_data = self._load_context['formatting']
+        num_display_cols = self._load_context['num_cols']
+        
+        # Cache UI states and mappings before entering the dense rendering loops
+        m = self.tools_pane.get_mappings()
+        map_inv = {v: k for k, v in m.items() if v >= 0}
+        sub_markup_idx = m.get('sub_markup', -1)
+        align_left = self.tools_pane.align_left_btn.isChecked()
+        align_excludes = [m.get('ref', -1), m.get('desc', -1), m.get('qty', -1), m.get('unit', -1)]
+        longest = table.longest_text
+        longest_len = [longest.get(c, (0, 0))[0] for c in range(num_display_cols)]
+        
+        table.setRowCount(max(table.rowCount(), start_row + len(entries)))
+        for r_idx, (global_row_idx, row_id, row_data, is_flagged) in enumerate(entries, start_row):
+            for c_idx in range(num_display_cols):
+                val = row_data[c_idx] if c_idx < len(row_data) else ""
+                display_val = str(val) if val is not None else ""
+                
+                # Format Subbee Markup if mapped
+                if c_idx == sub_markup_idx and display_val:
+                    try:
+                        f_val = float(display_val.replace('%','').replace(',',''))
+                        display_val = "{:,.2f}%".format(f_val)
+                    except: pass
+                if len(display_val) > longest_len[c_idx]:
+                    longest_len[c_idx] = len(display_val)
+                    longest[c_idx] = (longest_len[c_idx], r_idx)
+                     
+                item = QTableWidgetItem(display_val)
+                
+                # Apply Role-based or Default Column Color
+                role = map_inv.get(c_idx)
+                color = table.get_role_color(role) if role else table.get_column_default_color(c_idx)
+                if color: item.setBackground(color)
+                
+                # Apply Alignment
+                if c_idx in align_excludes:
+                    if role == 'unit':
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                    elif role == 'qty':
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                    else:
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+                else:
+                    if align_left:
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+                    else:
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
+                if c_idx == 0:
+                    item.setData(Qt.ItemDataRole.UserRole, row_id)
+                    item.setData(Qt.ItemDataRole.UserRole + 2, is_flagged) # Store flag state
+                    self.rowid_to_item0[row_id] = item
+                item.setData(Qt.ItemDataRole.UserRole + 1, global_row_idx)
+
+                # Apply Flagged Highlighting (Highest Priority Visual)
+                if is_flagged and not self._is_pricing_column(c_idx):
+                    item.setBackground(const.COLOR_FLAGGED)
+                
+                # Apply Specific Saved Formatting (overwrites default)
+                fmt = formatting_data.get((global_row_idx, c_idx))
+                if fmt:
+                    self._apply_item_format(item, fmt)
+                
+                if item.text() == "0.00":
+                    item.setForeground(const.COLOR_GRAY_TEXT)
+                    
+                table.setItem(r_idx, c_idx, item)
+
+    def _load_all_sheets(self):
+        """Materializes every sheet not yet loaded; whole-bill operations call this first."""
+        pending = [i for i in range(self.tabs.count()) if self.tabs.widget(i) in self._pending_sheets]
+        if not pending: return
+        total = sum(self._pending_sheets[self.tabs.widget(i)][1] for i in pending)
+        progress = QProgressDialog("Loading Sheets...", None, 0, len(pending), self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0 if total > 2000 else 500)
+        try:
+            for n, i in enumerate(pending):
+                progress.setValue(n)
+                QApplication.processEvents()
+                self._ensure_sheet_loaded(i)
+            progress.setValue(len(pending))
+        finally:
+            progress.close()
+
+    def _prefetch_next_sheet(self, index):
+        """Reads the next unloaded sheet on a worker thread so switching to it is quick."""
+        for i in list(range(index + 1, self.tabs.count())) + list(range(index)):
+            table = self.tabs.widget(i)
+            if table not in self._pending_sheets or table.rowCount(): continue
+            if table not in self._sheet_loads: self._start_sheet_load(table)
+            return
+
     def _handle_cell_updated(self, rowid, col_idx, new_val):
         """Called when a user manually edits a cell in the table."""
         self._persist_updates(col_idx, [(rowid, new_val)])
 
+    def _schedule_global_search(self, _text=None):
+        self._search_timer.start()
+
     def _run_global_search(self, text):
         """Filters rows in all sheets based on the search text."""
+        self._search_timer.stop()
         text = text.lower().strip()
-        is_review_search = text in ["@review", "@flag", "@flagged"]
-        
+        # Every sheet that can hold a match is loaded first, so no tab is left out of the search
+        if text in ["@review", "@flag", "@flagged"]:
+            for i in range(self.tabs.count()):
+                if self.tabs.widget(i) in self._pending_sheets and self.flags.rowids_of(self.tabs.tabText(i)):
+                    self._ensure_sheet_loaded(i)
+        elif text:
+            self._load_all_sheets()
         for i in range(self.tabs.count()):
             table = self.tabs.widget(i)
             if not isinstance(table, PBOQTable): continue
-            
-            # Fast path: empty search means show all rows
-            if not text:
-                for r in range(table.rowCount()):
-                    table.setRowHidden(r, False)
-                continue
-            
-            for r in range(table.rowCount()):
-                match = False
-                if is_review_search:
-                    item0 = table.item(r, 0)
-                    if item0 and item0.data(Qt.ItemDataRole.UserRole + 2) == 1:
-                        match = True
-                else:
-                    # Search in all visible columns
-                    for c in range(table.columnCount()):
-                        item = table.item(r, c)
-                        if item and text in item.text().lower():
-                            match = True
-                            break
-                table.setRowHidden(r, not match)
+            self._filter_table(table, text)
+
+    def _active_search_text(self):
+        return self.search_bar.text().lower().strip()
+
+    def _filter_table(self, table, text):
+        # Fast path: empty search means show all rows
+        if not text:
+            apply_row_visibility(table, None)
+            return
+        
+        if text in ["@review", "@flag", "@flagged"]:
+            items0 = (self.rowid_to_item0.get(rowid) for rowid in self.flags)
+            visible = {item0.row() for item0 in items0 if item0 and item0.tableWidget() is table}
+        else:
+            # Search in all columns via the table's trigram index
+            visible = table.search_index.rows_containing(text)
+        apply_row_visibility(table, visible)
+
+    def _filter_new_rows(self, table, start_row, text):
+        """Hides the rows just streamed into a sheet that do not match the active search."""
+        # Checked directly: querying the index would rebuild it after every slice
+        review = text in ["@review", "@flag", "@flagged"]
+        for r in range(start_row, table.rowCount()):
+            if review:
+                item0 = table.item(r, 0)
+                match = bool(item0 and item0.data(Qt.ItemDataRole.UserRole) in self.flags)
+            else:
+                match = any(item and text in item.text().lower()
+                            for item in (table.item(r, c) for c in range(table.columnCount())))
+            if not match: table.setRowHidden(r, True)
 
     def _apply_item_format(self, item, fmt):
         font = item.font()
@@ -540,8 +812,7 @@ class PBOQDialog(QDialog):
                 return
 
             menu = QMenu(self)
-            item0 = table.item(row, 0)
-            is_f = item0.data(Qt.ItemDataRole.UserRole + 2) == 1
+            is_f = rowid in self.flags
             flag_act = menu.addAction("Remove Review Flag" if is_f else "Flag for Review")
             
             action = menu.exec(table.viewport().mapToGlobal(pos))
@@ -564,7 +835,7 @@ class PBOQDialog(QDialog):
         if not db_path:
             return
             
-        conn = sqlite3.connect(db_path)
+        conn = connect_bill(db_path)
         cursor = conn.cursor()
         try:
             cursor.execute("SELECT subcontractor_name, rate FROM subcontractor_quotes WHERE package_name=? AND row_idx=? AND rate > 0", (pkg, rowid))
@@ -1186,7 +1457,7 @@ class PBOQDialog(QDialog):
             query = f"SELECT {prefix}Formula, {prefix}Category, {prefix}Currency, {prefix}ExchangeRates, {prefix}Code, {rate_col_name}{extra_cols} FROM pboq_items WHERE rowid = ?"
             
             try:
-                conn = sqlite3.connect(file_path)
+                conn = connect_bill(file_path)
                 cursor = conn.cursor()
                 cursor.execute(query, (rowid,))
                 res = cursor.fetchone()
@@ -1256,7 +1527,7 @@ class PBOQDialog(QDialog):
                 
                 # Update Logical Database Columns (Formula, Category, etc.)
                 try:
-                    conn = sqlite3.connect(file_path)
+                    conn = connect_bill(file_path)
                     cursor = conn.cursor()
                     
                     factor_bit = ""
@@ -1430,7 +1701,7 @@ class PBOQDialog(QDialog):
                     
                     # Fetch logical context from DB to ensure we have non-visible fields like Markup/Category
                     try:
-                        conn = sqlite3.connect(file_path)
+                        conn = connect_bill(file_path)
                         cursor = conn.cursor()
                         cursor.execute("SELECT SubbeeMarkup, SubbeeCategory, PlugCategory, PlugCurrency FROM pboq_items WHERE rowid=?", (rowid,))
                         l_row = cursor.fetchone()
@@ -1543,21 +1814,11 @@ class PBOQDialog(QDialog):
             self._run_collect_logic(force_refresh=True)
 
     def _check_has_collection_cells(self, m):
-        """Scans ALL tabs for cells with the collection background color."""
+        """Checks ALL tabs for cells with the collection background color."""
         bill_amt_col = m.get('bill_amount', -1)
         if bill_amt_col < 0:
             return False
-        
-        collect_hex = const.COLOR_COLLECT.name().lower()
-        for i in range(self.tabs.count()):
-            table = self.tabs.widget(i)
-            if not isinstance(table, PBOQTable):
-                continue
-            for r in range(table.rowCount()):
-                it = table.item(r, bill_amt_col)
-                if it and it.background().color().name().lower() == collect_hex:
-                    return True
-        return False
+        return any(COLLECT_BG in sheet.bg.get(bill_amt_col, ()) for sheet in self._document(loaded_only=True).sheets)
 
 
     def _sync_coded_updates(self, display_col, updates):
@@ -1578,6 +1839,7 @@ class PBOQDialog(QDialog):
             return
             
         code_col_idx = sync_map[display_col]
+        self._load_all_sheets()
         
         # We collect all updates found to avoid N separate persist calls
         synced_updates = []
@@ -1629,159 +1891,81 @@ class PBOQDialog(QDialog):
             amt_item = QTableWidgetItem()
             table.setItem(row, bill_amount_col, amt_item)
 
-        # Check Price Type Logic (using colors as markers)
-        bg_color = amt_item.background().color().name().lower()
-        bill_rate_bg = rate_item.background().color().name().lower() if rate_item else ""
-        
-        # Lumpsum markers: Purple (if in Amount col) or Light Cyan (Prov Sum)
-        is_lumpsum_plug = (bg_color in [const.COL_COLOR_PURPLE.name().lower(), const.COLOR_LINK_CYAN.name().lower()])
-        is_prov_sum = (bg_color == const.COLOR_PROV_SUM.name().lower())
-        
-        # Rate-based markers: Purple (if in Rate col), Green (Gross), Orange (Subbee), Cyan (Linked) or Default (Yellow)
-        is_rate_based = (bill_rate_bg in [const.COL_COLOR_PURPLE.name().lower(),
-                                           const.COL_COLOR_GREEN.name().lower(),
-                                           const.COL_COLOR_ORANGE.name().lower(),
-                                           const.COLOR_LINK_CYAN.name().lower()])
-        # Fallback: if it's default (Yellow/No Color), assume extension unless already marked as lump sum
-        if not is_rate_based and not (is_lumpsum_plug or is_prov_sum):
-            if bill_rate_bg == "" or bill_rate_bg == const.COL_COLOR_YELLOW.name().lower():
-                is_rate_based = True
-
-        if is_rate_based:
-            # Multiplier Dynamics: Qty * Rate = Amount
-            if qty_item and rate_item:
-                try:
-                    q_str = qty_item.text().replace(',', '').strip()
-                    r_str = rate_item.text().replace(',', '').strip()
-                    if not q_str or not r_str: return
-                    
-                    # Rounding values to standard construction precision (Qty:4, Rate:2)
-                    # to match Excel's "Precision as Displayed" math.
-                    q_val = round(float(q_str), 4)
-                    r_val = round(float(r_str), 2)
-                    amt_val = round(q_val * r_val, 2)
-                    amt_str = "{:,.2f}".format(amt_val)
-                    
-                    changed = (amt_item.text() != amt_str)
-                    if changed:
-                        amt_item.setText(amt_str)
-                        if batch_mode:
-                            return (rowid, amt_str)
-                        else:
-                            # Avoid infinite recalc loops by passing trigger_recalc=False
-                            self._persist_updates(bill_amount_col, [(rowid, amt_str)], trigger_recalc=False)
-                except ValueError: pass
-        else:
-            # Lumpsum Dynamics: Amount is needed, ignore Quantity changes
-            # (Logic handled by simply doing nothing here)
-            pass
+        # Price type is read from the colour markers (see pboq_document.extension_amount)
+        amt_str = extension_amount(
+            qty_item.text() if qty_item else None,
+            rate_item.text() if rate_item else None,
+            amt_item.background().color().name().lower(),
+            rate_item.background().color().name().lower() if rate_item else "")
+        
+        if amt_str is not None and amt_item.text() != amt_str:
+            amt_item.setText(amt_str)
+            if batch_mode:
+                return (rowid, amt_str)
+            # Avoid infinite recalc loops by passing trigger_recalc=False
+            self._persist_updates(bill_amount_col, [(rowid, amt_str)], trigger_recalc=False)
         return None
 
-
+    def _document(self, loaded_only=False):
+        """Headless PBOQDocument of the open bill; only rows edited since the last call are re-read.
+        loaded_only=True leaves out sheets that have not been opened yet instead of loading them."""
+        if not loaded_only: self._load_all_sheets()
+        tables = [(self.tabs.tabText(i), self.tabs.widget(i)) for i in range(self.tabs.count())
+                  if isinstance(self.tabs.widget(i), PBOQTable) and self.tabs.widget(i) not in self._pending_sheets]
+        return self.doc_sync.refresh(tables, self.tools_pane.get_mappings())
+
+    def _render_deltas(self, deltas):
+        """Paints document deltas onto the table items. Persistence is left to the caller."""
+        for d in deltas:
+            item0 = self.rowid_to_item0.get(d.rowid)
+            if not item0: continue
+            table, row = item0.tableWidget(), item0.row()
+            cols = range(table.columnCount()) if d.col == ALL_COLUMNS else (d.col,)
+            for c in cols:
+                item = table.item(row, c)
+                if not item:
+                    item = QTableWidgetItem()
+                    table.setItem(row, c, item)
+                # Store original value for SOR revert if not already stored
+                if d.sor_mark and not item.data(Qt.ItemDataRole.UserRole + 10):
+                    item.setData(Qt.ItemDataRole.UserRole + 11, item.text())
+                if d.text is not None: item.setText(d.text)
+                if d.bg is not None: item.setBackground(QColor(d.bg))
+                if d.fg is not None: item.setForeground(QColor(d.fg))
+                if d.sor_mark: item.setData(Qt.ItemDataRole.UserRole + 10, True)
+        return deltas
+
+    def _delta_updates(self, deltas, col):
+        """(rowid, value) pairs of the deltas that change the text of one display column."""
+        if col < 0: return []
+        return [(d.rowid, d.db_value) for d in deltas if d.col == col and d.text is not None]
+
+    def _delta_format_rows(self, deltas, col, cleared=False):
+        """(global_row_idx, fmt) pairs to persist, or global_row_idx list to clear when cleared=True."""
+        out = []
+        if col < 0: return out
+        for d in deltas:
+            if d.col != col or not (d.clear_fmt if cleared else d.fmt): continue
+            item0 = self.rowid_to_item0.get(d.rowid)
+            g_idx = item0.data(Qt.ItemDataRole.UserRole + 1) if item0 else None
+            if g_idx is None: continue
+            out.append(g_idx if cleared else (g_idx, d.fmt))
+        return out
 
     def _update_stats(self):
         m = self.tools_pane.get_mappings()
-        total, priced, flagged = 0, 0, 0
         
         # Guard against unmapped columns
         if m['qty'] < 0:
             self.stats_label.setText("Map 'Quantity' column to see stats")
             return
 
-        # Colors that indicate a tool has been used for pricing
-        pricing_hexes = [
-            const.COL_COLOR_GREEN.name().lower(),
-            const.COL_COLOR_PURPLE.name().lower(),
-            const.COL_COLOR_ORANGE.name().lower(),
-            const.COLOR_PROV_SUM.name().lower(),
-            const.COL_COLOR_LIME.name().lower(),
-            const.COL_COLOR_BROWN.name().lower(),
-            const.COLOR_LINK_CYAN.name().lower()
-        ]
-
-        # Mirror the 'Extend' tool's criteria selection and dummy rate value
-        dummy_rate = self.tools_pane.dummy_rate_spin.value()
-        checked_cols = []
-        if self.tools_pane.extend_cb0.isChecked(): checked_cols.append(0)
-        if self.tools_pane.extend_cb1.isChecked(): checked_cols.append(1)
-        if self.tools_pane.extend_cb2.isChecked(): checked_cols.append(2)
-        if self.tools_pane.extend_cb3.isChecked(): checked_cols.append(3)
-
-        for i in range(self.tabs.count()):
-            t = self.tabs.widget(i)
-            if not isinstance(t, PBOQTable): continue
-            
-            for r in range(t.rowCount()):
-                # Count Flagged items (independent of validity)
-                item0 = t.item(r, 0)
-                if item0 and item0.data(Qt.ItemDataRole.UserRole + 2) == 1:
-                    flagged += 1
-
-                # 1. Alignment Check (Mirroring the Extend Tool's gatekeeper)
-                if not checked_cols: continue
-                is_aligned = all(t.item(r, c) and t.item(r, c).text().strip() for c in checked_cols)
-                if not is_aligned: continue
-
-                # 2. Quantity Check (Mirroring the Extend Tool's logic)
-                qty_item = t.item(r, m['qty'])
-                if not qty_item or not qty_item.text().strip(): continue
-                try:
-                    qty_val = float(qty_item.text().replace(',', ''))
-                    if qty_val <= 0: continue
-                except (ValueError, TypeError): continue
-
-                # If it passes the above, it is a valid priceable item for stats
-                total += 1
-
-                # 3. Pricing Detection (Total vs Priced)
-                is_row_priced = False
-                rate_col = m.get('bill_rate', -1)
-                amt_col = m.get('bill_amount', -1)
-                
-                # Manual pricing check with dummy rate filter (following user request)
-                if rate_col >= 0:
-                    it = t.item(r, rate_col)
-                    val_str = it.text().replace(',', '').strip() if it else ""
-                    if val_str:
-                        try:
-                            val_f = float(val_str)
-                            # Only count as priced if it's not the dummy rate
-                            if val_f > 0 and abs(val_f - dummy_rate) > 0.0001:
-                                is_row_priced = True
-                        except: pass
-
-                # If rate didn't confirm priced, check amount (lump sums) 
-                # but only if the rate isn't currently set to the dummy value
-                if not is_row_priced and amt_col >= 0:
-                    it = t.item(r, amt_col)
-                    val_str = it.text().replace(',', '').strip() if it else ""
-                    if val_str:
-                        try:
-                            if float(val_str) > 0:
-                                r_it = t.item(r, rate_col) if rate_col >= 0 else None
-                                is_dummy = False
-                                if r_it:
-                                    try: 
-                                        if abs(float(r_it.text().replace(',','').strip()) - dummy_rate) < 0.0001:
-                                            is_dummy = True
-                                    except: pass
-                                
-                                if not is_dummy:
-                                    is_row_priced = True
-                        except: pass
-
-                # OVERRIDE: Any Tool-based background color always counts as priced regardless of value
-                for c_idx in [rate_col, amt_col]:
-                    if c_idx < 0: continue
-                    it = t.item(r, c_idx)
-                    if it:
-                        bg_color = it.background().color()
-                        if bg_color.isValid() and bg_color.name().lower() in pricing_hexes:
-                            is_row_priced = True
-                            break
-                
-                if is_row_priced:
-                    priced += 1
+        # Only rows touched since the last call are re-classified
+        # Sheets that have not been opened yet are left out until they load
+        sheets = [(self.tabs.tabText(i), self.tabs.widget(i)) for i in range(self.tabs.count())
+                  if isinstance(self.tabs.widget(i), PBOQTable) and self.tabs.widget(i) not in self._pending_sheets]
+        project = self.stats_engine.refresh(sheets, StatsRules.from_dialog(self))
+        total, priced, flagged = project.items, project.priced, project.flagged
         
         outstanding = total - priced
         
@@ -1798,9 +1982,16 @@ class PBOQDialog(QDialog):
             f"Outstanding: <span style='color:{orange_color}'>{outstanding}</span> | "
             f"To Review: <span style='color:{red_color}'>{flagged}</span>"
         )
+        if self._pending_sheets:
+            stats_text += f" | Sheets loaded: {len(sheets)}/{len(sheets) + len(self._pending_sheets)}"
         self.stats_label.setText(stats_text)
+        self.stats_label.setToolTip("\n".join(
+            f"{name}: {st.items} items, {st.priced} priced, {st.flagged} to review, {st.amount:,.2f}"
+            for name, st in self.stats_engine.sheet_totals().items()))
 
     def _on_tab_changed(self, index):
+        if self.tabs.widget(index) in self._pending_sheets:
+            self._activate_sheet(index)
         self._save_pboq_state()
 
     def _on_mdi_subwindow_activated(self, sub):
@@ -2064,8 +2255,13 @@ class PBOQDialog(QDialog):
 
         self._update_stats()
 
-    def _sync_logical_assignment_columns(self):
-        """Backfills all hidden subbee logical columns from whatever physical columns are currently mapped."""
+    def _sync_logical_assignment_columns(self, tables=None):
+        """Backfills all hidden subbee logical columns from whatever physical columns are currently mapped.
+        Sheets that are not loaded yet are backfilled when they load (tables: just those sheets)."""
+        if tables is None:
+            tables = [self.tabs.widget(i) for i in range(self.tabs.count())
+                      if isinstance(self.tabs.widget(i), PBOQTable) and self.tabs.widget(i) not in self._pending_sheets]
+            self._logical_sync_pending = True
         m = self.tools_pane.get_mappings()
         sync_map = {
             'sub_name': 'SubbeeName',
@@ -2090,9 +2286,7 @@ class PBOQDialog(QDialog):
         file_path = self.pboq_file_selector.currentData()
         updates = {role: [] for role in active}
         
-        for i in range(self.tabs.count()):
-            table = self.tabs.widget(i)
-            if not isinstance(table, PBOQTable): continue
+        for table in tables:
             for r in range(table.rowCount()):
                 rowid = table.item(r, 0).data(Qt.ItemDataRole.UserRole)
                 for role, col_idx in active.items():
@@ -2113,9 +2307,7 @@ class PBOQDialog(QDialog):
             # We aggregate across the roles that were actually mapped
             active_sync_roles = [r for r in sync_roles if r in active]
             if active_sync_roles:
-                for i in range(self.tabs.count()):
-                    table = self.tabs.widget(i)
-                    if not isinstance(table, PBOQTable): continue
+                for table in tables:
                     for r in range(table.rowCount()):
                         rowid = table.item(r, 0).data(Qt.ItemDataRole.UserRole)
                         for role in active_sync_roles:
@@ -2145,6 +2337,92 @@ class PBOQDialog(QDialog):
 
     # --- Worker Logic Methods ---
 
+    # --- Undo / Redo ---
+    def _run_journaled(self, label, operation, *args):
+        """Runs a bill operation as one step of the bill's undo journal."""
+        self.journal.begin(label)
+        try:
+            return operation(*args)
+        finally:
+            self.journal.commit()
+            self._update_undo_buttons()
+
+    def _undo_operation(self):
+        self._apply_journal_change(self.journal.undo())
+
+    def _redo_operation(self):
+        self._apply_journal_change(self.journal.redo())
+
+    def _apply_journal_change(self, change):
+        """Re-reads the rows an undo/redo wrote back and rebuilds only their cells."""
+        if change is None: return
+        positions = self._load_context['positions']
+        rowid_at = {g_idx: rowid for rowid, g_idx in positions.items()}
+        rowids = change.rowids | {rowid_at[r] for r, _ in change.style_cells if r in rowid_at}
+        self._refresh_rows(rowids, reload_formatting=True)
+        self._update_undo_buttons()
+
+    def apply_sync_deltas(self, deltas):
+        """Applies cells another window wrote into the open bill (rate_sync.SyncDelta) by
+        re-reading only their rows, instead of reloading the bill."""
+        file_path = self.pboq_file_selector.currentData()
+        rowids = {d.rowid for d in deltas if same_file(d.path, file_path)}
+        if not rowids: return
+        self._refresh_rows(rowids)
+        self._schedule_auto_collect(self.tools_pane.get_mappings())
+
+    def _refresh_rows(self, rowids, reload_formatting=False):
+        """Rebuilds the cells of the given bill rows from the database."""
+        file_path = self.pboq_file_selector.currentData()
+        conn = self.logic.connect_db(file_path)
+        if not conn: return
+        try:
+            if reload_formatting: self._load_context['formatting'] = self.logic.load_formatting(conn)
+            entries = read_row_entries(conn, self.db_columns, rowids, self.tools_pane.get_mappings(),
+                                       self._load_context['positions'])
+            self.flags.reload_rows(conn, rowids)
+        finally:
+            conn.close()
+        
+        # Rows of sheets not built and not being read yet are read from the database when they load
+        by_table = {}
+        for entry in entries:
+            item0 = self.rowid_to_item0.get(entry[1])
+            if item0: by_table.setdefault(item0.tableWidget(), []).append((item0.row(), entry))
+        for table, rows in by_table.items():
+            rows.sort(key=lambda x: x[0])
+            run_start, run = rows[0][0], []
+            for row, entry in rows:
+                if row != run_start + len(run):
+                    self._populate_sheet_table(table, run, start_row=run_start)
+                    run_start, run = row, []
+                run.append(entry)
+            self._populate_sheet_table(table, run, start_row=run_start)
+        self._refresh_sheet_loads(rowids, entries)
+        
+        self._update_column_headers(skip_cells=True)
+        self._update_stats()
+
+    def _refresh_sheet_loads(self, rowids, entries):
+        """Keeps background sheet reads from showing rows older than a change: finished reads
+        get the fresh entries in their buffer, reads still running may be delivering chunks
+        read before the change and start over (a read-ahead simply goes)."""
+        fresh = {entry[1]: entry for entry in entries}
+        changed = set(rowids)
+        for load in list(self._sheet_loads.values()):
+            if load.done:
+                load.buffer = [fresh.get(e[1], e) for e in load.buffer if e[1] not in changed or e[1] in fresh]
+            else:
+                self._cancel_sheet_load(load)
+                if load.live: self._activate_sheet(self.tabs.indexOf(load.table))
+        self._show_load_progress()
+
+    def _update_undo_buttons(self):
+        for btn, verb, label in ((self.undo_btn, "Undo", self.journal.undo_label()),
+                                 (self.redo_btn, "Redo", self.journal.redo_label())):
+            btn.setEnabled(label is not None)
+            btn.setToolTip(f"{verb} {label}" if label else f"Nothing to {verb.lower()}")
+
     def _run_extend_logic(self):
         m = self.tools_pane.get_mappings()
         if m['qty'] < 0 or m['bill_rate'] < 0:
@@ -2152,9 +2430,6 @@ class PBOQDialog(QDialog):
             return
 
         d_rate = self.tools_pane.dummy_rate_spin.value()
-        d_rate_str = "{:,.2f}".format(d_rate)
-        
-        rate_updates, amt_updates = [], []
         
         checked_cols = []
         if self.tools_pane.extend_cb0.isChecked(): checked_cols.append(0)
@@ -2162,58 +2437,20 @@ class PBOQDialog(QDialog):
         if self.tools_pane.extend_cb2.isChecked(): checked_cols.append(2)
         if self.tools_pane.extend_cb3.isChecked(): checked_cols.append(3)
 
-        for i in range(self.tabs.count()):
-            table = self.tabs.widget(i)
-            for r in range(table.rowCount()):
-                rowid = table.item(r, 0).data(Qt.ItemDataRole.UserRole)
-                rate_item = table.item(r, m['bill_rate'])
-                
-                # Extend Logic
-                if not checked_cols: continue
-                is_aligned = all(table.item(r, c) and table.item(r, c).text().strip() for c in checked_cols)
-                if not is_aligned: continue
-                
-                qty_item = table.item(r, m['qty'])
-                if not qty_item or not qty_item.text().strip(): continue
-                
-                # Already has a rate?
-                if rate_item and rate_item.text().strip(): continue
-                
-                try:
-                    qty_val = float(qty_item.text().replace(',', ''))
-                    if qty_val <= 0: continue
-                    
-                    if not rate_item:
-                        rate_item = QTableWidgetItem()
-                        table.setItem(r, m['bill_rate'], rate_item)
-                    
-                    rate_item.setText(d_rate_str)
-                    rate_item.setForeground(const.COLOR_GRAY_TEXT)
-                    rate_updates.append((rowid, d_rate_str))
-                    
-                    if m['bill_amount'] >= 0:
-                        amt_val = qty_val * d_rate
-                        amt_str = "{:,.2f}".format(amt_val)
-                        amt_item = table.item(r, m['bill_amount'])
-                        if not amt_item:
-                            amt_item = QTableWidgetItem()
-                            table.setItem(r, m['bill_amount'], amt_item)
-                        amt_item.setText(amt_str)
-                        amt_item.setForeground(const.COLOR_GRAY_TEXT)
-                        amt_updates.append((rowid, amt_str))
-                except ValueError: continue
+        deltas = self._render_deltas(self._document().extend(checked_cols, d_rate))
+        rate_updates = self._delta_updates(deltas, m['bill_rate'])
+        amt_updates = self._delta_updates(deltas, m['bill_amount'])
+        file_path = self.pboq_file_selector.currentData()
 
         if rate_updates:
             self._persist_updates(m['bill_rate'], rate_updates)
             # Persist gray color for rates
-            fmt_updates = [(self.rowid_to_item0[rid].data(Qt.ItemDataRole.UserRole + 1), {'font_color': const.COLOR_GRAY_TEXT.name()}) for rid, _ in rate_updates]
-            self.logic.persist_batch_cell_formatting(self.pboq_file_selector.currentData(), m['bill_rate'], fmt_updates)
+            self.logic.persist_batch_cell_formatting(file_path, m['bill_rate'], self._delta_format_rows(deltas, m['bill_rate']))
 
             if amt_updates: 
                 self._persist_updates(m['bill_amount'], amt_updates)
                 # Persist gray color for amounts
-                fmt_amt_updates = [(self.rowid_to_item0[rid].data(Qt.ItemDataRole.UserRole + 1), {'font_color': const.COLOR_GRAY_TEXT.name()}) for rid, _ in amt_updates]
-                self.logic.persist_batch_cell_formatting(self.pboq_file_selector.currentData(), m['bill_amount'], fmt_amt_updates)
+                self.logic.persist_batch_cell_formatting(file_path, m['bill_amount'], self._delta_format_rows(deltas, m['bill_amount']))
             
             self._update_column_headers()
             QMessageBox.information(self, "Success", f"Extended {len(rate_updates)} rows.")
@@ -2225,29 +2462,14 @@ class PBOQDialog(QDialog):
             return
 
         d_rate = self.tools_pane.dummy_rate_spin.value()
-        d_rate_str = "{:,.2f}".format(d_rate)
+        deltas = self._render_deltas(self._document().revert_extend(d_rate))
+        rate_updates = self._delta_updates(deltas, m['bill_rate'])
+        amt_updates = self._delta_updates(deltas, m['bill_amount'])
         
-        rate_updates, amt_updates = [], []
-        
-        for i in range(self.tabs.count()):
-            table = self.tabs.widget(i)
-            for r in range(table.rowCount()):
-                rowid = table.item(r, 0).data(Qt.ItemDataRole.UserRole)
-                rate_item = table.item(r, m['bill_rate'])
-                g_idx = table.item(r, 0).data(Qt.ItemDataRole.UserRole + 1)
-                
-                if rate_item and rate_item.text() == d_rate_str and rate_item.foreground().color().name().lower() == const.COLOR_GRAY_TEXT.name().lower():
-                    rate_item.setText("")
-                    rate_item.setForeground(Qt.GlobalColor.black)
-                    rate_updates.append((rowid, ""))
-                    if g_idx is not None: self.logic.clear_cell_formatting(self.pboq_file_selector.currentData(), g_idx, m['bill_rate'])
-                    if m['bill_amount'] >= 0:
-                        amt_item = table.item(r, m['bill_amount'])
-                        if amt_item: 
-                            amt_item.setText("")
-                            amt_item.setForeground(Qt.GlobalColor.black)
-                        amt_updates.append((rowid, ""))
-                        if g_idx is not None: self.logic.clear_cell_formatting(self.pboq_file_selector.currentData(), g_idx, m['bill_amount'])
+        file_path = self.pboq_file_selector.currentData()
+        for col in (m['bill_rate'], m['bill_amount']):
+            cleared = self._delta_format_rows(deltas, col, cleared=True)
+            if cleared: self.logic.clear_batch_cell_formatting(file_path, col, cleared)
 
         if rate_updates:
             self._persist_updates(m['bill_rate'], rate_updates)
@@ -2264,18 +2486,9 @@ class PBOQDialog(QDialog):
             if not silent: QMessageBox.warning(self, "Mapping Required", "Map Qty, Bill Rate, and Bill Amount columns.")
             return
 
-        total_updates = []
-        for i in range(self.tabs.count()):
-            table = self.tabs.widget(i)
-            # Check all rows
-            for r in range(table.rowCount()):
-                item0 = table.item(r, 0)
-                if not item0: continue
-                rowid = item0.data(Qt.ItemDataRole.UserRole)
-                # This uses the core rounding logic (Rate:2, Qty:4)
-                update = self._recalculate_row_extension(table, r, rowid, batch_mode=True)
-                if update:
-                    total_updates.append(update)
+        # This uses the core rounding logic (Rate:2, Qty:4)
+        deltas = self._render_deltas(self._document().recalculate())
+        total_updates = self._delta_updates(deltas, m['bill_amount'])
 
         if total_updates:
             self._persist_updates(m['bill_amount'], total_updates)
@@ -2284,6 +2497,7 @@ class PBOQDialog(QDialog):
             if not silent: QMessageBox.information(self, "Recalculation Complete", "All Bill Amount calculations are already accurate.")
 
     def _clear_bill_rates(self):
+        self._load_all_sheets()
         m = self.tools_pane.get_mappings()
         d_rate_str = "{:,.2f}".format(self.tools_pane.dummy_rate_spin.value())
         updates = []
@@ -2312,59 +2526,15 @@ class PBOQDialog(QDialog):
             search_desc = self.tools_pane.collect_desc_cb.isChecked()
             search_amt = self.tools_pane.collect_amount_cb.isChecked()
             
-            updates = []
-            
-            for i in range(self.tabs.count()):
-                t = self.tabs.widget(i)
-                if not isinstance(t, PBOQTable): continue
-                
-                cur_sum = 0.0
-                for r in range(t.rowCount()):
-                    item_desc = t.item(r, m['desc'])
-                    item_amt = t.item(r, m['bill_amount'])
-                    rowid = t.item(r, 0).data(Qt.ItemDataRole.UserRole)
-                    
-                    # Check for matches based on user selection
-                    match = False
-                    if search_desc and item_desc and kw and kw in item_desc.text().lower():
-                        match = True
-                    if not match and search_amt and item_amt and kw and kw in item_amt.text().lower():
-                        match = True
-                        
-                    if match:
-                        if not item_amt:
-                            item_amt = QTableWidgetItem()
-                            t.setItem(r, m['bill_amount'], item_amt)
-                        
-                        f_sum = "{:,.2f}".format(cur_sum)
-                        item_amt.setText(f_sum)
-                        item_amt.setBackground(const.COLOR_COLLECT)
-                        item_amt.setForeground(const.COLOR_GRAY_TEXT)
-                        updates.append((rowid, f_sum))
-                        cur_sum = 0.0
-                    else:
-                        # Add to sum if not a logic cell
-                        if item_amt and item_amt.text().strip():
-                            bg_hex = item_amt.background().color().name().lower()
-                            is_logic = bg_hex == const.COLOR_COLLECT.name().lower()
-                            
-                            if not is_logic:
-                                try: 
-                                    val = float(item_amt.text().replace(',', ''))
-                                    cur_sum += val
-                                except ValueError: pass
+            # Auto-collect (force_refresh) only rewrites the collection cells whose section changed;
+            # sections live within one sheet, so sheets not opened yet keep their stored totals
+            deltas = self._render_deltas(self.collect_index.collect(
+                self._document(loaded_only=force_refresh), kw, search_desc, search_amt, full=not force_refresh))
+            updates = self._delta_updates(deltas, m['bill_amount'])
             
             if updates:
                 self._persist_updates(m['bill_amount'], updates)
-                fmt_updates = []
-                for rid, val in updates:
-                    if val == "": continue 
-                    item0 = self.rowid_to_item0.get(rid)
-                    if item0:
-                        g_idx = item0.data(Qt.ItemDataRole.UserRole + 1)
-                        if g_idx is not None:
-                            fmt_updates.append((g_idx, {'bg_color': const.COLOR_COLLECT.name(), 'font_color': const.COLOR_GRAY_TEXT.name()}))
-                
+                fmt_updates = self._delta_format_rows(deltas, m['bill_amount'])
                 if fmt_updates:
                     self.logic.persist_batch_cell_formatting(self.pboq_file_selector.currentData(), m['bill_amount'], fmt_updates)
             
@@ -2379,24 +2549,11 @@ class PBOQDialog(QDialog):
         
         self.is_updating_logic = True
         try:
-            updates = []
-            for i in range(self.tabs.count()):
-                t = self.tabs.widget(i)
-                if not isinstance(t, PBOQTable): continue
-                
-                for r in range(t.rowCount()):
-                    item_amt = t.item(r, m['bill_amount'])
-                    rowid = t.item(r, 0).data(Qt.ItemDataRole.UserRole)
-                    g_idx = item_amt.data(Qt.ItemDataRole.UserRole + 1) if item_amt else None
-                    
-                    if item_amt and item_amt.background().color().name().lower() == const.COLOR_COLLECT.name().lower():
-                        item_amt.setText("")
-                        def_color = t.get_column_default_color(m['bill_amount'])
-                        item_amt.setBackground(def_color if def_color else QBrush())
-                        item_amt.setForeground(Qt.GlobalColor.black)
-                        updates.append((rowid, ""))
-                        if g_idx is not None: 
-                            self.logic.clear_cell_formatting(self.pboq_file_selector.currentData(), g_idx, m['bill_amount'])
+            deltas = self._render_deltas(self._document().revert_collect())
+            updates = self._delta_updates(deltas, m['bill_amount'])
+            cleared = self._delta_format_rows(deltas, m['bill_amount'], cleared=True)
+            if cleared:
+                self.logic.clear_batch_cell_formatting(self.pboq_file_selector.currentData(), m['bill_amount'], cleared)
             
             if updates:
                 self._persist_updates(m['bill_amount'], updates)
@@ -2441,6 +2598,7 @@ class PBOQDialog(QDialog):
 
     def _clear_columns(self, col_indices, label, custom_prompt=None, is_subbee=False):
         """Generic helper to clear one or more columns across all sheets."""
+        self._load_all_sheets()
         if all(c < 0 for c in col_indices):
             QMessageBox.warning(self, "Clear", f"Please map the {label} columns first.")
             return
@@ -2458,8 +2616,7 @@ class PBOQDialog(QDialog):
         if is_subbee:
             try:
                 pboq_db_path = self.pboq_file_selector.itemData(self.pboq_file_selector.currentIndex())
-                import sqlite3
-                conn = sqlite3.connect(pboq_db_path)
+                conn = connect_bill(pboq_db_path)
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM subcontractor_quotes") # Wipe quotes
                 conn.commit()
@@ -2493,7 +2650,7 @@ class PBOQDialog(QDialog):
     def _export_to_excel(self):
         """Exports the currently selected PBOQ database to an Excel workbook."""
         from PyQt6.QtWidgets import QFileDialog
-        from pboq_export import PBOQExcelExporter
+        from export_jobs import ExportJob, ExportProgressDialog, pboq_export_task
         from logger import get_logger
         log = get_logger("pboq_viewer")
 
@@ -2516,8 +2673,8 @@ class PBOQDialog(QDialog):
             return
 
         log.info(f"User requested PBOQ export to: {output_path}")
-        exporter = PBOQExcelExporter(db_path, self.project_dir)
-        success, message = exporter.export(output_path)
+        job = ExportJob([pboq_export_task(db_path, self.project_dir, output_path)])
+        _, success, message = ExportProgressDialog(job, self).run()[0]
 
         if success:
             log.info(f"PBOQ export succeeded: {message}")
@@ -2618,21 +2775,7 @@ class PBOQDialog(QDialog):
             self.price_pane.gross_rate_tool.price_sor_btn.blockSignals(False)
             return
 
-        # 2. Helper functions for robust matching
-        def normalize_desc(d):
-            if not d: return ""
-            return str(d).rsplit(':', 1)[-1].strip().lower()
-
-        def normalize_qty(q):
-            try:
-                # Remove commas and convert to float for comparison
-                clean = str(q).replace(',', '').strip()
-                if not clean: return "0.00"
-                return "{:.2f}".format(float(clean))
-            except (ValueError, TypeError):
-                return str(q).strip().lower()
-
-        # 3. Get Mappings
+        # 2. Get Mappings
         mapping = self.tools_pane.get_mappings()
         if mapping['desc'] < 0 or mapping['qty'] < 0 or mapping['rate'] < 0 or mapping['rate_code'] < 0:
             QMessageBox.warning(self, "Mapping Error", "Please ensure Description, Quantity, Gross Rate, and Rate Code columns are mapped in the Tools Pane first.")
@@ -2641,90 +2784,48 @@ class PBOQDialog(QDialog):
             self.price_pane.gross_rate_tool.price_sor_btn.blockSignals(False)
             return
 
-        # 4. Load SOR data into a lookup map
-        sor_lookup = {}
+        # 3. Load SOR data into a normalized lookup map
         try:
-            conn = sqlite3.connect(sor_path)
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(sor_items)")
-            cols = [info[1] for info in cursor.fetchall()]
-            
-            query = "SELECT Sheet, Ref, Description, Quantity, Unit"
-            query += ", GrossRate" if "GrossRate" in cols else ", NULL"
-            query += ", RateCode" if "RateCode" in cols else ", NULL"
-            query += " FROM sor_items"
-            
-            cursor.execute(query)
-            for row in cursor.fetchall():
-                sheet, ref, desc, qty, unit, gross, code = row
-                if not (gross or code): continue
-                
-                # Normalize key
-                key = (str(sheet).strip().lower(), 
-                       str(ref).strip().lower(), 
-                       normalize_desc(desc), 
-                       normalize_qty(qty), 
-                       str(unit).strip().lower())
-                sor_lookup[key] = (gross, code)
-            conn.close()
+            sor_lookup = load_sor_lookup(sor_path)
         except Exception as e:
             QMessageBox.critical(self, "SOR Error", f"Failed to load SOR database for cross-referencing:\n{e}")
             return
 
-        # 5. Iterate PBOQ tabs and price
-        priced_count = 0
+        # 4. Match PBOQ rows (sheet, ref, desc tail, qty, unit) on their persisted keys and price them
         pboq_db_path = self.pboq_file_selector.itemData(self.pboq_file_selector.currentIndex())
-        price_updates = []
+        row_keys = load_pboq_keys(pboq_db_path, self.db_columns, mapping)
+        doc = self._document()
+        deltas = self._render_deltas(doc.price_sor(sor_lookup, row_keys))
 
-        for i in range(self.tabs.count()):
-            sheet_name = self.tabs.tabText(i).strip().lower()
-            table = self.tabs.widget(i)
-            if not isinstance(table, PBOQTable): continue
-            
-            for r in range(table.rowCount()):
-                row_id_item = table.item(r, 0)
-                if not row_id_item: continue
-                row_id = row_id_item.data(Qt.ItemDataRole.UserRole)
-                
-                # Extract PBOQ values
-                p_ref = table.item(r, mapping['ref']).text().strip().lower() if mapping['ref'] >= 0 else ""
-                p_desc_full = table.item(r, mapping['desc']).text().strip()
-                p_qty_raw = table.item(r, mapping['qty']).text().strip()
-                p_unit = table.item(r, mapping['unit']).text().strip().lower() if mapping['unit'] >= 0 else ""
-                
-                p_desc_tail = normalize_desc(p_desc_full)
-                p_qty = normalize_qty(p_qty_raw)
-                
-                key = (sheet_name, p_ref, p_desc_tail, p_qty, p_unit)
-                
-                if key in sor_lookup:
-                    gross, code = sor_lookup[key]
-                    gross_item = table.item(r, mapping['rate'])
-                    code_item = table.item(r, mapping['rate_code'])
-                    
-                    # Store original values for revert if not already stored
-                    if not gross_item.data(Qt.ItemDataRole.UserRole + 10):
-                        gross_item.setData(Qt.ItemDataRole.UserRole + 11, gross_item.text())
-                        code_item.setData(Qt.ItemDataRole.UserRole + 11, code_item.text())
-                        
-                    gross_item.setText(str(gross) if gross else "")
-                    code_item.setText(str(code) if code else "")
-                    
-                    # Mark as SOR priced
-                    gross_item.setData(Qt.ItemDataRole.UserRole + 10, True)
-                    code_item.setData(Qt.ItemDataRole.UserRole + 10, True)
-                    
-                    # Highlight row (Light Green)
-                    for c in range(table.columnCount()):
-                        table.item(r, c).setBackground(QColor("#e8f5e9"))
-                        
-                    price_updates.append((row_id, gross, code))
-                    priced_count += 1
+        # Rows that almost matched, by the key component that failed
+        misses = near_misses(row_keys, sor_lookup)
+        miss_note = f"\n\n{len(misses)} near match(es) were not priced: {summarize_misses(misses)}." if misses else ""
+
+        # 4b. Offer description-similarity matches for the rows strict matching left unpriced
+        try:
+            fuzzy = doc.fuzzy_matches(build_sor_fuzzy_index(sor_path), FUZZY_MIN_SCORE)
+        except Exception as e:
+            print(f"Error building fuzzy SOR index: {e}")
+            fuzzy = {}
+        if fuzzy:
+            mean_score = sum(score for _, score in fuzzy.values()) / len(fuzzy)
+            reply = QMessageBox.question(self, "Similar Descriptions",
+                f"{len(fuzzy)} unpriced item(s) closely match SOR descriptions "
+                f"(average confidence {mean_score:.0%}, minimum {FUZZY_MIN_SCORE:.0%}).\n\n"
+                "Price these items from their closest SOR match as well?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if reply == QMessageBox.StandardButton.Yes:
+                deltas += self._render_deltas(doc.price_rows({rid: hit for rid, (hit, _) in fuzzy.items()}))
+                miss_note = f"\n\n{len(fuzzy)} of these were matched by description similarity." + miss_note
+
+        codes = {d.rowid: d.db_value for d in deltas if d.col == mapping['rate_code']}
+        price_updates = [(d.rowid, d.db_value, codes.get(d.rowid)) for d in deltas if d.col == mapping['rate']]
+        priced_count = len(price_updates)
 
-        # 6. Persist to PBOQ DB
+        # 5. Persist to PBOQ DB
         if price_updates:
             try:
-                conn = sqlite3.connect(pboq_db_path)
+                conn = connect_bill(pboq_db_path)
                 cursor = conn.cursor()
                 if mapping['rate'] < 0 or mapping['rate_code'] < 0:
                     conn.close()
@@ -2732,20 +2833,19 @@ class PBOQDialog(QDialog):
                 gross_col_name = self.db_columns[mapping['rate'] + 1]
                 code_col_name = self.db_columns[mapping['rate_code'] + 1]
                 
-                for row_id, gross, code in price_updates:
-                    cursor.execute(f'UPDATE pboq_items SET "{gross_col_name}" = ?, "{code_col_name}" = ? WHERE rowid = ?',
-                                 (gross, code, row_id))
+                cursor.executemany(f'UPDATE pboq_items SET "{gross_col_name}" = ?, "{code_col_name}" = ? WHERE rowid = ?',
+                                   [(gross, code, row_id) for row_id, gross, code in price_updates])
                 conn.commit()
                 conn.close()
             except Exception as e:
                  QMessageBox.critical(self, "DB Error", f"Prices were applied to UI but failed to persist to project database:\n{e}")
 
         if priced_count > 0:
-            QMessageBox.information(self, "Pricing Successful", f"Found and applied matching rates for {priced_count} items using the project SOR.")
+            QMessageBox.information(self, "Pricing Successful", f"Found and applied matching rates for {priced_count} items using the project SOR.{miss_note}")
             # Automate Link to Bill Rate for the entire sheet to skip manual process
             self._run_link_bill_to_rate_logic()
         else:
-            QMessageBox.information(self, "No Matches", "No matching items were found in the SOR for the current PBOQ view using strict validation.\n\nTips:\n- Ensure the 'Sheet' names in SOR match the PBOQ tab names.\n- Ensure Quantity values are identical (including decimal precision).")
+            QMessageBox.information(self, "No Matches", f"No matching items were found in the SOR for the current PBOQ view using strict validation.{miss_note}\n\nTips:\n- Ensure the 'Sheet' names in SOR match the PBOQ tab names.\n- Ensure Quantity values are identical (including decimal precision).")
             # Reset button state
             self.price_pane.gross_rate_tool.price_sor_btn.blockSignals(True)
             self.price_pane.gross_rate_tool.price_sor_btn.setText("Price with SOR")
@@ -2753,80 +2853,124 @@ class PBOQDialog(QDialog):
 
         self._update_stats()
 
-    def _price_by_description(self, description_mapping):
+    def price_by_description(self, description_mapping, min_score=FUZZY_MIN_SCORE):
         """
-        Prices items in the PBOQ where the description matches one in description_mapping.
+        Prices items in the PBOQ where the description matches one in description_mapping
+        (the Rate Manager's "price open windows"); one undoable step.
         description_mapping: {desc.lower().strip(): (rate_str, code_str)}
+        Unpriced items without an exact match may take the closest description scoring at
+        least min_score (None disables the similarity fallback); those are only applied
+        after the user confirms them. Returns (items priced, of which by similarity).
         """
+        self._load_all_sheets()
+        exact, fuzzy = self._match_descriptions(description_mapping, min_score)
+        if fuzzy:
+            mean_score = sum(score for _, score in fuzzy.values()) / len(fuzzy)
+            reply = QMessageBox.question(self, "Similar Descriptions",
+                f"{self.windowTitle()}: {len(fuzzy)} unpriced item(s) closely match known descriptions "
+                f"(average confidence {mean_score:.0%}, minimum {min_score:.0%}).\n\n"
+                "Price these items from their closest match as well?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes: fuzzy = {}
+        hits = {**exact, **{cell: hit for cell, (hit, _) in fuzzy.items()}}
+        if not hits: return 0, 0
+        count = self._run_journaled("Price by Description", self._apply_description_prices, hits)
+        return count, len(fuzzy)
+
+    def _price_by_description(self, description_mapping, min_score=None):
+        """Prices description matches without asking and outside the undo journal;
+        similarity matches only when min_score is given. Returns the items priced."""
+        self._load_all_sheets()
+        exact, fuzzy = self._match_descriptions(description_mapping, min_score)
+        hits = {**exact, **{cell: hit for cell, (hit, _) in fuzzy.items()}}
+        return self._apply_description_prices(hits) if hits else 0
+
+    def _match_descriptions(self, description_mapping, min_score):
+        """({(table, row): hit} of exact description matches,
+        {(table, row): (hit, score)} of similarity matches for unpriced rows)."""
         m = self.tools_pane.get_mappings()
-        rate_col = m.get('rate', -1)
-        code_col = m.get('rate_code', -1)
-        desc_col = m.get('desc', -1)
-        
-        if desc_col < 0 or rate_col < 0 or code_col < 0:
-            return 0
+        rate_col, desc_col, unit_col = m.get('rate', -1), m.get('desc', -1), m.get('unit', -1)
+        exact, fuzzy = {}, {}
+        if desc_col < 0 or rate_col < 0 or m.get('rate_code', -1) < 0:
+            return exact, fuzzy
             
-        updated_count = 0
-        
-        # We'll group updates by sheet to avoid too many UI refreshes if possible
-        # However, _persist_updates handles batching if we call it correctly.
+        fuzzy_index = None
+        if min_score is not None and description_mapping:
+            fuzzy_index = FuzzyIndex()
+            for known_desc, hit in description_mapping.items():
+                fuzzy_index.add(known_desc, hit)
         
         for i in range(self.tabs.count()):
             table = self.tabs.widget(i)
             if not isinstance(table, PBOQTable): continue
-            
-            sheet_updates_rate = []
-            sheet_updates_code = []
-            
             for r in range(table.rowCount()):
                 desc_item = table.item(r, desc_col)
                 if not desc_item: continue
                 
                 desc = desc_item.text().strip().lower()
-                if desc in description_mapping:
-                    rate, code = description_mapping[desc]
-                    rowid = table.item(r, 0).data(Qt.ItemDataRole.UserRole)
-                    
-                    # Update UI directly for immediate feedback
-                    it_rate = table.item(r, rate_col)
-                    if not it_rate: 
-                        it_rate = QTableWidgetItem()
-                        table.setItem(r, rate_col, it_rate)
-                    it_rate.setText(rate)
-                    it_rate.setBackground(const.COL_COLOR_GREEN)
-                    it_rate.setForeground(const.COLOR_GRAY_TEXT)
-                    
-                    it_code = table.item(r, code_col)
-                    if not it_code:
-                        it_code = QTableWidgetItem()
-                        table.setItem(r, code_col, it_code)
-                    it_code.setText(code)
-                    
-                    # Highlight row (Light Green) as feedback
-                    for c in range(table.columnCount()):
-                        item = table.item(r, c)
-                        if item:
-                            item.setBackground(QColor("#e8f5e9"))
+                hit = description_mapping.get(desc)
+                if hit is not None:
+                    exact[(table, r)] = hit
+                elif fuzzy_index is not None and desc:
+                    rate_item = table.item(r, rate_col)
+                    if not (rate_item and rate_item.text().strip()):
+                        unit_item = table.item(r, unit_col) if unit_col >= 0 else None
+                        best = fuzzy_index.best_match(desc, unit=unit_item.text() if unit_item else "")
+                        if best and best[1] >= min_score:
+                            fuzzy[(table, r)] = best
+        return exact, fuzzy
+
+    def _apply_description_prices(self, hits):
+        """Writes {(table, row): (rate, code)} into the Gross Rate and Rate Code columns,
+        then links the Bill Rate; returns the number of items priced."""
+        m = self.tools_pane.get_mappings()
+        rate_col, code_col = m.get('rate', -1), m.get('rate_code', -1)
+        
+        # Updates are persisted per sheet
+        by_table = {}
+        for (table, r), hit in hits.items():
+            by_table.setdefault(table, []).append((r, hit))
+        for table, rows in by_table.items():
+            sheet_updates_rate = []
+            sheet_updates_code = []
+            for r, (rate, code) in sorted(rows, key=lambda x: x[0]):
+                rowid = table.item(r, 0).data(Qt.ItemDataRole.UserRole)
+                
+                # Update UI directly for immediate feedback
+                it_rate = table.item(r, rate_col)
+                if not it_rate: 
+                    it_rate = QTableWidgetItem()
+                    table.setItem(r, rate_col, it_rate)
+                it_rate.setText(rate)
+                it_rate.setBackground(const.COL_COLOR_GREEN)
+                it_rate.setForeground(const.COLOR_GRAY_TEXT)
+                
+                it_code = table.item(r, code_col)
+                if not it_code:
+                    it_code = QTableWidgetItem()
+                    table.setItem(r, code_col, it_code)
+                it_code.setText(code)
+                
+                # Highlight row (Light Green) as feedback
+                for c in range(table.columnCount()):
+                    item = table.item(r, c)
+                    if item:
+                        item.setBackground(QColor("#e8f5e9"))
 
-                    sheet_updates_rate.append((rowid, rate))
-                    sheet_updates_code.append((rowid, code))
-                    updated_count += 1
+                sheet_updates_rate.append((rowid, rate))
+                sheet_updates_code.append((rowid, code))
             
-            # Persist for this sheet
-            if sheet_updates_rate:
-                self._persist_updates(rate_col, sheet_updates_rate)
-            if sheet_updates_code:
-                self._persist_updates(code_col, sheet_updates_code)
+            self._persist_updates(rate_col, sheet_updates_rate)
+            self._persist_updates(code_col, sheet_updates_code)
 
-        if updated_count > 0:
-            self._update_stats()
-            # Try to auto-link to bill rate to complete the pricing flow
-            self._run_link_bill_to_rate_logic()
-            
-        return updated_count
+        self._update_stats()
+        # Try to auto-link to bill rate to complete the pricing flow
+        self._run_link_bill_to_rate_logic()
+        return len(hits)
 
     def _revert_sor_pricing(self):
         """Reverts Gross Rate and Rate Code to their original state before SOR pricing."""
+        self._load_all_sheets()
         pboq_db_path = self.pboq_file_selector.itemData(self.pboq_file_selector.currentIndex())
         mapping = self.tools_pane.get_mappings()
         
@@ -2875,7 +3019,7 @@ class PBOQDialog(QDialog):
 
         if db_updates:
             try:
-                conn = sqlite3.connect(pboq_db_path)
+                conn = connect_bill(pboq_db_path)
                 cursor = conn.cursor()
                 gross_col_name = self.db_columns[mapping['gross_rate'] + 1]
                 code_col_name = self.db_columns[mapping['rate_code'] + 1]
@@ -2898,35 +3042,20 @@ class PBOQDialog(QDialog):
         m = self.tools_pane.get_mappings()
         price_type = self.price_pane.price_type_combo.currentText()
         
-        # We handle dynamic targeting for Plug Rate inside the loop
-        static_target_role = None
-        if price_type == "Prov Sum":
-            static_target_role = 'bill_amount'
-            source_col_key = 'prov_sum'
-        elif price_type == "PC Sum":
-            static_target_role = 'bill_amount'
-            source_col_key = 'pc_sum'
-        elif price_type == "Subcontractor Rate":
-            static_target_role = 'bill_rate'
-            source_col_key = 'sub_rate'
-        elif price_type == "Plug Rate":
-            source_col_key = 'plug_rate'
-        else: # Gross Rate
-            static_target_role = 'bill_rate'
-            source_col_key = 'rate'
+        # Source column per price type (Plug Rate targets are resolved per row by the document)
+        source_col_key = LINK_SOURCES.get(price_type, LINK_SOURCES["Gross Rate"])[0]
 
         if m[source_col_key] < 0:
             QMessageBox.warning(self, "Mapping Error", f"Please map the '{price_type}' source column first.")
             return
 
         db_path = self.pboq_file_selector.currentData()
-        source_color = PBOQTable().get_role_color(source_col_key) or const.COLOR_LINK_CYAN
 
         # Fetch subbee markup map if needed
         db_markup_map = {}
         if price_type == "Subcontractor Rate":
              try:
-                conn = sqlite3.connect(db_path)
+                conn = connect_bill(db_path)
                 cursor = conn.cursor()
                 cursor.execute("SELECT rowid, SubbeeMarkup FROM pboq_items WHERE SubbeeMarkup IS NOT NULL AND SubbeeMarkup != ''")
                 for rid, m_str in cursor.fetchall():
@@ -2937,87 +3066,13 @@ class PBOQDialog(QDialog):
                 conn.close()
              except: pass
 
-        # We'll use two sets of updates since targets can vary by row for Plug Rate
-        rate_updates, rate_fmt = [], []
-        amt_updates, amt_fmt = [], []
-        
-        processed_count = 0
-
-        for i in range(self.tabs.count()):
-            table = self.tabs.widget(i)
-            if not isinstance(table, PBOQTable): continue
-            
-            for r in range(table.rowCount()):
-                row_id_item = table.item(r, 0)
-                if not row_id_item: continue
-                row_id = row_id_item.data(Qt.ItemDataRole.UserRole)
-                
-                source_item = table.item(r, m[source_col_key])
-                if not source_item or not source_item.text().strip(): continue
-                
-                # If PC Sum, only link if it has the PC- prefix
-                if price_type == "PC Sum":
-                    code_col = m.get('pc_sum_code', -1)
-                    if code_col < 0:
-                        continue # Cannot verify without mapping
-                    code_item = table.item(r, code_col)
-                    code_text = code_item.text().strip().upper() if code_item else ""
-                    if not code_text.startswith("PC-"):
-                        continue
-                
-                # Determine Target Role for this row
-                target_role = static_target_role
-                if price_type == "Plug Rate":
-                    qty_item = table.item(r, m['qty']) if m['qty'] >= 0 else None
-                    if not qty_item or not qty_item.text().strip():
-                        target_role = 'bill_amount'
-                    else:
-                        try:
-                            if float(qty_item.text().replace(',','')) == 0:
-                                target_role = 'bill_amount'
-                            else:
-                                target_role = 'bill_rate'
-                        except: target_role = 'bill_rate'
-
-                target_col = m.get(target_role, -1)
-                if target_col < 0: continue
-
-                val_str = source_item.text().strip()
-                active_val_str = val_str
-
-                try:
-                    # Always treat linked rates as 2-decimal rounded figures to ensure 
-                    # software math matches Excel physical math.
-                    r_val = float(val_str.replace(',', ''))
-                    
-                    if price_type == "Subcontractor Rate":
-                        effective_markup = db_markup_map.get(row_id, 0.0)
-                        if effective_markup != 0:
-                            r_val = r_val * (1 + (effective_markup / 100.0))
-                    
-                    active_val_str = "{:,.2f}".format(r_val)
-                except: pass
-
-                # Update UI
-                item = table.item(r, target_col)
-                if not item:
-                    item = QTableWidgetItem()
-                    table.setItem(r, target_col, item)
-                item.setText(active_val_str)
-                item.setBackground(source_color)
-                item.setForeground(const.COLOR_GRAY_TEXT)
-                
-                # Buffer for Persistence
-                fmt_info = (row_id_item.data(Qt.ItemDataRole.UserRole + 1), {'bg_color': source_color.name(), 'font_color': const.COLOR_GRAY_TEXT.name()})
-                if target_role == 'bill_rate':
-                    rate_updates.append((row_id, active_val_str))
-                    rate_fmt.append(fmt_info)
-                else:
-                    amt_updates.append((row_id, active_val_str))
-                    amt_fmt.append(fmt_info)
-                
-                # We skip inline recalculation here because _persist_updates handles it natively in batch mode.
-                processed_count += 1
+        # Targets can vary by row for Plug Rate, so rate and amount updates are split by column
+        deltas = self._render_deltas(self._document().link_bill_to_rate(price_type, db_markup_map))
+        rate_updates = self._delta_updates(deltas, m['bill_rate'])
+        rate_fmt = self._delta_format_rows(deltas, m['bill_rate'])
+        amt_updates = self._delta_updates(deltas, m['bill_amount'])
+        amt_fmt = self._delta_format_rows(deltas, m['bill_amount'])
+        processed_count = len(deltas)
 
         # Persistence
         if rate_updates:
@@ -3032,6 +3087,8 @@ class PBOQDialog(QDialog):
         
         self._update_stats()
     def closeEvent(self, event):
+        self._cancel_sheet_loads()
+        self._close_mirror()
         # Ensure the tools dock is hidden when the window is closed
         try:
             if hasattr(self, 'tools_dock') and self.tools_dock:
@@ -3051,6 +3108,51 @@ class PBOQDialog(QDialog):
             except RuntimeError:
                 pass
 
+    # --- In-Memory Editing ---
+
+    def _mirror_enabled(self):
+        """Opt-in application setting: edit the open bill in memory, written back on a timer."""
+        db_manager = getattr(self.main_window, 'db_manager', None)
+        return bool(db_manager) and db_manager.get_setting('pboq_memory_mirror', '0') == '1'
+
+    def _open_mirror(self, file_path):
+        if not file_path or not os.path.exists(file_path) or not self._mirror_enabled(): return
+        try:
+            self.mirror = PBOQMirror.open(file_path)
+        except (OSError, sqlite3.Error) as e:
+            # The bill still opens, edited on disk as usual
+            print(f"In-memory editing unavailable for {file_path}: {e}")
+            return
+        self._mirror_watch.start()
+        if self.mirror.recovered:
+            QMessageBox.information(self, "Edits Recovered",
+                                    "Unsaved edits from the last session were restored from the recovery journal.")
+
+    def _check_mirror_conflict(self):
+        """Warns once when the bill file was changed on disk while it is edited in memory."""
+        if not self.mirror or not self.mirror.conflict: return
+        self._mirror_watch.stop()
+        QMessageBox.warning(self, "Bill Changed on Disk",
+                            f"{os.path.basename(self.mirror.db_path)} was saved by another program or user while "
+                            "you were editing it in memory. Your edits are no longer written to the file, so "
+                            "neither set of changes is lost; they are kept in the recovery journal. Close the "
+                            "bill and reconcile the two versions.")
+
+    def _close_mirror(self):
+        """Writes the open bill's mirror back to disk and releases it."""
+        if not self.mirror: return
+        self._mirror_watch.stop()
+        mirror, self.mirror = self.mirror, None
+        saved = mirror.close()
+        if mirror.conflict and mirror.rescue_path:
+            QMessageBox.warning(self, "Edits Kept Aside",
+                                f"{os.path.basename(mirror.db_path)} was changed on disk while you edited it in "
+                                f"memory, so it was not overwritten. Your edits are kept in:\n{mirror.rescue_path}")
+        elif not saved:
+            QMessageBox.warning(self, "Save Pending",
+                                f"{os.path.basename(mirror.db_path)} could not be written back. Your edits are kept "
+                                "in the recovery journal and restored the next time the bill is opened.")
+
     def _get_project_db_path(self):
         """Locates the primary project database file (e.g. Two.db)."""
         pdb_dir = os.path.join(self.project_dir, "Project Database")
@@ -3182,7 +3284,7 @@ class PBOQDialog(QDialog):
         file_path = self.pboq_file_selector.currentData()
         existing_codes = []
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             cursor.execute("SELECT SubbeeCode FROM pboq_items WHERE SubbeeCode LIKE ?", (f"{sr_prefix}%",))
             existing_codes = [r[0] for r in cursor.fetchall() if r[0]]
@@ -3229,7 +3331,7 @@ class PBOQDialog(QDialog):
 
         # Update Database (Both Logical and Physical)
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             # Logical
             cursor.execute("UPDATE pboq_items SET SubbeeCategory = ?, SubbeeCode = ? WHERE rowid = ?", (new_cat, new_code, rowid))
@@ -3272,6 +3374,7 @@ class PBOQDialog(QDialog):
 
     def get_package_items(self, pkg):
         """Called by PackageAdjudicatorDialog to get BOQ items for a specific package."""
+        self._load_all_sheets()
         m = self.tools_pane.get_mappings()
         pkg_col = m.get('sub_package', -1)
         ref_col = m.get('ref', -1)
@@ -3311,6 +3414,7 @@ class PBOQDialog(QDialog):
         Extracts the entire PBOQ structure for 'Filtered Full BOQ' Excel export.
         Returns a list of dicts for ALL rows. Each dict includes 'is_target_pkg'.
         """
+        self._load_all_sheets()
         m = self.tools_pane.get_mappings()
         pkg_col = m.get('sub_package', -1)
         ref_col = m.get('ref', -1)
@@ -3351,6 +3455,7 @@ class PBOQDialog(QDialog):
 
     def apply_winning_subcontractor(self, pkg, winner_name, winning_rates):
         """Called by PackageAdjudicatorDialog to apply chosen rates and generate SR- codes."""
+        self._load_all_sheets()
         m = self.tools_pane.get_mappings()
         file_path = self.pboq_file_selector.currentData()
         
@@ -3378,7 +3483,7 @@ class PBOQDialog(QDialog):
         # 3. Code Generation Logic
         existing_codes = []
         try:
-            conn = sqlite3.connect(file_path)
+            conn = connect_bill(file_path)
             cursor = conn.cursor()
             cursor.execute("SELECT SubbeeCode FROM pboq_items WHERE SubbeeCode LIKE ?", (f"{sr_prefix}%",))
             existing_codes = [r[0] for r in cursor.fetchall() if r[0]]
@@ -3487,7 +3592,7 @@ class PBOQDialog(QDialog):
         # 5. Persist to Database
         if db_updates:
             try:
-                conn = sqlite3.connect(file_path)
+                conn = connect_bill(file_path)
                 cursor = conn.cursor()
                 for up in db_updates:
                     # Sync logical columns
@@ -3569,6 +3674,15 @@ class PBOQDialog(QDialog):
         dialog.dataChanged.connect(lambda: self._load_pboq_db(self.pboq_file_selector.currentIndex()))
         dialog.exec()
 
+    def _open_branches(self):
+        """Open the snapshots and what-if branches of the current bill."""
+        file_path = self.pboq_file_selector.currentData()
+        if not file_path or not self.db_columns: return
+        dialog = BranchesDialog(file_path, self.db_columns, self.tools_pane.get_mappings(), self.journal, self)
+        dialog.billChanged.connect(lambda: self._load_pboq_db(self.pboq_file_selector.currentIndex()))
+        dialog.exec()
+        self._update_undo_buttons()
+
     def keyPressEvent(self, event):
         """Allows ESC key to cancel specific modes like PC Selection."""
         if event.key() == Qt.Key.Key_Escape and self._pc_selection_mode:
@@ -3584,6 +3698,7 @@ class PBOQDialog(QDialog):
 
     def _run_update_pc_calculations(self):
         """Updates all Profit and Attendance items in the project based on current tool percentages."""
+        self._load_all_sheets()
         m = self.tools_pane.get_mappings()
         pc_sum_col = m.get('pc_sum', -1)
         pc_code_col = m.get('pc_sum_code', -1)
@@ -3715,6 +3830,7 @@ class PBOQDialog(QDialog):
 
     def _run_update_daywork_calculations(self):
         """Updates all Daywork items in the project based on current tool percentages."""
+        self._load_all_sheets()
         m = self.tools_pane.get_mappings()
         dw_sum_col = m.get('daywork', -1)
         dw_code_col = m.get('daywork_code', -1)
@@ -3839,8 +3955,7 @@ class PBOQDialog(QDialog):
         file_path = self.pboq_file_selector.currentData()
         if not file_path: return
         
-        item0 = table.item(row, 0)
-        current_state = item0.data(Qt.ItemDataRole.UserRole + 2) == 1
+        current_state = table.item(row, 0).data(Qt.ItemDataRole.UserRole) in self.flags
         
         # Handle multiple selection
         selected_indexes = table.selectedIndexes()
@@ -3853,11 +3968,13 @@ class PBOQDialog(QDialog):
             rows_to_toggle.append((r, rid))
             
         target_state = 0 if current_state else 1
-        updates = [(rid, target_state) for r, rid in rows_to_toggle]
         
-        success = self.logic.persist_batch_named_updates(file_path, "IsFlagged", updates)
+        # All selected rows are written in one transaction
+        success = write_flags(file_path, [rid for r, rid in rows_to_toggle], target_state)
         if success:
+            sheet_name = self.tabs.tabText(self.tabs.indexOf(table))
             for r, rid in rows_to_toggle:
+                self.flags.set(sheet_name, rid, target_state)
                 it0 = table.item(r, 0)
                 it0.setData(Qt.ItemDataRole.UserRole + 2, target_state)
                 
@@ -3874,52 +3991,88 @@ class PBOQDialog(QDialog):
             
             self._update_stats()
 
+    def _goto_next_flag(self):
+        self._goto_flag(backwards=False)
+
+    def _goto_previous_flag(self):
+        self._goto_flag(backwards=True)
+
+    def _goto_flag(self, backwards):
+        """Moves to the next (or previous) row flagged for review, across sheets."""
+        sheet_name, rowid = None, None
+        table = self.tabs.currentWidget()
+        if isinstance(table, PBOQTable):
+            sheet_name = self.tabs.tabText(self.tabs.currentIndex())
+            item0 = table.item(table.currentRow(), 0) if table.currentRow() >= 0 else None
+            if item0: rowid = item0.data(Qt.ItemDataRole.UserRole)
+        target = self.flags.following(sheet_name, rowid, backwards)
+        if target is None: return
+        
+        tab_idx = self._tab_of_sheet(target[0])
+        if tab_idx < 0: return
+        self._ensure_sheet_loaded(tab_idx)
+        item0 = self.rowid_to_item0.get(target[1])
+        if not item0: return
+        from PyQt6.QtWidgets import QTableWidget
+        self.tabs.setCurrentIndex(tab_idx)
+        table = self.tabs.widget(tab_idx)
+        table.setCurrentCell(item0.row(), 0)
+        table.scrollToItem(item0, QTableWidget.ScrollHint.PositionAtCenter)
+
+    def _tab_of_sheet(self, sheet_name):
+        for i in range(self.tabs.count()):
+            if self.tabs.tabText(i) == sheet_name and isinstance(self.tabs.widget(i), PBOQTable): return i
+        return -1
+
     def highlight_code(self, code):
         """Finds and highlights a specific code in the PBOQ across all sheets."""
         if not code or not str(code).strip(): return False
-        code = str(code).strip().lower()
-        
-        m = self.tools_pane.get_mappings()
-        # Potential columns that might contain the code
-        code_cols = [m.get('rate_code'), m.get('plug_code'), m.get('sub_code')]
-        code_cols = [c for c in code_cols if c >= 0]
+        hit = self._find_indexed_code(code)
+        if hit is None:
+            # Not in a code column (e.g. a description): search every cell
+            self._load_all_sheets()
+            hit = self._find_text(str(code).strip().lower())
+        if hit is None: return False
+        tab_idx, row = hit
+        table = self.tabs.widget(tab_idx)
         
         from PyQt6.QtWidgets import QTableWidget
-        from PyQt6.QtGui import QColor
-        
+        self.tabs.setCurrentIndex(tab_idx)
+        table.setCurrentCell(row, 0)
+        table.scrollToItem(table.item(row, 0), QTableWidget.ScrollHint.PositionAtCenter)
+        
+        # Highlight effect (temporary yellow)
+        for c in range(table.columnCount()):
+            item = table.item(row, c)
+            if item:
+                item.setBackground(QColor("#fff9c4")) # Light yellow
+        return True
+
+    def _find_indexed_code(self, code):
+        """(tab, row) of the first bill row carrying code in a code column, looked up in the
+        project's code index; only the sheet holding it is loaded."""
+        file_path = self.pboq_file_selector.currentData()
+        if not file_path or not self.project_dir: return None
+        uses = ProjectCodeIndex(self.project_dir).where_used(code, kind='pboq', path=file_path)
+        hits = ((self._tab_of_sheet(u.sheet), u.rowid) for u in uses)
+        for tab_idx, rowid in sorted(hit for hit in hits if hit[0] >= 0):
+            self._ensure_sheet_loaded(tab_idx)
+            item0 = self.rowid_to_item0.get(rowid)
+            if item0 and item0.tableWidget() is self.tabs.widget(tab_idx):
+                return tab_idx, item0.row()
+        return None
+
+    def _find_text(self, text):
+        """(tab, row) of the first row with a cell equal to text (lower-cased, stripped)."""
         for tab_idx in range(self.tabs.count()):
             table = self.tabs.widget(tab_idx)
             if not isinstance(table, PBOQTable): continue
-            
             for row in range(table.rowCount()):
-                found = False
-                # 1. Try mapped code columns first
-                for c in code_cols:
+                for c in range(table.columnCount()):
                     it = table.item(row, c)
-                    if it and it.text().strip().lower() == code:
-                        found = True
-                        break
-                
-                # 2. Fallback: Search ALL columns if not found in primary ones
-                if not found:
-                    for c in range(table.columnCount()):
-                        it = table.item(row, c)
-                        if it and it.text().strip().lower() == code:
-                            found = True
-                            break
-                            
-                if found:
-                    self.tabs.setCurrentIndex(tab_idx)
-                    table.setCurrentCell(row, 0)
-                    table.scrollToItem(table.item(row, 0), QTableWidget.ScrollHint.PositionAtCenter)
-                    
-                    # Highlight effect (temporary yellow)
-                    for c in range(table.columnCount()):
-                        item = table.item(row, c)
-                        if item:
-                            item.setBackground(QColor("#fff9c4")) # Light yellow
-                    return True
-        return False
+                    if it and it.text().strip().lower() == text:
+                        return tab_idx, row
+        return None
 
     def get_selected_row_data(self):
         """
@@ -0,0 +1,243 @@
+"""
+Project Code Index — Where every rate, plug and subcontractor code of a project is used.
+
+"Where used" lookups (the global rate sync's impact scan, Rate Manager's jump to a
+bill row, PBOQDialog.highlight_code) used to open every Priced BOQ and SOR file and
+compare codes column by column. The index keeps one small SQLite database per
+project, '<project>/Project Database/_code_index.sqlite', mapping each normalized
+code (TRIM + UPPER) to the (file, sheet, rowid, role) cells carrying it, so a lookup
+is a single indexed query.
+
+The index is kept current file by file: each indexed file is stamped with its size,
+mtime and SQLite change counter (or, while the bill is mirrored in memory, the
+mirror's data_version) together with the mtime of its saved PBOQ state. Every lookup
+first re-reads only the files whose stamp moved, in parallel, so edits made by any
+window, tool or process are picked up without write hooks. The file deliberately
+does not end in '.db': the Project Database folder's first '*.db' is the project
+database.
+
+Roles are the viewer's code mappings: 'rate_code', 'plug_code', 'sub_code',
+'prov_sum_code', 'pc_sum_code' and 'daywork_code' for Priced BOQs, and 'rate_code'
+for SOR items.
+
+Usage:
+    from project_code_index import ProjectCodeIndex
+    index = ProjectCodeIndex(project_dir)
+    for use in index.where_used("RC-001"):            # CodeUse(kind, path, sheet, rowid, role)
+        ...
+    index.counts("RC-001", kind='pboq')               # {bill path: rows carrying the code}
+    index.refresh(rebuild=True)                       # drop everything and re-read every file
+"""
+
+import os
+import json
+import sqlite3
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from logger import get_logger
+from pboq_batch import SMART_COLUMNS, load_state, resolve_mappings
+from pboq_loader import SHEET_NAME_SQL
+from pboq_mirror import connect_bill, mirror_of
+from rate_sync import same_file
+
+log = get_logger("project_code_index")
+
+INDEX_NAME = "_code_index.sqlite"
+SCHEMA_VERSION = 1
+
+# Mapping roles whose columns hold codes
+CODE_ROLES = tuple(role for role in SMART_COLUMNS if role.endswith('_code'))
+
+# Project folder -> kind of the '*.db' files in it
+SOURCES = (("Priced BOQs", 'pboq'), ("SOR", 'sor'))
+
+
+@dataclass(frozen=True)
+class CodeUse:
+    """One cell carrying a code: pboq_items / sor_items row of a project file."""
+    kind: str       # 'pboq' or 'sor'
+    path: str
+    sheet: str
+    rowid: int
+    role: str
+
+
+def normalize_code(code):
+    return str(code or "").strip().upper()
+
+
+def _quote(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _file_stamp(path):
+    """Size, mtime and SQLite change counter of a file; None when it is missing.
+
+    The change counter (database header bytes 24-27) moves on every commit in rollback
+    journal mode, so an edit is seen even where the share's mtime is coarse.
+    """
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            header = f.read(28)
+    except OSError:
+        return None
+    counter = int.from_bytes(header[24:28], "big") if len(header) == 28 else 0
+    return [st.st_size, st.st_mtime_ns, counter]
+
+
+# ─── Reading Files ───────────────────────────────────────────────────────────
+
+def _code_columns(db_columns, saved_mappings):
+    """(physical column, role) pairs holding codes: the viewer's resolved mappings plus
+    the columns saved in the bill's state (which the global rate sync writes through)."""
+    resolved = resolve_mappings(db_columns, saved_mappings)
+    pairs = []
+    for mappings in (resolved, saved_mappings or {}):
+        for role in CODE_ROLES:
+            db_idx = mappings.get(role, -1) + 1
+            if 0 < db_idx < len(db_columns) and (db_columns[db_idx], role) not in pairs:
+                pairs.append((db_columns[db_idx], role))
+    return pairs
+
+
+def read_codes(path, kind, project_dir):
+    """Every non-empty code of a file as (code, sheet, rowid, role) rows."""
+    conn = connect_bill(path) if kind == 'pboq' else sqlite3.connect(path)
+    try:
+        table = "pboq_items" if kind == 'pboq' else "sor_items"
+        db_columns = [info[1] for info in conn.execute(f"PRAGMA table_info({table})")]
+        if not db_columns: return []
+        if kind == 'pboq':
+            pairs = _code_columns(db_columns, load_state(project_dir, path).get('mappings'))
+            sheet_sql = SHEET_NAME_SQL
+        else:
+            pairs = [("RateCode", 'rate_code')] if "RateCode" in db_columns else []
+            sheet_sql = "CAST(Sheet AS TEXT)" if "Sheet" in db_columns else "''"
+        if not pairs: return []
+        selects = [f"SELECT TRIM(UPPER({_quote(col)})), {sheet_sql}, rowid, '{role}' FROM {table} "
+                   f"WHERE TRIM({_quote(col)}) <> ''" for col, role in pairs]
+        return list(dict.fromkeys(conn.execute(" UNION ALL ".join(selects)).fetchall()))
+    finally:
+        conn.close()
+
+
+# ─── Index ───────────────────────────────────────────────────────────────────
+
+class ProjectCodeIndex:
+    """The code index of one project folder."""
+
+    def __init__(self, project_dir):
+        self.project_dir = os.path.abspath(project_dir)
+        self.index_path = os.path.join(self.project_dir, "Project Database", INDEX_NAME)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=10)
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript(f"""
+                DROP TABLE IF EXISTS code_files;
+                DROP TABLE IF EXISTS code_uses;
+                CREATE TABLE code_files (path TEXT PRIMARY KEY, kind TEXT NOT NULL, stamp TEXT NOT NULL);
+                CREATE TABLE code_uses (code TEXT NOT NULL, path TEXT NOT NULL, sheet TEXT,
+                                        rowid_ INTEGER NOT NULL, role TEXT NOT NULL);
+                CREATE INDEX idx_code_uses_code ON code_uses(code);
+                CREATE INDEX idx_code_uses_path ON code_uses(path);
+                PRAGMA user_version = {SCHEMA_VERSION};
+            """)
+        return conn
+
+    def project_files(self):
+        """{path: kind} of every Priced BOQ and SOR file of the project."""
+        files = {}
+        for folder, kind in SOURCES:
+            folder_path = os.path.join(self.project_dir, folder)
+            if not os.path.isdir(folder_path): continue
+            for f in sorted(os.listdir(folder_path)):
+                if f.lower().endswith('.db'): files[os.path.join(folder_path, f)] = kind
+        return files
+
+    def _stamp(self, path, kind):
+        if kind == 'pboq':
+            mirror = mirror_of(path)
+            # A remapped code column changes which cells are codes
+            try: state = os.stat(os.path.join(self.project_dir, "PBOQ States", os.path.basename(path) + ".json")).st_mtime_ns
+            except OSError: state = None
+            if mirror is not None:
+                return json.dumps(['mirror', mirror.uri, mirror.version, state])
+            return json.dumps([_file_stamp(path), state])
+        return json.dumps([_file_stamp(path)])
+
+    def refresh(self, rebuild=False):
+        """Re-reads the files added or changed since they were indexed (every file with
+        rebuild=True) and forgets removed ones; returns the number of files re-read."""
+        files = self.project_files()
+        conn = self._connect()
+        try:
+            if rebuild:
+                conn.execute("DELETE FROM code_files")
+                conn.execute("DELETE FROM code_uses")
+            indexed = dict(conn.execute("SELECT path, stamp FROM code_files").fetchall())
+            stamps = {path: self._stamp(path, kind) for path, kind in files.items()}
+            stale = [path for path in files if indexed.get(path) != stamps[path]]
+            removed = [path for path in indexed if path not in files]
+            if not stale and not removed:
+                conn.commit()
+                return 0
+
+            # Files are independent and SQLite releases the GIL while a statement runs
+            read = {}
+            with ThreadPoolExecutor(max_workers=min(8, len(stale) or 1)) as pool:
+                futures = {pool.submit(read_codes, path, files[path], self.project_dir): path for path in stale}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        read[path] = future.result()
+                    except sqlite3.Error as e:
+                        log.warning(f"Could not index {os.path.basename(path)}: {e}")
+
+            for path in removed + list(read):
+                conn.execute("DELETE FROM code_uses WHERE path = ?", (path,))
+                conn.execute("DELETE FROM code_files WHERE path = ?", (path,))
+            for path, rows in read.items():
+                conn.executemany("INSERT INTO code_uses (code, sheet, rowid_, role, path) VALUES (?, ?, ?, ?, ?)",
+                                 [row + (path,) for row in rows])
+                conn.execute("INSERT INTO code_files (path, kind, stamp) VALUES (?, ?, ?)",
+                             (path, files[path], stamps[path]))
+            conn.commit()
+            if read or removed:
+                log.info(f"Code index: re-read {len(read)} file(s), dropped {len(removed)}")
+            return len(read)
+        finally:
+            conn.close()
+
+    def where_used(self, code, kind=None, path=None):
+        """Every cell carrying a code (case and surrounding spaces ignored), optionally of
+        one kind of file or one file, in file and row order."""
+        code = normalize_code(code)
+        if not code: return []
+        try:
+            self.refresh()
+        except (OSError, sqlite3.Error) as e:
+            log.warning(f"Code index of {self.project_dir} could not be refreshed: {e}")
+            return []
+        sql = ("SELECT f.kind, u.path, u.sheet, u.rowid_, u.role FROM code_uses u "
+               "JOIN code_files f ON f.path = u.path WHERE u.code = ?")
+        params = [code]
+        if kind:
+            sql += " AND f.kind = ?"
+            params.append(kind)
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql + " ORDER BY u.path, u.rowid_", params).fetchall()
+        finally:
+            conn.close()
+        return [CodeUse(*row) for row in rows if not path or same_file(row[1], path)]
+
+    def counts(self, code, kind=None):
+        """{path: number of rows carrying the code} in file order."""
+        rows = {}
+        for use in self.where_used(code, kind):
+            rows.setdefault(use.path, set()).add(use.rowid)
+        return {path: len(rowids) for path, rowids in rows.items()}
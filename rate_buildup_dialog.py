@@ -460,7 +460,10 @@ class RateBuildUpDialog(QDialog):
 
     def _trigger_global_sync(self):
         """Analyzes impact of the rate change across the whole project and asks user to sync."""
-        import os, sqlite3, json
+        import os
+        import sqlite3
+        from project_code_index import ProjectCodeIndex
+        from rate_sync import count_code_rows
         
         if not self.db_path or "Project Database" not in self.db_path:
             return # Only sync for project-specific rates
@@ -469,97 +472,22 @@ class RateBuildUpDialog(QDialog):
         rate_code = self.estimate.rate_code
         new_gross = self.estimate.calculate_totals()['grand_total']
         
-        sor_dir = os.path.join(project_dir, "SOR")
-        pboq_dir = os.path.join(project_dir, "Priced BOQs")
-        
-        impact = {'sor': [], 'pboq': []} # List of (path, count)
-        rate_code_clean = rate_code.strip().upper()
-
-        # 1. Analyze SOR impact
-        if os.path.exists(sor_dir):
-            for f in os.listdir(sor_dir):
-                if not f.lower().endswith('.db'): continue
-                path = os.path.join(sor_dir, f)
-                try:
-                    conn = sqlite3.connect(path)
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sor_items'")
-                    if cursor.fetchone():
-                        cursor.execute("PRAGMA table_info(sor_items)")
-                        cols = [i[1] for i in cursor.fetchall()]
-                        if "RateCode" in cols:
-                            # Use Trim/Upper for robust matching
-                            cursor.execute("SELECT COUNT(*) FROM sor_items WHERE TRIM(UPPER(RateCode)) = ?", (rate_code_clean,))
-                            count = cursor.fetchone()[0]
-                            if count > 0: impact['sor'].append((path, count))
-                    conn.close()
-                except: pass
-
-        # 2. Analyze PBOQ impact
-        if os.path.exists(pboq_dir):
-            for f in os.listdir(pboq_dir):
-                if not f.lower().endswith('.db'): continue
-                path = os.path.join(pboq_dir, f)
-                try:
-                    # Discover Mapping for this file to search accurately
-                    mapping = None
-                    if self.main_window:
-                        for sub in self.main_window.mdi_area.subWindowList():
-                            w = sub.widget()
-                            if getattr(w, '__class__', None).__name__ == 'PBOQDialog':
-                                if hasattr(w, 'pboq_file_selector') and w.pboq_file_selector.currentData() == path:
-                                    mapping = w.tools_pane.get_mappings()
-                                    break
-                    if not mapping:
-                        state_file = os.path.join(project_dir, "PBOQ States", f + ".json")
-                        if os.path.exists(state_file):
-                            try:
-                                with open(state_file, 'r') as sf:
-                                    st_json = json.load(sf)
-                                    mapping = st_json.get('mappings')
-                            except: pass
-
-                    conn = sqlite3.connect(path)
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pboq_items'")
-                    if cursor.fetchone():
-                        cursor.execute("PRAGMA table_info(pboq_items)")
-                        db_cols = [info[1] for info in cursor.fetchall()]
-                        
-                        found_count = 0
-                        # 1. Try Mapping Search
-                        if mapping and mapping.get('rate_code', -1) >= 0:
-                            db_idx = mapping['rate_code'] + 1
-                            if db_idx < len(db_cols):
-                                try:
-                                    cursor.execute(f'SELECT COUNT(*) FROM pboq_items WHERE TRIM(UPPER("{db_cols[db_idx]}")) = ?', (rate_code_clean,))
-                                    found_count = cursor.fetchone()[0]
-                                except: pass
-                        
-                        # 2. Try Logical 'RateCode' Column Search
-                        if found_count == 0 and "RateCode" in db_cols:
-                            try:
-                                cursor.execute('SELECT COUNT(*) FROM pboq_items WHERE TRIM(UPPER(RateCode)) = ?', (rate_code_clean,))
-                                found_count = cursor.fetchone()[0]
-                            except: pass
-                        
-                        # 3. Brute Force Search all columns as final fallback
-                        if found_count == 0:
-                            try:
-                                conditions = " OR ".join([f'TRIM(UPPER("{c}")) = ?' for c in db_cols])
-                                cursor.execute(f"SELECT COUNT(*) FROM pboq_items WHERE {conditions}", [rate_code_clean] * len(db_cols))
-                                found_count = cursor.fetchone()[0]
-                            except: pass
-                        
-                        if found_count > 0:
-                            impact['pboq'].append((path, found_count))
-                    conn.close()
-                except: pass
+        # SOR items and bill rows carrying the code, from the project's code index
+        index = ProjectCodeIndex(project_dir)
+        counts = {kind: index.counts(rate_code, kind) for kind in ('sor', 'pboq')}
+        # A bill holding the code only outside its code columns is still synced (sync_pboq_rate
+        # falls back to every column), so it is counted the same way
+        for path, kind in index.project_files().items():
+            if kind != 'pboq' or path in counts['pboq']: continue
+            try: found = count_code_rows(path, rate_code)
+            except sqlite3.Error: found = 0
+            if found: counts['pboq'][path] = found
+        impact = {kind: list(found.items()) for kind, found in counts.items()} # List of (path, count)
 
         if not impact['sor'] and not impact['pboq']:
             return
 
-        # 3. Present to user
+        # Present to user
         msg = f"<b>Rate Sync Notification</b><br><br>The rate <b>{rate_code}</b> has been updated.<br><br>"
         if impact['sor']:
             total_sor = sum(c for p, c in impact['sor'])
@@ -578,19 +506,15 @@ class RateBuildUpDialog(QDialog):
             self._perform_global_sync(project_dir, rate_code, new_gross, impact)
 
     def _perform_global_sync(self, project_dir, rate_code, new_gross, impact):
-        """Executes the actual database updates and UI refreshes."""
-        import sqlite3, json, os
-        new_gross_str = "{:,.2f}".format(new_gross)
-        rate_code_clean = rate_code.strip().upper()
+        """Executes the actual database updates and hands the written cells to open viewers."""
+        import json, os
+        from rate_sync import sync_sor_rate, sync_pboq_rate
 
+        deltas = []
         # 1. Update SOR Files
         for path, count in impact['sor']:
             try:
-                conn = sqlite3.connect(path)
-                cursor = conn.cursor()
-                cursor.execute("UPDATE sor_items SET GrossRate = ? WHERE TRIM(UPPER(RateCode)) = ?", (new_gross_str, rate_code_clean))
-                conn.commit()
-                conn.close()
+                deltas += sync_sor_rate(path, rate_code, new_gross)
             except: pass
 
         # 2. Update PBOQ Files
@@ -632,107 +556,24 @@ class RateBuildUpDialog(QDialog):
                         'rate_code': 7
                     }
 
-                conn = sqlite3.connect(path)
-                cursor = conn.cursor()
-                
-                # Fetch database columns to identify physical names (Column 0, Column 1, etc.)
-                cursor.execute("PRAGMA table_info(pboq_items)")
-                db_col_info = cursor.fetchall()
-                db_cols = [info[1] for info in db_col_info]
-                
-                # Find physical column for Rate Code search
-                code_db_col = None
-                if mappings.get('rate_code', -1) >= 0:
-                    db_idx = mappings['rate_code'] + 1
-                    if db_idx < len(db_cols):
-                        code_db_col = db_cols[db_idx]
-                
-                if not code_db_col and "RateCode" in db_cols:
-                    code_db_col = "RateCode"
-                
-                if db_cols:
-                    # Identify mappings for specific roles
-                    m_rate = mappings.get('bill_rate', -1)
-                    m_gross = mappings.get('rate', -1)
-                    m_code = mappings.get('rate_code', -1)
-                    m_amt = mappings.get('bill_amount', -1)
-                    m_qty = mappings.get('qty', -1)
-
-                    # Robust WHERE clause construction
-                    search_col = code_db_col if code_db_col else "RateCode"
-                    where_frag = f'TRIM(UPPER("{search_col}")) = ?'
-                    
-                    # Verify if specific column works; otherwise fallback to brute force
-                    cursor.execute(f'SELECT COUNT(*) FROM pboq_items WHERE {where_frag}', (rate_code_clean,))
-                    if cursor.fetchone()[0] == 0:
-                        where_frag = " OR ".join([f'TRIM(UPPER("{c}")) = ?' for c in db_cols])
-                        q_params = [rate_code_clean] * len(db_cols)
-                    else:
-                        q_params = [rate_code_clean]
-
-                    # 1. Update all mapped rate-related columns in a single pass if possible
-                    update_fields = []
-                    upd_params = []
-                    
-                    # Physical mapped columns
-                    for m_idx, val in [(m_rate, new_gross_str), (m_gross, new_gross_str), (m_code, rate_code)]:
-                        if m_idx >= 0:
-                            db_idx = m_idx + 1
-                            if db_idx < len(db_cols):
-                                update_fields.append(f'"{db_cols[db_idx]}" = ?')
-                                upd_params.append(val)
-                    
-                    # Always update logical helper columns too
-                    if "GrossRate" in db_cols:
-                        update_fields.append("GrossRate = ?")
-                        upd_params.append(new_gross_str)
-                    if "RateCode" in db_cols:
-                        update_fields.append("RateCode = ?")
-                        upd_params.append(rate_code)
-
-                    if update_fields:
-                        cursor.execute(f'UPDATE pboq_items SET {", ".join(update_fields)} WHERE {where_frag}', upd_params + q_params)
-
-                    # 2. Row-by-row recalculation of Bill Amount
-                    if m_amt >= 0 and m_qty >= 0:
-                        db_idx_amt, db_idx_qty = m_amt + 1, m_qty + 1
-                        if db_idx_amt < len(db_cols) and db_idx_qty < len(db_cols):
-                            a_col = db_cols[db_idx_amt]
-                            q_col = db_cols[db_idx_qty]
-                            cursor.execute(f'SELECT rowid, "{q_col}" FROM pboq_items WHERE {where_frag}', q_params)
-                            rows_to_recalc = cursor.fetchall()
-                            for rid, q_str in rows_to_recalc:
-                                try:
-                                    if q_str is None or str(q_str).strip() == "": continue
-                                    qv = float(str(q_str).replace(',', ''))
-                                    r_val_rounded = round(float(new_gross), 2)
-                                    q_val_rounded = round(float(qv), 4)
-                                    av = round(r_val_rounded * q_val_rounded, 2)
-                                    cursor.execute(f'UPDATE pboq_items SET "{a_col}" = ? WHERE rowid = ?', ("{:,.2f}".format(av), rid))
-                                except: pass
-                
-                conn.commit()
-                conn.close()
+                deltas += sync_pboq_rate(path, rate_code, new_gross, mappings)
             except Exception as e:
                 print(f"Error syncing PBOQ {path}: {e}")
                 pass
 
-        # 3. Refresh Viewers
+        # 3. Refresh Viewers: each applies only the cells of its own files
         if self.main_window:
             for sub in self.main_window.mdi_area.subWindowList():
                 w = sub.widget()
                 w_class = getattr(w, '__class__', None).__name__
                 
                 if w_class == 'SORDialog':
-                    if hasattr(w, '_load_selected_sor'): w._load_selected_sor()
+                    if hasattr(w, 'apply_sync_deltas'): w.apply_sync_deltas(deltas)
                 
                 if w_class == 'PBOQDialog':
                     # Check if it's the right project
                     if hasattr(w, 'project_dir') and os.path.abspath(w.project_dir) == os.path.abspath(project_dir):
-                        # Reload the current DB to show changes and refresh collections
-                        if hasattr(w, '_load_pboq_db'):
-                            idx = w.pboq_file_selector.currentIndex()
-                            w._load_pboq_db(idx)
+                        if hasattr(w, 'apply_sync_deltas'): w.apply_sync_deltas(deltas)
 
     def refresh_view(self):
         self.is_loading = True
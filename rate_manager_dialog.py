@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
 from PyQt6.QtGui import QAction
 from PyQt6.QtCore import Qt
 from database import DatabaseManager
+from pboq_mirror import connect_bill
 from rate_buildup_dialog import RateBuildUpDialog
 
 class NewRateDialog(QDialog):
@@ -141,7 +142,7 @@ class RateManagerDialog(QDialog):
                         mgr = DatabaseManager(db_path)
                         # Ensure background libraries have correct schema for syncing
                         try:
-                            conn = sqlite3.connect(db_path)
+                            conn = connect_bill(db_path)
                             PBOQLogic.ensure_schema(conn)
                             conn.close()
                         except: pass
@@ -334,26 +335,32 @@ class RateManagerDialog(QDialog):
             QMessageBox.warning(self, "Error", "Main window or MDI area not found.")
             return
 
-        updated_stats = [] # list of (window_title, count)
+        updated_stats = [] # list of (window_title, count, similarity matches)
         
         for sub in self.main_window.mdi_area.subWindowList():
             win = sub.widget()
             if not win: continue
             
             # Check if window has our custom pricing method
-            if hasattr(win, '_price_by_description'):
-                try:
-                    count = win._price_by_description(historical_mapping)
-                    if count > 0:
-                        updated_stats.append((win.windowTitle(), count))
-                except Exception as e:
-                    print(f"Error pricing window '{win.windowTitle()}': {e}")
+            try:
+                if hasattr(win, 'price_by_description'):
+                    # PBOQ: similarity matches are confirmed by the user and reported apart
+                    count, fuzzy_count = win.price_by_description(historical_mapping)
+                elif hasattr(win, '_price_by_description'):
+                    count, fuzzy_count = win._price_by_description(historical_mapping), 0
+                else:
+                    continue
+                if count > 0:
+                    updated_stats.append((win.windowTitle(), count, fuzzy_count))
+            except Exception as e:
+                print(f"Error pricing window '{win.windowTitle()}': {e}")
 
         # 3. Final Summary
         if updated_stats:
             msg = "Pricing complete!\n\n"
-            for title, count in updated_stats:
-                msg += f"- {title}: {count} items updated.\n"
+            for title, count, fuzzy_count in updated_stats:
+                msg += f"- {title}: {count} items updated"
+                msg += f" ({fuzzy_count} by description similarity).\n" if fuzzy_count else ".\n"
             QMessageBox.information(self, "Pricing Summary", msg)
         else:
             QMessageBox.information(self, "No Matches", "No matching descriptions found in any open SOR or PBOQ windows.")
@@ -720,71 +727,67 @@ class RateManagerDialog(QDialog):
             cursor = conn.cursor()
             
             # Ensure pboq_items table exists in project DB using standard schema
-            PBOQLogic.ensure_schema(conn)
+            _, db_columns = PBOQLogic.ensure_schema(conn)
 
-            
+            # 1. Update/Ensure estimates entries: existing records are read once, new codes
+            # inserted and changed descriptions/units written back in one pass each.
+            codes = list(dict.fromkeys(r.get('rate_code') for r in rates_to_bake))
+            est_records = {}
+            for i in range(0, len(codes), 500):
+                chunk = codes[i:i + 500]
+                cursor.execute(f"SELECT id, project_name, unit, rate_code FROM estimates "
+                               f"WHERE rate_code IN ({', '.join('?' * len(chunk))}) ORDER BY id DESC", chunk)
+                for eid, old_desc, old_unit, code in cursor.fetchall():
+                    est_records[code] = [eid, old_desc, old_unit]     # lowest id wins
+            new_estimates, changed = {}, set()
             for r in rates_to_bake:
                 code = r.get('rate_code')
                 desc = r.get('project_name', '')
                 unit = r.get('unit', '')
-                curr = r.get('currency', '')
-                rate = r.get('_rate_val', 0.0)
-                
-                # 1. Update/Ensure estimates entry
-                cursor.execute("SELECT id, project_name, unit FROM estimates WHERE rate_code = ?", (code,))
-                est_record = cursor.fetchone()
-                if not est_record:
-                    cursor.execute("""
-                        INSERT INTO estimates (project_name, rate_code, unit, currency, rate_type, grand_total, net_total, date_created)
-                        VALUES (?, ?, ?, ?, 'Plug Rate', 0.0, 0.0, ?)
-                    """, (desc, code, unit, curr, r.get('date_created', 'From PBOQ')))
-                else:
-                    eid, old_desc, old_unit = est_record
-                    if desc and (not old_desc or desc != old_desc):
-                        cursor.execute("UPDATE estimates SET project_name = ? WHERE id = ?", (desc, eid))
-                    if unit and (not old_unit or unit != old_unit):
-                        cursor.execute("UPDATE estimates SET unit = ? WHERE id = ?", (unit, eid))
-                
-                # 2. Update/Insert in pboq_items using standard logical columns.
-                # Search across all possible historical code columns to avoid duplicate rows.
-                cursor.execute("""
-                    SELECT rowid FROM pboq_items 
-                    WHERE PlugCode = ? OR SubbeeCode = ? OR RateCode = ?
-                """, (code, code, code))
-                pboq_record = cursor.fetchone()
-                
-                if pboq_record:
-                    # Detect which 'Bill Rate' variants exist to avoid crashes
-                    cursor.execute("PRAGMA table_info(pboq_items)")
-                    actual_cols = [c[1] for c in cursor.fetchall()]
-                    
-                    br_sets = []
-                    br_params = []
-                    for variant in ["Bill Rate", "BillRate", "Bill Rate "]:
-                        if variant in actual_cols:
-                            br_sets.append(f"\"{variant}\" = ?")
-                            br_params.append(rate)
-                    
-                    br_clause = ", " + ", ".join(br_sets) if br_sets else ""
-
-                    # Perform a clean migration/update to the standard columns
-                    cursor.execute(f"""
-                        UPDATE pboq_items 
-                        SET "Description" = ?, "Unit" = ?, PlugRate = ?, SubbeeRate = ? {br_clause},
-                            PlugCode = CASE WHEN ? NOT LIKE 'SR-%' THEN ? ELSE PlugCode END,
-                            SubbeeCode = CASE WHEN ? LIKE 'SR-%' THEN ? ELSE SubbeeCode END,
-                            RateCode = NULL
-                        WHERE rowid = ?
-                    """, (desc, unit, rate, rate) + tuple(br_params) + (code, code, code, code, pboq_record[0]))
-
-                else:
-                    target_col = "SubbeeCode" if code.startswith('SR-') else "PlugCode"
-                    cursor.execute(f"""
-                        INSERT INTO pboq_items ({target_col}, "Description", "Unit", "Bill Rate", PlugRate, SubbeeRate) 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (code, desc, unit, rate, rate, rate))
+                record = est_records.get(code) or new_estimates.get(code)
+                if not record:
+                    new_estimates[code] = [desc, code, unit, r.get('currency', ''), r.get('date_created', 'From PBOQ')]
+                    continue
+                desc_i = 1 if code in est_records else 0          # unit is record[2] in both
+                if desc and (not record[desc_i] or desc != record[desc_i]):
+                    record[desc_i] = desc
+                    changed.add(code)
+                if unit and (not record[2] or unit != record[2]):
+                    record[2] = unit
+                    changed.add(code)
+            if new_estimates:
+                cursor.executemany("""
+                    INSERT INTO estimates (project_name, rate_code, unit, currency, rate_type, grand_total, net_total, date_created)
+                    VALUES (?, ?, ?, ?, 'Plug Rate', 0.0, 0.0, ?)
+                """, list(new_estimates.values()))
+            changed = [est_records[code] for code in changed if code in est_records]
+            if changed:
+                cursor.executemany("UPDATE estimates SET project_name = ?, unit = ? WHERE id = ?",
+                                   [(desc, unit, eid) for eid, desc, unit in changed])
 
+            # 2. Update/Insert in pboq_items using standard logical columns.
+            # Search across all possible historical code columns to avoid duplicate rows.
+            entries = []
+            for r in rates_to_bake:
+                code = r.get('rate_code')
+                params = {'code': code, 'desc': r.get('project_name', ''), 'unit': r.get('unit', ''),
+                          'rate': r.get('_rate_val', 0.0), 'sr': int(code.startswith('SR-'))}
+                entries.append((code, params, params))
 
+            # Detect which 'Bill Rate' variants exist to avoid crashes
+            br_clause = "".join(f', "{variant}" = :rate' for variant in ["Bill Rate", "BillRate", "Bill Rate "]
+                                if variant in db_columns)
+            PBOQLogic.write_master_rows(cursor, entries, """
+                INSERT INTO pboq_items (PlugCode, SubbeeCode, "Description", "Unit", "Bill Rate", PlugRate, SubbeeRate)
+                VALUES (CASE WHEN :sr THEN NULL ELSE :code END, CASE WHEN :sr THEN :code END, :desc, :unit, :rate, :rate, :rate)
+            """, f"""
+                UPDATE pboq_items 
+                SET "Description" = :desc, "Unit" = :unit, PlugRate = :rate, SubbeeRate = :rate {br_clause},
+                    PlugCode = CASE WHEN :sr THEN PlugCode ELSE :code END,
+                    SubbeeCode = CASE WHEN :sr THEN :code ELSE SubbeeCode END,
+                    RateCode = NULL
+                WHERE rowid = :rowid
+            """)
             
             conn.commit()
             conn.close()
@@ -999,19 +1002,13 @@ class RateManagerDialog(QDialog):
             
         # --- SMART REDIRECT ---
         # If the source is the Project Database (e.g., Two.db), it won't have a bill view alone.
-        # We scan all PBOQs in the project to find where this rate is actually being used.
+        # The project's code index tells which bill actually uses this rate.
         proj_db_name = getattr(self, 'project_db_name', "Two.db")
         if lib_name.lower() == proj_db_name.lower():
-            pboq_dir = os.path.join(project_dir, "Priced BOQs")
-            if os.path.exists(pboq_dir):
-                from database import DatabaseManager as _DB
-                for f in os.listdir(pboq_dir):
-                    if f.lower().endswith('.db'):
-                        test_path = os.path.join(pboq_dir, f)
-                        temp_db = _DB(test_path)
-                        if rate_code in temp_db.get_pboq_rates_summary():
-                            lib_name = f # Redirect lib_name to the bill filename
-                            break
+            from project_code_index import ProjectCodeIndex
+            uses = ProjectCodeIndex(project_dir).where_used(rate_code, kind='pboq')
+            if uses:
+                lib_name = os.path.basename(uses[0].path) # Redirect lib_name to the bill filename
         # ----------------------
 
         bill_path = os.path.join(project_dir, "Priced BOQs", lib_name)
@@ -0,0 +1,139 @@
+"""
+Rate Sync — Writes a changed rate into the project's SOR and PBOQ files and reports each cell it changed.
+
+The global sync of the Rate Build-up used to refresh open viewers by reloading whole
+bills. The sync functions here return the cells they changed as SyncDelta(path,
+rowid, column, value), so an open PBOQDialog or SORDialog re-reads or rewrites only
+those rows.
+
+Usage:
+    from rate_sync import sync_sor_rate, sync_pboq_rate, count_code_rows
+    count_code_rows(pboq_path, "RC-001")    # rows the PBOQ sync would fall back to
+    deltas = sync_sor_rate(sor_path, "RC-001", 125.5)
+    deltas += sync_pboq_rate(pboq_path, "RC-001", 125.5, mappings)
+    viewer.apply_sync_deltas(deltas)        # PBOQDialog / SORDialog
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass
+
+from pboq_mirror import connect_bill
+
+
+@dataclass(frozen=True)
+class SyncDelta:
+    """One cell a sync wrote: pboq_items / sor_items row and physical column name."""
+    path: str
+    rowid: int
+    column: str
+    value: str
+
+
+def same_file(a, b):
+    return bool(a) and bool(b) and os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def _quote(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _any_column(db_cols, rate_code_clean):
+    """WHERE fragment and parameters matching a code in any column of pboq_items."""
+    return " OR ".join(f'TRIM(UPPER({_quote(c)})) = ?' for c in db_cols), [rate_code_clean] * len(db_cols)
+
+
+def count_code_rows(path, rate_code):
+    """Rows of a bill holding rate_code in any column: the rows sync_pboq_rate falls back
+    to when the code is not in the bill's rate code column."""
+    conn = connect_bill(path)
+    try:
+        db_cols = [info[1] for info in conn.execute("PRAGMA table_info(pboq_items)")]
+        if not db_cols: return 0
+        where_frag, q_params = _any_column(db_cols, rate_code.strip().upper())
+        return conn.execute(f'SELECT COUNT(*) FROM pboq_items WHERE {where_frag}', q_params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def sync_sor_rate(path, rate_code, new_gross):
+    """Sets GrossRate on every SOR item carrying rate_code; returns the changed cells."""
+    new_gross_str = "{:,.2f}".format(new_gross)
+    rate_code_clean = rate_code.strip().upper()
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT rowid, GrossRate FROM sor_items WHERE TRIM(UPPER(RateCode)) = ?", (rate_code_clean,))
+        deltas = [SyncDelta(path, rowid, "GrossRate", new_gross_str)
+                  for rowid, old in cursor.fetchall() if old != new_gross_str]
+        cursor.execute("UPDATE sor_items SET GrossRate = ? WHERE TRIM(UPPER(RateCode)) = ?", (new_gross_str, rate_code_clean))
+        conn.commit()
+        return deltas
+    finally:
+        conn.close()
+
+
+def sync_pboq_rate(path, rate_code, new_gross, mappings):
+    """Writes the new gross rate into the rate columns of every bill row carrying rate_code
+    and re-extends their Bill Amount; returns the changed cells.
+
+    Rows are found through the mapped Rate Code column (or the logical RateCode), falling
+    back to any column holding the code. mappings are display indices as in the PBOQ viewer.
+    """
+    new_gross_str = "{:,.2f}".format(new_gross)
+    rate_code_clean = rate_code.strip().upper()
+    conn = connect_bill(path)
+    try:
+        cursor = conn.cursor()
+        # Physical names (Column 0, Column 1, ...) of the mapped roles
+        cursor.execute("PRAGMA table_info(pboq_items)")
+        db_cols = [info[1] for info in cursor.fetchall()]
+        deltas = []
+        if not db_cols: return deltas
+
+        def mapped(role):
+            db_idx = mappings.get(role, -1) + 1
+            return db_cols[db_idx] if 0 < db_idx < len(db_cols) else None
+
+        search_col = mapped('rate_code') or "RateCode"
+        where_frag = f'TRIM(UPPER({_quote(search_col)})) = ?'
+        q_params = [rate_code_clean]
+        # A code not found in its column is looked for in every column
+        cursor.execute(f'SELECT COUNT(*) FROM pboq_items WHERE {where_frag}', q_params)
+        if cursor.fetchone()[0] == 0:
+            where_frag, q_params = _any_column(db_cols, rate_code_clean)
+
+        # 1. Mapped rate columns and the logical helpers, in one UPDATE (a repeated column keeps its last value)
+        values = {}
+        for role, val in (('bill_rate', new_gross_str), ('rate', new_gross_str), ('rate_code', rate_code)):
+            if mapped(role): values[mapped(role)] = val
+        if "GrossRate" in db_cols: values["GrossRate"] = new_gross_str
+        if "RateCode" in db_cols: values["RateCode"] = rate_code
+        if values:
+            cols = list(values)
+            cursor.execute(f'SELECT rowid, {", ".join(_quote(c) for c in cols)} FROM pboq_items WHERE {where_frag}',
+                           q_params)
+            for rowid, *old in cursor.fetchall():
+                deltas.extend(SyncDelta(path, rowid, c, values[c]) for c, o in zip(cols, old) if o != values[c])
+            cursor.execute(f'UPDATE pboq_items SET {", ".join(f"{_quote(c)} = ?" for c in cols)} WHERE {where_frag}',
+                           [values[c] for c in cols] + q_params)
+
+        # 2. Bill Amount = rate x quantity for the synced rows
+        a_col, q_col = mapped('bill_amount'), mapped('qty')
+        if a_col and q_col:
+            r_val_rounded = round(float(new_gross), 2)
+            cursor.execute(f'SELECT rowid, {_quote(q_col)}, {_quote(a_col)} FROM pboq_items WHERE {where_frag}', q_params)
+            amounts = []
+            for rowid, q_str, old_amt in cursor.fetchall():
+                if q_str is None or str(q_str).strip() == "": continue
+                try: qv = float(str(q_str).replace(',', ''))
+                except ValueError: continue
+                amt = "{:,.2f}".format(round(r_val_rounded * round(qv, 4), 2))
+                amounts.append((amt, rowid))
+                if amt != old_amt: deltas.append(SyncDelta(path, rowid, a_col, amt))
+            cursor.executemany(f'UPDATE pboq_items SET {_quote(a_col)} = ? WHERE rowid = ?', amounts)
+
+        conn.commit()
+        return deltas
+    finally:
+        conn.close()
@@ -10,6 +10,8 @@ from reportlab.pdfgen import canvas
 import os
 import sqlite3
 import json
+from pboq_mirror import connect_bill
+from pboq_numeric import ensure_numbers, numbers_join, number_of
 
 class ReportGenerator:
     def __init__(self, estimate):
@@ -808,7 +810,7 @@ class ExecutiveAnalyticsReportGenerator:
                     except: pass
                 
                 try:
-                    conn = sqlite3.connect(db_path)
+                    conn = connect_bill(db_path)
                     cursor = conn.cursor()
                     cursor.execute("PRAGMA table_info(pboq_items)")
                     cols = [info[1] for info in cursor.fetchall()]
@@ -844,12 +846,15 @@ class ExecutiveAnalyticsReportGenerator:
                         conn.close()
                         continue
                         
+                    # Money and quantity columns come pre-parsed from their numeric shadows
+                    shadowed = ensure_numbers(conn, build=False)
                     query_cols = []
                     for k in ['sheet', 'desc', 'qty', 'bill_rate', 'bill_amt', 'unit', 'gross', 'plug', 'sub', 'prov', 'pc', 'dw', 'flag', 'rcode', 'pcode', 'spkg', 'sname', 'sub_code']:
-                        if col_map[k]: query_cols.append(f"\"{col_map[k]}\"")
+                        if k in ('qty', 'bill_rate', 'bill_amt', 'gross', 'plug', 'sub', 'prov', 'pc', 'dw'): query_cols.append(number_of(col_map[k], shadowed))
+                        elif col_map[k]: query_cols.append(f"pboq_items.\"{col_map[k]}\"")
                         else: query_cols.append("''")
                         
-                    cursor.execute(f"SELECT {', '.join(query_cols)} FROM pboq_items")
+                    cursor.execute(f"SELECT {', '.join(query_cols)} FROM pboq_items {numbers_join(shadowed)}")
                     rows = cursor.fetchall()
                     
                     # Also need to get project estimates net cache
@@ -863,25 +868,14 @@ class ExecutiveAnalyticsReportGenerator:
                     except: pass
                     
                     for r in rows:
-                        sheet, desc, q, br, ba, unit_val, gross, plug, sub, prov, pc, dw, flag, rcode, pcode, spkg, sname, sub_code = r
+                        sheet, desc, qty_f, bill_rate_f, bill_amt_f, unit_val, g_val, p_val, s_val, pr_val, pc_val, d_val, flag, rcode, pcode, spkg, sname, sub_code = r
                         desc_low = (desc or "").lower()
                         if not str(desc).strip() or "collection" in desc_low or "summary" in desc_low:
                             continue
-                            
-                        qty_f = self._to_float(q)
-                        bill_rate_f = self._to_float(br)
-                        bill_amt_f = self._to_float(ba)
                         
                         if qty_f == 0 and bill_amt_f == 0:
                             continue
                         
-                        g_val = self._to_float(gross)
-                        p_val = self._to_float(plug)
-                        s_val = self._to_float(sub)
-                        pr_val = self._to_float(prov)
-                        pc_val = self._to_float(pc)
-                        d_val = self._to_float(dw)
-                        
                         is_row_priced = (g_val > 0 or p_val > 0 or s_val > 0 or pr_val > 0 or pc_val > 0 or d_val > 0)
                         if not is_row_priced:
                             if bill_rate_f > 0 and abs(bill_rate_f - dummy_val) > 0.0001:
@@ -1095,7 +1089,7 @@ class ExecutiveAnalyticsReportGenerator:
                     
                     if q_idx is None or br_idx is None or pkg_idx is None: continue
                     
-                    conn = sqlite3.connect(db_path)
+                    conn = connect_bill(db_path)
                     cursor = conn.cursor()
                     cursor.execute("PRAGMA table_info(pboq_items)")
                     cols = [info[1] for info in cursor.fetchall()]
@@ -592,7 +592,7 @@ class RSDialog(QDialog):
             return
 
         try:
-            from rs_export import RSExcelExporter
+            from export_jobs import ExportJob, ExportProgressDialog, rs_export_task
         except ImportError:
             QMessageBox.warning(self, "Export Error", "rs_export module not found.")
             return
@@ -610,8 +610,8 @@ class RSDialog(QDialog):
             return
 
         try:
-            exporter = RSExcelExporter(self.result)
-            success, message = exporter.export(output_path)
+            job = ExportJob([rs_export_task(self.result, output_path)], workers=0)
+            _, success, message = ExportProgressDialog(job, self).run()[0]
             if success:
                 QMessageBox.information(self, "Export Complete", message)
             else:
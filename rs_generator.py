@@ -15,11 +15,12 @@ Usage:
 
 import os
 import re
-import sqlite3
 import json
 from dataclasses import dataclass, field
 from database import DatabaseManager
 from orm_models import DBEstimate
+from pboq_mirror import connect_bill
+from pboq_numeric import parse_number
 
 
 # ─── Data Classes ────────────────────────────────────────────────────────────
@@ -207,7 +208,7 @@ class RSGenerator:
         """
         from pboq_logic import PBOQLogic
 
-        conn = sqlite3.connect(self.pboq_db_path)
+        conn = connect_bill(self.pboq_db_path)
         PBOQLogic.ensure_schema(conn)
         cursor = conn.cursor()
 
@@ -578,16 +579,9 @@ class RSGenerator:
 
     @staticmethod
     def _parse_float(val):
-        """Safely parses a value to float, returning 0.0 on failure."""
-        if val is None:
-            return 0.0
-        try:
-            cleaned = str(val).replace(',', '').replace('₵', '').replace('$', '').strip()
-            if not cleaned:
-                return 0.0
-            return float(cleaned)
-        except (ValueError, TypeError):
-            return 0.0
+        """Parses a cell value like pboq_numeric.parse_number, returning 0.0 when it is empty or not a number."""
+        number = parse_number(val)
+        return 0.0 if number is None else number
 
     @staticmethod
     def _clean_str(val):
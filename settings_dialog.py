@@ -1,6 +1,7 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QLineEdit, QComboBox, 
                              QDialogButtonBox, QLabel, QMessageBox, QPushButton, QFileDialog, QHBoxLayout,
-                             QColorDialog, QGroupBox, QGridLayout, QTableWidget, QTableWidgetItem, QHeaderView, QMenu)
+                             QColorDialog, QGroupBox, QGridLayout, QTableWidget, QTableWidgetItem, QHeaderView, QMenu,
+                             QCheckBox)
 from PyQt6.QtGui import QDoubleValidator, QColor, QAction
 from PyQt6.QtCore import Qt
 from database import DatabaseManager
@@ -268,6 +269,13 @@ class SettingsDialog(QDialog):
             
         app_form.addRow("AI Reasoner Model:", self.ai_model_combo)
 
+        # Bills kept in memory while open, written back on a timer (pboq_mirror)
+        self.memory_mirror_check = QCheckBox("Edit open PBOQs in memory")
+        self.memory_mirror_check.setToolTip("Faster edits on network drives. The bill is saved back every "
+                                            "30 seconds and on close, with local crash recovery.")
+        self.memory_mirror_check.setChecked(self.db_manager.get_setting('pboq_memory_mirror', '0') == '1')
+        app_form.addRow("PBOQ Editing:", self.memory_mirror_check)
+
         self.logs_btn = QPushButton("Open Logs Folder...")
         self.logs_btn.clicked.connect(self._open_logs_folder)
         app_form.addRow("Diagnostics:", self.logs_btn)
@@ -626,6 +634,7 @@ class SettingsDialog(QDialog):
             if selected_model == "None":
                 selected_model = ""
             self.db_manager.set_setting('ai_model_name', selected_model)
+            self.db_manager.set_setting('pboq_memory_mirror', '1' if self.memory_mirror_check.isChecked() else '0')
 
             QMessageBox.information(self, "Success", "Settings saved successfully.")
             self.accept()
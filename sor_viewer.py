@@ -1,13 +1,14 @@
 import os
 import sqlite3
 import json
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QSplitter, 
                              QListWidget, QTableWidget, QTableWidgetItem, 
                              QLabel, QMessageBox, QHeaderView, QListWidgetItem,
                              QLineEdit, QWidget, QCheckBox, QDockWidget, QScrollArea,
                              QFrame, QGroupBox)
 import pboq_constants as const
+from pboq_search import TableSearchIndex, apply_row_visibility
 
 class SORToolsPane(QWidget):
     """Encapsulates the search, list, and stats for SOR into a dockable pane."""
@@ -88,6 +89,7 @@ class SORDialog(QDialog):
         self.project_dir = project_dir
         self.sor_folder = os.path.join(self.project_dir, "SOR")
         self.clipboard_data = None  # Store copied rate data
+        self._row_of = {}           # (normalized SOR path, sor_items rowid) -> table row
         
         self.setWindowTitle("Schedules of Rate (SOR)")
         self.setMinimumSize(950, 400)
@@ -101,7 +103,12 @@ class SORDialog(QDialog):
         self.keywords_input = QLineEdit()
         self.keywords_input.setPlaceholderText("Enter keywords (comma separated) to filter SOR...")
         self.keywords_input.setMinimumWidth(300)
-        self.keywords_input.textChanged.connect(self._filter_table)
+        self.keywords_input.textChanged.connect(lambda _: self._filter_timer.start())
+        # Debounce keystrokes so a burst of typing runs a single filter pass
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(150)
+        self._filter_timer.timeout.connect(self._filter_table)
         top_bar.addWidget(self.keywords_input)
         top_bar.addStretch()
 
@@ -128,6 +135,7 @@ class SORDialog(QDialog):
         self.table_widget.setAlternatingRowColors(True)
         self.table_widget.verticalHeader().setVisible(False)
         self.table_widget.setShowGrid(False)
+        self.search_index = TableSearchIndex(self.table_widget)
         self.table_widget.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         
         header = self.table_widget.horizontalHeader()
@@ -225,6 +233,7 @@ class SORDialog(QDialog):
     def _load_selected_sor(self):
         self._save_sor_state()
         self.table_widget.setRowCount(0)
+        self._row_of = {}
         
         checked_items = []
         for index in range(self.list_widget.count()):
@@ -262,7 +271,7 @@ class SORDialog(QDialog):
                 cursor.execute("PRAGMA table_info(sor_items)")
                 columns = [info[1] for info in cursor.fetchall()]
                 
-                query = "SELECT Sheet, Ref, Description, Quantity, Unit"
+                query = "SELECT rowid, Sheet, Ref, Description, Quantity, Unit"
                 if "GrossRate" in columns: query += ", GrossRate"
                 else: query += ", NULL"
                 if "RateCode" in columns: query += ", RateCode"
@@ -272,8 +281,10 @@ class SORDialog(QDialog):
                 cursor.execute(query)
                 rows = cursor.fetchall()
                 
+                file_key = os.path.normcase(os.path.abspath(file_path))
                 for r in rows:
-                    all_rows.append((sor_name,) + r)
+                    self._row_of[(file_key, r[0])] = len(all_rows)
+                    all_rows.append((sor_name,) + r[1:])
                     
                 conn.close()
                 
@@ -303,31 +314,28 @@ class SORDialog(QDialog):
 
         self._filter_table()
 
-    def _filter_table(self, *args):
-        keywords_text = self.keywords_input.text().lower()
-        keywords = [k.strip() for k in keywords_text.split(',') if k.strip()]
+    def apply_sync_deltas(self, deltas):
+        """Writes the cells a global rate sync changed (rate_sync.SyncDelta) into the loaded rows,
+        instead of reloading every checked SOR."""
+        col_of = {"GrossRate": 6, "RateCode": 7}
+        changed = False
+        for d in deltas:
+            row = self._row_of.get((os.path.normcase(os.path.abspath(d.path)), d.rowid))
+            col = col_of.get(d.column)
+            if row is None or col is None: continue
+            item = self.table_widget.item(row, col)
+            if item: item.setText(d.value)
+            changed = True
+        if changed: self._update_priced_stats()
 
-        found_count = 0
+    def _filter_table(self, *args):
+        self._filter_timer.stop()
+        keywords = self._get_active_keywords()
 
-        for row in range(self.table_widget.rowCount()):
-            row_visible = True
-            
-            row_texts = []
-            for col in range(self.table_widget.columnCount()):
-                item = self.table_widget.item(row, col)
-                if item:
-                    row_texts.append(item.text().lower())
-            
-            full_row_text = " ".join(row_texts)
-            
-            if keywords:
-                # AND logic: all keywords must be present
-                if not all(kw in full_row_text for kw in keywords):
-                    row_visible = False
-                        
-            self.table_widget.setRowHidden(row, not row_visible)
-            if row_visible:
-                found_count += 1
+        # AND logic: all keywords must be present in the joined row text
+        visible = self.search_index.rows_containing_all(keywords) if keywords else None
+        apply_row_visibility(self.table_widget, visible)
+        found_count = len(visible) if visible is not None else self.table_widget.rowCount()
                 
         if not keywords:
             self.found_rates_label.setText("Found Rates : 0")
@@ -725,27 +733,18 @@ class SORDialog(QDialog):
             
         found_count = 0
         
-        for row in range(self.table_widget.rowCount()):
-            # We match against the full row text just like the filter does
-            row_texts = []
-            for col in range(self.table_widget.columnCount()):
-                item = self.table_widget.item(row, col)
-                if item:
-                    row_texts.append(item.text().lower())
+        # We match against the full row text just like the filter does
+        for row in sorted(self.search_index.rows_containing_all(keywords)):
+            # Update UI
+            gross_item = QTableWidgetItem(f"{gross_rate:,.2f}")
+            gross_item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+            self.table_widget.setItem(row, 6, gross_item)
+            self.table_widget.setItem(row, 7, QTableWidgetItem(rate_code))
             
-            full_row_text = " ".join(row_texts)
+            # Persist to DB
+            self._persist_to_sor_db(row, f"{gross_rate:,.2f}", rate_code)
+            found_count += 1
             
-            if all(kw in full_row_text for kw in keywords):
-                # Update UI
-                gross_item = QTableWidgetItem(f"{gross_rate:,.2f}")
-                gross_item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-                self.table_widget.setItem(row, 6, gross_item)
-                self.table_widget.setItem(row, 7, QTableWidgetItem(rate_code))
-                
-                # Persist to DB
-                self._persist_to_sor_db(row, f"{gross_rate:,.2f}", rate_code)
-                found_count += 1
-                
         if found_count > 0:
             self.table_widget.resizeColumnToContents(6)
             self.table_widget.resizeColumnToContents(7)
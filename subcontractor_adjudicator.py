@@ -7,6 +7,7 @@ import os
 import shutil
 from PyQt6.QtCore import Qt, QSettings
 from PyQt6.QtGui import QColor, QBrush
+from pboq_mirror import connect_bill
 
 # Number of fixed (read-only) base columns: Ref, Description, Qty, Unit, Ref Rate
 BASE_COL_COUNT = 5
@@ -361,7 +362,7 @@ class PackageAdjudicatorDialog(QDialog):
         self.package_combo.blockSignals(True)
         self.package_combo.clear()
         
-        conn = sqlite3.connect(self.pboq_db_path)
+        conn = connect_bill(self.pboq_db_path)
         cursor = conn.cursor()
         try:
             cursor.execute(f'SELECT DISTINCT "{self.pkg_db_col}" FROM pboq_items WHERE "{self.pkg_db_col}" IS NOT NULL AND "{self.pkg_db_col}" != \'\'')
@@ -392,7 +393,7 @@ class PackageAdjudicatorDialog(QDialog):
         self.subcontractors = []
         quotes = {}
         try:
-            conn = sqlite3.connect(self.pboq_db_path)
+            conn = connect_bill(self.pboq_db_path)
             cursor = conn.cursor()
             cursor.execute("SELECT subcontractor_name, row_idx, rate FROM subcontractor_quotes WHERE package_name=?", (pkg,))
             for sub_name, rid, rate in cursor.fetchall():
@@ -507,7 +508,7 @@ class PackageAdjudicatorDialog(QDialog):
 
             # Save Subcontractor Contact Details to DB
             try:
-                conn = sqlite3.connect(self.pboq_db_path)
+                conn = connect_bill(self.pboq_db_path)
                 from pboq_logic import PBOQLogic
                 PBOQLogic.ensure_schema(conn)
                 cursor = conn.cursor()
@@ -602,7 +603,7 @@ class PackageAdjudicatorDialog(QDialog):
 
             # Delete from database
             try:
-                conn = sqlite3.connect(self.pboq_db_path)
+                conn = connect_bill(self.pboq_db_path)
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM subcontractor_quotes WHERE package_name=? AND subcontractor_name=?", (pkg, name))
                 conn.commit()
@@ -616,7 +617,7 @@ class PackageAdjudicatorDialog(QDialog):
             # Reload quotes for remaining subcontractors
             quotes = {}
             try:
-                conn = sqlite3.connect(self.pboq_db_path)
+                conn = connect_bill(self.pboq_db_path)
                 cursor = conn.cursor()
                 cursor.execute("SELECT subcontractor_name, row_idx, rate FROM subcontractor_quotes WHERE package_name=?", (pkg,))
                 for sub_name, rid, rate in cursor.fetchall():
@@ -715,7 +716,7 @@ class PackageAdjudicatorDialog(QDialog):
             rate = 0.0
             
         try:
-            conn = sqlite3.connect(self.pboq_db_path)
+            conn = connect_bill(self.pboq_db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT id FROM subcontractor_quotes WHERE package_name=? AND row_idx=? AND subcontractor_name=?", (pkg, rowid, sub_name))
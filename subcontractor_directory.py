@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdi
                              QMessageBox, QAbstractItemView)
 from PyQt6.QtCore import Qt
 from pboq_logic import PBOQLogic
+from pboq_mirror import connect_bill
 
 class SubcontractorDirectoryDialog(QDialog):
     def __init__(self, pboq_db_path, project_dir, parent=None):
@@ -90,7 +91,7 @@ class SubcontractorDirectoryDialog(QDialog):
         # 1. Gather all Contact Details from current DB (assume it's the primary working file)
         directories = {} # name -> {phone, email}
         try:
-            conn = sqlite3.connect(self.pboq_db_path)
+            conn = connect_bill(self.pboq_db_path)
             PBOQLogic.ensure_schema(conn)
             cursor = conn.cursor()
             cursor.execute("SELECT name, phone, email FROM subcontractor_details")
@@ -107,7 +108,7 @@ class SubcontractorDirectoryDialog(QDialog):
         
         for db_file in all_dbs:
             try:
-                conn = sqlite3.connect(db_file)
+                conn = connect_bill(db_file)
                 cursor = conn.cursor()
                 
                 # We strictly query the logical columns 'SubbeeName' and 'SubbeePackage'
@@ -196,7 +197,7 @@ class SubcontractorDirectoryDialog(QDialog):
         updated_count = 0
         for db_file in all_dbs:
             try:
-                conn = sqlite3.connect(db_file)
+                conn = connect_bill(db_file)
                 PBOQLogic.ensure_schema(conn)
                 cursor = conn.cursor()
                 for name, phone, email in updates:
@@ -236,7 +237,7 @@ class SubcontractorDirectoryDialog(QDialog):
             all_dbs = self._get_all_pboq_dbs()
             for db_file in all_dbs:
                 try:
-                    conn = sqlite3.connect(db_file)
+                    conn = connect_bill(db_file)
                     cursor = conn.cursor()
                     cursor.execute("DELETE FROM subcontractor_details WHERE name=?", (name,))
                     conn.commit()
@@ -1,6 +1,7 @@
 import sqlite3
 import pandas as pd
 from openpyxl.styles import PatternFill, Font, Alignment, Protection
+from pboq_mirror import connect_bill
 
 class SubcontractorIO:
     """Handles exporting and importing Excel RFQs securely to ensure data integrity."""
@@ -203,7 +204,7 @@ class SubcontractorIO:
 
         updates = 0
         
-        conn = sqlite3.connect(db_path)
+        conn = connect_bill(db_path)
         cursor = conn.cursor()
         
         try: